@@ -0,0 +1,130 @@
+"""
+Damage Map Benchmark
+지도 HTML 생성 시간 / 크기 비교 스크립트 (이미지 base64 삽입 vs 파일 URL 참조)
+
+Writes the total damage map of N markers twice and reports the generation time and HTML size:
+- inline: every image read and base64 encoded into an IFrame popup (the previous UserClass.makeDamageMap).
+- url: all markers as one clustered array (UserClass.makeDamageMap without the damage index), popups
+  reference the 200px thumbnail (or the image) by file URL, loaded when the popup opens.
+The fixture images are generated unless --images_dir is given, their thumbnails are made beforehand
+(as the inference scripts do) and not counted.
+
+Usage:
+    python benchmark_damage_map.py --num_markers 1000
+    python benchmark_damage_map.py --num_markers 50000 --image_size 320 240 --modes url
+    python benchmark_damage_map.py --images_dir "init/data/Images" --thumbnail_dir "init/data/thumbnails"
+"""
+
+import os
+import sys
+import time
+import base64
+import argparse
+import tempfile
+
+import numpy as np
+import folium
+from PySide6.QtGui import QGuiApplication, QImage
+
+from modules.damage_map import newDamageMap, addClusteredMarkers
+from modules.map_bridge import markerRow, imageUrl
+from modules.thumbnail_cache import ThumbnailCache
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark the damage map HTML')
+    parser.add_argument('--num_markers', type=int, default=1000, help='the number of markers')
+    parser.add_argument('--images_dir', default=None, help='the dir of images to show (generated by default)')
+    parser.add_argument('--thumbnail_dir', default=None, help='the thumbnail cache dir (a temporary one by default)')
+    parser.add_argument('--image_size', type=int, nargs=2, default=[1920, 1080], help='the width and height of generated images')
+    parser.add_argument('--modes', nargs='+', default=['inline', 'url'], choices=['inline', 'url'], help='the maps to write')
+    parser.add_argument('--seed', type=int, default=0, help='the seed of generated images and locations')
+
+    args = parser.parse_args()
+    return args
+
+
+def write_images(images_dir, num_images, width, height, rng):
+    # Smooth blocks with fine noise, about the JPEG size of road surface photos
+    os.makedirs(images_dir, exist_ok=True)
+    for i in range(num_images):
+        blocks = rng.integers(60, 200, (height // 16 + 1, width // 16 + 1, 1), dtype=np.uint8)
+        image = np.repeat(np.repeat(blocks, 16, axis=0), 16, axis=1)[:height, :width]
+        image = np.repeat(image, 3, axis=2) + rng.integers(0, 24, (height, width, 3), dtype=np.uint8)
+        image = np.ascontiguousarray(image)
+        QImage(image.data, width, height, width * 3, QImage.Format.Format_RGB888).save(os.path.join(images_dir, f'image_{i:05d}.jpg'), 'JPG', 90)
+
+
+def make_items(images_dir, num_markers, rng):
+    names = sorted(name for name in os.listdir(images_dir) if name.lower().endswith(('.jpg', '.jpeg', '.png')))
+    latitudes = 37.5 + rng.normal(0, 0.05, num_markers)
+    longitudes = 127.0 + rng.normal(0, 0.05, num_markers)
+
+    return [
+        {"name": f"항목 {i}", "image_path": names[i % len(names)], "latitude": float(latitudes[i]), "longitude": float(longitudes[i])}
+        for i in range(num_markers)
+    ]
+
+
+def inline_map(items, images_dir, html_path):
+    # The previous implementation, kept here for comparison
+    damage_map = folium.Map(location=[37.5, 127.0], zoom_start=11)
+    for item in items:
+        encoded_image = base64.b64encode(open(os.path.join(images_dir, item["image_path"]), 'rb').read()).decode()
+        popup_html = f"""
+        <b>{item['name']}</b><br>
+        위도: {item['latitude']:.6f}<br>
+        경도: {item['longitude']:.6f}<br><br>
+        <img src="data:image/jpeg;base64,{encoded_image}" width="200">
+        """
+        iframe = folium.IFrame(popup_html, width=240, height=280)
+        folium.Marker(location=[item['latitude'], item['longitude']], popup=folium.Popup(iframe), tooltip=item['name']).add_to(damage_map)
+    damage_map.save(html_path)
+
+
+def url_map(items, images_dir, thumbnail_cache, html_path):
+    damage_map = newDamageMap([37.5, 127.0], zoom_start=11)
+    rows = []
+    for item in items:
+        image_path = os.path.join(images_dir, item["image_path"])
+        rows.append(markerRow(item, imageUrl(thumbnail_cache.cachedThumbnail(image_path, 200) or image_path)))
+    addClusteredMarkers(damage_map, rows)
+    damage_map.save(html_path)
+
+
+def main():
+    args = parse_args()
+    app = QGuiApplication.instance() or QGuiApplication(sys.argv)
+    rng = np.random.default_rng(args.seed)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        images_dir = args.images_dir
+        if images_dir is None:
+            images_dir = os.path.join(tmp_dir, 'Images')
+            write_images(images_dir, args.num_markers, *args.image_size, rng)
+        items = make_items(images_dir, args.num_markers, rng)
+        image_bytes = sum(os.path.getsize(os.path.join(images_dir, item["image_path"])) for item in items)
+
+        # Thumbnails are made beforehand, by the inference scripts or the list of the viewer
+        thumbnail_cache = ThumbnailCache(args.thumbnail_dir or os.path.join(tmp_dir, 'thumbnails'))
+        start = time.perf_counter()
+        for item in items:
+            thumbnail_cache.thumbnail(os.path.join(images_dir, item["image_path"]), 200)
+        print(f"{len(items)} markers, images {image_bytes / 2 ** 20:.1f} MB, thumbnails made in {time.perf_counter() - start:.2f}s (not counted)")
+
+        print(f"{'mode':<8}{'time (s)':>10}{'HTML (MB)':>12}")
+        for mode in args.modes:
+            html_path = os.path.join(tmp_dir, f'{mode}_damagemap.html')
+            start = time.perf_counter()
+            if mode == 'inline':
+                inline_map(items, images_dir, html_path)
+            else:
+                url_map(items, images_dir, thumbnail_cache, html_path)
+            print(f"{mode:<8}{time.perf_counter() - start:>10.2f}{os.path.getsize(html_path) / 2 ** 20:>12.2f}")
+
+        thumbnail_cache.close()
+    del app
+
+
+if __name__ == '__main__':
+    main()
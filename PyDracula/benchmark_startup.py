@@ -0,0 +1,162 @@
+"""
+Startup Benchmark
+PyDracula 시작 시간 측정 스크립트 (-X importtime)
+
+Starts the viewer in new interpreters with -X importtime, as `python main.py` does, until the window is painted
+for the first time, and reports:
+- the time to the end of the imports of main.py and to the first paint, from the start of the interpreter,
+- the peak memory (RSS) at the first paint, where the resource module reports it (not on Windows),
+- the top level modules that took longest to import (cumulative, from -X importtime, median run),
+- the heavy modules already imported at the first paint (pandas, folium, pyarrow, QtWebEngine), which
+  should only be imported after it.
+With --cold, every run uses a new empty bytecode cache (PYTHONPYCACHEPREFIX), so all modules (the standard
+library included) are compiled from source: the worst case, slower than the first start after an install.
+The operating system file cache is not cleared.
+Exits with status 1 when the median time to the first paint is over --budget.
+
+Usage:
+    python benchmark_startup.py
+    python benchmark_startup.py --runs 5 --cold
+    QT_QPA_PLATFORM=offscreen python benchmark_startup.py --budget 2.0 --top 20
+"""
+
+import os
+import sys
+import json
+import time
+import runpy
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+HEAVY_MODULES = ["pandas", "folium", "pyarrow", "PySide6.QtWebEngineWidgets", "PySide6.QtWebEngineCore", "PySide6.QtWebChannel"]
+RESULT_PREFIX = "STARTUP_BENCHMARK "
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark the startup of the viewer')
+    parser.add_argument('--runs', type=int, default=3, help='the number of starts (new processes)')
+    parser.add_argument('--cold', action='store_true', help='compile all modules from source in every run')
+    parser.add_argument('--budget', type=float, default=2.0, help='the target time to the first paint (seconds)')
+    parser.add_argument('--top', type=int, default=15, help='the number of slowest imports to show')
+    parser.add_argument('--child', type=float, default=None, help=argparse.SUPPRESS)  # launch time of a run
+
+    args = parser.parse_args()
+    return args
+
+
+def run_child(launch):
+    # One start of the viewer, in the process started by run_once
+    sys.path.insert(0, APP_DIR)
+    os.chdir(APP_DIR)
+
+    from PySide6.QtCore import Qt, QCoreApplication, QEvent, QObject
+    from PySide6.QtWidgets import QApplication
+
+    # Run as a script like `python main.py` (its modules import it back as `main`), without its __main__ block
+    main = runpy.run_path(os.path.join(APP_DIR, "main.py"), run_name="__startup_benchmark__")
+    imported = time.time()
+
+    class FirstPaint(QObject):
+        def eventFilter(self, obj, event):
+            if event.type() == QEvent.Type.Paint and self.painted is None:
+                self.painted = time.time()
+                self.heavy = [name for name in HEAVY_MODULES if name in sys.modules]
+                self.rss = peak_rss()
+                app.quit()
+            return False
+
+    # As main.py
+    QCoreApplication.setAttribute(Qt.AA_ShareOpenGLContexts)
+    app = QApplication(sys.argv[:1])
+    first_paint = FirstPaint()
+    first_paint.painted = None
+    window = main["MainWindow"]()
+    window.installEventFilter(first_paint)
+    app.exec()
+
+    print(RESULT_PREFIX + json.dumps({
+        "imports": imported - launch,
+        "paint": first_paint.painted - launch,
+        "heavy": first_paint.heavy,
+        "rss": first_paint.rss,
+    }), flush=True)
+
+
+def peak_rss():
+    # Peak resident memory of the process in MB, None where it is not reported
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10  # bytes on macOS, KB elsewhere
+
+
+def parse_importtime(stderr):
+    # Lines "import time: self [us] | cumulative | imported package", nested imports indented by two spaces
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        imports.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return imports
+
+
+def run_once(cold):
+    env = dict(os.environ)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        if cold:
+            env["PYTHONPYCACHEPREFIX"] = cache_dir
+        launch = time.time()
+        process = subprocess.run(
+            [sys.executable, "-X", "importtime", os.path.abspath(__file__), "--child", repr(launch)],
+            cwd=APP_DIR, env=env, capture_output=True, text=True
+        )
+
+    lines = [line for line in process.stdout.splitlines() if line.startswith(RESULT_PREFIX)]
+    if process.returncode != 0 or not lines:
+        raise RuntimeError(f"The viewer did not start:\n{process.stderr[-2000:]}")
+
+    result = json.loads(lines[-1][len(RESULT_PREFIX):])
+    result["importtime"] = parse_importtime(process.stderr)
+    return result
+
+
+def main():
+    args = parse_args()
+    if args.child is not None:
+        run_child(args.child)
+        return
+
+    results = []
+    print(f"{'run':<6}{'imports (s)':>12}{'first paint (s)':>17}{'peak RSS (MB)':>15}  heavy modules at first paint")
+    for run in range(args.runs):
+        result = run_once(args.cold)
+        results.append(result)
+        rss = f"{result['rss']:.1f}" if result["rss"] is not None else "-"
+        print(f"{run + 1:<6}{result['imports']:>12.2f}{result['paint']:>17.2f}{rss:>15}  {', '.join(result['heavy']) or '-'}")
+
+    # Slowest imports of the median run
+    results.sort(key=lambda result: result["paint"])
+    median = results[len(results) // 2]
+    top_level = sorted((item for item in median["importtime"] if item[1] == 0), key=lambda item: -item[3])
+    print(f"\nslowest top level imports (median run, {sum(item[2] for item in median['importtime']) / 1e6:.2f}s importing in total)")
+    print(f"{'module':<40}{'cumulative (ms)':>16}")
+    for name, _, _, cumulative_us in top_level[:args.top]:
+        print(f"{name:<40}{cumulative_us / 1000:>16.1f}")
+
+    paint = statistics.median(result["paint"] for result in results)
+    print(f"\nmedian first paint {paint:.2f}s, budget {args.budget:.2f}s ({'cold' if args.cold else 'warm'} bytecode cache)")
+    if paint > args.budget:
+        print("over budget")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
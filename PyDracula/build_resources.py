@@ -0,0 +1,105 @@
+"""
+Build Resources
+UI 리소스(resources.qrc) 빌드 스크립트: 바이너리 .rcc + Python 대체 모듈
+
+Compiles resources.qrc with rcc into:
+- modules/resources.rcc: binary bundle, registered at startup with QResource.registerResource (memory-mapped by Qt)
+- modules/resources_fallback_rc.py: the same files as a Python module, imported only when the bundle is missing
+With --from_py the files listed in resources.qrc are read back from the existing Python module instead of the
+images folder (when it is not checked out), and only the binary bundle is written.
+
+Usage:
+    python build_resources.py
+    python build_resources.py --from_py
+"""
+
+import os
+import sys
+import shutil
+import argparse
+import tempfile
+import subprocess
+import importlib.util
+import xml.etree.ElementTree as ET
+
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+QRC_PATH = os.path.join(APP_DIR, "resources.qrc")
+RCC_PATH = os.path.join(APP_DIR, "modules", "resources.rcc")
+FALLBACK_PATH = os.path.join(APP_DIR, "modules", "resources_fallback_rc.py")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Build the UI resources')
+    parser.add_argument('--from_py', action='store_true', help='read the files from the Python module instead of the images folder')
+    parser.add_argument('--rcc', default=None, help='the rcc executable (the rcc of PySide6 by default)')
+
+    args = parser.parse_args()
+    return args
+
+
+def find_rcc():
+    # The rcc shipped with PySide6 (pyside6-rcc always adds "-g python", which the binary bundle cannot use)
+    import PySide6
+    package_dir = os.path.dirname(PySide6.__file__)
+    for path in [os.path.join(package_dir, "rcc.exe"), os.path.join(package_dir, "Qt", "libexec", "rcc")]:
+        if os.path.exists(path):
+            return path
+    raise FileNotFoundError("rcc not found, install PySide6 or pass --rcc")
+
+
+def qrc_files(qrc_path):
+    # (resource path, file path relative to the .qrc) of every file, e.g. (":/icons/images/icons/cil-3d.png", "images/icons/cil-3d.png")
+    files = []
+    for resource in ET.parse(qrc_path).getroot().iter("qresource"):
+        prefix = resource.get("prefix", "/").strip("/")
+        for file in resource.iter("file"):
+            name = file.get("alias") or file.text
+            files.append((":/" + "/".join(part for part in [prefix, name] if part), file.text))
+    return files
+
+
+def extract_files(qrc_path, out_dir):
+    # Registers the Python module (on import) and writes its files where resources.qrc expects them
+    from PySide6.QtCore import QFile, QIODevice
+
+    # Qt reads the registered bytes of the module, it is kept until the files are written
+    spec = importlib.util.spec_from_file_location("resources_fallback_rc", FALLBACK_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    for resource_path, file_path in qrc_files(qrc_path):
+        file = QFile(resource_path)
+        if not file.open(QIODevice.OpenModeFlag.ReadOnly):
+            raise FileNotFoundError(f"{resource_path} is not in {FALLBACK_PATH}")
+        os.makedirs(os.path.join(out_dir, os.path.dirname(file_path)), exist_ok=True)
+        with open(os.path.join(out_dir, file_path), "wb") as f:
+            f.write(bytes(file.readAll()))
+        file.close()
+    shutil.copy(qrc_path, os.path.join(out_dir, os.path.basename(qrc_path)))
+    module.qCleanupResources()
+
+
+def run_rcc(rcc, qrc_path, *options):
+    subprocess.run([rcc, *options, os.path.basename(qrc_path)], cwd=os.path.dirname(qrc_path), check=True)
+
+
+def main():
+    args = parse_args()
+    rcc = args.rcc or find_rcc()
+
+    # The bundle is compressed with zlib only (--no-zstd), readable by Qt builds without zstd
+
+    if args.from_py:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            extract_files(QRC_PATH, tmp_dir)
+            run_rcc(rcc, os.path.join(tmp_dir, os.path.basename(QRC_PATH)), "--binary", "--no-zstd", "-o", RCC_PATH)
+    else:
+        run_rcc(rcc, QRC_PATH, "--binary", "--no-zstd", "-o", RCC_PATH)
+        run_rcc(rcc, QRC_PATH, "-g", "python", "-o", FALLBACK_PATH)
+
+    print(f"{RCC_PATH}: {os.path.getsize(RCC_PATH) / 2 ** 10:.0f} KB")
+
+
+if __name__ == '__main__':
+    main()
@@ -63,8 +63,9 @@ class MainWindow(QMainWindow):
         # ///////////////////////////////////////////////////////////////
         UIFunctions.uiDefinitions(self)
 
-        # SET USER CLASS
+        # SET USER CLASS (STARTED AFTER THE FIRST PAINT, SEE paintEvent)
         self.user = UserClass(widgets, self)
+        self.userStarted = False
 
         # QTableWidget PARAMETERS
         # ///////////////////////////////////////////////////////////////
@@ -144,6 +145,16 @@ class MainWindow(QMainWindow):
         # Update Size Grips
         UIFunctions.resize_grips(self)
 
+    # PAINT EVENTS
+    # ///////////////////////////////////////////////////////////////
+    def paintEvent(self, event):
+        QMainWindow.paintEvent(self, event)
+
+        # START THE MAP VIEW AND PROJECT LOADING ONCE THE WINDOW IS ON SCREEN
+        if not self.userStarted:
+            self.userStarted = True
+            QTimer.singleShot(0, self.user.start)
+
     # MOUSE CLICK EVENTS
     # ///////////////////////////////////////////////////////////////
     def mousePressEvent(self, event):
@@ -157,6 +168,8 @@ class MainWindow(QMainWindow):
             print('Mouse click: RIGHT CLICK')
 
 if __name__ == "__main__":
+    # QtWebEngine is imported after the window is shown, it needs this set before the application is made
+    QCoreApplication.setAttribute(Qt.AA_ShareOpenGLContexts)
     app = QApplication(sys.argv)
     app.setWindowIcon(QIcon("icon.ico"))
     window = MainWindow()
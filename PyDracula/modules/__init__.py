@@ -13,6 +13,15 @@
 # https://doc.qt.io/qtforpython/licenses.html
 #
 # ///////////////////////////////////////////////////////////////
+import os
+import sys
+
+# MODULES SHARED WITH THE INFERENCE SCRIPTS
+# Imported from ../inferences (frozen into the build by setup.py), so the viewer and the scripts use one definition of each
+INFERENCES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "..", "inferences")
+if os.path.isdir(INFERENCES_DIR) and os.path.abspath(INFERENCES_DIR) not in map(os.path.abspath, sys.path):
+    sys.path.append(os.path.abspath(INFERENCES_DIR))
+
 from PySide6.QtCore import *
 from PySide6.QtGui import *
 from PySide6.QtWidgets import *
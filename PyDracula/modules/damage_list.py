@@ -0,0 +1,230 @@
+import os
+import sqlite3
+from collections import OrderedDict
+
+from PySide6.QtCore import Qt, QObject, QRunnable, QThreadPool, QAbstractListModel, QModelIndex, QRect, QSize, Signal
+from PySide6.QtGui import QImage, QImageReader, QPixmap, QColor, QFont, QPalette
+from PySide6.QtWidgets import QStyle, QStyledItemDelegate
+
+
+THUMBNAIL_SIZE = 60
+ITEM_MARGIN = 5
+
+
+# THUMBNAILS
+# Read in a thread pool from the thumbnail cache on disk (thumbnail_cache.py), or decoded at thumbnail size
+# (QImageReader scales JPEGs while decoding, the full image is never in memory), and kept in an LRU cache
+# in memory. Only the rows painted by the view request a thumbnail.
+# ///////////////////////////////////////////////////////////////
+class ThumbnailSignals(QObject):
+    # QImage is safe to create in worker threads, QPixmap is made on the GUI thread
+    loaded = Signal(str, QImage)
+
+
+class ThumbnailTask(QRunnable):
+    def __init__(self, image_path, size, signals, disk_cache=None):
+        super().__init__()
+        self.image_path = image_path
+        self.size = size
+        self.signals = signals
+        self.disk_cache = disk_cache
+
+    def run(self):
+        path = None
+        if self.disk_cache is not None:
+            try:
+                path = self.disk_cache.thumbnail(self.image_path, self.size)
+            except (OSError, sqlite3.Error) as e:
+                print(f"Thumbnail cache error: {e}")
+
+        reader = QImageReader(path or self.image_path)
+        reader.setAutoTransform(True)
+
+        image_size = reader.size()
+        if image_size.isValid():
+            reader.setScaledSize(image_size.scaled(self.size, self.size, Qt.AspectRatioMode.KeepAspectRatio))
+
+        # A null image when the file is missing or cannot be decoded
+        self.signals.loaded.emit(self.image_path, reader.read())
+
+
+class ThumbnailLoader(QObject):
+    thumbnailReady = Signal(str)
+
+    def __init__(self, size=THUMBNAIL_SIZE, max_cached=2000, max_threads=None, disk_cache=None, parent=None):
+        super().__init__(parent)
+        self.size = size
+        self.max_cached = max_cached
+        self.disk_cache = disk_cache
+
+        self.cache = OrderedDict()  # image path -> QPixmap (None: could not be loaded)
+        self.pending = set()
+
+        self.pool = QThreadPool(self)
+        if max_threads is not None:
+            self.pool.setMaxThreadCount(max_threads)
+
+        # Created after the pool: children are deleted in order, the pool waits for its tasks first
+        self.signals = ThumbnailSignals(self)
+        self.signals.loaded.connect(self.onLoaded)
+
+    def thumbnail(self, image_path):
+        # Cached thumbnail, or None and a load is queued (thumbnailReady is emitted when it is done)
+        if image_path in self.cache:
+            self.cache.move_to_end(image_path)
+            return self.cache[image_path]
+
+        if image_path not in self.pending:
+            self.pending.add(image_path)
+            self.pool.start(ThumbnailTask(image_path, self.size, self.signals, self.disk_cache))
+        return None
+
+    def onLoaded(self, image_path, image):
+        self.pending.discard(image_path)
+
+        self.cache[image_path] = None if image.isNull() else QPixmap.fromImage(image)
+        self.cache.move_to_end(image_path)
+        while len(self.cache) > self.max_cached:
+            self.cache.popitem(last=False)
+
+        self.thumbnailReady.emit(image_path)
+
+    def clearQueue(self):
+        # Drop the loads which have not started, e.g. the rows of a list which was replaced
+        self.pool.clear()
+        self.pending.clear()
+
+    def stop(self):
+        self.clearQueue()
+        self.pool.waitForDone()
+
+
+# MODEL
+# ///////////////////////////////////////////////////////////////
+class DamageListModel(QAbstractListModel):
+    def __init__(self, images_dir, thumbnail_loader, parent=None):
+        super().__init__(parent)
+        self.images_dir = images_dir
+        self.thumbnails = thumbnail_loader
+        self.thumbnails.thumbnailReady.connect(self.onThumbnailReady)
+
+        self.items = []
+        self.rows_by_path = {}
+
+        # fetch_more(last_item) -> (items, has_more), called by the view when it scrolls to the end
+        self.fetch_more = None
+        self.has_more = False
+
+    def setItems(self, items, fetch_more=None, has_more=False):
+        # The items list is kept and extended in place by appendItems and fetchMore
+        self.beginResetModel()
+        self.thumbnails.clearQueue()
+        self.items = items if items is not None else []
+        self.rows_by_path = {}
+        for row, item in enumerate(self.items):
+            self.rows_by_path.setdefault(self.imagePath(item), []).append(row)
+        self.fetch_more = fetch_more
+        self.has_more = has_more
+        self.endResetModel()
+
+    def appendItems(self, items):
+        # Rows added at the end, e.g. while a project is loading
+        if not items:
+            return
+
+        first = len(self.items)
+        self.beginInsertRows(QModelIndex(), first, first + len(items) - 1)
+        self.items.extend(items)
+        for row, item in enumerate(items, first):
+            self.rows_by_path.setdefault(self.imagePath(item), []).append(row)
+        self.endInsertRows()
+
+    def setFetchMore(self, fetch_more, has_more):
+        self.fetch_more = fetch_more
+        self.has_more = has_more
+
+    def imagePath(self, item):
+        return os.path.join(self.images_dir, item.get("image_path"))
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.items)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or index.row() >= len(self.items):
+            return None
+
+        item = self.items[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return item["name"]
+        if role == Qt.ItemDataRole.UserRole:
+            return item
+        if role == Qt.ItemDataRole.DecorationRole:
+            return self.thumbnails.thumbnail(self.imagePath(item))
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self.fetch_more is not None and self.has_more
+
+    def fetchMore(self, parent=QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+
+        page, self.has_more = self.fetch_more(self.items[-1] if self.items else None)
+        self.appendItems(page)
+
+    def onThumbnailReady(self, image_path):
+        for row in self.rows_by_path.get(image_path, []):
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [Qt.ItemDataRole.DecorationRole])
+
+
+# DELEGATE
+# Paints a row: the thumbnail on the left, the name (bold) and the coordinates (gray) on the right
+# ///////////////////////////////////////////////////////////////
+class DamageItemDelegate(QStyledItemDelegate):
+    def sizeHint(self, option, index):
+        return QSize(option.rect.width(), THUMBNAIL_SIZE + 2 * ITEM_MARGIN)
+
+    def paint(self, painter, option, index):
+        item = index.data(Qt.ItemDataRole.UserRole)
+        if item is None:
+            return
+
+        painter.save()
+
+        # Selection / hover background of the current style
+        style = option.widget.style() if option.widget is not None else None
+        if style is not None:
+            style.drawPrimitive(QStyle.PrimitiveElement.PE_PanelItemViewItem, option, painter, option.widget)
+
+        rect = option.rect.adjusted(ITEM_MARGIN, ITEM_MARGIN, -ITEM_MARGIN, -ITEM_MARGIN)
+        image_rect = QRect(rect.left(), rect.top(), THUMBNAIL_SIZE, THUMBNAIL_SIZE)
+
+        # Thumbnail, or a color made from the name while it loads / when there is no image
+        pixmap = index.data(Qt.ItemDataRole.DecorationRole)
+        if pixmap is None:
+            painter.fillRect(image_rect, QColor((hash(item["name"]) & 0x00FFFFFF) | 0x00A0A0A0))
+        else:
+            x = image_rect.left() + (THUMBNAIL_SIZE - pixmap.width()) // 2
+            y = image_rect.top() + (THUMBNAIL_SIZE - pixmap.height()) // 2
+            painter.drawPixmap(x, y, pixmap)
+
+        # Name and coordinates
+        text_rect = rect.adjusted(THUMBNAIL_SIZE + 2 * ITEM_MARGIN, 0, 0, 0)
+        font = QFont(option.font)
+        font.setBold(True)
+        painter.setFont(font)
+        painter.setPen(option.palette.color(QPalette.ColorRole.Text))
+        name_height = painter.fontMetrics().height()
+        painter.drawText(QRect(text_rect.left(), text_rect.top(), text_rect.width(), name_height),
+                         Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter, item["name"])
+
+        font = QFont(option.font)
+        font.setPointSize(9)
+        painter.setFont(font)
+        painter.setPen(QColor("gray"))
+        painter.drawText(QRect(text_rect.left(), text_rect.top() + name_height, text_rect.width(), painter.fontMetrics().height()),
+                         Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter,
+                         f"위도: {item['latitude']:.4f}, 경도: {item['longitude']:.4f}")
+
+        painter.restore()
@@ -0,0 +1,162 @@
+import folium
+from folium.elements import JSCSSMixin
+from folium.plugins import FastMarkerCluster
+from branca.element import MacroElement
+from jinja2 import Template
+
+
+# Folium damage maps
+# Popup images are referenced by file URL (thumbnails from the disk cache) instead of being inlined as base64,
+# and only requested when their popup is opened, so the HTML size and load time do not depend on the images
+# The total map draws the damages as canvas circle markers, either all of them clustered in the page
+# or, with the damage index, only those of the current view, asked from the viewer through a web channel
+# The page is loaded once, selecting an item of the list runs selectDamage in it (see map_bridge.selectDamageScript)
+POPUP_IMAGE_WIDTH = 200
+POPUP_MAX_WIDTH = 240
+
+
+class LazyPopupImages(MacroElement):
+    # Popup images keep their URL in data-src (images parsed with a src attribute are fetched at once),
+    # it is moved to src when the popup opens and the popup is resized when the image arrives
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+            {{ this._parent.get_name() }}.on("popupopen", function (e) {
+                e.popup.getElement().querySelectorAll("img[data-src]").forEach(function (img) {
+                    img.onload = function () { e.popup.update(); };
+                    img.src = img.getAttribute("data-src");
+                    img.removeAttribute("data-src");
+                });
+            });
+        {% endmacro %}
+    """)
+
+    def __init__(self):
+        super().__init__()
+        self._name = "LazyPopupImages"
+
+
+class DamageMarkerFunctions(MacroElement):
+    # Markers made in the page from rows of [latitude, longitude, name, image url] (markerRow)
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+            function damagePopupHtml(row) {
+                if (row[3] === null) {
+                    return "<b>" + row[2] + "</b><br>위도: " + row[0] + "<br>경도: " + row[1] + "<br>(이미지 없음)";
+                }
+                return "<b>" + row[2] + "</b><br>위도: " + row[0].toFixed(6) + "<br>경도: " + row[1].toFixed(6) +
+                    "<br><br><img data-src='" + row[3] + "' width='{{ this.image_width }}'>";
+            }
+            function damageMarker(row) {
+                return L.circleMarker([row[0], row[1]], {radius: 6, color: "#ff5555", fillOpacity: 0.8, weight: 1})
+                    .bindTooltip(row[2])
+                    .bindPopup(damagePopupHtml(row), {maxWidth: {{ this.max_width }}});
+            }
+            function damageClusterIcon(count) {
+                var size = count < 100 ? 30 : count < 1000 ? 36 : 44;
+                return L.divIcon({
+                    html: "<div style='width:" + size + "px;height:" + size + "px;line-height:" + size + "px;" +
+                        "border-radius:50%;background:rgba(255,85,85,0.75);color:#fff;text-align:center;font:bold 12px sans-serif'>" +
+                        count + "</div>",
+                    className: "",
+                    iconSize: [size, size]
+                });
+            }
+        {% endmacro %}
+    """)
+
+    def __init__(self):
+        super().__init__()
+        self._name = "DamageMarkerFunctions"
+        self.image_width = POPUP_IMAGE_WIDTH
+        self.max_width = POPUP_MAX_WIDTH
+
+
+class DamageSelection(MacroElement):
+    # Called by the viewer: selectDamage(row, zoom) moves to a damage and opens its popup on a highlighted marker,
+    # resetDamageMap() removes it and goes back to the initial view
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+            var damageHome = [{{ this._parent.get_name() }}.getCenter(), {{ this._parent.get_name() }}.getZoom()];
+            var damageSelection = null;
+            function selectDamage(row, zoom) {
+                var map = {{ this._parent.get_name() }};
+                if (damageSelection !== null) { map.removeLayer(damageSelection); }
+                damageSelection = L.marker([row[0], row[1]], {zIndexOffset: 1000})
+                    .bindTooltip(row[2])
+                    .bindPopup(damagePopupHtml(row), {maxWidth: {{ this.max_width }}})
+                    .addTo(map);
+                map.setView([row[0], row[1]], Math.max(map.getZoom(), zoom));
+                damageSelection.openPopup();
+            }
+            function resetDamageMap() {
+                var map = {{ this._parent.get_name() }};
+                if (damageSelection !== null) { map.removeLayer(damageSelection); damageSelection = null; }
+                map.closePopup();
+                map.setView(damageHome[0], damageHome[1]);
+            }
+        {% endmacro %}
+    """)
+
+    def __init__(self):
+        super().__init__()
+        self._name = "DamageSelection"
+        self.max_width = POPUP_MAX_WIDTH
+
+
+class ViewportMarkers(JSCSSMixin, MacroElement):
+    # Asks the object published as object_name for the markers of the view after every move (debounced),
+    # answers of views left in the meantime are dropped
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+            (function () {
+                var map = {{ this._parent.get_name() }};
+                var layer = L.layerGroup().addTo(map);
+                var request = 0, timer = null;
+
+                function show(data) {
+                    layer.clearLayers();
+                    data.clusters.forEach(function (cluster) {
+                        L.marker([cluster[0], cluster[1]], {icon: damageClusterIcon(cluster[2])})
+                            .on("click", function () { map.setView([cluster[0], cluster[1]], map.getZoom() + 2); })
+                            .addTo(layer);
+                    });
+                    data.markers.forEach(function (row) { damageMarker(row).addTo(layer); });
+                }
+
+                new QWebChannel(qt.webChannelTransport, function (channel) {
+                    var source = channel.objects.{{ this.object_name }};
+                    function refresh() {
+                        var bounds = map.getBounds(), id = ++request;
+                        source.markers(bounds.getSouth(), bounds.getWest(), bounds.getNorth(), bounds.getEast(), map.getZoom(),
+                            function (answer) { if (id === request) { show(JSON.parse(answer)); } });
+                    }
+                    map.on("moveend", function () { clearTimeout(timer); timer = setTimeout(refresh, 150); });
+                    refresh();
+                });
+            })();
+        {% endmacro %}
+    """)
+
+    default_js = [("qwebchannel", "qrc:///qtwebchannel/qwebchannel.js")]
+
+    def __init__(self, object_name):
+        super().__init__()
+        self._name = "ViewportMarkers"
+        self.object_name = object_name
+
+
+def newDamageMap(location, zoom_start):
+    damage_map = folium.Map(location=location, zoom_start=zoom_start, prefer_canvas=True)
+    LazyPopupImages().add_to(damage_map)
+    DamageMarkerFunctions().add_to(damage_map)
+    DamageSelection().add_to(damage_map)
+    return damage_map
+
+
+def addClusteredMarkers(damage_map, rows):
+    # All markers in the page as one array, clustered by Leaflet.markercluster (only the visible ones are drawn)
+    FastMarkerCluster(rows, callback="damageMarker", control=False, chunkedLoading=True).add_to(damage_map)
+
+
+def addViewportMarkers(damage_map, object_name):
+    ViewportMarkers(object_name).add_to(damage_map)
@@ -0,0 +1,66 @@
+import json
+import pathlib
+
+from PySide6.QtCore import QObject, Slot
+
+
+# What the viewer exchanges with the damage map page (written by damage_map.py): marker rows, the scripts run
+# in the page and the markers of its view. Kept apart from the page elements so that the window starts
+# without importing folium, which is only needed to write the page (in the project loader thread)
+SELECTED_ZOOM = 15
+RESET_MAP_SCRIPT = "resetDamageMap();"
+
+# Viewport loading: individual markers up to this many damages in view, grid clusters of about
+# CLUSTER_CELL_PIXELS on screen above (except at CLUSTER_MAX_ZOOM, where the first markers are shown)
+VIEWPORT_MAX_MARKERS = 1000
+CLUSTER_CELL_PIXELS = 80
+CLUSTER_MAX_ZOOM = 18
+
+
+class DamageMapBridge(QObject):
+    # Published to the total map page with QWebChannel, viewport_markers(bounds, zoom) -> see viewportMarkers
+    def __init__(self, viewport_markers, parent=None):
+        super().__init__(parent)
+        self.viewport_markers = viewport_markers
+
+    @Slot(float, float, float, float, int, result=str)
+    def markers(self, south, west, north, east, zoom):
+        return json.dumps(self.viewport_markers((south, west, north, east), zoom))
+
+
+def imageUrl(path):
+    return pathlib.Path(path).resolve().as_uri()
+
+
+def markerRow(item, image_url=None):
+    return [item['latitude'], item['longitude'], item['name'], image_url]
+
+
+def clusterCellSize(zoom):
+    # Degrees covered by CLUSTER_CELL_PIXELS at a zoom level (256px tiles)
+    return 360.0 / (256 * 2 ** zoom) * CLUSTER_CELL_PIXELS
+
+
+def viewportMarkers(damage_index, bounds, zoom, filters, image_url, max_markers=VIEWPORT_MAX_MARKERS):
+    # Markers of the matching damages inside bounds (south, west, north, east), grid clusters when there are too many
+    # Returns {"count": n, "markers": [markerRow, ...], "clusters": [[latitude, longitude, count], ...]}
+    south, west, north, east = max(bounds[0], -90.0), max(bounds[1], -180.0), min(bounds[2], 90.0), min(bounds[3], 180.0)
+    if filters.get("bbox") is not None:
+        min_lat, min_lon, max_lat, max_lon = filters["bbox"]
+        south, west, north, east = max(south, min_lat), max(west, min_lon), min(north, max_lat), min(east, max_lon)
+    if south > north or west > east:
+        return {"count": 0, "markers": [], "clusters": []}
+
+    # One grouped scan gives the count too, the markers are only read for views with few damages
+    filters = dict(filters, bbox=(south, west, north, east))
+    clusters = [[latitude, longitude, n] for n, latitude, longitude in damage_index.clusters(clusterCellSize(zoom), **filters)]
+    count = sum(cluster[2] for cluster in clusters)
+    if count > max_markers and zoom < CLUSTER_MAX_ZOOM:
+        return {"count": count, "markers": [], "clusters": clusters}
+
+    markers = [markerRow(item, image_url(item)) for item in damage_index.query(limit=max_markers, **filters)]
+    return {"count": count, "markers": markers, "clusters": []}
+
+
+def selectDamageScript(item, image_url=None, zoom=SELECTED_ZOOM):
+    return f"selectDamage({json.dumps(markerRow(item, image_url))}, {zoom});"
@@ -0,0 +1,120 @@
+import threading
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+
+
+# PROJECT LOADING
+# The damage list is read and the total map written in a worker thread, so the window paints at once
+# and the list fills while the results are read. Starting a load cancels the previous one: its signals
+# are dropped (each carries the generation of its load) and its job stops at the next checkCancelled.
+# ///////////////////////////////////////////////////////////////
+class LoadCancelled(Exception):
+    pass
+
+
+class ProjectLoadSignals(QObject):
+    progress = Signal(int, int, int, str)  # generation, done, total (0: unknown), message
+    itemsLoaded = Signal(int, object)  # generation, list of items
+    finished = Signal(int, object)  # generation, result of the job
+    failed = Signal(int, str)  # generation, error
+
+
+class ProjectLoadTask(QRunnable):
+    def __init__(self, job, generation, signals):
+        super().__init__()
+        self.job = job
+        self.generation = generation
+        self.signals = signals
+        self.cancelled = threading.Event()
+
+        # Kept by the loader to be cancelled, so it is not deleted by the pool when it finishes
+        self.setAutoDelete(False)
+
+    def run(self):
+        try:
+            self.checkCancelled()
+            result = self.job(self)
+        except LoadCancelled:
+            return
+        except Exception as e:
+            self.signals.failed.emit(self.generation, f"{type(e).__name__}: {e}")
+            return
+        self.signals.finished.emit(self.generation, result)
+
+    # Called by the job, in the worker thread
+    def checkCancelled(self):
+        if self.cancelled.is_set():
+            raise LoadCancelled()
+
+    def report(self, done, total, message):
+        self.checkCancelled()
+        self.signals.progress.emit(self.generation, done, total, message)
+
+    def addItems(self, items):
+        self.checkCancelled()
+        self.signals.itemsLoaded.emit(self.generation, items)
+
+
+class ProjectLoader(QObject):
+    # Emitted on the GUI thread for the current load only
+    progress = Signal(int, int, str)
+    itemsLoaded = Signal(object)
+    finished = Signal(object)
+    failed = Signal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+
+        # One load at a time: a cancelled load stops before the next one starts, they never write the same files
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+
+        # Created after the pool: children are deleted in order, the pool waits for its task first
+        self.signals = ProjectLoadSignals(self)
+        self.signals.progress.connect(self.onProgress)
+        self.signals.itemsLoaded.connect(self.onItemsLoaded)
+        self.signals.finished.connect(self.onFinished)
+        self.signals.failed.connect(self.onFailed)
+
+        self.generation = 0
+        self.task = None
+
+    def start(self, job):
+        # job(task) runs in the worker thread, sends items with task.addItems and returns the result of finished
+        self.cancel()
+        self.generation += 1
+        self.task = ProjectLoadTask(job, self.generation, self.signals)
+        self.pool.start(self.task)
+
+    def cancel(self):
+        if self.task is not None:
+            self.task.cancelled.set()
+            self.task = None
+
+    def isLoading(self):
+        return self.task is not None
+
+    def stop(self):
+        self.cancel()
+        self.pool.waitForDone()
+
+    def isCurrent(self, generation):
+        return self.task is not None and generation == self.generation
+
+    def onProgress(self, generation, done, total, message):
+        if self.isCurrent(generation):
+            self.progress.emit(done, total, message)
+
+    def onItemsLoaded(self, generation, items):
+        if self.isCurrent(generation):
+            self.itemsLoaded.emit(items)
+
+    def onFinished(self, generation, result):
+        if self.isCurrent(generation):
+            self.task = None
+            self.finished.emit(result)
+
+    def onFailed(self, generation, message):
+        if self.isCurrent(generation):
+            self.task = None
+            self.failed.emit(message)
@@ -0,0 +1,159 @@
+import os
+import time
+import threading
+
+from PySide6.QtCore import Qt
+from PySide6.QtGui import QImageReader
+
+from thumbnail_layout import THUMBNAIL_SIZES, THUMBNAIL_QUALITY, thumbnail_path, image_digest, open_manifest
+
+
+# Thumbnail cache shared with the inference scripts (inferences/thumbnail_cache.py)
+# The layout and the manifest schema are the ones of inferences/thumbnail_layout.py (on the path, see modules/__init__.py)
+# The scripts add the thumbnails of the images they write, the viewer makes the ones it misses
+
+# Last access times are written in batches of this many thumbnails (and on close)
+ACCESS_FLUSH_INTERVAL = 256
+
+
+class ThumbnailCache():
+    def __init__(self, cache_dir, sizes=THUMBNAIL_SIZES, budget_bytes=None):
+        self.cache_dir = cache_dir
+        self.sizes = tuple(sizes)
+        self.budget_bytes = budget_bytes  # Enforced on close, least recently used first
+
+        # Used by the thumbnail threads of the list and the GUI thread (map popups), one at a time
+        self.lock = threading.Lock()
+        self.conn = open_manifest(cache_dir)
+        self.accessed = {}  # (digest, size) -> last access
+
+    def thumbnailPath(self, digest, size):
+        return thumbnail_path(self.cache_dir, digest, size)
+
+    def knownDigest(self, source_path, stat):
+        # Content hash of an image from the manifest, None when it is not known or its size or modification time changed
+        with self.lock:
+            row = self.conn.execute("SELECT size, mtime_ns, digest FROM sources WHERE path = ?", (source_path,)).fetchone()
+        if row is not None and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return row[2]
+        return None
+
+    def digest(self, source_path):
+        # Content hash of an image, hashed again only when its size or modification time changed
+        source_path = os.path.abspath(source_path)
+        stat = os.stat(source_path)
+
+        digest = self.knownDigest(source_path, stat)
+        if digest is not None:
+            return digest
+
+        digest = image_digest(source_path)
+
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?)",
+                              (source_path, stat.st_size, stat.st_mtime_ns, digest))
+        return digest
+
+    def thumbnail(self, source_path, size):
+        # Path of the thumbnail of an image, made when it is missing (None when the image cannot be read)
+        try:
+            digest = self.digest(source_path)
+        except OSError:
+            return None
+
+        path = self.thumbnailPath(digest, size)
+        if not os.path.exists(path) and not self.makeThumbnails(source_path, digest):
+            return None
+
+        self.touch(digest, size)
+        return path
+
+    def cachedThumbnail(self, source_path, size):
+        # Path of a thumbnail already in the cache, without hashing or decoding the image (None when not cached)
+        source_path = os.path.abspath(source_path)
+        try:
+            digest = self.knownDigest(source_path, os.stat(source_path))
+        except OSError:
+            return None
+
+        path = self.thumbnailPath(digest, size) if digest is not None else None
+        if path is None or not os.path.exists(path):
+            return None
+
+        self.touch(digest, size)
+        return path
+
+    def touch(self, digest, size):
+        with self.lock:
+            self.accessed[(digest, size)] = time.time()
+            if len(self.accessed) >= ACCESS_FLUSH_INTERVAL:
+                self.flushAccess()
+
+    def makeThumbnails(self, source_path, digest):
+        # Decoded once at the largest size (scaled while decoding), the smaller sizes are scaled from it
+        largest = max(self.sizes)
+        reader = QImageReader(source_path)
+        reader.setAutoTransform(True)
+        image_size = reader.size()
+        if image_size.isValid() and max(image_size.width(), image_size.height()) > largest:
+            reader.setScaledSize(image_size.scaled(largest, largest, Qt.AspectRatioMode.KeepAspectRatio))
+
+        image = reader.read()
+        if image.isNull():
+            return False
+
+        rows = []
+        for size in sorted(self.sizes, reverse=True):
+            if max(image.width(), image.height()) > size:
+                image = image.scaled(size, size, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
+
+            # Written to a temporary file and renamed, other threads never read a partial thumbnail
+            path = self.thumbnailPath(digest, size)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            if not image.save(tmp_path, "JPG", THUMBNAIL_QUALITY):
+                return False
+            os.replace(tmp_path, path)
+            rows.append((digest, size, os.path.getsize(path), time.time()))
+
+        with self.lock, self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO thumbnails VALUES (?, ?, ?, ?)", rows)
+        return True
+
+    def flushAccess(self):
+        # Called with self.lock held
+        with self.conn:
+            self.conn.executemany("UPDATE thumbnails SET last_access = ? WHERE digest = ? AND size = ?",
+                                  [(last_access, digest, size) for (digest, size), last_access in self.accessed.items()])
+        self.accessed = {}
+
+    def evict(self, budget_bytes=None):
+        # Remove the least recently used thumbnails until they fit in the budget, returns the number removed
+        budget_bytes = self.budget_bytes if budget_bytes is None else budget_bytes
+        if budget_bytes is None:
+            return 0
+
+        with self.lock:
+            self.flushAccess()
+            excess = self.conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM thumbnails").fetchone()[0] - budget_bytes
+            removed = []
+            for digest, size, num_bytes in self.conn.execute("SELECT digest, size, bytes FROM thumbnails ORDER BY last_access"):
+                if excess <= 0:
+                    break
+                removed.append((digest, size))
+                excess -= num_bytes
+
+            for digest, size in removed:
+                try:
+                    os.remove(self.thumbnailPath(digest, size))
+                except FileNotFoundError:
+                    pass
+            with self.conn:
+                self.conn.executemany("DELETE FROM thumbnails WHERE digest = ? AND size = ?", removed)
+        return len(removed)
+
+    def close(self):
+        self.evict()
+        with self.lock:
+            self.flushAccess()
+            self.conn.close()
@@ -258,8 +258,8 @@ class UIFunctions(MainWindow):
         self.shadow.setColor(QColor(0, 0, 0, 150))
         self.ui.bgApp.setGraphicsEffect(self.shadow)
 
-        self.ui.webEngineView.setGraphicsEffect(self.shadow)
-        self.ui.webEngineView.graphicsEffect().setEnabled(False)
+        self.ui.mapContainer.setGraphicsEffect(self.shadow)
+        self.ui.mapContainer.graphicsEffect().setEnabled(False)
 
         # RESIZE WINDOW
         self.sizegrip = QSizeGrip(self.ui.frame_size_grip)
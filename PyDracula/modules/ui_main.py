@@ -15,9 +15,8 @@ from PySide6.QtGui import (QBrush, QColor, QConicalGradient, QCursor,
     QFont, QFontDatabase, QGradient, QIcon,
     QImage, QKeySequence, QLinearGradient, QPainter,
     QPalette, QPixmap, QRadialGradient, QTransform)
-from PySide6.QtWebEngineWidgets import QWebEngineView
 from PySide6.QtWidgets import (QApplication, QFrame, QGridLayout, QHBoxLayout,
-    QLabel, QListWidget, QListWidgetItem, QMainWindow,
+    QLabel, QListView, QMainWindow,
     QPushButton, QSizePolicy, QSpacerItem, QStackedWidget,
     QVBoxLayout, QWidget)
 from . import resources_rc
@@ -805,11 +804,12 @@ class Ui_MainWindow(object):
 
         self.verticalLayout_12.addWidget(self.extraTopMenu, 0, Qt.AlignmentFlag.AlignTop)
 
-        self.DamagelistWidget = QListWidget(self.extraContent)
-        self.DamagelistWidget.setObjectName(u"DamagelistWidget")
-        self.DamagelistWidget.setStyleSheet(u"background-color: transparent;")
+        self.DamagelistView = QListView(self.extraContent)
+        self.DamagelistView.setObjectName(u"DamagelistView")
+        self.DamagelistView.setStyleSheet(u"background-color: transparent;")
+        self.DamagelistView.setUniformItemSizes(True)
 
-        self.verticalLayout_12.addWidget(self.DamagelistWidget)
+        self.verticalLayout_12.addWidget(self.DamagelistView)
 
         self.extraCenter = QFrame(self.extraContent)
         self.extraCenter.setObjectName(u"extraCenter")
@@ -986,11 +986,14 @@ class Ui_MainWindow(object):
         self.map_page.setObjectName(u"map_page")
         self.verticalLayout_20 = QVBoxLayout(self.map_page)
         self.verticalLayout_20.setObjectName(u"verticalLayout_20")
-        self.webEngineView = QWebEngineView(self.map_page)
-        self.webEngineView.setObjectName(u"webEngineView")
-        self.webEngineView.setUrl(QUrl(u"about:blank"))
+        self.mapContainer = QWidget(self.map_page)
+        self.mapContainer.setObjectName(u"mapContainer")
+        self.mapContainerLayout = QVBoxLayout(self.mapContainer)
+        self.mapContainerLayout.setSpacing(0)
+        self.mapContainerLayout.setObjectName(u"mapContainerLayout")
+        self.mapContainerLayout.setContentsMargins(0, 0, 0, 0)
 
-        self.verticalLayout_20.addWidget(self.webEngineView)
+        self.verticalLayout_20.addWidget(self.mapContainer)
 
         self.frame = QFrame(self.map_page)
         self.frame.setObjectName(u"frame")
@@ -1018,6 +1021,20 @@ class Ui_MainWindow(object):
 
         self.horizontalLayout_7.addWidget(self.InitializeButton)
 
+        self.DetectButton = QPushButton(self.frame)
+        self.DetectButton.setObjectName(u"DetectButton")
+        self.DetectButton.setMinimumSize(QSize(200, 30))
+        self.DetectButton.setMaximumSize(QSize(200, 30))
+        self.DetectButton.setStyleSheet(u".QPushButton { background-color: rgb(52, 59, 72); border: none;  border-radius: 5px; }\n"
+".QPushButton:hover { background-color: rgb(44, 49, 57); border-style: solid; border-radius: 4px; }\n"
+".QPushButton:pressed { background-color: rgb(23, 26, 30); border-style: solid; border-radius: 4px; }\n"
+"")
+        icon5 = QIcon()
+        icon5.addFile(u":/icons/images/icons/cil-magnifying-glass.png", QSize(), QIcon.Mode.Normal, QIcon.State.Off)
+        self.DetectButton.setIcon(icon5)
+
+        self.horizontalLayout_7.addWidget(self.DetectButton)
+
 
         self.verticalLayout_20.addWidget(self.frame)
 
@@ -1171,6 +1188,7 @@ class Ui_MainWindow(object):
 #endif // QT_CONFIG(tooltip)
         self.closeAppBtn.setText("")
         self.InitializeButton.setText(QCoreApplication.translate("MainWindow", u"Initialize Location", None))
+        self.DetectButton.setText(QCoreApplication.translate("MainWindow", u"Detect Cracks", None))
         self.label_2.setText(QCoreApplication.translate("MainWindow", u"Extra Tools", None))
         self.creditsLabel.setText(QCoreApplication.translate("MainWindow", u"By: Wanderson M. Pimenta", None))
         self.version.setText(QCoreApplication.translate("MainWindow", u"v1.0.3", None))
@@ -1,58 +1,22 @@
 import os
+import time
+import sqlite3
 
-import pandas as pd
-import folium
-import base64
+from PySide6.QtCore import Qt, QUrl, QCoreApplication
+from PySide6.QtGui import QImage
+from PySide6.QtWidgets import QFileDialog
 
-from PySide6.QtWidgets import QWidget, QHBoxLayout, QVBoxLayout, QLabel, QListWidgetItem
-from PySide6.QtGui import QPixmap, QColor
-from PySide6.QtCore import Qt, QUrl
-from PySide6.QtWebEngineCore import QWebEngineSettings
+# Only light modules here, the window is shown before the heavy ones are imported:
+# QtWebEngine when the map view is made (setupMapView), folium and pandas in the project loader thread
+from .map_bridge import markerRow, viewportMarkers, selectDamageScript, imageUrl, DamageMapBridge, RESET_MAP_SCRIPT
+from .damage_list import DamageListModel, DamageItemDelegate, ThumbnailLoader
+from .project_loader import ProjectLoader
+from .thumbnail_cache import ThumbnailCache
 
-
-class CustomListItem(QWidget):
-    def __init__(self, item_data, parent=None):
-        super().__init__(parent)
-        self.item_data = item_data
-        self.init_ui()
-
-    def init_ui(self):
-        layout = QHBoxLayout(self)
-        layout.setContentsMargins(5, 5, 5, 5) # 위젯 내부 여백
-
-        # 이미지 라벨
-        image_label = QLabel()
-        image_label.setFixedSize(60, 60)
-
-        image_path = os.path.join(os.getcwd(), "init", "data", "Images", self.item_data.get("image_path"))
-        if image_path:
-            pixmap = QPixmap(image_path)
-        else:
-            # 이미지가 없을 경우, 이름에 따라 색상 생성
-            pixmap = QPixmap(60, 60)
-            color = QColor((hash(self.item_data['name']) & 0x00FFFFFF) | 0x00A0A0A0)
-            pixmap.fill(color)
-            
-        image_label.setPixmap(pixmap.scaled(
-            image_label.size(),
-            Qt.AspectRatioMode.KeepAspectRatio,
-            Qt.TransformationMode.SmoothTransformation
-        ))
-        
-        # 텍스트 정보 (이름, 위도, 경도)
-        text_info_layout = QVBoxLayout()
-        name_label = QLabel(self.item_data["name"])
-        name_label.setStyleSheet("font-weight: bold;")
-        
-        coords_label = QLabel(f"위도: {self.item_data['latitude']:.4f}, 경도: {self.item_data['longitude']:.4f}")
-        coords_label.setStyleSheet("font-size: 9pt; color: gray;")
-
-        text_info_layout.addWidget(name_label)
-        text_info_layout.addWidget(coords_label)
-        text_info_layout.addStretch()
-
-        layout.addWidget(image_label)
-        layout.addLayout(text_info_layout)
+# Shared with the inference scripts (inferences/, on the path, see modules/__init__.py)
+from damage_index import DamageIndexReader
+from inference_client import InferenceClient, DEFAULT_SERVER_URL
+from config import CONFIG
 
 
 class UserClass():
@@ -62,200 +26,384 @@ class UserClass():
         self.main = main_window
 
         # VARIABLES
-        self.excel_path = os.path.join(os.getcwd(), "init", "data", "data.xlsx")
+        self.thumbnail_cache_dir = os.path.join(os.getcwd(), "init", "data", "thumbnails")
+        self.thumbnail_cache_budget = 512 * 1024 * 1024  # Bytes on disk, least recently used thumbnails are removed on exit
         self.html_path_total = os.path.join(os.getcwd(), "init", "map", "total_damagemap.html")
-        self.html_path_each = os.path.join(os.getcwd(), "init", "map", "each_damagemap.html")
         self.damage_data = []
+        self.damage_index = None
+        self.damage_filters = {}  # See DamageIndexReader._where_clause
+        self.damage_page_size = 200
+        self.map_viewport_loading = True  # With the damage index, the total map asks for the markers of its view only
+        self.map_view = None  # QWebEngineView, made once the window is shown (setupMapView)
+        self.map_url = None  # Page to show in the map view
+        self.map_ready = False  # The map page finished loading and can run scripts
+        self.pending_map_script = None  # Last script sent while the page was loading
+        self.title_info = self.ui.titleRightInfo.text()  # Shown again when a project finished loading
+        self.inference_server_url = DEFAULT_SERVER_URL  # inferences/inference_server.py, keeps the crack model loaded
+        self.inference_params = {  # Sliding window settings of inferences/config.py, as the scripts use them
+            "score_thr": CONFIG["SCORE_THRESHOLD"], "window_size": CONFIG["WINDOW_SIZE"], "overlap_ratio": CONFIG["OVERLAP_RATIO"],
+            "batch_size": CONFIG["BATCH_SIZE"], "blend": CONFIG["BLEND_MODE"], "gate_threshold": CONFIG["GATE_THRESHOLD"],
+        }
+        self.setDataDir(os.path.join(os.getcwd(), "init", "data"))
 
         # INITIALIZE
-        settings1 = self.ui.webEngineView.settings()
-        settings1.setAttribute(QWebEngineSettings.WebAttribute.LocalContentCanAccessRemoteUrls, True)
-        settings1.setAttribute(QWebEngineSettings.WebAttribute.LocalContentCanAccessFileUrls, True)
-
-        self.ui.DamagelistWidget.itemClicked.connect(self.ListViewSelected)
+        # The total map page reads the markers of its view from the damage index through this (see setupMapView)
+        self.map_bridge = DamageMapBridge(self.mapViewportMarkers, self.main)
+
+        # Only the visible rows are painted, thumbnails are read from the disk cache (or made) in a thread pool
+        self.thumbnail_cache = ThumbnailCache(self.thumbnail_cache_dir, budget_bytes=self.thumbnail_cache_budget)
+        self.thumbnail_loader = ThumbnailLoader(disk_cache=self.thumbnail_cache, parent=self.main)
+        self.damage_model = DamageListModel(self.images_dir, self.thumbnail_loader, self.main)
+        self.ui.DamagelistView.setModel(self.damage_model)
+        self.ui.DamagelistView.setItemDelegate(DamageItemDelegate(self.ui.DamagelistView))
+        self.ui.DamagelistView.clicked.connect(self.ListViewSelected)
         self.ui.InitializeButton.clicked.connect(self.InitializeBtnClicked)
+        self.ui.DetectButton.clicked.connect(self.DetectBtnClicked)
+        QCoreApplication.instance().aboutToQuit.connect(self.closeProject)
+
+        # Projects are loaded in a worker thread, the window is shown before the results are read
+        self.project_loader = ProjectLoader(self.main)
+        self.project_loader.progress.connect(self.projectLoadProgress)
+        self.project_loader.itemsLoaded.connect(self.projectItemsLoaded)
+        self.project_loader.finished.connect(self.projectLoaded)
+        self.project_loader.failed.connect(self.projectLoadFailed)
+
+        # Crack detection is requested from the inference server in another worker, one image at a time
+        self.inference_runner = ProjectLoader(self.main)
+        self.inference_runner.progress.connect(self.projectLoadProgress)
+        self.inference_runner.finished.connect(self.inferenceFinished)
+        self.inference_runner.failed.connect(self.inferenceFailed)
+
+        # INITIALIZATION COMPLETE (the project is loaded by start, once the window is shown)
+        print("UserClass Initialized")
 
+    def start(self):
+        # Called by the main window after its first paint
         self.InitializeProject()
-
-        # INITIALIZATION COMPLETE
-        print("UserClass Initialized")
+        self.setupMapView()
 
     # RECEIVE PROJECT/USER INPUT
     # ///////////////////////////////////////////////////////////////
     def InitializeProject(self):
-        # 1. Read Excel File from the Project
-        loaded_df = self.readExcel()
-
-        # 2. Make Damage List and Visualization
-        self.damage_data = self.makeDamageList(loaded_df)
-        self.showDamageList()
-
-        # 3. Make Damage Map and Visualization
-        if self.damage_data and len(self.damage_data) > 0:
-            self.makeEachDamageMap(self.damage_data[0])  # First Item
-            self.makeDamageMap()
-            self.showDamageMap(mode="total")
+        # 1. Empty the List, a Load Still Running is Cancelled
+        self.damage_data = []
+        self.damage_model.setItems(self.damage_data)
+
+        # 2. Read the Damages and Write the Map in the Worker Thread (loadProject), the List Fills as They are Read
+        filters = dict(self.damage_filters)
+        self.project_loader.start(lambda task: self.loadProject(task, filters))
+
+    def openProject(self, data_dir):
+        # Results of another folder (same layout as init/data), e.g. another survey
+        if self.damage_index is not None:
+            self.damage_index.close()
+            self.damage_index = None
+        self.setDataDir(data_dir)
+        self.damage_model.images_dir = self.images_dir
+        self.InitializeProject()
 
-    def ListViewSelected(self, current_item):
+    def ListViewSelected(self, index):
         # 1. Read Data from the Selected Item
-        if current_item is None:
+        if index is None or not index.isValid():
             return
-        item_data = current_item.data(Qt.ItemDataRole.UserRole)
+        item_data = index.data(Qt.ItemDataRole.UserRole)
 
-        # 2. Make Individual Map with the Data
-        self.makeEachDamageMap(item_data)
+        # 2. Move the Map to the Item and Open its Popup, without Reloading the Page
+        self.runMapScript(selectDamageScript(item_data, self.popupImageUrl(item_data)))
 
-        # 3. Show the Individual Map
-        self.showDamageMap(mode="each")
-    
     def InitializeBtnClicked(self):
-        self.showDamageMap(mode="total")
-    
+        self.runMapScript(RESET_MAP_SCRIPT)
+
+    def DetectBtnClicked(self):
+        image_paths, _ = QFileDialog.getOpenFileNames(self.main, "Detect Cracks", self.images_dir, "Images (*.jpg *.jpeg *.png *.tif *.tiff)")
+        if image_paths:
+            self.requestInference(image_paths)
+
+    def requestInference(self, image_paths, **params):
+        # Masks of the images from the inference server, saved to the Masks folder of the project (see runInference)
+        params = dict(self.inference_params, **params)
+        self.inference_runner.start(lambda task: self.runInference(task, list(image_paths), params))
+
+    def mapLoadFinished(self, ok):
+        self.map_ready = ok
+        if ok and self.pending_map_script is not None:
+            self.map_view.page().runJavaScript(self.pending_map_script)
+        self.pending_map_script = None
+
+    def projectLoadProgress(self, done, total, message):
+        self.ui.titleRightInfo.setText(f"{message} ({done}/{total})" if total else f"{message} ({done})")
+
+    def projectItemsLoaded(self, items):
+        # The model appends the items to self.damage_data
+        self.damage_model.appendItems(items)
+
+    def projectLoaded(self, result):
+        self.ui.titleRightInfo.setText(self.title_info)
+
+        # 1. Next Pages of the Damage Index are Fetched by the View
+        if result["from_index"] and self.openDamageIndex():
+            self.damage_model.setFetchMore(self.fetchDamagePage, result["has_more"])
+
+        # 2. Show the Map Written by the Worker
+        if len(self.damage_data) == 0:
+            print("No Damage Data to Show")
+            return
+        self.showDamageMap()
+
+    def projectLoadFailed(self, message):
+        print(f"Failed to load the project: {message}")
+        self.ui.titleRightInfo.setText(f"Failed to load the project: {message}")
+
+    def inferenceFinished(self, result):
+        message = f"Cracks in {result['with_cracks']}/{result['images']} images ({result['seconds']:.1f}s), masks in {self.masks_dir}"
+        print(message)
+        self.ui.titleRightInfo.setText(message)
+
+    def inferenceFailed(self, message):
+        print(f"Crack detection failed: {message}")
+        self.ui.titleRightInfo.setText(f"Crack detection failed: {message}")
+
+    def closeProject(self):
+        # Wait for the worker threads, then keep the thumbnail cache within its budget
+        self.project_loader.stop()
+        self.inference_runner.stop()
+        self.thumbnail_loader.stop()
+        self.thumbnail_cache.close()
+
+    def setDamageFilter(self, **filters):
+        # e.g. setDamageFilter(min_width=3.0, date_from="2024-01-01", bbox=(37.4, 126.8, 37.7, 127.2))
+        self.damage_filters = filters
+        self.InitializeProject()
+
     # PROCESS FUNCTIONS
     # ///////////////////////////////////////////////////////////////
+    def setDataDir(self, data_dir):
+        self.excel_path = os.path.join(data_dir, "data.xlsx")
+        self.result_store_dir = os.path.join(data_dir, "results")
+        self.damage_index_path = os.path.join(data_dir, "damage_index.sqlite")
+        self.images_dir = os.path.join(data_dir, "Images")
+        self.masks_dir = os.path.join(data_dir, "Masks")
+
+    def loadProject(self, task, filters):
+        # Runs in the worker thread of the project loader: no widgets here, items are sent with task.addItems
+        # 1. Read the First Page of the Damage Index, or All Results (Result Store Parts, Excel as Fallback)
+        task.report(0, 0, "Reading the damage list")
+        items, has_more, map_center = [], False, None
+        index = self.newDamageIndexReader()
+        if index is not None:
+            try:
+                items = index.query(limit=self.damage_page_size, **filters)
+                has_more = len(items) == self.damage_page_size
+                map_center = index.center(**filters)
+            finally:
+                index.close()
+            task.addItems(items)
+        else:
+            for done, total, df in self.readResults():
+                page = self.makeDamageList(df, first_index=len(items)) or []
+                items.extend(page)
+                task.addItems(page)
+                task.report(done, total, "Reading the damage list")
+
+        # 2. Make Damage Map
+        if len(items) > 0:
+            task.report(len(items), 0, "Writing the damage map")
+            self.makeDamageMap(task, items, map_center, viewport=index is not None and self.map_viewport_loading)
+
+        return {"from_index": index is not None, "has_more": has_more}
+
+    def runInference(self, task, image_paths, params):
+        # Runs in the worker thread of the inference runner: the model stays loaded in the server, each job is the inference only
+        client = InferenceClient(self.inference_server_url)
+        client.health()  # ConnectionError when the server is not running
+        os.makedirs(self.masks_dir, exist_ok=True)
+
+        start = time.perf_counter()
+        with_cracks = 0
+        for done, image_path in enumerate(image_paths):
+            task.report(done, len(image_paths), "Detecting cracks")
+            mask, _ = client.infer_path(image_path, **params)
+            with_cracks += bool(mask.any())
+
+            # 0/255 grayscale PNG, QImage can be written in worker threads
+            mask = (mask > 0).astype("uint8") * 255
+            image = QImage(mask.data, mask.shape[1], mask.shape[0], mask.strides[0], QImage.Format.Format_Grayscale8)
+            image.save(os.path.join(self.masks_dir, os.path.splitext(os.path.basename(image_path))[0] + ".png"))
+
+        return {"images": len(image_paths), "with_cracks": with_cracks, "seconds": time.perf_counter() - start}
+
+    def newDamageIndexReader(self):
+        # A connection of the calling thread, None without an index
+        if not os.path.exists(self.damage_index_path):
+            return None
+
+        try:
+            return DamageIndexReader(self.damage_index_path)
+        except sqlite3.Error as e:
+            print(f"Failed to open the damage index: {e}")
+            return None
+
+    def openDamageIndex(self):
+        # The index read by the GUI thread (list pages, map viewport)
+        if self.damage_index is None:
+            self.damage_index = self.newDamageIndexReader()
+        return self.damage_index is not None
+
+    def mapViewportMarkers(self, bounds, zoom):
+        # Called by the total map page (DamageMapBridge) after it was moved
+        if self.damage_index is None:
+            return {"count": 0, "markers": [], "clusters": []}
+        return viewportMarkers(self.damage_index, bounds, zoom, self.damage_filters, self.popupImageUrl)
+
+    def fetchDamagePage(self, last_item):
+        # Next page of the damage index after the last listed item, called by the list model
+        page = self.damage_index.query(after_id=last_item["id"], limit=self.damage_page_size, **self.damage_filters)
+        return page, len(page) == self.damage_page_size
+
+    def readResults(self):
+        # (done, total, DataFrame) per part of the latest result store run, or once for the whole Excel file
+        parts = self.resultStoreParts()
+        if parts is not None:
+            yield from self.readResultStore(parts)
+            return
+
+        df = self.readExcel()
+        if df is not None:
+            yield 1, 1, df
+
+    def resultStoreParts(self):
+        # Parts of the latest run of the image table written by the inference CLIs, None without a readable store
+        images_dir = os.path.join(self.result_store_dir, "images")
+        if not os.path.isdir(images_dir):
+            return None
+
+        # Latest finished run (marked with _SUCCESS), or the latest run while the first job is still writing
+        runs = sorted(name for name in os.listdir(images_dir) if name.startswith("run="))
+        complete_runs = [name for name in runs if os.path.exists(os.path.join(images_dir, name, "_SUCCESS"))]
+        runs = complete_runs or runs
+        if not runs:
+            return None
+        run_dir = os.path.join(images_dir, runs[-1])
+        parts = [os.path.join(run_dir, name) for name in sorted(os.listdir(run_dir)) if name.startswith("part-")]
+        if not parts:
+            return None
+
+        try:
+            import pyarrow.dataset  # noqa: F401
+        except ImportError:
+            print("pyarrow is not installed, reading the Excel file")
+            return None
+        return parts
+
+    def readResultStore(self, parts):
+        # One part (one batch of the result writer) at a time, only the columns used by the list and maps
+        import pyarrow.dataset as ds
+
+        file_format = "feather" if parts[0].endswith(".feather") else "parquet"
+        for done, part in enumerate(parts, 1):
+            table = ds.dataset(part, format=file_format).to_table(columns=["image_path", "latitude", "longitude"])
+
+            # Images without a location cannot be placed on the map
+            yield done, len(parts), table.to_pandas().dropna(subset=["latitude", "longitude"]).reset_index(drop=True)
+
     def readExcel(self):
-        df = pd.read_excel(self.excel_path)
-        return df
+        if not os.path.exists(self.excel_path):
+            print("No Result File to Read")
+            return None
+
+        import pandas as pd
 
-    def makeDamageList(self, df):
+        df = pd.read_excel(self.excel_path, usecols=['이미지 경로', '위도', '경도'])
+        return df.rename(columns={'이미지 경로': "image_path", '위도': "latitude", '경도': "longitude"})
+
+    def makeDamageList(self, df, first_index=0):
         if df is None or df.empty:
             print("Invalid DataFrame")
             return
-        
-        ITEMS_DATA = []
-
-        for index, row in df.iterrows():
-            item_dict = {
-                "name": f"항목 {index}",  
-                "image_path": row['이미지 경로'], 
-                "latitude": row['위도'],
-                "longitude": row['경도']
+
+        # Build the items column-wise instead of iterating over DataFrame rows
+        ITEMS_DATA = [
+            {
+                "name": f"항목 {index}",
+                "image_path": image_path,
+                "latitude": latitude,
+                "longitude": longitude
             }
-            ITEMS_DATA.append(item_dict)
-        
+            for index, image_path, latitude, longitude in zip(
+                range(first_index, first_index + len(df)), df["image_path"].tolist(), df["latitude"].tolist(), df["longitude"].tolist()
+            )
+        ]
+
         return ITEMS_DATA
-    
-    def showDamageList(self):
-        if self.damage_data is None or len(self.damage_data) == 0:
-            self.ui.DamagelistWidget.clear()
-            print("No Damage Data to Show")
-            return
-        
-        self.ui.DamagelistWidget.clear()
-
-        for item in self.damage_data:
-            list_item = QListWidgetItem(self.ui.DamagelistWidget)
-            custom_widget = CustomListItem(item)
-            list_item.setSizeHint(custom_widget.sizeHint())
-            list_item.setData(Qt.ItemDataRole.UserRole, item)  # Store item data
-            self.ui.DamagelistWidget.addItem(list_item)
-            self.ui.DamagelistWidget.setItemWidget(list_item, custom_widget)
-
-    def makeDamageMap(self):
-        if self.damage_data is None or len(self.damage_data) == 0:
-            print("Invalid Damage Data")
-            return
-        
-        # 1. Calculate Center of the Map
-        avg_lat = sum(item['latitude'] for item in self.damage_data) / len(self.damage_data)
-        avg_lon = sum(item['longitude'] for item in self.damage_data) / len(self.damage_data)
-        map_center = [avg_lat, avg_lon]
 
-        # 2. Create Folium Map
-        damage_map = folium.Map(location=map_center, zoom_start=11)
-
-        # 3. Add Markers to the Map
-        for item in self.damage_data:
-            # 3.1. Encode image to base64
-            image_path = os.path.join(os.getcwd(), "init", "data", "Images", item.get("image_path"))
-            if os.path.exists(image_path):
-                encoded_image = base64.b64encode(open(image_path, 'rb').read()).decode()
-            else:
-                encoded_image = None
-            
-            # 3.2. Create Popup HTML
-            popup_html = self.makePopupHtml(item, encoded_image)
-
-            # 3.3. Add Marker
-            if encoded_image is None:
-                popup = folium.Popup(popup_html, max_width=240)
-            else:
-                iframe = folium.IFrame(popup_html, width=240, height=280)
-                popup = folium.Popup(iframe)
-            
-            folium.Marker(
-                location=[item['latitude'], item['longitude']],
-                popup=popup,
-                tooltip=item['name']
-            ).add_to(damage_map)
-
-        # 4. Save Map to HTML
-        damage_map.save(self.html_path_total)
-    
-    def makeEachDamageMap(self, map_data):
-        if map_data is None:
-            print("Invalid Damage Data")
-            return
-        
-        # 1. Calculate Center of the Map
-        map_center = [map_data['latitude'], map_data['longitude']]
+    def makeDamageMap(self, task, items, map_center=None, viewport=False):
+        # Runs in the worker thread of the project loader, which also imports folium
+        from .damage_map import newDamageMap, addClusteredMarkers, addViewportMarkers
+
+        # 1. Calculate Center of the Map (of All Matching Damages when Reading the Index)
+        if map_center is None:
+            avg_lat = sum(item['latitude'] for item in items) / len(items)
+            avg_lon = sum(item['longitude'] for item in items) / len(items)
+            map_center = [avg_lat, avg_lon]
 
         # 2. Create Folium Map
-        damage_map = folium.Map(location=map_center, zoom_start=15)
+        damage_map = newDamageMap(map_center, zoom_start=11)
 
-        # 3. Add Markers to the Map
-        # 3.1. Encode image to base64
-        image_path = os.path.join(os.getcwd(), "init", "data", "Images", map_data.get("image_path"))
-        if os.path.exists(image_path):
-            encoded_image = base64.b64encode(open(image_path, 'rb').read()).decode()
+        # 3. Add Markers to the Map: Those of the View from the Damage Index, or All Listed Items Clustered
+        if viewport:
+            addViewportMarkers(damage_map, "damageMap")
         else:
-            encoded_image = None
+            addClusteredMarkers(damage_map, [markerRow(item, self.popupImageUrl(item)) for item in items])
 
-        # 3.2. Create Popup HTML
-        popup_html = self.makePopupHtml(map_data, encoded_image)
+        # 4. Save Map to HTML (Renamed when Complete, Unless the Load was Cancelled Meanwhile)
+        tmp_path = self.html_path_total + ".partial"
+        damage_map.save(tmp_path)
+        task.checkCancelled()
+        os.replace(tmp_path, self.html_path_total)
 
-        # 3.3. Add Marker
-        if encoded_image is None:
-            popup = folium.Popup(popup_html, max_width=240)
-        else:
-            iframe = folium.IFrame(popup_html, width=240, height=280)
-            popup = folium.Popup(iframe)
-
-        folium.Marker(
-            location=[map_data['latitude'], map_data['longitude']],
-            popup=popup,
-            tooltip=map_data['name']
-            ).add_to(damage_map)
-
-        # 4. Save Map to HTML
-        damage_map.save(self.html_path_each)
-    
-    def showDamageMap(self, mode="total"):
-        # 1. Read Mode and Select HTML Path
-        if mode == "total":
-            current_html = self.html_path_total
-        elif mode == "each":
-            current_html = self.html_path_each
-        else:
-            print("Invalid mode for DamageMap")
+    def setupMapView(self):
+        # QtWebEngine takes a while to import and start, so the view is made after the window is shown
+        if self.map_view is not None:
             return
-        
-        # 2. Load HTML to the QWebEngineView
-        self.ui.webEngineView.load(QUrl.fromLocalFile(current_html))
-    
+        from PySide6.QtWebChannel import QWebChannel
+        from PySide6.QtWebEngineCore import QWebEngineSettings
+        from PySide6.QtWebEngineWidgets import QWebEngineView
+
+        self.map_view = QWebEngineView(self.ui.mapContainer)
+        self.map_view.setObjectName("webEngineView")
+        settings1 = self.map_view.settings()
+        settings1.setAttribute(QWebEngineSettings.WebAttribute.LocalContentCanAccessRemoteUrls, True)
+        settings1.setAttribute(QWebEngineSettings.WebAttribute.LocalContentCanAccessFileUrls, True)
+
+        self.map_channel = QWebChannel(self.main)
+        self.map_channel.registerObject("damageMap", self.map_bridge)
+        self.map_view.page().setWebChannel(self.map_channel)
+        self.map_view.loadFinished.connect(self.mapLoadFinished)
+        self.ui.mapContainerLayout.addWidget(self.map_view)
+
+        # A project loaded before the view was made
+        if self.map_url is not None:
+            self.map_view.load(self.map_url)
+
+    def showDamageMap(self):
+        # Load HTML to the QWebEngineView, scripts sent until it finished loading wait for it
+        self.map_ready = False
+        self.map_url = QUrl.fromLocalFile(self.html_path_total)
+        if self.map_view is not None:
+            self.map_view.load(self.map_url)
+
+    def runMapScript(self, script):
+        if self.map_ready:
+            self.map_view.page().runJavaScript(script)
+        else:
+            self.pending_map_script = script
+
     # UTILS
     # ///////////////////////////////////////////////////////////////
-    def makePopupHtml(self, item, encoded_image=None):
-        if item is None:
-            return ""
-        
-        if encoded_image is None:
-            html_template = f"<b>{item['name']}</b><br>위도: {item['latitude']}<br>경도: {item['longitude']}<br>(이미지 없음)"
-        else:
-            html_template = f"""
-        <b>{item['name']}</b><br>
-        위도: {item['latitude']:.6f}<br>
-        경도: {item['longitude']:.6f}<br><br>
-        <img src="data:image/jpeg;base64,{encoded_image}" width="200">
-        """
-        return html_template
\ No newline at end of file
+    def popupImageUrl(self, item):
+        # File URL of the 200px thumbnail of the item image if it is cached (the image itself otherwise), None without an image
+        # Nothing is decoded or hashed here, the map of a whole survey is written without reading its images
+        image_path = os.path.join(self.images_dir, item.get("image_path"))
+        if not os.path.exists(image_path):
+            return None
+        return imageUrl(self.thumbnail_cache.cachedThumbnail(image_path, 200) or image_path)
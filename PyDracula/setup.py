@@ -3,7 +3,15 @@ import os
 from cx_Freeze import setup, Executable
 
 # ADD FILES
-files = ['icon.ico','themes/']
+# UI resources: the binary bundle next to the frozen modules (lib/modules), built by build_resources.py
+files = ['icon.ico','themes/', ('modules/resources.rcc', 'lib/modules/resources.rcc')]
+
+# THE PYTHON COPY OF THE RESOURCES IS ONLY NEEDED WITHOUT THE BUNDLE
+excludes = ['modules.resources_fallback_rc']
+
+# MODULES SHARED WITH THE INFERENCE SCRIPTS (see modules/__init__.py)
+path = sys.path + [os.path.join('..', 'inferences')]
+includes = ['damage_index', 'inference_client', 'thumbnail_layout', 'config']
 
 # TARGET
 target = Executable(
@@ -18,7 +26,7 @@ setup(
     version = "1.0",
     description = "Modern GUI for Python applications",
     author = "Wanderson M. Pimenta",
-    options = {'build_exe' : {'include_files' : files}},
+    options = {'build_exe' : {'include_files' : files, 'excludes' : excludes, 'path' : path, 'includes' : includes}},
     executables = [target]
     
 )
@@ -3,139 +3,175 @@ Crack Detection and Quantification with CSV Export
 폴더 내 모든 이미지를 탐지하고 정량화 결과를 CSV로 저장하는 코드
 '''
 import os
-import csv
 import argparse
+from functools import partial
 from glob import glob
 from pathlib import Path
 
+# images loaded whole (without --stream) may be larger than the default limit of OpenCV
 os.environ["OPENCV_IO_MAX_IMAGE_PIXELS"] = str(pow(2,40))
 
-from mmseg.apis import init_model, inference_model
 import mmcv
 import numpy as np
 from mmengine import track_progress
 
-from quantify_seg_results import quantify_crack_width_length
-from torch.cuda import empty_cache
-from utils import inference_segmentor_sliding_window
+from quantify_seg_results import quantify_crack_width_length, quantify_crack_width_length_streaming, crack_result_rows
+from inference_client import InferenceClient
+from pipeline import run_pipeline
+from sparse_mask import SPARSE_MASK_SUFFIX, write_mask
+from strip_reader import TIFF_SUFFIXES, open_strip_reader, create_disk_backed_mask, write_tiff_strips
+from result_store import CRACK_TABLE, image_row, crack_table
+from result_writer import open_result_writer
+from thumbnail_cache import ThumbnailCache
+from config import CONFIG
 
 def parse_args():
     parser = argparse.ArgumentParser(description='Crack Detection and Quantification with CSV Export')
-    parser.add_argument('--crack_config', help='the config file to inference crack')
-    parser.add_argument('--crack_checkpoint', help='the checkpoint file to inference crack')
+    parser.add_argument('--crack_config', help='the config file to inference crack (the model of the server with --server)')
+    parser.add_argument('--crack_checkpoint', help='the checkpoint file to inference crack (the model of the server with --server)')
+    parser.add_argument('--server', default=CONFIG['INFERENCE_SERVER_URL'], help='the inference server URL (inference_server.py), the model is not loaded here')
     parser.add_argument('--srx_dir', help='the dir to inference')
     parser.add_argument('--rst_dir', help='the dir to save result')
     parser.add_argument('--csv_output', default='crack_detection_results.csv', help='the CSV output file name')
     parser.add_argument('--srx_suffix', default='.png', help='the source image extension')
     parser.add_argument('--rst_suffix', default='.png', help='the result image extension')
-    parser.add_argument('--mask_suffix', default='.png', help='the mask output extension')
-    parser.add_argument('--alpha', default=0.8, help='the alpha value for blending')
+    parser.add_argument('--mask_suffix', default='.png', help='the mask output extension (.rle saves the compact sparse mask format)')
+    parser.add_argument('--alpha', type=float, default=0.8, help='the alpha value for blending')
     parser.add_argument('--rgb_to_bgr', action='store_true', help='convert rgb to bgr, if the model palette is written in rgb format.')
     parser.set_defaults(rgb_to_bgr=False)
     parser.add_argument('--overwrite_crack_palette', action='store_true', help='overwrite the crack palette with black and red. To be used when the crack model is trained with a different palette.')
     parser.add_argument('--minimum_area', default=500, help='minimum crack area for detection')
+    parser.add_argument('--batch_size', type=int, default=CONFIG['BATCH_SIZE'], help='the number of sliding windows per forward pass')
+    parser.add_argument('--blend', default=CONFIG['BLEND_MODE'], choices=['none', 'cosine', 'gaussian'], help="the probability blending of overlapping windows ('none' keeps the last window)")
+    parser.add_argument('--gate_threshold', type=float, default=CONFIG['GATE_THRESHOLD'], help='the edge energy below which windows are skipped')
+    parser.add_argument('--decode_workers', type=int, default=CONFIG['DECODE_WORKERS'], help='the number of threads reading images ahead of inference')
+    parser.add_argument('--postprocess_workers', type=int, default=CONFIG['POSTPROCESS_WORKERS'], help='the number of processes quantifying cracks (0: one thread)')
+    parser.add_argument('--queue_size', type=int, default=CONFIG['PIPELINE_QUEUE_SIZE'], help='the number of images buffered between pipeline stages')
+    parser.add_argument('--result_store', help='the columnar result store directory (default: <rst_dir>/crack_results)')
+    parser.add_argument('--store_format', default=CONFIG['RESULT_STORE_FORMAT'], choices=['parquet', 'feather'], help='the file format of the result store')
+    parser.add_argument('--result_db', help='the SQLite database to also write the results to (readable while running)')
+    parser.add_argument('--damage_index', help='the damage index read by the PyDracula viewer (e.g. PyDracula/init/data/damage_index.sqlite)')
+    parser.add_argument('--result_batch_rows', type=int, default=CONFIG['RESULT_BATCH_ROWS'], help='the maximum number of result rows buffered before writing')
+    parser.add_argument('--thumbnail_cache', help='the thumbnail cache read by the PyDracula viewer (e.g. PyDracula/init/data/thumbnails)')
+    parser.add_argument('--stream', action='store_true', help='read the images strip by strip and keep the masks on disk, for mosaics which do not fit in memory')
+    parser.set_defaults(stream=CONFIG['STREAM_INFERENCE'])
 
     args = parser.parse_args()
+    if args.blend == 'none':
+        args.blend = None
+    if not args.server and not (args.crack_config and args.crack_checkpoint):
+        parser.error('--crack_config and --crack_checkpoint (or --server) are required')
+    if args.stream and not args.rst_suffix.lower().endswith(TIFF_SUFFIXES):
+        parser.error('--stream writes the result images strip by strip as TIFF, use --rst_suffix .tif')
+    if args.stream and not args.mask_suffix.lower().endswith(TIFF_SUFFIXES + (SPARSE_MASK_SUFFIX,)):
+        parser.error(f'--stream writes the masks strip by strip, use --mask_suffix {SPARSE_MASK_SUFFIX} or .tif')
     return args
 
-def process_single_image(crack_model, img_path, args, crack_palette):
+def quantify_image(img_path, inferred, crack_palette, alpha, minimum_area, stream=False):
     """
-    Process a single image for crack detection and quantification
+    Visualize and quantify cracks of a single image. Runs in the postprocess stage of the pipeline.
     
     Args:
-        crack_model: The crack detection model
         img_path: Path to the input image
-        args: Command line arguments
+        inferred: Tuple of (original image, crack mask)
         crack_palette: Color palette for crack visualization
+        alpha: The alpha value for blending
+        minimum_area: Minimum crack area for detection
+        stream: Quantify the disk-backed mask strip by strip, the image (a strip reader) is drawn when it is saved
         
     Returns:
-        tuple: (image_name, crack_quantification_results)
+        tuple: (seg_result, crack_mask, crack_quantification_results)
     """
-    try:
-        # Perform crack detection
-        _, crack_mask = inference_segmentor_sliding_window(
-            crack_model, img_path, color_mask=None, 
-            score_thr=0.1, window_size=1024, overlap_ratio=0.1
-        )
-
-        # Read the original image
-        seg_result = mmcv.imread(img_path)
-        
-        # Visualize the crack mask
-        color = crack_palette[1]
-        color = np.array(color, dtype=np.uint8)
-        mask_bool = crack_mask == 1
-
-        seg_result[mask_bool, :] = seg_result[mask_bool, :] * (1 - args.alpha) + color * args.alpha
+    seg_result, crack_mask = inferred
 
-        # Quantify crack width and length
-        seg_result, crack_quantification_results = quantify_crack_width_length(
-            seg_result, crack_mask, crack_palette[1], 
-            minimum_area=args.minimum_area
+    if stream:
+        crack_quantification_results = quantify_crack_width_length_streaming(
+            crack_mask, minimum_area=minimum_area, num_workers=CONFIG['QUANTIFY_WORKERS']
         )
+        return seg_result, crack_mask, crack_quantification_results
 
-        # Save result images
-        rst_name = os.path.basename(img_path).replace(args.srx_suffix, args.rst_suffix)
-        mask_name = os.path.basename(img_path).replace(args.srx_suffix, args.mask_suffix)
+    # Visualize the crack mask
+    color = crack_palette[1]
+    color = np.array(color, dtype=np.uint8)
+    mask_bool = crack_mask == 1
 
-        rst_path = os.path.join(args.rst_dir, rst_name)
-        mask_path = os.path.join(args.rst_dir, mask_name)
+    seg_result[mask_bool, :] = seg_result[mask_bool, :] * (1 - alpha) + color * alpha
 
-        # Create output directory if it doesn't exist
-        os.makedirs(args.rst_dir, exist_ok=True)
-        
-        mmcv.imwrite(seg_result, rst_path)
-        mmcv.imwrite(crack_mask.astype(np.uint8), mask_path)
+    # Quantify crack width and length
+    seg_result, crack_quantification_results = quantify_crack_width_length(
+        seg_result, crack_mask, crack_palette[1], 
+        minimum_area=minimum_area, num_workers=CONFIG['QUANTIFY_WORKERS']
+    )
 
-        # Get image name without extension
-        image_name = os.path.splitext(os.path.basename(img_path))[0]
-        
-        return image_name, crack_quantification_results
+    return seg_result, crack_mask, crack_quantification_results
 
-    except Exception as e:
-        print(f"Error processing {img_path}: {str(e)}")
-        return None, []
-
-def save_results_to_csv(all_results, csv_output_path):
+def save_image_results(img_path, processed, args, thumbnails=None, crack_color=None):
     """
-    Save all crack detection results to CSV file
+    Save result images of a single image. Runs in the write stage of the pipeline.
     
     Args:
-        all_results: List of tuples containing (image_name, crack_quantification_results)
-        csv_output_path: Path to save the CSV file
+        img_path: Path to the input image
+        processed: Tuple of (seg_result, crack_mask, crack_quantification_results)
+        args: Command line arguments
+        thumbnails: ThumbnailCache to add the thumbnails of the result image to (optional)
+        crack_color: Color of the cracks, to draw the result image strip by strip with --stream
+        
+    Returns:
+        tuple: (image_name, crack_quantification_results)
     """
-    # Prepare CSV data - only include images with detected cracks
-    csv_data = []
-    
-    for image_name, crack_results in all_results:
-        if crack_results:  # Only save if cracks were detected
-            for crack_data in crack_results:
-                csv_data.append({
-                    'Image_Name': image_name,
-                    'Pixel_Coordinates': crack_data[0],
-                    'Measurements': crack_data[1],
-                    'Class_ID': crack_data[2]
-                })
-    
-    # Write to CSV
-    fieldnames = ['Image_Name', 'Pixel_Coordinates', 'Measurements', 'Class_ID']
+    seg_result, crack_mask, crack_quantification_results = processed
+
+    # Save result images
+    rst_name = os.path.basename(img_path).replace(args.srx_suffix, args.rst_suffix)
+    mask_name = os.path.basename(img_path).replace(args.srx_suffix, args.mask_suffix)
+
+    rst_path = os.path.join(args.rst_dir, rst_name)
+    mask_path = os.path.join(args.rst_dir, mask_name)
+
+    # Create output directory if it doesn't exist
+    os.makedirs(args.rst_dir, exist_ok=True)
     
-    with open(csv_output_path, 'w', newline='', encoding='utf-8') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(csv_data)
+    if args.stream:
+        # Drawn and written strip by strip, the thumbnails are made from a downscaled copy
+        with seg_result as reader:
+            result_rows = crack_result_rows(reader.read_rows, crack_mask, crack_quantification_results, crack_color, args.alpha)
+            downscaled = write_tiff_strips(rst_path, result_rows, reader.shape,
+                                           downscale=thumbnails.downscale_factor(reader.shape) if thumbnails is not None else None)
+        if thumbnails is not None:
+            thumbnails.add(rst_path, downscaled)
+    else:
+        mmcv.imwrite(seg_result, rst_path)
+        if thumbnails is not None:
+            thumbnails.add(rst_path, seg_result)
+    write_mask(mask_path, crack_mask, {
+        'source_image': os.path.basename(img_path), 'config': args.crack_config, 'checkpoint': args.crack_checkpoint
+    })
+
+    # Get image name without extension
+    image_name = os.path.splitext(os.path.basename(img_path))[0]
     
-    print(f"Results saved to: {csv_output_path}")
-    print(f"Total images processed: {len(all_results)}")
-    print(f"Images with cracks detected: {len(csv_data)}")
-    print(f"Total crack detections: {sum(len(results) for _, results in all_results if results)}")
+    return image_name, crack_quantification_results
 
 def main():
     args = parse_args()
     
-    # Initialize crack detection model
-    print("Initializing crack detection model...")
-    crack_model = init_model(args.crack_config, args.crack_checkpoint, device='cuda:0')
+    # Initialize crack detection model, or use the model loaded by the inference server
+    client = None
+    if args.server:
+        client = InferenceClient(args.server)
+        server_model = client.health()
+        args.crack_config, args.crack_checkpoint = server_model['config'], server_model['checkpoint']
+        crack_palette = server_model['palette'][:2]
+        print(f"Using the inference server: {args.server} ({os.path.basename(args.crack_checkpoint)})")
+    else:
+        # mmseg and torch are only imported to load the model here
+        from mmseg.apis import init_model
+        from torch.cuda import empty_cache
+        from utils import inference_segmentor_sliding_window
+
+        print("Initializing crack detection model...")
+        crack_model = init_model(args.crack_config, args.crack_checkpoint, device='cuda:0')
+        crack_palette = crack_model.dataset_meta['palette'][:2]  # Only keep the first two colors
     
     # Get list of images to process
     img_list = glob(os.path.join(args.srx_dir, f'*{args.srx_suffix}'))
@@ -147,32 +183,91 @@ def main():
     print(f"Found {len(img_list)} images to process")
     
     # Setup crack palette
-    crack_palette = crack_model.dataset_meta['palette'][:2]  # Only keep the first two colors
-
     if args.rgb_to_bgr:
         crack_palette = [p[::-1] for p in crack_palette]
 
     if args.overwrite_crack_palette:
         crack_palette[1] = [0, 0, 255]  # Redefine crack color if necessary
 
-    # Process all images
-    all_results = []
-    
+    # Process all images, decoding, detection, quantification and saving of different images overlap
+    img_numbers = {img_path: i for i, img_path in enumerate(img_list)}
+    window_stats = {}
+
+    job_params = {
+        'score_thr': 0.1, 'window_size': 1024, 'overlap_ratio': 0.1, 'batch_size': args.batch_size, 'blend': args.blend,
+        'gate_threshold': args.gate_threshold,
+    }
+
+    def load_image(img_path):
+        if args.stream:
+            # The image is read strip by strip and the mask is a temporary file, neither is held in memory
+            reader = open_strip_reader(img_path, CONFIG['STREAM_CACHE_DIR'])
+            return reader, create_disk_backed_mask(reader.shape, CONFIG['STREAM_CACHE_DIR'])
+        return mmcv.imread(img_path), None
+
+    def detect_cracks(img_path, loaded):
+        seg_result, mask_output = loaded
+        print(f"Processing {img_numbers[img_path]+1}/{len(img_list)}: {os.path.basename(img_path)}")
+
+        # Perform crack detection, on the server when there is one
+        if client is not None:
+            # The server reads a streamed image from its path, strip by strip, into the disk-backed mask
+            if args.stream:
+                crack_mask, job_stats = client.infer_path(img_path, out=mask_output, stream=True, **job_params)
+            else:
+                crack_mask, job_stats = client.infer_array(seg_result, **job_params)
+            for key, count in job_stats.items():
+                window_stats[key] = window_stats.get(key, 0) + count
+        else:
+            _, crack_mask = inference_segmentor_sliding_window(
+                crack_model, seg_result, color_mask=None, mask_output=mask_output, window_stats=window_stats, **job_params
+            )
+
+            # Clear GPU memory
+            empty_cache()
+
+        return seg_result, crack_mask
+
+    # Results are written in batches as images finish: the CSV with one row per crack, the result store and the database
+    csv_output_path = os.path.join(args.rst_dir, args.csv_output)
+    writer = open_result_writer(
+        store_dir=args.result_store or os.path.join(args.rst_dir, 'crack_results'),
+        csv_path=csv_output_path, db_path=args.result_db, index_path=args.damage_index, fmt=args.store_format,
+        batch_rows=args.result_batch_rows, flush_interval=CONFIG['RESULT_FLUSH_INTERVAL'],
+        survey=os.path.abspath(args.srx_dir)
+    )
+    images_with_cracks = []
+
+    # Thumbnails of the result images for the viewer, made from the image in memory (a downscaled copy with --stream)
+    thumbnails = ThumbnailCache(args.thumbnail_cache, budget_bytes=CONFIG['THUMBNAIL_CACHE_BUDGET']) if args.thumbnail_cache else None
+
+    def save_results(img_path, processed):
+        image_name, crack_results = save_image_results(img_path, processed, args, thumbnails, crack_palette[1])
+        writer.add(image_row(image_name, crack_results), crack_table(image_name, crack_results))
+        if len(crack_results) > 0:
+            images_with_cracks.append(image_name)
+
+    # Streamed masks are disk-backed, so they are quantified in threads instead of being copied to processes
+    # The batches written so far are kept if the run fails, the outputs are only finalized when it completes
     print("Processing images...")
-    for i, img_path in enumerate(img_list):
-        print(f"Processing {i+1}/{len(img_list)}: {os.path.basename(img_path)}")
-        
-        image_name, crack_results = process_single_image(crack_model, img_path, args, crack_palette)
-        
-        if image_name is not None:
-            all_results.append((image_name, crack_results))
-        
-        # Clear GPU memory
-        empty_cache()
+    with writer:
+        outputs, _ = run_pipeline(
+            img_list, load_image, detect_cracks,
+            partial(quantify_image, crack_palette=crack_palette, alpha=args.alpha, minimum_area=args.minimum_area, stream=args.stream),
+            save_results,
+            decode_workers=args.decode_workers, postprocess_workers=0 if args.stream else args.postprocess_workers,
+            queue_size=args.queue_size
+        )
+    if thumbnails is not None:
+        thumbnails.close()
+
+    if args.gate_threshold is not None:
+        print(f"Gate skipped {window_stats.get('skipped_windows', 0)}/{window_stats.get('windows', 0)} windows")
     
-    # Save results to CSV
-    csv_output_path = os.path.join(args.rst_dir, args.csv_output)
-    save_results_to_csv(all_results, csv_output_path)
+    print(f"Results saved to: {csv_output_path}")
+    print(f"Total images processed: {len(outputs)}")
+    print(f"Images with cracks detected: {len(images_with_cracks)}")
+    print(f"Total crack detections: {writer.rows_written[CRACK_TABLE]}")
     
     print("Processing completed!")
 
@@ -0,0 +1,175 @@
+"""
+Crack Connection Benchmark
+균열 끝점 연결 속도 비교 스크립트
+
+Compares connect_cracks_by_edge with its previous nested-loop version, on synthetic masks
+from 10 to 50,000 crack fragments, and checks that both draw the same connection lines.
+The nested loop is quadratic, so it is only run up to --max_loop_components.
+
+Usage:
+    python benchmark_connect_cracks.py --num_components 10 100 1000 10000 50000
+"""
+
+import argparse
+import time
+
+import cv2
+import numpy as np
+from skimage.measure import label, regionprops_table
+
+from quantify_seg_results import connect_cracks_by_edge, _crack_endpoints, _pair_nearest_endpoints
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark crack endpoint pairing')
+    parser.add_argument('--num_components', type=int, nargs='+', default=[10, 100, 1000, 10000, 50000], help='the numbers of crack fragments')
+    parser.add_argument('--epsilon', type=float, default=5000000, help='the search radius of connect_cracks_by_edge')
+    parser.add_argument('--max_loop_components', type=int, default=1000, help='the largest size the nested loop is run for')
+    parser.add_argument('--seed', type=int, default=0, help='the random seed')
+
+    args = parser.parse_args()
+    return args
+
+
+def make_fragment_mask(num_components, cell_size=24, seed=0):
+    """
+    Draw one short crack fragment in each cell of a square grid
+    Args:
+        num_components (int): The number of fragments.
+        cell_size (int): The cell size in pixels. Fragments stay inside their cell, so they never touch.
+        seed (int): The random seed.
+
+    Returns:
+        mask (ndarray): The crack mask.
+    """
+    rng = np.random.default_rng(seed)
+    cells_across = int(np.ceil(np.sqrt(num_components)))
+    size = cells_across * cell_size
+    mask = np.zeros((size, size), dtype=np.uint8)
+
+    for cell in range(num_components):
+        top = (cell // cells_across) * cell_size
+        left = (cell % cells_across) * cell_size
+        x0, y0, x1, y1 = rng.integers(2, cell_size - 3, 4)
+        cv2.line(mask, (int(left + x0), int(top + y0)), (int(left + x1), int(top + y1)), 1, 1)
+
+    return mask
+
+
+def loop_connect_cracks_by_edge(mask_output, epsilon = 5000000):
+    """
+    connect_cracks_by_edge as it was before the KD-tree pairing, kept as the reference.
+    Every e2 is compared with every e1 in nested loops.
+    """
+    labels, num = label(mask_output, connectivity=2, return_num=True)
+    crack_region_table = regionprops_table(labels, properties=('label', 'bbox', 'coords', 'orientation'))
+
+    width = crack_region_table['bbox-3'] - crack_region_table['bbox-1']
+    height = crack_region_table['bbox-2'] - crack_region_table['bbox-0']
+
+    crack_region_table['is_horizontal'] = width > height
+
+    connecting_directions = ['x_axis', 'y_axis']
+    connect_line_img = np.zeros_like(mask_output, dtype=np.uint8)
+
+    for connecting_direction in connecting_directions:
+
+        e2_list = []
+        e1_list = []
+
+        for crack_num, crack_region in enumerate(crack_region_table['label']):
+
+            min_row = crack_region_table['bbox-0'][crack_num]
+            min_col = crack_region_table['bbox-1'][crack_num]
+            max_row = crack_region_table['bbox-2'][crack_num] - 1
+            max_col = crack_region_table['bbox-3'][crack_num] - 1
+
+            if crack_region_table['is_horizontal'][crack_num]:
+                col = crack_region_table['coords'][crack_num][:, 1]
+
+                e2 = crack_region_table['coords'][crack_num][np.argwhere(col == max_col), :][-1][0]
+                e1 = crack_region_table['coords'][crack_num][np.argwhere(col == min_col), :][0][0]
+
+                if connecting_direction == 'y_axis' and e2[0] < e1[0]:
+                    e2, e1 = e1, e2
+
+            else:
+                row = crack_region_table['coords'][crack_num][:, 0]
+
+                e2 = crack_region_table['coords'][crack_num][np.argwhere(row == max_row), :][-1][0]
+                e1 = crack_region_table['coords'][crack_num][np.argwhere(row == min_row), :][0][0]
+
+                if connecting_direction == 'x_axis' and e2[1] < e1[1]:
+                    e2, e1 = e1, e2
+
+            e2_list.append(e2)
+            e1_list.append(e1)
+
+        color = (1)  # binary image
+
+        for num_e2, e2 in enumerate(e2_list):
+
+            connect_candidates_e2 = []
+            connect_candidates_e1 = []
+            distance_list = []
+
+            for num_e1, e1 in enumerate(e1_list):
+
+                if num_e2 != num_e1:
+                    d = np.subtract(e1, e2)
+                    distance = np.sqrt(d[0] ** 2 + d[1] ** 2)
+
+                    if (distance < epsilon):
+                        distance_list.append(distance)
+                        connect_candidates_e2.append(tuple(int(v) for v in e2[::-1]))
+                        connect_candidates_e1.append(tuple(int(v) for v in e1[::-1]))
+
+            if distance_list :
+                connect_idx = np.argmin(distance_list)
+                connect_line_img = cv2.line(connect_line_img, connect_candidates_e2[connect_idx], connect_candidates_e1[connect_idx], color, 8)
+
+    mask_output = mask_output + connect_line_img
+    mask_output[mask_output > 1] = 1
+
+    return mask_output
+
+
+def pairing_inputs(mask):
+    """Endpoints of the x_axis pass of connect_cracks_by_edge, for timing the pairing alone"""
+    labels = label(mask, connectivity=2)
+    crack_region_table = regionprops_table(labels, properties=('label', 'bbox'))
+    width = crack_region_table['bbox-3'] - crack_region_table['bbox-1']
+    height = crack_region_table['bbox-2'] - crack_region_table['bbox-0']
+    crack_region_table['is_horizontal'] = width > height
+
+    return _crack_endpoints(labels, crack_region_table)
+
+
+def main():
+    args = parse_args()
+
+    print(f"{'components':>10} {'loop (s)':>9} {'kd-tree (s)':>12} {'pairing only (s)':>17}")
+    for num_components in args.num_components:
+        mask = make_fragment_mask(num_components, seed=args.seed)
+
+        e2, e1 = pairing_inputs(mask)
+        start = time.perf_counter()
+        _pair_nearest_endpoints(e2, e1, args.epsilon)
+        pairing_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        connected = connect_cracks_by_edge(mask, args.epsilon)
+        tree_time = time.perf_counter() - start
+
+        loop_time = float('nan')
+        if num_components <= args.max_loop_components:
+            start = time.perf_counter()
+            loop_connected = loop_connect_cracks_by_edge(mask, args.epsilon)
+            loop_time = time.perf_counter() - start
+            assert np.array_equal(connected, loop_connected), 'KD-tree connection lines differ from the nested loop'
+
+        print(f"{num_components:>10} {loop_time:>9.3f} {tree_time:>12.3f} {pairing_time:>17.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+"""
+Crack Measurement Benchmark
+균열 폭/길이 측정 속도 비교 스크립트
+
+Compares the per-crack loop which was used in quantify_crack_width_length
+(one full-image mask per crack) with the single-pass bincount measurement,
+and medial_axis on the full image with medial_axis on crack crops,
+on synthetic masks with an increasing number of crack fragments.
+
+Usage:
+    python benchmark_quantify.py --size 4000 --num_cracks 100 1000 3000
+"""
+
+import argparse
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+from skimage.measure import label
+from skimage.morphology import medial_axis
+
+from quantify_seg_results import create_distance_map, create_sparse_distance_map, _calculate_crack_width_length
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark crack width/length measurement')
+    parser.add_argument('--size', type=int, default=4000, help='the height and width of the synthetic mask')
+    parser.add_argument('--num_cracks', type=int, nargs='+', default=[100, 1000, 3000], help='the numbers of crack fragments')
+    parser.add_argument('--minimum_area', type=int, default=0, help='the minimum crack area')
+    parser.add_argument('--num_workers', type=int, default=0, help='the number of processes for the cropped medial axis')
+    parser.add_argument('--seed', type=int, default=0, help='the random seed')
+
+    args = parser.parse_args()
+    return args
+
+
+def make_crack_mask(size, num_cracks, seed=0):
+    """
+    Draw random line fragments of various width as a synthetic crack mask
+    Args:
+        size (int): The height and width of the mask.
+        num_cracks (int): The number of line fragments.
+        seed (int): The random seed.
+
+    Returns:
+        mask (ndarray): The crack mask. The shape is (size, size).
+    """
+    rng = np.random.default_rng(seed)
+    mask = np.zeros((size, size), dtype=np.uint8)
+
+    for _ in range(num_cracks):
+        x0, y0 = rng.integers(0, size, 2)
+        angle = rng.uniform(0, np.pi)
+        length = rng.integers(10, 120)
+        x1 = int(np.clip(x0 + length * np.cos(angle), 0, size - 1))
+        y1 = int(np.clip(y0 + length * np.sin(angle), 0, size - 1))
+        cv2.line(mask, (int(x0), int(y0)), (x1, y1), 1, int(rng.integers(1, 8)))
+
+    return mask
+
+
+def loop_measurements(mask_label, distance_map, minimum_area):
+    """
+    Per-crack measurement as previously done in quantify_crack_width_length
+    Returns:
+        measurements (list): (crack_id, area, width, length) of cracks larger than minimum_area.
+    """
+    measurements = []
+
+    for crack_id in np.unique(mask_label)[1:]:
+        crack_mask = mask_label == crack_id
+
+        crack_area = np.sum(crack_mask)
+        if crack_area < minimum_area:
+            continue
+
+        crack_distance_map = distance_map * crack_mask
+        crack_width = np.mean(crack_distance_map[crack_distance_map > 0])
+        crack_length = np.sum(crack_distance_map > 0)
+
+        measurements.append((crack_id, crack_area, crack_width, crack_length))
+
+    return measurements
+
+
+def bincount_measurements(mask_label, distance_map, minimum_area):
+    """
+    Single-pass measurement with _calculate_crack_width_length
+    Returns:
+        measurements (list): (crack_id, area, width, length) of cracks larger than minimum_area.
+    """
+    num_labels = int(mask_label.max())
+    rows, cols = np.nonzero(distance_map)
+    skeleton = (rows, cols, distance_map[rows, cols])
+    crack_areas, crack_widths, crack_lengths = _calculate_crack_width_length(mask_label, skeleton, num_labels)
+
+    return [
+        (crack_id, crack_areas[crack_id], crack_widths[crack_id], crack_lengths[crack_id])
+        for crack_id in range(1, num_labels + 1)
+        if crack_areas[crack_id] >= minimum_area
+    ]
+
+
+def measure_peak(func, *args, **kwargs):
+    """Return the elapsed time of func, and the peak traced memory in MB of a second run"""
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+
+    # tracemalloc slows down allocations, so memory is measured separately
+    tracemalloc.start()
+    func(*args, **kwargs)
+    peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    tracemalloc.stop()
+
+    return elapsed, peak
+
+
+def main():
+    args = parse_args()
+
+    print("medial axis")
+    print(f"{'cracks':>7} {'coverage':>9} {'full (s)':>9} {'full (MB)':>10} {'cropped (s)':>12} {'cropped (MB)':>13}")
+    for num_cracks in args.num_cracks:
+        mask = make_crack_mask(args.size, num_cracks, args.seed)
+
+        full_time, full_peak = measure_peak(medial_axis, mask, return_distance=True)
+        cropped_time, cropped_peak = measure_peak(create_sparse_distance_map, mask, num_workers=args.num_workers)
+
+        print(f"{num_cracks:>7} {mask.mean():>9.2%} {full_time:>9.3f} {full_peak:>10.1f} {cropped_time:>12.3f} {cropped_peak:>13.1f}")
+
+    print("\nwidth / length measurement")
+    print(f"{'cracks':>7} {'labels':>7} {'loop (s)':>9} {'bincount (s)':>13} {'speedup':>8}")
+    for num_cracks in args.num_cracks:
+        mask = make_crack_mask(args.size, num_cracks, args.seed)
+        distance_map = create_distance_map(mask)
+        mask_label = label(mask)
+
+        start = time.perf_counter()
+        loop_result = loop_measurements(mask_label, distance_map, args.minimum_area)
+        loop_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        bincount_result = bincount_measurements(mask_label, distance_map, args.minimum_area)
+        bincount_time = time.perf_counter() - start
+
+        # the results are reported with 2 decimals, so they must format identically
+        assert [f"{w:.2f}x{l:.2f}" for _, _, w, l in loop_result] == [f"{w:.2f}x{l:.2f}" for _, _, w, l in bincount_result]
+
+        print(f"{num_cracks:>7} {len(loop_result):>7} {loop_time:>9.3f} {bincount_time:>13.3f} {loop_time / bincount_time:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+ROI Inference Benchmark
+저해상도 ROI 추론 임계값별 윈도우 수 / 처리 시간 / 재현율 비교 스크립트
+
+Runs sliding window inference over a sample set of images once over every window and then in the
+coarse-to-fine ROI mode with several heatmap thresholds, and reports the full resolution windows run
+per image, the ratio of skipped windows, the low resolution windows per image, the time per image and
+the pixel recall of cracks, both against the ground truth masks and against the full inference.
+
+Usage:
+    python benchmark_roi_inference.py --crack_config "config.py" --crack_checkpoint "checkpoint.pth" \
+        --srx_dir "images" --gt_dir "gt_masks" --coarse_scale 0.25 --thresholds 0.1 0.2 0.3
+"""
+
+import os
+
+os.environ["OPENCV_IO_MAX_IMAGE_PIXELS"] = str(pow(2,40))
+
+import argparse
+import time
+from glob import glob
+
+import mmcv
+from mmseg.apis import init_model
+
+from utils import inference_segmentor_sliding_window
+from benchmark_window_gate import load_gt_mask, pixel_recall
+from config import CONFIG
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark the coarse-to-fine ROI inference')
+    parser.add_argument('--crack_config', required=True, help='the config file to inference crack')
+    parser.add_argument('--crack_checkpoint', required=True, help='the checkpoint file to inference crack')
+    parser.add_argument('--srx_dir', required=True, help='the dir of images to inference')
+    parser.add_argument('--gt_dir', default=None, help='the dir of ground truth masks (optional)')
+    parser.add_argument('--srx_suffix', default='.png', help='the source image extension')
+    parser.add_argument('--gt_suffix', default='.png', help='the ground truth mask extension')
+    parser.add_argument('--target_label', type=int, default=1, help='the crack label in the ground truth masks')
+    parser.add_argument('--max_images', type=int, default=None, help='the number of images of the sample set (all by default)')
+    parser.add_argument('--coarse_scale', type=float, default=CONFIG['COARSE_SCALE'], help='the scale of the low resolution heatmap')
+    parser.add_argument('--thresholds', type=float, nargs='+', default=[0.1, 0.2, 0.3], help='the heatmap thresholds to compare')
+    parser.add_argument('--roi_margin', type=int, default=CONFIG['ROI_MARGIN'], help='the margin run around the candidates (pixels)')
+    parser.add_argument('--window_size', type=int, default=CONFIG['WINDOW_SIZE'], help='the size of sliding window')
+    parser.add_argument('--overlap_ratio', type=float, default=CONFIG['OVERLAP_RATIO'], help='the overlap ratio of sliding window')
+    parser.add_argument('--batch_size', type=int, default=CONFIG['BATCH_SIZE'], help='the number of sliding windows per forward pass')
+    parser.add_argument('--blend', default=CONFIG['BLEND_MODE'], choices=['none', 'cosine', 'gaussian'], help="the probability blending of overlapping windows ('none' keeps the last window)")
+    parser.add_argument('--device', default='cuda:0', help='the device used for inference')
+
+    args = parser.parse_args()
+    if args.blend == 'none':
+        args.blend = None
+    return args
+
+
+def run_roi(model, images, args, roi_threshold):
+    """
+    Run sliding window inference over all images with one heatmap threshold
+    Args:
+        model (nn.Module): The loaded detector.
+        images (list): The loaded images.
+        args (Namespace): The parsed arguments.
+        roi_threshold (float): The heatmap threshold. None runs every window.
+
+    Returns:
+        masks (list): The boolean crack masks.
+        window_stats (dict): The window counts.
+        elapsed (float): The inference time in seconds, the low resolution pass included.
+    """
+    window_stats = {}
+    masks = []
+
+    start = time.perf_counter()
+    for img in images:
+        _, mask = inference_segmentor_sliding_window(
+            model, img.copy(), color_mask=None, window_size=args.window_size, overlap_ratio=args.overlap_ratio,
+            batch_size=args.batch_size, blend=args.blend, window_stats=window_stats,
+            roi_scale=None if roi_threshold is None else args.coarse_scale, roi_threshold=roi_threshold, roi_margin=args.roi_margin
+        )
+        masks.append(mask.astype(bool))
+    elapsed = time.perf_counter() - start
+
+    return masks, window_stats, elapsed
+
+
+def main():
+    args = parse_args()
+
+    model = init_model(args.crack_config, args.crack_checkpoint, device=args.device)
+
+    img_list = sorted(glob(os.path.join(args.srx_dir, f'*{args.srx_suffix}')))[:args.max_images]
+    images = [mmcv.imread(img_path) for img_path in img_list]
+    gt_masks = [
+        load_gt_mask(args.gt_dir, img_path, args.srx_suffix, args.gt_suffix, args.target_label, img.shape)
+        for img_path, img in zip(img_list, images)
+    ]
+    print(f"Loaded {len(images)} images, {sum(gt is not None for gt in gt_masks)} with ground truth")
+
+    # warm up cuDNN autotuning so the full inference is not penalized
+    run_roi(model, images[:1], args, None)
+
+    rows = []
+    full_masks = None
+    for roi_threshold in [None] + args.thresholds:
+        masks, window_stats, elapsed = run_roi(model, images, args, roi_threshold)
+        if full_masks is None:
+            full_masks = masks
+
+        num_images = max(len(images), 1)
+        rows.append((
+            'full' if roi_threshold is None else f'{roi_threshold:g}',
+            (window_stats['windows'] - window_stats['skipped_windows']) / num_images,
+            window_stats['skipped_windows'] / max(window_stats['windows'], 1),
+            window_stats.get('coarse_windows', 0) / num_images,
+            elapsed / num_images,
+            pixel_recall(masks, gt_masks),
+            pixel_recall(masks, full_masks),
+        ))
+
+    print(f"\ncoarse scale {args.coarse_scale:g}, margin {args.roi_margin}px, window {args.window_size}px")
+    print(f"{'roi':>6} {'windows/image':>14} {'skipped':>8} {'coarse/image':>13} {'s/image':>8} {'GT recall':>10} {'vs full':>8}")
+    for name, windows_per_image, skip_ratio, coarse_per_image, seconds_per_image, gt_recall, full_recall in rows:
+        print(f"{name:>6} {windows_per_image:>14.1f} {skip_ratio:>8.1%} {coarse_per_image:>13.1f} {seconds_per_image:>8.2f} "
+              f"{gt_recall:>10.4f} {full_recall:>8.4f}")
+
+
+if __name__ == '__main__':
+    main()
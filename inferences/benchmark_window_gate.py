@@ -0,0 +1,159 @@
+"""
+Window Gate Benchmark
+윈도우 게이트 임계값별 처리량 / 재현율 비교 스크립트
+
+Runs sliding window inference with several edge-energy gate thresholds and reports
+throughput (windows/s), the ratio of skipped windows and the pixel recall of cracks,
+both against the ground truth masks and against the ungated prediction.
+
+Usage:
+    python benchmark_window_gate.py --crack_config "config.py" --crack_checkpoint "checkpoint.pth" \
+        --srx_dir "images" --gt_dir "gt_masks" --thresholds 2 4 8 16
+"""
+
+import os
+
+os.environ["OPENCV_IO_MAX_IMAGE_PIXELS"] = str(pow(2,40))
+
+import argparse
+import time
+from glob import glob
+
+import cv2
+import mmcv
+from mmseg.apis import init_model
+
+from utils import inference_segmentor_sliding_window
+from config import CONFIG
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark the edge-energy window gate')
+    parser.add_argument('--crack_config', required=True, help='the config file to inference crack')
+    parser.add_argument('--crack_checkpoint', required=True, help='the checkpoint file to inference crack')
+    parser.add_argument('--srx_dir', required=True, help='the dir of images to inference')
+    parser.add_argument('--gt_dir', default=None, help='the dir of ground truth masks (optional)')
+    parser.add_argument('--srx_suffix', default='.png', help='the source image extension')
+    parser.add_argument('--gt_suffix', default='.png', help='the ground truth mask extension')
+    parser.add_argument('--target_label', type=int, default=1, help='the crack label in the ground truth masks')
+    parser.add_argument('--thresholds', type=float, nargs='+', default=[2, 4, 8, 16], help='the gate thresholds to compare')
+    parser.add_argument('--window_size', type=int, default=CONFIG['WINDOW_SIZE'], help='the size of sliding window')
+    parser.add_argument('--overlap_ratio', type=float, default=CONFIG['OVERLAP_RATIO'], help='the overlap ratio of sliding window')
+    parser.add_argument('--batch_size', type=int, default=CONFIG['BATCH_SIZE'], help='the number of sliding windows per forward pass')
+    parser.add_argument('--blend', default=CONFIG['BLEND_MODE'], choices=['none', 'cosine', 'gaussian'], help="the probability blending of overlapping windows ('none' keeps the last window)")
+    parser.add_argument('--device', default='cuda:0', help='the device used for inference')
+
+    args = parser.parse_args()
+    if args.blend == 'none':
+        args.blend = None
+    return args
+
+
+def load_gt_mask(gt_dir, img_path, srx_suffix, gt_suffix, target_label, shape):
+    """
+    Load the binary crack mask of an image from the ground truth directory
+    Args:
+        gt_dir (str): The ground truth directory. None disables the ground truth.
+        img_path (str): The image filename.
+        srx_suffix (str): The image extension.
+        gt_suffix (str): The ground truth extension.
+        target_label (int): The crack label.
+        shape (tuple): The image shape.
+
+    Returns:
+        gt_mask (ndarray): The boolean crack mask, or None when there is no ground truth.
+    """
+    if gt_dir is None:
+        return None
+
+    gt_path = os.path.join(gt_dir, os.path.basename(img_path).replace(srx_suffix, gt_suffix))
+    gt = cv2.imread(gt_path, cv2.IMREAD_UNCHANGED)
+    if gt is None:
+        return None
+
+    if gt.ndim == 3:
+        gt = gt[..., 0]
+    if gt.shape[:2] != shape[:2]:
+        gt = cv2.resize(gt, (shape[1], shape[0]), interpolation=cv2.INTER_NEAREST)
+
+    return gt == target_label
+
+
+def run_gate(model, images, args, gate_threshold):
+    """
+    Run sliding window inference over all images with one gate threshold
+    Args:
+        model (nn.Module): The loaded detector.
+        images (list): The loaded images.
+        args (Namespace): The parsed arguments.
+        gate_threshold (float): The gate threshold. None runs every window.
+
+    Returns:
+        masks (list): The boolean crack masks.
+        window_stats (dict): The window counts.
+        elapsed (float): The inference time in seconds.
+    """
+    window_stats = {}
+    masks = []
+
+    start = time.perf_counter()
+    for img in images:
+        _, mask = inference_segmentor_sliding_window(
+            model, img.copy(), color_mask=None, window_size=args.window_size, overlap_ratio=args.overlap_ratio,
+            batch_size=args.batch_size, blend=args.blend, gate_threshold=gate_threshold, window_stats=window_stats
+        )
+        masks.append(mask.astype(bool))
+    elapsed = time.perf_counter() - start
+
+    return masks, window_stats, elapsed
+
+
+def pixel_recall(masks, reference_masks):
+    """Ratio of reference crack pixels which are also predicted as crack"""
+    pairs = [(mask, reference) for mask, reference in zip(masks, reference_masks) if reference is not None]
+    total = sum(int(reference.sum()) for _, reference in pairs)
+    if total == 0:
+        return float('nan')
+
+    return sum(int((mask & reference).sum()) for mask, reference in pairs) / total
+
+
+def main():
+    args = parse_args()
+
+    model = init_model(args.crack_config, args.crack_checkpoint, device=args.device)
+
+    img_list = sorted(glob(os.path.join(args.srx_dir, f'*{args.srx_suffix}')))
+    images = [mmcv.imread(img_path) for img_path in img_list]
+    gt_masks = [
+        load_gt_mask(args.gt_dir, img_path, args.srx_suffix, args.gt_suffix, args.target_label, img.shape)
+        for img_path, img in zip(img_list, images)
+    ]
+    print(f"Loaded {len(images)} images, {sum(gt is not None for gt in gt_masks)} with ground truth")
+
+    # warm up cuDNN autotuning so the first threshold is not penalized
+    run_gate(model, images[:1], args, None)
+
+    rows = []
+    ungated_masks = None
+    for gate_threshold in [None] + args.thresholds:
+        masks, window_stats, elapsed = run_gate(model, images, args, gate_threshold)
+        if ungated_masks is None:
+            ungated_masks = masks
+
+        rows.append((
+            'off' if gate_threshold is None else f'{gate_threshold:g}',
+            window_stats['windows'] / elapsed,
+            window_stats['skipped_windows'] / max(window_stats['windows'], 1),
+            pixel_recall(masks, gt_masks),
+            pixel_recall(masks, ungated_masks),
+            elapsed,
+        ))
+
+    print(f"\n{'gate':>6} {'windows/s':>10} {'skipped':>8} {'GT recall':>10} {'vs ungated':>11} {'time (s)':>9}")
+    for name, windows_per_second, skip_ratio, gt_recall, ungated_recall, elapsed in rows:
+        print(f"{name:>6} {windows_per_second:>10.2f} {skip_ratio:>8.1%} {gt_recall:>10.4f} {ungated_recall:>11.4f} {elapsed:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
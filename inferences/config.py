@@ -15,9 +15,33 @@ BASE_DIR = "/home/user/PT"
 # Excel 파일 저장 경로 (수정 가능)
 EXCEL_OUTPUT_PATH = os.path.join(BASE_DIR, "PyDracula/init/data/crack_detection_results.xlsx")
 
+# 열 기반 결과 저장소 경로 (실행마다 이미지별/크랙별 테이블을 추가, Excel은 여기서 파생 가능)
+RESULT_STORE_DIR = os.path.join(BASE_DIR, "PyDracula/init/data/results")
+
+# 결과 저장소 파일 형식 ('parquet': 필터 조회에 유리, 'feather': 전체 읽기/쓰기가 빠름)
+RESULT_STORE_FORMAT = 'parquet'
+
+# PyDracula 뷰어가 조회하는 손상 인덱스 (SQLite + R-tree, 조사 전체의 손상 이미지를 위치/속성/날짜로 조회)
+DAMAGE_INDEX_PATH = os.path.join(BASE_DIR, "PyDracula/init/data/damage_index.sqlite")
+
+# PyDracula 목록 아이콘/지도 팝업 썸네일 캐시 (결과 이미지 저장 시 함께 생성, 빈 값이면 생성하지 않음)
+THUMBNAIL_CACHE_DIR = os.path.join(BASE_DIR, "PyDracula/init/data/thumbnails")
+
+# 썸네일 캐시 디스크 예산 (바이트, 초과 시 가장 오래 사용하지 않은 썸네일부터 삭제)
+THUMBNAIL_CACHE_BUDGET = 512 * 1024 * 1024
+
+# 결과를 한 번에 기록할 최대 행 수 (이미지 또는 크랙 행, 메모리 사용량 상한)
+RESULT_BATCH_ROWS = 10000
+
+# 마지막 기록 후 이 시간(초)이 지나면 행 수와 관계없이 기록 (실행 중 조회 시 최신 결과 반영)
+RESULT_FLUSH_INTERVAL = 30.0
+
 # 탐지 결과 이미지 저장 경로 (수정 가능)
 IMAGE_OUTPUT_PATH = os.path.join(BASE_DIR, "crack_detection_images")
 
+# 추론 결과 캐시 경로 (이미지 내용과 모델/추론 설정이 같으면 다음 실행에서 재사용)
+RESULT_CACHE_DIR = os.path.join(BASE_DIR, "crack_detection_cache")
+
 # =============================================================================
 # 크기 필터링 설정 (픽셀 단위)
 # =============================================================================
@@ -30,6 +54,9 @@ MIN_CRACK_WIDTH = 0
 # 최소 크랙 길이 (픽셀 단위)
 MIN_CRACK_LENGTH = 0
 
+# 크랙 골격(medial axis) 계산에 사용할 프로세스 수 (0이면 현재 프로세스에서 계산)
+QUANTIFY_WORKERS = 0
+
 # =============================================================================
 # 시각화 설정
 # =============================================================================
@@ -51,6 +78,53 @@ OVERLAP_RATIO = 0.5
 # 신뢰도 임계값
 SCORE_THRESHOLD = 0.5
 
+# 한 번의 forward에 묶어서 추론할 윈도우 개수 (GPU 메모리에 맞게 조정)
+BATCH_SIZE = 4
+
+# 겹치는 윈도우 병합 방식 (None: 마지막 윈도우 결과 사용, 'cosine' / 'gaussian': 확률 가중 평균)
+# 가중 평균을 사용하면 윈도우 경계의 이음새가 줄어들어 OVERLAP_RATIO를 낮출 수 있습니다.
+# 기본값은 기존 결과와 같은 None이며, 스크립트에서는 --blend none / cosine / gaussian으로 선택합니다.
+BLEND_MODE = None
+
+# 스트리밍 추론 사용 여부 (이미지 전체를 메모리에 올리지 않고 띠 단위로 읽음, 초대형 모자이크용)
+STREAM_INFERENCE = False
+
+# 스트리밍 추론 시 임시 래스터/마스크 파일을 저장할 디렉토리 (None이면 시스템 임시 디렉토리)
+STREAM_CACHE_DIR = None
+
+# 균열이 없어 보이는 평탄한 윈도우(하늘, 수면, 매끈한 콘크리트)를 건너뛰는 엣지 에너지 임계값
+# (None이면 모든 윈도우 추론, benchmark_window_gate.py로 재현율을 확인한 뒤 설정하세요)
+GATE_THRESHOLD = None
+
+# 다중 스케일 추론 (multi_scale_inference_segmentor_crack.py)
+# 축소 이미지 전체를 먼저 추론한 뒤, 크랙 확률이 ROI_THRESHOLD 이상인 영역과 그 주변(ROI_MARGIN 픽셀)만
+# REFINE_SCALES의 각 스케일로 다시 추론하여 확률을 평균합니다 (1.0: 원본 해상도, 2.0: 2배 확대)
+COARSE_SCALE = 0.25
+REFINE_SCALES = [1.0]
+ROI_THRESHOLD = 0.2
+ROI_MARGIN = 128
+
+# 저해상도 ROI 추론 (슬라이딩 윈도우, --roi): COARSE_SCALE로 축소한 이미지의 크랙 확률 지도에서
+# ROI_THRESHOLD 이상인 영역과 그 주변(ROI_MARGIN 픽셀)에 걸치는 원본 해상도 윈도우만 추론합니다
+# (나머지 윈도우는 배경, benchmark_roi_inference.py로 재현율을 확인한 뒤 사용하세요)
+ROI_INFERENCE = False
+
+# 추론 서버 (inference_server.py): 모델을 한 번만 로드해 두고 스크립트와 PyDracula의 작업을 받음
+# 주소를 지정하면 추론 스크립트가 모델을 직접 로드하지 않고 서버에 추론을 요청합니다 (None이면 직접 로드)
+INFERENCE_SERVER_URL = None
+
+# =============================================================================
+# 파이프라인 설정 (디코딩 / 추론 / 후처리 / 저장 단계를 동시에 실행)
+# =============================================================================
+# 이미지를 미리 읽어두는 디코딩 스레드 수
+DECODE_WORKERS = 2
+
+# 정량화/시각화를 수행하는 프로세스 수 (0이면 별도 스레드 하나에서 수행)
+POSTPROCESS_WORKERS = 0
+
+# 단계 사이에 대기할 수 있는 이미지 수 (메모리 사용량 상한)
+PIPELINE_QUEUE_SIZE = 4
+
 # =============================================================================
 # 기본 좌표 설정 (이미지에서 좌표를 추출할 수 없는 경우 사용)
 # =============================================================================
@@ -69,15 +143,38 @@ DEFAULT_MASK_SUFFIX = '.png'
 # =============================================================================
 CONFIG = {
     'EXCEL_OUTPUT_PATH': EXCEL_OUTPUT_PATH,
+    'RESULT_STORE_DIR': RESULT_STORE_DIR,
+    'RESULT_STORE_FORMAT': RESULT_STORE_FORMAT,
+    'DAMAGE_INDEX_PATH': DAMAGE_INDEX_PATH,
+    'THUMBNAIL_CACHE_DIR': THUMBNAIL_CACHE_DIR,
+    'THUMBNAIL_CACHE_BUDGET': THUMBNAIL_CACHE_BUDGET,
+    'RESULT_BATCH_ROWS': RESULT_BATCH_ROWS,
+    'RESULT_FLUSH_INTERVAL': RESULT_FLUSH_INTERVAL,
     'IMAGE_OUTPUT_PATH': IMAGE_OUTPUT_PATH,
+    'RESULT_CACHE_DIR': RESULT_CACHE_DIR,
     'MIN_CRACK_AREA': MIN_CRACK_AREA,
     'MIN_CRACK_WIDTH': MIN_CRACK_WIDTH,
     'MIN_CRACK_LENGTH': MIN_CRACK_LENGTH,
+    'QUANTIFY_WORKERS': QUANTIFY_WORKERS,
     'VISUALIZATION_ALPHA': VISUALIZATION_ALPHA,
     'CRACK_COLOR': CRACK_COLOR,
     'WINDOW_SIZE': WINDOW_SIZE,
     'OVERLAP_RATIO': OVERLAP_RATIO,
     'SCORE_THRESHOLD': SCORE_THRESHOLD,
+    'BATCH_SIZE': BATCH_SIZE,
+    'BLEND_MODE': BLEND_MODE,
+    'STREAM_INFERENCE': STREAM_INFERENCE,
+    'STREAM_CACHE_DIR': STREAM_CACHE_DIR,
+    'GATE_THRESHOLD': GATE_THRESHOLD,
+    'COARSE_SCALE': COARSE_SCALE,
+    'REFINE_SCALES': REFINE_SCALES,
+    'ROI_THRESHOLD': ROI_THRESHOLD,
+    'ROI_MARGIN': ROI_MARGIN,
+    'ROI_INFERENCE': ROI_INFERENCE,
+    'INFERENCE_SERVER_URL': INFERENCE_SERVER_URL,
+    'DECODE_WORKERS': DECODE_WORKERS,
+    'POSTPROCESS_WORKERS': POSTPROCESS_WORKERS,
+    'PIPELINE_QUEUE_SIZE': PIPELINE_QUEUE_SIZE,
     'DEFAULT_LATITUDE': DEFAULT_LATITUDE,
     'DEFAULT_LONGITUDE': DEFAULT_LONGITUDE,
     'DEFAULT_INPUT_SUFFIX': DEFAULT_INPUT_SUFFIX,
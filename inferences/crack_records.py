@@ -0,0 +1,149 @@
+"""
+Crack Measurement Records
+균열 측정 결과를 열 단위(structured array)로 다루는 모듈
+
+quantify_crack_width_length returns one record per crack in a NumPy structured array:
+- min_row, min_col, max_row, max_col: the bounding box (max exclusive, as regionprops).
+- area: the number of crack pixels.
+- width, length: the mean skeleton distance and the number of skeleton pixels (width is NaN without skeleton).
+- centroid_row, centroid_col: the mean pixel position.
+- class_id: the class of the crack.
+Filtering, summaries and exports work on whole columns, so no strings are formatted or parsed per crack.
+"""
+
+import numpy as np
+import pandas as pd
+
+CRACK_RECORD_DTYPE = np.dtype([
+    ('min_row', np.int32),
+    ('min_col', np.int32),
+    ('max_row', np.int32),
+    ('max_col', np.int32),
+    ('area', np.int64),
+    ('width', np.float64),
+    ('length', np.float64),
+    ('centroid_row', np.float64),
+    ('centroid_col', np.float64),
+    ('class_id', np.int16),
+])
+
+
+def empty_records(size=0):
+    """
+    Create zero-filled crack records
+    Args:
+        size (int): The number of records.
+
+    Returns:
+        records (ndarray): Structured array of CRACK_RECORD_DTYPE.
+    """
+    return np.zeros(size, dtype=CRACK_RECORD_DTYPE)
+
+
+def bbox_areas(records):
+    """Areas of the bounding boxes of the cracks"""
+    return (records['max_row'].astype(np.int64) - records['min_row']) * (records['max_col'].astype(np.int64) - records['min_col'])
+
+
+def filter_records(records, min_area=None, min_width=None, min_length=None):
+    """
+    Keep the cracks which are at least as large as the given sizes
+    Args:
+        records (ndarray): The crack records.
+        min_area (float): The minimum bounding box area. None or 0 disables the criterion.
+        min_width (float): The minimum width. Cracks without a width (NaN) are kept.
+        min_length (float): The minimum length.
+
+    Returns:
+        records (ndarray): The records passing every criterion, in the same order.
+    """
+    keep = np.ones(len(records), dtype=bool)
+
+    if min_area:
+        keep &= ~(bbox_areas(records) < min_area)
+    if min_width:
+        keep &= ~(records['width'] < min_width)
+    if min_length:
+        keep &= ~(records['length'] < min_length)
+
+    return records[keep]
+
+
+def summarize_records(records):
+    """
+    Number of cracks and the largest width and length
+    Args:
+        records (ndarray): The crack records.
+
+    Returns:
+        summary (dict): 'count', 'max_width' and 'max_length'. The maxima are NaN without cracks.
+    """
+    if len(records) == 0:
+        return {'count': 0, 'max_width': np.nan, 'max_length': np.nan}
+
+    widths = records['width']
+    return {
+        'count': len(records),
+        'max_width': float(np.nanmax(widths)) if not np.isnan(widths).all() else np.nan,
+        'max_length': float(records['length'].max()),
+    }
+
+
+def records_to_dataframe(records, image_name=None):
+    """
+    Convert crack records to a DataFrame, one column per field
+    Args:
+        records (ndarray): The crack records.
+        image_name (str): Optional image name, inserted as the first column 'Image_Name'.
+
+    Returns:
+        df (DataFrame): The crack table.
+    """
+    df = pd.DataFrame(records)
+    if image_name is not None:
+        df.insert(0, 'Image_Name', image_name)
+
+    return df
+
+
+def records_from_dataframe(df):
+    """
+    Convert a crack table (e.g. read back from CSV) to crack records
+    Args:
+        df (DataFrame): A table with the CRACK_RECORD_DTYPE columns. Other columns are ignored.
+
+    Returns:
+        records (ndarray): The crack records.
+    """
+    records = empty_records(len(df))
+    for name in CRACK_RECORD_DTYPE.names:
+        records[name] = df[name].to_numpy()
+
+    return records
+
+
+def bbox_mask(records, shape):
+    """
+    Mask of the bounding boxes of the cracks, filled without a loop over the cracks
+    Args:
+        records (ndarray): The crack records.
+        shape (tuple): The image shape (H, W).
+
+    Returns:
+        mask (ndarray): uint8 mask with 1 inside any bounding box. The shape is (H, W).
+    """
+    height, width = shape[:2]
+    min_rows = np.clip(records['min_row'], 0, height)
+    min_cols = np.clip(records['min_col'], 0, width)
+    max_rows = np.clip(records['max_row'], 0, height)
+    max_cols = np.clip(records['max_col'], 0, width)
+
+    # +1 / -1 at the box corners, the 2D cumulative sum counts the boxes covering each pixel
+    corners = np.zeros((height + 1, width + 1), dtype=np.int32)
+    np.add.at(corners, (min_rows, min_cols), 1)
+    np.add.at(corners, (min_rows, max_cols), -1)
+    np.add.at(corners, (max_rows, min_cols), -1)
+    np.add.at(corners, (max_rows, max_cols), 1)
+    coverage = corners.cumsum(axis=0).cumsum(axis=1)
+
+    return (coverage[:height, :width] > 0).astype(np.uint8)
@@ -0,0 +1,276 @@
+"""
+Damage Index
+PyDracula 뷰어가 조회하는 SQLite 손상 인덱스 (R-tree 위치 인덱스 포함)
+
+One row per image with detected damage, kept across surveys in one database:
+- damages: survey (the source directory of the run), image_path (unique within the survey, a re-run replaces the row,
+  or removes it when the image has no damage any more), run, survey_date, latitude, longitude, crack_count,
+  max_width, max_length, indexed_at. Camera file names repeat between surveys (DJI_0001.JPG), so the survey is part
+  of the key.
+- damage_rtree: an R-tree over (latitude, longitude) with the same id, for bounding box queries.
+Attribute indexes on survey_date, max_width, max_length and crack_count let the viewer filter and page
+(keyset paging on id) at a cost proportional to the page instead of the archive.
+
+The inference scripts fill the index through result_writer (DamageIndexSink) with DamageIndex,
+PyDracula reads it with DamageIndexReader from this module, so the schema is only defined here.
+Only the standard library and numpy are imported.
+"""
+
+import os
+import re
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+
+SCHEMA_VERSION = 2
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS damages (
+        id INTEGER PRIMARY KEY,
+        survey TEXT NOT NULL DEFAULT '',
+        image_path TEXT NOT NULL,
+        run TEXT,
+        survey_date TEXT,
+        latitude REAL,
+        longitude REAL,
+        crack_count INTEGER,
+        max_width REAL,
+        max_length REAL,
+        indexed_at TEXT,
+        UNIQUE (survey, image_path)
+    )""",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS damage_rtree USING rtree(id, min_lat, max_lat, min_lon, max_lon)",
+    "CREATE INDEX IF NOT EXISTS damages_survey_date ON damages (survey_date)",
+    "CREATE INDEX IF NOT EXISTS damages_max_width ON damages (max_width)",
+    "CREATE INDEX IF NOT EXISTS damages_max_length ON damages (max_length)",
+    "CREATE INDEX IF NOT EXISTS damages_crack_count ON damages (crack_count)",
+]
+
+# a re-run keeps the survey date of the first run, the date of the survey rather than of the re-run
+UPSERT = """INSERT INTO damages (survey, image_path, run, survey_date, latitude, longitude, crack_count, max_width, max_length, indexed_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(survey, image_path) DO UPDATE SET
+        run = excluded.run, survey_date = COALESCE(damages.survey_date, excluded.survey_date), latitude = excluded.latitude, longitude = excluded.longitude,
+        crack_count = excluded.crack_count, max_width = excluded.max_width, max_length = excluded.max_length,
+        indexed_at = excluded.indexed_at"""
+
+# a located image is a point box in the R-tree, images without a location are only removed from it
+UPDATE_RTREE = """INSERT OR REPLACE INTO damage_rtree (id, min_lat, max_lat, min_lon, max_lon)
+    SELECT id, latitude, latitude, longitude, longitude FROM damages
+    WHERE survey = ? AND image_path = ? AND latitude IS NOT NULL AND longitude IS NOT NULL"""
+DELETE_RTREE = "DELETE FROM damage_rtree WHERE id = (SELECT id FROM damages WHERE survey = ? AND image_path = ?)"
+DELETE = "DELETE FROM damages WHERE survey = ? AND image_path = ?"
+
+# version 1 keyed the rows by image_path alone, its rows keep their ids (and R-tree entries) with an empty survey
+MIGRATE_V1 = [
+    "ALTER TABLE damages RENAME TO damages_v1",
+    SCHEMA[0],
+    """INSERT INTO damages (id, survey, image_path, run, survey_date, latitude, longitude, crack_count, max_width, max_length, indexed_at)
+        SELECT id, '', image_path, run, survey_date, latitude, longitude, crack_count, max_width, max_length, indexed_at
+        FROM damages_v1""",
+    "DROP TABLE damages_v1",
+]
+
+# e.g. IMG_20231201_37.5665_126.9780.png
+DATE_PATTERN = re.compile(r'(?<!\d)(20\d{6})(?!\d)')
+
+
+def survey_date(image_path, run_id=None):
+    """
+    Survey date of an image, from a YYYYMMDD token of its name, otherwise from the run id
+    Args:
+        image_path (str): The image path.
+        run_id (str): The run id (result_store.new_run_id, starting with YYYYMMDD).
+
+    Returns:
+        date (str): 'YYYY-MM-DD', or None when unknown.
+    """
+    for token in DATE_PATTERN.findall(os.path.basename(image_path)) + ([run_id[:8]] if run_id else []):
+        try:
+            return datetime.strptime(token, '%Y%m%d').strftime('%Y-%m-%d')
+        except ValueError:
+            continue
+
+    return None
+
+
+def _value(value):
+    """Python value for sqlite3 (NaN as NULL)"""
+    if isinstance(value, (float, np.floating)):
+        return None if np.isnan(value) else float(value)
+    if isinstance(value, np.integer):
+        return int(value)
+    return value
+
+
+class DamageIndex():
+    """
+    Writer of the damage index
+    Args:
+        path (str): The database path, created when missing.
+    """
+    def __init__(self, path):
+        self.path = path
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # used from one thread at a time, not necessarily the one which opened it (see result_writer.ResultWriter)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+
+        # the viewer can query while a run adds images
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        with self.conn:
+            if self.conn.execute('PRAGMA user_version').fetchone()[0] == 1:
+                for statement in MIGRATE_V1:
+                    self.conn.execute(statement)
+            for statement in SCHEMA:
+                self.conn.execute(statement)
+            self.conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+    def upsert(self, image_df, run_id=None, survey=''):
+        """
+        Add or replace the images of a batch with damage and remove the ones without damage, in one transaction
+        (an image found cracked before and clean on a re-run leaves the index)
+        Args:
+            image_df (DataFrame): Rows of the image table (result_store.IMAGE_COLUMNS).
+            run_id (str): The run which produced the rows.
+            survey (str): The survey of the images, e.g. the absolute path of their source directory.
+        """
+        indexed_at = datetime.now().isoformat(timespec='seconds')
+        rows, removed = [], []
+        for latitude, longitude, image_path, crack_count, max_width, max_length in zip(
+            image_df['latitude'], image_df['longitude'], image_df['image_path'],
+            image_df['crack_count'], image_df['max_width'], image_df['max_length']
+        ):
+            if crack_count > 0:
+                rows.append((survey, image_path, run_id, survey_date(image_path, run_id), _value(latitude),
+                             _value(longitude), _value(crack_count), _value(max_width), _value(max_length), indexed_at))
+            else:
+                removed.append((survey, image_path))
+        image_paths = [row[:2] for row in rows]
+
+        with self.conn:
+            self.conn.executemany(DELETE_RTREE, image_paths + removed)
+            self.conn.executemany(DELETE, removed)
+            self.conn.executemany(UPSERT, rows)
+            self.conn.executemany(UPDATE_RTREE, image_paths)
+
+    def count(self):
+        return self.conn.execute('SELECT COUNT(*) FROM damages').fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+
+class DamageIndexReader():
+    """
+    Reader of the damage index, used by the PyDracula viewer
+    Queries filter by location (R-tree), attributes and survey date and return one page at a time,
+    ordered by id, so the viewer only reads the rows it shows.
+    Args:
+        path (str): The database path.
+    """
+    COLUMNS = ['id', 'image_path', 'latitude', 'longitude', 'crack_count', 'max_width', 'max_length', 'survey_date']
+
+    def __init__(self, path):
+        self.path = path
+
+        # read-only, the inference scripts may be adding a run at the same time (WAL)
+        self.conn = sqlite3.connect(f'file:{os.path.abspath(path)}?mode=ro', uri=True)
+
+    def _where_clause(self, bbox=None, min_width=None, min_length=None, min_count=None, date_from=None, date_to=None):
+        """
+        Join, conditions and parameters of the filters
+        Args:
+            bbox (tuple): (min_lat, min_lon, max_lat, max_lon), None keeps every located image.
+            min_width (float): The minimum of max_width.
+            min_length (float): The minimum of max_length.
+            min_count (int): The minimum of crack_count.
+            date_from (str): The first survey date, 'YYYY-MM-DD' (inclusive).
+            date_to (str): The last survey date, 'YYYY-MM-DD' (inclusive).
+        """
+        if bbox is None:
+            # images without a location cannot be placed on the map
+            joins, clauses, params = '', ['d.latitude IS NOT NULL', 'd.longitude IS NOT NULL'], []
+        else:
+            min_lat, min_lon, max_lat, max_lon = bbox
+            # the R-tree keeps float32 boxes rounded outward: overlap finds the candidates, the stored values decide
+            joins = ' JOIN damage_rtree r ON r.id = d.id'
+            clauses = ['r.max_lat >= ?', 'r.min_lat <= ?', 'r.max_lon >= ?', 'r.min_lon <= ?',
+                       'd.latitude BETWEEN ? AND ?', 'd.longitude BETWEEN ? AND ?']
+            params = [min_lat, max_lat, min_lon, max_lon, min_lat, max_lat, min_lon, max_lon]
+
+        for clause, value in [('d.max_width >= ?', min_width), ('d.max_length >= ?', min_length),
+                              ('d.crack_count >= ?', min_count),
+                              ('d.survey_date >= ?', date_from), ('d.survey_date <= ?', date_to)]:
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+
+        return joins, clauses, params
+
+    def query(self, after_id=None, limit=200, **filters):
+        """
+        Next page of the matching images, after the last id of the previous page (keyset paging, no OFFSET scan)
+        Args:
+            after_id (int): The last id of the previous page, None for the first page.
+            limit (int): The page size.
+            **filters: The filters of _where_clause.
+
+        Returns:
+            items (list): Dicts of COLUMNS and 'name' (the list label).
+        """
+        joins, clauses, params = self._where_clause(**filters)
+        if after_id is not None:
+            clauses.append('d.id > ?')
+            params.append(after_id)
+
+        columns = ', '.join(f'd.{name}' for name in self.COLUMNS)
+        rows = self.conn.execute(
+            f"SELECT {columns} FROM damages d{joins} WHERE {' AND '.join(clauses)} ORDER BY d.id LIMIT ?",
+            params + [limit]
+        ).fetchall()
+
+        items = []
+        for row in rows:
+            item = dict(zip(self.COLUMNS, row))
+            item['name'] = f"항목 {item['id']}"
+            items.append(item)
+
+        return items
+
+    def count(self, **filters):
+        joins, clauses, params = self._where_clause(**filters)
+        return self.conn.execute(f"SELECT COUNT(*) FROM damages d{joins} WHERE {' AND '.join(clauses)}", params).fetchone()[0]
+
+    def center(self, **filters):
+        """Mean location [latitude, longitude] of the matching images, None when there are none"""
+        joins, clauses, params = self._where_clause(**filters)
+        latitude, longitude = self.conn.execute(
+            f"SELECT AVG(d.latitude), AVG(d.longitude) FROM damages d{joins} WHERE {' AND '.join(clauses)}", params
+        ).fetchone()
+        if latitude is None:
+            return None
+
+        return [latitude, longitude]
+
+    def clusters(self, cell_size, **filters):
+        """
+        Matching images grouped in a grid
+        Args:
+            cell_size (float): The cell size in degrees.
+            **filters: The filters of _where_clause.
+
+        Returns:
+            clusters (list): (count, mean latitude, mean longitude) of every non-empty cell.
+        """
+        # shifted to positive values so that truncating to integers is flooring
+        joins, clauses, params = self._where_clause(**filters)
+        return self.conn.execute(
+            f"SELECT COUNT(*), AVG(d.latitude), AVG(d.longitude) FROM damages d{joins} WHERE {' AND '.join(clauses)} "
+            "GROUP BY CAST((d.latitude + 90) / ? AS INTEGER), CAST((d.longitude + 180) / ? AS INTEGER)",
+            params + [cell_size, cell_size]
+        ).fetchall()
+
+    def close(self):
+        self.conn.close()
@@ -4,43 +4,84 @@ Enhanced Crack Detection with Size Filtering and Excel Export
 
 사용법:
 python enhanced_crack_inference.py --crack_config "config_path" --crack_checkpoint "checkpoint_path" --srx_dir "input_dir" --rst_dir "output_dir"
+python enhanced_crack_inference.py --server "http://127.0.0.1:8765" --srx_dir "input_dir" --rst_dir "output_dir"   # 추론 서버 사용
 '''
 
 import os
 import argparse
+from functools import partial
 from glob import glob
 import pandas as pd
 import numpy as np
 import mmcv
 import cv2
-from mmseg.apis import init_model, inference_model
 # from mmengine import track_progress  # Not used in this version
-from torch.cuda import empty_cache
+# mmseg / torch는 모델을 직접 로드할 때만 import (main), 추론 서버를 사용하면 불러오지 않음
 
 # 기존 모듈 import
-from quantify_seg_results import quantify_crack_width_length
-from utils import inference_segmentor_sliding_window
+from quantify_seg_results import quantify_crack_width_length, quantify_crack_width_length_streaming
+from inference_client import InferenceClient
+from strip_reader import open_strip_reader, create_disk_backed_mask, read_downscaled
+from pipeline import run_pipeline
+from result_cache import ResultCache
+from sparse_mask import SPARSE_MASK_SUFFIX, write_mask
+from crack_records import filter_records
+from result_store import EXCEL_COLUMNS, CRACK_TABLE, image_row, crack_table
+from result_writer import open_result_writer
+from thumbnail_cache import ThumbnailCache
 
 # 설정 파일 import
 from config import CONFIG
 
+# Excel 열 (PyDracula는 위도, 경도, 이미지 경로를 사용), 결과 저장소의 이미지 테이블과 같은 순서
+DETECTION_COLUMNS = EXCEL_COLUMNS
+
 def parse_args():
     """명령행 인수 파싱"""
     parser = argparse.ArgumentParser(description='Enhanced Crack Detection with Excel Export')
-    parser.add_argument('--crack_config', required=True, help='크랙 탐지 모델 설정 파일 경로')
-    parser.add_argument('--crack_checkpoint', required=True, help='크랙 탐지 모델 체크포인트 파일 경로')
+    parser.add_argument('--crack_config', help='크랙 탐지 모델 설정 파일 경로 (--server 사용 시 서버의 모델)')
+    parser.add_argument('--crack_checkpoint', help='크랙 탐지 모델 체크포인트 파일 경로 (--server 사용 시 서버의 모델)')
+    parser.add_argument('--server', default=CONFIG['INFERENCE_SERVER_URL'], help='추론 서버 주소 (inference_server.py, 모델을 직접 로드하지 않음)')
     parser.add_argument('--srx_dir', required=True, help='입력 이미지 디렉토리 경로')
     parser.add_argument('--rst_dir', required=True, help='결과 이미지 저장 디렉토리 경로')
     parser.add_argument('--srx_suffix', default=CONFIG['DEFAULT_INPUT_SUFFIX'], help='입력 이미지 파일 확장자')
     parser.add_argument('--rst_suffix', default=CONFIG['DEFAULT_OUTPUT_SUFFIX'], help='결과 이미지 파일 확장자')
-    parser.add_argument('--mask_suffix', default=CONFIG['DEFAULT_MASK_SUFFIX'], help='마스크 이미지 파일 확장자')
+    parser.add_argument('--mask_suffix', default=CONFIG['DEFAULT_MASK_SUFFIX'], help='마스크 이미지 파일 확장자 (.rle이면 원본 해상도 마스크를 sparse 형식으로 추가 저장)')
     parser.add_argument('--rgb_to_bgr', action='store_true', help='RGB를 BGR로 변환')
     parser.add_argument('--overwrite_crack_palette', action='store_true', help='크랙 팔레트 덮어쓰기')
+    parser.add_argument('--batch_size', type=int, default=CONFIG['BATCH_SIZE'], help='한 번에 추론할 슬라이딩 윈도우 개수')
+    parser.add_argument('--blend', default=CONFIG['BLEND_MODE'], choices=['none', 'cosine', 'gaussian'], help='겹치는 윈도우의 확률 병합 방식 (none: 마지막 윈도우 결과 사용)')
+    parser.add_argument('--gate_threshold', type=float, default=CONFIG['GATE_THRESHOLD'], help='엣지 에너지가 이 값보다 낮은 윈도우는 추론하지 않음')
+    parser.add_argument('--roi', action='store_true', help='저해상도 크랙 확률 지도에서 후보 영역에 걸치는 윈도우만 원본 해상도로 추론')
+    parser.add_argument('--coarse_scale', type=float, default=CONFIG['COARSE_SCALE'], help='--roi: 확률 지도를 만들 축소 배율')
+    parser.add_argument('--roi_threshold', type=float, default=CONFIG['ROI_THRESHOLD'], help='--roi: 원본 해상도로 추론할 확률 지도 임계값')
+    parser.add_argument('--roi_margin', type=int, default=CONFIG['ROI_MARGIN'], help='--roi: 후보 영역 주변에 함께 추론할 여유 (픽셀)')
+    parser.add_argument('--stream', action='store_true', help='이미지를 띠 단위로 읽어 전체 이미지를 메모리에 올리지 않음 (초대형 모자이크용)')
+    parser.add_argument('--decode_workers', type=int, default=CONFIG['DECODE_WORKERS'], help='이미지를 미리 읽어 두는 스레드 개수')
+    parser.add_argument('--postprocess_workers', type=int, default=CONFIG['POSTPROCESS_WORKERS'], help='크랙 정량화 프로세스 개수 (0이면 스레드 하나에서 수행)')
+    parser.add_argument('--queue_size', type=int, default=CONFIG['PIPELINE_QUEUE_SIZE'], help='단계 사이에 대기할 수 있는 이미지 개수')
+    parser.add_argument('--cache_dir', default=CONFIG['RESULT_CACHE_DIR'], help='이전 실행 결과 캐시 디렉토리 (변경되지 않은 이미지는 건너뜀)')
+    parser.add_argument('--no_cache', action='store_true', help='캐시를 사용하지 않고 모든 이미지를 다시 처리')
+    parser.set_defaults(stream=CONFIG['STREAM_INFERENCE'], roi=CONFIG['ROI_INFERENCE'])
     
     # Excel 출력 경로 오버라이드 옵션
     parser.add_argument('--excel_output', help='Excel 출력 파일 경로 (기본값: CONFIG에서 설정)')
-    
-    return parser.parse_args()
+    parser.add_argument('--no_excel', action='store_true', help='Excel 파일을 저장하지 않음 (결과 저장소에서 result_store.py로 파생 가능)')
+    
+    # 열 기반 결과 저장소 옵션
+    parser.add_argument('--result_store', default=CONFIG['RESULT_STORE_DIR'], help='이미지별/크랙별 결과 테이블을 실행 단위로 추가할 디렉토리 (빈 값이면 저장하지 않음)')
+    parser.add_argument('--store_format', default=CONFIG['RESULT_STORE_FORMAT'], choices=['parquet', 'feather'], help='결과 저장소 파일 형식')
+    parser.add_argument('--result_db', help='결과를 추가로 기록할 SQLite 데이터베이스 경로 (실행 중에도 조회 가능)')
+    parser.add_argument('--damage_index', default=CONFIG['DAMAGE_INDEX_PATH'], help='PyDracula 뷰어가 조회하는 손상 인덱스 경로 (빈 값이면 기록하지 않음)')
+    parser.add_argument('--result_batch_rows', type=int, default=CONFIG['RESULT_BATCH_ROWS'], help='결과를 한 번에 기록할 최대 행 수 (메모리 사용량 상한)')
+    parser.add_argument('--thumbnail_cache', default=CONFIG['THUMBNAIL_CACHE_DIR'], help='PyDracula 목록/팝업용 썸네일 캐시 디렉토리 (빈 값이면 생성하지 않음)')
+    
+    args = parser.parse_args()
+    if args.blend == 'none':
+        args.blend = None
+    if not args.server and not (args.crack_config and args.crack_checkpoint):
+        parser.error('--crack_config와 --crack_checkpoint (또는 --server)가 필요합니다')
+    return args
 
 def create_output_directories():
     """출력 디렉토리 생성"""
@@ -77,53 +118,16 @@ def filter_crack_by_size(crack_quantification_results, min_area=None, min_width=
     크기 기준으로 크랙 필터링
     
     Args:
-        crack_quantification_results: 크랙 정량화 결과 리스트
-        min_area: 최소 면적
+        crack_quantification_results: 크랙 정량화 결과 (crack_records 구조체 배열)
+        min_area: 최소 면적 (바운딩 박스 면적 기준)
         min_width: 최소 폭
         min_length: 최소 길이
     
     Returns:
         filtered_results: 필터링된 크랙 결과
     """
-    if not crack_quantification_results:
-        return []
-    
-    filtered_results = []
-    
-    for result in crack_quantification_results:
-        # result 형식: [coordinates, measurements, class_id]
-        coordinates = result[0]  # "(minr,minc)-(maxr,maxc)" 형식
-        measurements = result[1]  # "width x length" 형식
-        
-        # 측정값 파싱
-        try:
-            width, length = map(float, measurements.split('x'))
-        except:
-            continue
-        
-        # 면적 계산 (대략적)
-        coord_parts = coordinates.replace('(', '').replace(')', '').split('-')
-        if len(coord_parts) == 2:
-            try:
-                min_coords = tuple(map(int, coord_parts[0].split(',')))
-                max_coords = tuple(map(int, coord_parts[1].split(',')))
-                area = (max_coords[0] - min_coords[0]) * (max_coords[1] - min_coords[1])
-            except:
-                area = width * length  # 대안 계산
-        else:
-            area = width * length
-        
-        # 크기 필터링
-        if min_area and area < min_area:
-            continue
-        if min_width and width < min_width:
-            continue
-        if min_length and length < min_length:
-            continue
-        
-        filtered_results.append(result)
-    
-    return filtered_results
+    # 문자열을 파싱하지 않고 열 단위로 한 번에 비교
+    return filter_records(crack_quantification_results, min_area=min_area, min_width=min_width, min_length=min_length)
 
 def visualize_crack_detection(seg_result, crack_mask, color=None, alpha=None):
     """
@@ -152,20 +156,56 @@ def visualize_crack_detection(seg_result, crack_mask, color=None, alpha=None):
     
     return seg_result
 
+def visualize_crack_detection_streaming(reader, crack_mask, target_size=(400, 400), color=None, alpha=None):
+    """
+    띠 단위로 오버레이를 적용하고 축소하여 400x400 결과 이미지 생성 (전체 이미지를 메모리에 올리지 않음)
+
+    Args:
+        reader: 원본 이미지 strip reader
+        crack_mask: 크랙 마스크 (np.memmap 가능)
+        target_size: 목표 크기 (width, height)
+        color: 오버레이 색상 (BGR 형식)
+        alpha: 투명도
+
+    Returns:
+        resized_visualized: 리사이즈된 시각화 이미지 (RGB)
+        resized_mask: 리사이즈된 마스크
+    """
+    # 정수 배율로 먼저 띠 단위 축소한 뒤 목표 크기로 리사이즈
+    factor = max(1, min(reader.shape[0] // target_size[1], reader.shape[1] // target_size[0]))
+
+    visualized = read_downscaled(
+        lambda y0, y1: visualize_crack_detection(reader.read_rows(y0, y1).copy(), crack_mask[y0:y1], color, alpha),
+        reader.shape, factor
+    )
+    mask = read_downscaled(lambda y0, y1: np.asarray(crack_mask[y0:y1], dtype=np.uint8), crack_mask.shape, factor)
+
+    return resize_and_convert_to_jpg(visualized, target_size), resize_and_convert_to_jpg(mask, target_size)
+
+def format_window_plan(window_stats):
+    """추론한 윈도우 수와 건너뛴 비율 (ROI / 게이트) 문자열"""
+    total = window_stats.get('windows', 0)
+    skipped = window_stats.get('skipped_windows', 0)
+    roi_skipped = window_stats.get('roi_skipped_windows', 0)
+    plan = f"{total - skipped}/{total}개 추론 (건너뜀 {skipped / max(total, 1):.1%}"
+    if 'coarse_windows' in window_stats:
+        plan += f", ROI {roi_skipped}개 / 게이트 {skipped - roi_skipped}개, 저해상도 {window_stats['coarse_windows']}개"
+    return plan + ")"
+
 def save_detection_to_excel(detection_data, excel_path):
     """
     탐지 결과를 Excel 파일로 저장
     
     Args:
-        detection_data: 탐지 데이터 리스트 (위도, 경도, 이미지 경로)
+        detection_data: 탐지 데이터 리스트 (위도, 경도, 이미지 경로, 크랙 개수, 최대 폭, 최대 길이)
         excel_path: Excel 파일 경로
     """
     if not detection_data:
         print("저장할 탐지 데이터가 없습니다.")
         return
     
-    # DataFrame 생성 (위도, 경도, 이미지 경로 형식)
-    df = pd.DataFrame(detection_data, columns=['위도', '경도', '이미지 경로'])
+    # DataFrame 생성 (위도, 경도, 이미지 경로 형식 + 이미지별 크랙 요약)
+    df = pd.DataFrame(detection_data, columns=DETECTION_COLUMNS)
     
     # Excel 파일로 저장
     try:
@@ -206,6 +246,106 @@ def extract_image_info_from_path(image_path):
     
     return image_name, default_latitude, default_longitude
 
+def get_result_paths(img_path, rst_dir, srx_suffix, mask_suffix):
+    """
+    이미지의 결과 파일 경로 생성
+    
+    Args:
+        img_path: 이미지 파일 경로
+        rst_dir: 결과 이미지 저장 디렉토리
+        srx_suffix: 입력 이미지 파일 확장자
+        mask_suffix: 마스크 파일 확장자 (SPARSE_MASK_SUFFIX이면 원본 해상도 마스크도 저장)
+    
+    Returns:
+        tuple: (결과 이미지 경로, 마스크 경로, 시각화 이미지 경로, 원본 해상도 마스크 경로 또는 None)
+    """
+    # 결과 이미지 저장 (JPG 형식으로 변경)
+    rst_name = os.path.basename(img_path).replace(srx_suffix, '.jpg')
+    mask_name = os.path.basename(img_path).replace(srx_suffix, '.jpg')
+    
+    rst_path = os.path.join(rst_dir, rst_name)
+    mask_path = os.path.join(rst_dir, mask_name)
+    vis_path = os.path.join(CONFIG['IMAGE_OUTPUT_PATH'], rst_name)
+    
+    # 원본 해상도 마스크는 압축된 sparse 형식으로만 저장 (400x400 JPG 마스크는 손실 압축)
+    sparse_mask_path = None
+    if mask_suffix == SPARSE_MASK_SUFFIX:
+        sparse_mask_path = os.path.join(rst_dir, os.path.basename(img_path).replace(srx_suffix, SPARSE_MASK_SUFFIX))
+    
+    return rst_path, mask_path, vis_path, sparse_mask_path
+
+def get_detection_row(img_path, filtered_cracks):
+    """
+    Excel에 저장할 탐지 결과 행 생성
+    
+    Args:
+        img_path: 이미지 파일 경로
+        filtered_cracks: 필터링된 크랙 결과
+    
+    Returns:
+        list: [위도, 경도, 최종 이미지 경로, 크랙 개수, 최대 폭, 최대 길이]
+    """
+    # 이미지 정보 추출
+    image_name, latitude, longitude = extract_image_info_from_path(img_path)
+    
+    # 최종 JPG 파일명으로 변경 (원본 .png를 .jpg로 변경)
+    final_image_name = image_name.replace('.png', '.jpg')
+    
+    return image_row(final_image_name, filtered_cracks, latitude, longitude)
+
+def filter_crack_by_config(crack_quantification_results):
+    """CONFIG의 크기 기준으로 크랙 필터링"""
+    return filter_crack_by_size(
+        crack_quantification_results,
+        min_area=CONFIG['MIN_CRACK_AREA'],
+        min_width=CONFIG['MIN_CRACK_WIDTH'],
+        min_length=CONFIG['MIN_CRACK_LENGTH']
+    )
+
+def quantify_and_filter(img_path, crack_mask, stream=False):
+    """
+    크랙 정량화 및 크기 필터링 (파이프라인 후처리 단계에서 실행)
+    
+    Args:
+        img_path: 이미지 파일 경로
+        crack_mask: 크랙 마스크 (스트리밍 모드에서는 디스크 기반 np.memmap)
+        stream: 마스크를 띠 단위로 읽어 정량화 (마스크 크기의 배열을 만들지 않음)
+    
+    Returns:
+        tuple: (전체 크랙 결과, 필터링된 크랙 결과)
+    """
+    # 크랙 정량화 수행 (측정값만 사용하므로 이미지에 그리지 않음)
+    if stream:
+        crack_quantification_results = quantify_crack_width_length_streaming(
+            crack_mask, num_workers=CONFIG['QUANTIFY_WORKERS']
+        )
+    else:
+        _, crack_quantification_results = quantify_crack_width_length(
+            None, crack_mask, CONFIG['CRACK_COLOR'], num_workers=CONFIG['QUANTIFY_WORKERS']
+        )
+    
+    # 크기 필터링 적용
+    filtered_cracks = filter_crack_by_config(crack_quantification_results)
+    
+    return crack_quantification_results, filtered_cracks
+
+def postprocess_detection(img_path, detected, stream=False):
+    """
+    파이프라인 후처리 단계: 추론한 마스크는 정량화, 캐시에서 읽은 결과는 그대로 전달
+    
+    Args:
+        img_path: 이미지 파일 경로
+        detected: 크랙 마스크, 또는 캐시된 (전체 크랙 결과, 필터링된 크랙 결과)
+        stream: 마스크를 띠 단위로 읽어 정량화
+    
+    Returns:
+        tuple: (전체 크랙 결과, 필터링된 크랙 결과)
+    """
+    if isinstance(detected, tuple):
+        return detected
+    
+    return quantify_and_filter(img_path, detected, stream=stream)
+
 def main():
     """메인 함수"""
     args = parse_args()
@@ -216,16 +356,28 @@ def main():
     # Excel 출력 경로 설정 (명령행 인수로 오버라이드 가능)
     excel_output_path = args.excel_output if args.excel_output else CONFIG['EXCEL_OUTPUT_PATH']
     
-    # 모델 초기화
-    print("크랙 탐지 모델을 초기화하는 중...")
-    crack_model = init_model(args.crack_config, args.crack_checkpoint, device='cuda:0')
+    # 모델 초기화: 추론 서버가 있으면 서버의 모델을 사용 (모델 로드 없이 추론만 요청)
+    client = None
+    if args.server:
+        client = InferenceClient(args.server)
+        server_model = client.health()
+        args.crack_config, args.crack_checkpoint = server_model['config'], server_model['checkpoint']
+        crack_palette = server_model['palette'][:2]
+        print(f"추론 서버 사용: {args.server} ({os.path.basename(args.crack_checkpoint)}, 처리한 작업 {server_model['jobs']}개)")
+    else:
+        from mmseg.apis import init_model
+        from torch.cuda import empty_cache
+        from utils import inference_segmentor_sliding_window
+        
+        print("크랙 탐지 모델을 초기화하는 중...")
+        crack_model = init_model(args.crack_config, args.crack_checkpoint, device='cuda:0')
+        crack_palette = crack_model.dataset_meta['palette'][:2]
     
     # 입력 이미지 리스트 생성
     img_list = glob(os.path.join(args.srx_dir, f'*{args.srx_suffix}'))
     print(f"처리할 이미지 개수: {len(img_list)}")
     
     # 크랙 팔레트 설정
-    crack_palette = crack_model.dataset_meta['palette'][:2]
     
     if args.rgb_to_bgr:
         crack_palette = [p[::-1] for p in crack_palette]
@@ -233,101 +385,267 @@ def main():
     if args.overwrite_crack_palette:
         crack_palette[1] = [0, 0, 255]
     
-    # 탐지 결과 저장용 리스트
-    detection_results = []
+    img_numbers = {img_path: idx for idx, img_path in enumerate(img_list)}
     
-    # 각 이미지에 대해 처리
-    for idx, img_path in enumerate(img_list):
-        print(f"\n처리 중: {os.path.basename(img_path)} ({idx+1}/{len(img_list)})")
-        
+    # 탐지 결과는 이미지가 끝날 때마다 배치로 기록 (결과 저장소, SQLite, Excel, 손상 인덱스)
+    writer = open_result_writer(
+        store_dir=args.result_store, db_path=args.result_db,
+        excel_path=None if args.no_excel else excel_output_path, index_path=args.damage_index,
+        fmt=args.store_format, batch_rows=args.result_batch_rows, flush_interval=CONFIG['RESULT_FLUSH_INTERVAL'],
+        survey=os.path.abspath(args.srx_dir)
+    )
+    
+    # 시각화 이미지의 썸네일 (PyDracula가 원본 대신 읽음), 저장 실패는 결과에 영향을 주지 않음
+    thumbnails = ThumbnailCache(args.thumbnail_cache, budget_bytes=CONFIG['THUMBNAIL_CACHE_BUDGET']) if args.thumbnail_cache else None
+    
+    def add_thumbnails(vis_path, image=None):
+        if thumbnails is None:
+            return
         try:
-            # 크랙 탐지 수행
-            _, crack_mask = inference_segmentor_sliding_window(
-                crack_model, img_path, 
-                color_mask=None, 
-                score_thr=CONFIG['SCORE_THRESHOLD'], 
-                window_size=CONFIG['WINDOW_SIZE'], 
-                overlap_ratio=CONFIG['OVERLAP_RATIO']
-            )
-            
-            # 원본 이미지 로드
-            seg_result = mmcv.imread(img_path)
+            if image is None:
+                thumbnails.add_file(vis_path)
+            else:
+                thumbnails.add(vis_path, image)
+        except (OSError, ValueError) as e:
+            print(f"  썸네일 생성 실패 ({os.path.basename(vis_path)}): {e}")
+    
+    # 전체 조사에서 크랙이 탐지된 이미지 수와 가장 큰 크랙
+    survey = {'images': 0, 'max_width': np.nan, 'max_length': np.nan}
+    
+    def record_detection(img_path, filtered_cracks):
+        row = get_detection_row(img_path, filtered_cracks)
+        writer.add(row, crack_table(row[2], filtered_cracks))
+        
+        survey['images'] += 1
+        survey['max_width'] = np.fmax(survey['max_width'], row[4])
+        survey['max_length'] = np.fmax(survey['max_length'], row[5])
+    
+    # 이전 실행 결과 캐시 (이미지 내용 + 모델 설정/체크포인트 + 추론 파라미터가 같으면 재사용)
+    # 크기 필터링은 캐시된 정량화 결과에 다시 적용하므로 필터 기준은 키에 포함하지 않음
+    cache = None
+    cache_keys = {}
+    cached_detections = {}  # 결과 이미지만 다시 저장할 이미지의 캐시된 (전체, 필터링된) 크랙 결과
+    img_queue = img_list
+    
+    if not args.no_cache:
+        inference_params = {
+            'window_size': CONFIG['WINDOW_SIZE'],
+            'overlap_ratio': CONFIG['OVERLAP_RATIO'],
+            'score_threshold': CONFIG['SCORE_THRESHOLD'],
+            'blend': args.blend,
+            'gate_threshold': args.gate_threshold,
+        }
+        # ROI 추론을 끈 실행의 캐시 키는 이전과 같음
+        if args.roi:
+            inference_params.update({'roi_scale': args.coarse_scale, 'roi_threshold': args.roi_threshold, 'roi_margin': args.roi_margin})
+        cache = ResultCache(args.cache_dir, [args.crack_config, args.crack_checkpoint], inference_params)
+        
+        img_queue = []
+        for img_path in img_list:
+            try:
+                cache_keys[img_path] = cache.key(img_path)
+            except OSError:
+                # 읽을 수 없는 파일은 파이프라인에서 오류로 보고됨
+                img_queue.append(img_path)
+                continue
             
-            # 크랙 정량화 수행 (시각화용)
-            seg_result_with_measurements, crack_quantification_results = quantify_crack_width_length(
-                seg_result.copy(), crack_mask, crack_palette[1]
-            )
+            cached_results = cache.load_results(cache_keys[img_path])
             
-            # 크기 필터링 적용
-            filtered_cracks = filter_crack_by_size(
-                crack_quantification_results,
-                min_area=CONFIG['MIN_CRACK_AREA'],
-                min_width=CONFIG['MIN_CRACK_WIDTH'],
-                min_length=CONFIG['MIN_CRACK_LENGTH']
-            )
+            if cached_results is not None:
+                filtered_cracks = filter_crack_by_config(cached_results)
+                
+                # 결과 이미지가 남아 있으면 추론 없이 재사용, 지워졌으면 캐시된 마스크로 다시 저장
+                if len(filtered_cracks) == 0:
+                    continue
+                result_paths = get_result_paths(img_path, args.rst_dir, args.srx_suffix, args.mask_suffix)
+                if all(os.path.exists(path) for path in result_paths if path is not None):
+                    add_thumbnails(result_paths[2])
+                    record_detection(img_path, filtered_cracks)
+                    continue
+                cached_detections[img_path] = cached_results, filtered_cracks
             
-            print(f"  전체 탐지: {len(crack_quantification_results)}개, 필터링 후: {len(filtered_cracks)}개")
+            img_queue.append(img_path)
+        
+        print(f"캐시된 결과 재사용: {len(img_list) - len(img_queue)}개, 처리할 이미지: {len(img_queue)}개")
+    
+    # 추론이 끝난 원본 이미지 (또는 strip reader)와 마스크, 저장 단계에서 시각화에 사용
+    # 후처리 단계에는 마스크만 전달하여 원본 이미지를 프로세스 간에 복사하지 않음
+    pending_images = {}
+    
+    # 추론한 이미지의 윈도우 계획 (전체 / 건너뜀 / 저해상도 윈도우 수), 실행 보고에 사용
+    run_stats = {'images': 0}
+    
+    # 슬라이딩 윈도우 추론 파라미터 (직접 추론과 서버 추론에 같이 사용)
+    job_params = {
+        'score_thr': CONFIG['SCORE_THRESHOLD'],
+        'window_size': CONFIG['WINDOW_SIZE'],
+        'overlap_ratio': CONFIG['OVERLAP_RATIO'],
+        'batch_size': args.batch_size,
+        'blend': args.blend,
+        'gate_threshold': args.gate_threshold,
+        'roi_scale': args.coarse_scale if args.roi else None,
+        'roi_threshold': args.roi_threshold,
+        'roi_margin': args.roi_margin,
+    }
+    
+    def load_image(img_path):
+        if args.stream:
+            # 띠 단위로 읽는 reader와 디스크 기반 마스크 사용
+            reader = open_strip_reader(img_path, CONFIG['STREAM_CACHE_DIR'])
+            return reader, create_disk_backed_mask(reader.shape, CONFIG['STREAM_CACHE_DIR'])
+        
+        # 원본 이미지는 한 번만 로드하여 시각화에 재사용
+        return mmcv.imread(img_path), None
+    
+    def detect_cracks(img_path, loaded):
+        img_input, mask_output = loaded
+        print(f"\n처리 중: {os.path.basename(img_path)} ({img_numbers[img_path]+1}/{len(img_list)})")
+        
+        # 마스크가 캐시되어 있으면 정량화 없이 결과 이미지만 다시 저장
+        if img_path in cached_detections:
+            crack_mask = cache.load_mask(cache_keys[img_path], out=mask_output)
+            if crack_mask is not None:
+                pending_images[img_path] = img_input, crack_mask
+                return cached_detections[img_path]
+            # 마스크를 읽을 수 없으면 다시 추론하고 캐시도 새로 기록
+            del cached_detections[img_path]
+        
+        try:
+            # 크랙 탐지 수행
+            if client is not None:
+                # 스트리밍 모드에서는 서버가 파일을 띠 단위로 읽고, 마스크는 디스크 기반 마스크로 받음
+                if args.stream:
+                    crack_mask, window_stats = client.infer_path(img_path, out=mask_output, stream=True, **job_params)
+                else:
+                    crack_mask, window_stats = client.infer_array(img_input, **job_params)
+            else:
+                window_stats = {}
+                _, crack_mask = inference_segmentor_sliding_window(
+                    crack_model, img_input, 
+                    color_mask=None, 
+                    mask_output=mask_output,
+                    window_stats=window_stats,
+                    **job_params
+                )
+                
+                # GPU 메모리 정리
+                empty_cache()
+        except Exception:
+            if args.stream:
+                img_input.close()
+            raise
+        
+        print(f"  윈도우 계획: {format_window_plan(window_stats)}")
+        run_stats['images'] += 1
+        for key, count in window_stats.items():
+            run_stats[key] = run_stats.get(key, 0) + count
+        
+        pending_images[img_path] = img_input, crack_mask
+        return crack_mask
+    
+    def save_to_cache(img_path, crack_mask, crack_quantification_results):
+        if img_path in cache_keys and img_path not in cached_detections:
+            cache.save(cache_keys[img_path], crack_mask, crack_quantification_results)
+    
+    def save_results(img_path, processed):
+        img_input, crack_mask = pending_images.pop(img_path, (None, None))
+        
+        try:
+            crack_quantification_results, filtered_cracks = processed
+            print(f"  {os.path.basename(img_path)} 전체 탐지: {len(crack_quantification_results)}개, 필터링 후: {len(filtered_cracks)}개")
             
             # 필터링된 크랙이 있는 경우에만 처리
-            if filtered_cracks:
-                # 이미지 정보 추출
-                image_name, latitude, longitude = extract_image_info_from_path(img_path)
-                
-                # 최대 크랙 크기 계산
-                max_size = max([float(crack[1].split('x')[0]) * float(crack[1].split('x')[1]) 
-                              for crack in filtered_cracks])
-                
-                # 최종 JPG 파일명으로 변경 (원본 .png를 .jpg로 변경)
-                final_image_name = image_name.replace('.png', '.jpg')
-                
-                # 탐지 결과 저장 (위도, 경도, 최종 이미지 경로)
-                detection_results.append([
-                    latitude,
-                    longitude,
-                    final_image_name
-                ])
-                
-                # 빨간색 오버레이 시각화 (정량화 텍스트 제외)
+            if len(filtered_cracks) == 0:
+                save_to_cache(img_path, crack_mask, crack_quantification_results)
+                return img_path
+            
+            rst_path, mask_path, vis_path, sparse_mask_path = get_result_paths(img_path, args.rst_dir, args.srx_suffix, args.mask_suffix)
+            
+            # 빨간색 오버레이 시각화 (정량화 텍스트 제외), 이미지 리사이즈 및 JPG 변환
+            if args.stream:
+                resized_visualized, resized_mask = visualize_crack_detection_streaming(
+                    img_input, crack_mask,
+                    color=CONFIG['CRACK_COLOR'],
+                    alpha=CONFIG['VISUALIZATION_ALPHA']
+                )
+            else:
                 visualized_image = visualize_crack_detection(
-                    seg_result.copy(), crack_mask, 
+                    img_input, crack_mask, 
                     color=CONFIG['CRACK_COLOR'], 
                     alpha=CONFIG['VISUALIZATION_ALPHA']
                 )
-                
-                # 결과 이미지 저장 (JPG 형식으로 변경)
-                rst_name = os.path.basename(img_path).replace(args.srx_suffix, '.jpg')
-                mask_name = os.path.basename(img_path).replace(args.srx_suffix, '.jpg')
-                
-                rst_path = os.path.join(args.rst_dir, rst_name)
-                mask_path = os.path.join(args.rst_dir, mask_name)
-                vis_path = os.path.join(CONFIG['IMAGE_OUTPUT_PATH'], rst_name)
-                
-                # 이미지 리사이즈 및 JPG 변환
                 resized_visualized = resize_and_convert_to_jpg(visualized_image)
                 resized_mask = resize_and_convert_to_jpg(crack_mask.astype(np.uint8))
-                
-                # 파일 저장 (JPG 형식)
-                cv2.imwrite(rst_path, cv2.cvtColor(resized_visualized, cv2.COLOR_RGB2BGR), [cv2.IMWRITE_JPEG_QUALITY, 85])
-                cv2.imwrite(mask_path, resized_mask, [cv2.IMWRITE_JPEG_QUALITY, 85])
-                cv2.imwrite(vis_path, cv2.cvtColor(resized_visualized, cv2.COLOR_RGB2BGR), [cv2.IMWRITE_JPEG_QUALITY, 85])
-                
-                print(f"  결과 저장: {rst_path}")
-                print(f"  시각화 저장: {vis_path}")
             
-            # GPU 메모리 정리
-            empty_cache()
+            # 파일 저장 (JPG 형식), 썸네일은 메모리의 시각화 이미지에서 생성
+            visualized_bgr = cv2.cvtColor(resized_visualized, cv2.COLOR_RGB2BGR)
+            cv2.imwrite(rst_path, visualized_bgr, [cv2.IMWRITE_JPEG_QUALITY, 85])
+            cv2.imwrite(mask_path, resized_mask, [cv2.IMWRITE_JPEG_QUALITY, 85])
+            cv2.imwrite(vis_path, visualized_bgr, [cv2.IMWRITE_JPEG_QUALITY, 85])
+            add_thumbnails(vis_path, visualized_bgr)
             
-        except Exception as e:
-            print(f"  오류 발생: {e}")
-            continue
-    
-    # Excel 파일로 탐지 결과 저장
-    if detection_results:
-        save_detection_to_excel(detection_results, excel_output_path)
-        print(f"\n총 {len(detection_results)}개의 이미지에서 크랙이 탐지되어 Excel에 저장되었습니다.")
+            if sparse_mask_path is not None:
+                write_mask(sparse_mask_path, crack_mask, {
+                    'source_image': os.path.basename(img_path), 'config': args.crack_config, 'checkpoint': args.crack_checkpoint
+                })
+            
+            print(f"  결과 저장: {rst_path}")
+            print(f"  시각화 저장: {vis_path}")
+            
+            # 결과 이미지를 저장한 뒤 캐시에 기록하여 중단된 실행을 이어서 진행할 수 있도록 함
+            save_to_cache(img_path, crack_mask, crack_quantification_results)
+            
+            # 탐지 결과 (위도, 경도, 최종 이미지 경로)와 크랙별 측정값 기록
+            record_detection(img_path, filtered_cracks)
+            return img_path
+        finally:
+            if args.stream and img_input is not None:
+                img_input.close()
+    
+    def report_error(img_path, error):
+        print(f"  오류 발생 ({os.path.basename(img_path)}): {error}")
+        
+        # 후처리 단계에서 실패하면 저장 단계가 호출되지 않으므로 여기서 정리
+        img_input, _ = pending_images.pop(img_path, (None, None))
+        if args.stream and img_input is not None:
+            img_input.close()
+    
+    # 디코딩 / 추론 / 정량화 / 저장 단계를 서로 다른 이미지에 대해 동시에 수행
+    # 스트리밍 모드의 마스크는 디스크 기반이므로 프로세스 간에 복사하지 않도록 후처리를 스레드에서 수행
+    # 중간에 실패하면 지금까지 기록한 배치는 남기고 완료 표시는 하지 않음
+    try:
+        run_pipeline(
+            img_queue, load_image, detect_cracks, partial(postprocess_detection, stream=args.stream), save_results,
+            decode_workers=args.decode_workers,
+            postprocess_workers=0 if args.stream else args.postprocess_workers,
+            queue_size=args.queue_size,
+            on_error=report_error
+        )
+    except BaseException:
+        writer.abort()
+        raise
+    finally:
+        if cache is not None:
+            cache.close()
+        if thumbnails is not None:
+            thumbnails.close()
+    
+    writer.close()
+    
+    if survey['images']:
+        print(f"\n총 {survey['images']}개의 이미지에서 크랙이 탐지되었습니다. (크랙 {writer.rows_written[CRACK_TABLE]}개, 배치 {writer.num_batches}개)")
+        for sink in writer.sinks:
+            print(f"  저장: {sink.path}")
+        if thumbnails is not None:
+            print(f"  썸네일: {args.thumbnail_cache}")
+        print(f"최대 크랙 폭: {survey['max_width']:.2f}px, 최대 크랙 길이: {survey['max_length']:.2f}px")
     else:
         print("\n크기가 충분한 크랙이 탐지되지 않았습니다.")
     
+    if run_stats['images']:
+        print(f"윈도우 계획 ({run_stats['images']}개 이미지): {format_window_plan(run_stats)}, "
+              f"이미지당 {(run_stats['windows'] - run_stats['skipped_windows']) / run_stats['images']:.1f}개 추론")
+    
     print("크랙 탐지 및 분석이 완료되었습니다.")
 
 if __name__ == '__main__':
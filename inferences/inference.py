@@ -2,19 +2,26 @@
 python prototyping/inference.py --crack_config '/home/deogwonkang/WindowsShare/05. Data/03. Checkpoints/hardnegative/학습데이터_방법_및_데이터개수로_분리/Only_Positive/seg_PSOnly_Positive800_noOversampling/convnext_tiny_fpn_crack_hardnegative_100units.py' --crack_checkpoint '/home/deogwonkang/WindowsShare/05. Data/03. Checkpoints/hardnegative/학습데이터_방법_및_데이터개수로_분리/Only_Positive/seg_PSOnly_Positive800_noOversampling/iter_best.pth' --srx_dir "prototyping/test_data/leftImg8bit/test" --rst_dir "prototyping/test_data/inference_results"
 '''
 import os
+# images loaded whole (without --stream) may be larger than the default limit of OpenCV
 os.environ["OPENCV_IO_MAX_IMAGE_PIXELS"] = str(pow(2,40))
 
 import argparse
+from functools import partial
 from glob import glob
 
 import mmcv
 import numpy as np
-import pandas as pd
-from mmengine import track_iter_progress
-from mmseg.apis import init_model
+from mmengine import ProgressBar
 
-from quantify_seg_results import quantify_crack_width_length
-from utils import inference_segmentor_sliding_window
+from quantify_seg_results import quantify_crack_width_length, quantify_crack_width_length_streaming, crack_result_rows
+from inference_client import InferenceClient
+from pipeline import run_pipeline
+from sparse_mask import SPARSE_MASK_SUFFIX, write_mask
+from strip_reader import TIFF_SUFFIXES, open_strip_reader, create_disk_backed_mask, write_tiff_strips
+from result_store import image_row, crack_table
+from result_writer import open_result_writer
+from thumbnail_cache import ThumbnailCache
+from config import CONFIG
 
 
 """
@@ -26,22 +33,79 @@ The crack model should have 'background' and 'crack' classes.
 def parse_args():
     """Parse command-line arguments."""
     parser = argparse.ArgumentParser(description='Inference segmentor for cracks')
-    parser.add_argument('--crack_config', required=True, help='config file for crack inference')
-    parser.add_argument('--crack_checkpoint', required=True, help='checkpoint file for crack inference')
+    parser.add_argument('--crack_config', help='config file for crack inference (the model of the server with --server)')
+    parser.add_argument('--crack_checkpoint', help='checkpoint file for crack inference (the model of the server with --server)')
+    parser.add_argument('--server', default=CONFIG['INFERENCE_SERVER_URL'], help='inference server URL (inference_server.py), the model is not loaded here')
     parser.add_argument('--srx_dir', required=True, help='directory of images to inference')
     parser.add_argument('--rst_dir', required=True, help='directory to save results')
     parser.add_argument('--srx_suffix', default='.png', help='source image extension')
     parser.add_argument('--rst_suffix', default='.png', help='result image extension')
-    parser.add_argument('--mask_suffix', default='.png', help='mask output extension')
+    parser.add_argument('--mask_suffix', default='.png', help='mask output extension (.rle saves the compact sparse mask format)')
     parser.add_argument('--alpha', type=float, default=0.8, help='alpha value for blending')
     parser.add_argument('--rgb_to_bgr', action='store_true', help='convert rgb to bgr if model palette is in rgb format')
     parser.set_defaults(rgb_to_bgr=False)
     parser.add_argument('--overwrite_crack_palette', action='store_true', help='overwrite the crack palette with red')
     parser.add_argument('--scaling_factor', type=float, default=1, help='scaling factor if using upscaled images')
+    parser.add_argument('--batch_size', type=int, default=CONFIG['BATCH_SIZE'], help='number of sliding windows per forward pass')
+    parser.add_argument('--blend', default=CONFIG['BLEND_MODE'], choices=['none', 'cosine', 'gaussian'], help="probability blending of overlapping windows ('none' keeps the last window)")
+    parser.add_argument('--gate_threshold', type=float, default=CONFIG['GATE_THRESHOLD'], help='skip windows with edge energy below this value')
+    parser.add_argument('--roi', action='store_true', help='only run the full resolution windows over crack candidates of a low resolution heatmap')
+    parser.add_argument('--coarse_scale', type=float, default=CONFIG['COARSE_SCALE'], help='--roi: scale of the low resolution heatmap')
+    parser.add_argument('--roi_threshold', type=float, default=CONFIG['ROI_THRESHOLD'], help='--roi: heatmap crack probability above which windows are run')
+    parser.add_argument('--roi_margin', type=int, default=CONFIG['ROI_MARGIN'], help='--roi: margin run around the candidates (pixels)')
+    parser.set_defaults(roi=CONFIG['ROI_INFERENCE'])
+    parser.add_argument('--decode_workers', type=int, default=CONFIG['DECODE_WORKERS'], help='number of threads reading images ahead of inference')
+    parser.add_argument('--postprocess_workers', type=int, default=CONFIG['POSTPROCESS_WORKERS'], help='number of processes quantifying cracks (0: one thread)')
+    parser.add_argument('--queue_size', type=int, default=CONFIG['PIPELINE_QUEUE_SIZE'], help='number of images buffered between pipeline stages')
+    parser.add_argument('--result_store', help='columnar result store directory (default: <rst_dir>/crack_results)')
+    parser.add_argument('--store_format', default=CONFIG['RESULT_STORE_FORMAT'], choices=['parquet', 'feather'], help='file format of the result store')
+    parser.add_argument('--result_db', help='SQLite database to also write the results to (readable while running)')
+    parser.add_argument('--damage_index', help='damage index read by the PyDracula viewer (e.g. PyDracula/init/data/damage_index.sqlite)')
+    parser.add_argument('--result_batch_rows', type=int, default=CONFIG['RESULT_BATCH_ROWS'], help='maximum number of result rows buffered before writing')
+    parser.add_argument('--thumbnail_cache', help='thumbnail cache read by the PyDracula viewer (e.g. PyDracula/init/data/thumbnails)')
+    parser.add_argument('--stream', action='store_true', help='read the images strip by strip and keep the masks on disk, for mosaics which do not fit in memory')
+    parser.set_defaults(stream=CONFIG['STREAM_INFERENCE'])
     args = parser.parse_args()
+    if args.blend == 'none':
+        args.blend = None
+    if not args.server and not (args.crack_config and args.crack_checkpoint):
+        parser.error('--crack_config and --crack_checkpoint (or --server) are required')
+    if args.stream and not args.rst_suffix.lower().endswith(TIFF_SUFFIXES):
+        parser.error('--stream writes the result images strip by strip as TIFF, use --rst_suffix .tif')
+    if args.stream and not args.mask_suffix.lower().endswith(TIFF_SUFFIXES + (SPARSE_MASK_SUFFIX,)):
+        parser.error(f'--stream writes the masks strip by strip, use --mask_suffix {SPARSE_MASK_SUFFIX} or .tif')
     return args
 
 
+def overlay_and_quantify(img_path, inferred, palette, alpha, stream=False):
+    """
+    Blend the crack mask onto the image and draw the crack measurements. Runs in the postprocess stage.
+    With stream, the disk-backed mask is quantified strip by strip and the image (a strip reader) is drawn when it is written.
+
+    Returns:
+        tuple: (seg_result, crack_mask, crack_quantification_results)
+    """
+    seg_result, crack_mask = inferred
+
+    if stream:
+        crack_quantification_results = quantify_crack_width_length_streaming(crack_mask, num_workers=CONFIG['QUANTIFY_WORKERS'])
+        return seg_result, crack_mask, crack_quantification_results
+
+    # Visualize the crack mask by blending it onto the original image
+    if len(palette) > 1:
+        color = np.array(palette[1], dtype=np.uint8)
+        mask_bool = (crack_mask == 1)
+        # Apply color blending only on crack pixels
+        seg_result[mask_bool, :] = seg_result[mask_bool, :] * (1 - alpha) + color * alpha
+
+    # Quantify crack properties (e.g., width, length) and draw them on the result image
+    seg_result, crack_quantification_results = quantify_crack_width_length(
+        seg_result, crack_mask, palette[1], num_workers=CONFIG['QUANTIFY_WORKERS']
+    )
+
+    return seg_result, crack_mask, crack_quantification_results
+
+
 def main():
     """Main function to run crack inference and quantification."""
     args = parse_args()
@@ -49,56 +113,83 @@ def main():
     # Ensure the result directory exists
     os.makedirs(args.rst_dir, exist_ok=True)
 
-    # Initialize the crack segmentation model
-    crack_model = init_model(args.crack_config, args.crack_checkpoint, device='cuda:0')
+    # Initialize the crack segmentation model, or use the model loaded by the inference server
+    client = None
+    if args.server:
+        client = InferenceClient(args.server)
+        server_model = client.health()
+        args.crack_config, args.crack_checkpoint = server_model['config'], server_model['checkpoint']
+        palette = server_model['palette']
+    else:
+        # mmseg and torch are only imported to load the model here
+        from mmseg.apis import init_model
+        from utils import inference_segmentor_sliding_window
+
+        crack_model = init_model(args.crack_config, args.crack_checkpoint, device='cuda:0')
+
+        # Get palette from the model's metadata
+        palette = crack_model.dataset_meta['palette']
 
     # Find all images to be processed
     img_list = glob(os.path.join(args.srx_dir, f'*{args.srx_suffix}'))
     
-    # Get palette from the model's metadata
-    palette = crack_model.dataset_meta['palette']
-    
     if args.rgb_to_bgr:
         palette = [p[::-1] for p in palette]
 
     if args.overwrite_crack_palette and len(palette) > 1:
         palette[1] = [0, 0, 255] # Set crack color to red (BGR)
 
-    # Initialize list to store all quantification results
-    all_quantification_results = []
+    # Window counts over all images (the window plan of the ROI mode and the gate), for the run report
+    window_stats = {}
+
+    job_params = {
+        'score_thr': 0.1, 'window_size': 2048, 'overlap_ratio': 0.1, 'batch_size': args.batch_size, 'blend': args.blend,
+        'gate_threshold': args.gate_threshold, 'roi_scale': args.coarse_scale if args.roi else None,
+        'roi_threshold': args.roi_threshold, 'roi_margin': args.roi_margin,
+    }
+
+    def load_image(img_path):
+        if args.stream:
+            # the image is read strip by strip and the mask is a temporary file, neither is held in memory
+            reader = open_strip_reader(img_path, CONFIG['STREAM_CACHE_DIR'])
+            return reader, create_disk_backed_mask(reader.shape, CONFIG['STREAM_CACHE_DIR'])
+        return mmcv.imread(img_path), None
+
+    def infer(img_path, loaded):
+        seg_result, mask_output = loaded
+
+        # Perform inference to get the crack mask, on the server when there is one
+        if client is not None:
+            # the server reads a streamed image from its path, strip by strip, into the disk-backed mask
+            if args.stream:
+                crack_mask, job_stats = client.infer_path(img_path, out=mask_output, stream=True, **job_params)
+            else:
+                crack_mask, job_stats = client.infer_array(seg_result, **job_params)
+            for key, count in job_stats.items():
+                window_stats[key] = window_stats.get(key, 0) + count
+        else:
+            _, crack_mask = inference_segmentor_sliding_window(
+                crack_model, seg_result, color_mask=None, mask_output=mask_output, window_stats=window_stats, **job_params
+            )
+        return seg_result, crack_mask
+
+    progress_bar = ProgressBar(len(img_list))
+
+    # Results are written in batches as images finish: the CSV with one row per crack, the result store and the database
+    writer = open_result_writer(
+        store_dir=args.result_store or os.path.join(args.rst_dir, 'crack_results'),
+        csv_path=os.path.join(args.rst_dir, 'all_crack_quantification_results.csv'),
+        db_path=args.result_db, index_path=args.damage_index, fmt=args.store_format,
+        batch_rows=args.result_batch_rows, flush_interval=CONFIG['RESULT_FLUSH_INTERVAL'],
+        survey=os.path.abspath(args.srx_dir)
+    )
+
+    # Thumbnails of the visualized images for the viewer, made from the image in memory (a downscaled copy with --stream)
+    thumbnails = ThumbnailCache(args.thumbnail_cache, budget_bytes=CONFIG['THUMBNAIL_CACHE_BUDGET']) if args.thumbnail_cache else None
+
+    def write(img_path, processed):
+        seg_result, mask_result, crack_quantification_results = processed
 
-    # Process each image
-    for img_path in track_iter_progress(img_list):
-        
-        # Perform inference to get the crack mask
-        _, crack_mask = inference_segmentor_sliding_window(
-            crack_model, img_path, color_mask=None, score_thr=0.1, window_size=2048, overlap_ratio=0.1
-        )
-
-        # The final mask is just the crack mask
-        mask_result = crack_mask
-
-        # Load the original image to draw the segmentation on
-        seg_result = mmcv.imread(img_path)
-
-        # Visualize the crack mask by blending it onto the original image
-        if len(palette) > 1:
-            color = np.array(palette[1], dtype=np.uint8)
-            mask_bool = (mask_result == 1)
-            # Apply color blending only on crack pixels
-            seg_result[mask_bool, :] = seg_result[mask_bool, :] * (1 - args.alpha) + color * args.alpha
-
-        # Quantify crack properties (e.g., width, length) and draw them on the result image
-        seg_result, crack_quantification_results = quantify_crack_width_length(
-            seg_result, crack_mask, palette[1]
-        )
-
-        # Add image name to each crack result and append to all results
-        if crack_quantification_results:
-            for result in crack_quantification_results:
-                result_with_image = [os.path.basename(img_path)] + result
-                all_quantification_results.append(result_with_image)
-        
         # Define output paths
         rst_name = os.path.basename(img_path).replace(args.srx_suffix, args.rst_suffix)
         mask_name = os.path.basename(img_path).replace(args.srx_suffix, args.mask_suffix)
@@ -106,15 +197,47 @@ def main():
         mask_path = os.path.join(args.rst_dir, mask_name)
 
         # Save the final visualized image and the raw mask
-        mmcv.imwrite(seg_result, rst_path)
-        mmcv.imwrite(mask_result, mask_path)
-
-    # Save all quantification results to a single CSV file
-    if all_quantification_results:
-        all_df = pd.DataFrame(all_quantification_results, columns=['Image_Name', 'Pixel_Coordinates', 'Measurements', 'class_id'])
-        csv_path = os.path.join(args.rst_dir, 'all_crack_quantification_results.csv')
-        all_df.to_csv(csv_path, index=False)
-        print(f"All quantification results saved to: {csv_path}")
+        if args.stream:
+            # drawn and written strip by strip, the thumbnails are made from a downscaled copy
+            with seg_result as reader:
+                result_rows = crack_result_rows(reader.read_rows, mask_result, crack_quantification_results, palette[1], args.alpha)
+                downscaled = write_tiff_strips(rst_path, result_rows, reader.shape,
+                                               downscale=thumbnails.downscale_factor(reader.shape) if thumbnails is not None else None)
+            if thumbnails is not None:
+                thumbnails.add(rst_path, downscaled)
+        else:
+            mmcv.imwrite(seg_result, rst_path)
+            if thumbnails is not None:
+                thumbnails.add(rst_path, seg_result)
+        write_mask(mask_path, mask_result, {
+            'source_image': os.path.basename(img_path), 'config': args.crack_config, 'checkpoint': args.crack_checkpoint
+        })
+        progress_bar.update()
+
+        # One row per image and one row per crack, with the image name as the key
+        image_name = os.path.basename(img_path)
+        writer.add(image_row(image_name, crack_quantification_results), crack_table(image_name, crack_quantification_results))
+
+    # Decode, inference, quantification and saving of different images overlap
+    # Streamed masks are disk-backed, so they are quantified in threads instead of being copied to processes
+    # The batches written so far are kept if the run fails, the outputs are only finalized when it completes
+    with writer:
+        run_pipeline(
+            img_list, load_image, infer, partial(overlay_and_quantify, palette=palette, alpha=args.alpha, stream=args.stream), write,
+            decode_workers=args.decode_workers, postprocess_workers=0 if args.stream else args.postprocess_workers,
+            queue_size=args.queue_size
+        )
+    if thumbnails is not None:
+        thumbnails.close()
+
+    for sink in writer.sinks:
+        print(f"All quantification results saved to: {sink.path}")
+
+    if img_list:
+        run_windows = window_stats.get('windows', 0) - window_stats.get('skipped_windows', 0)
+        print(f"Windows run: {run_windows}/{window_stats.get('windows', 0)} ({run_windows / len(img_list):.1f} per image), "
+              f"skipped {window_stats.get('skipped_windows', 0) / max(window_stats.get('windows', 0), 1):.1%} "
+              f"(ROI {window_stats.get('roi_skipped_windows', 0)}, low resolution windows {window_stats.get('coarse_windows', 0)})")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,310 @@
+"""
+Inference Client
+추론 서버(inference_server.py) 클라이언트
+
+Sends sliding window inference jobs to the local inference server, which keeps the crack model loaded,
+so a job costs the inference only (no model load). Only the standard library and numpy are imported,
+the scripts using the server do not import torch or mmseg, and PyDracula imports this module as it is
+(PyDracula/modules/__init__.py puts this directory on the path).
+
+Protocol (local HTTP):
+- GET  /health: JSON with the model (config, checkpoint, palette, classes, device), load/warm-up times, job count
+- POST /infer?<params>: one image, either a path on the server machine (JSON {"path": ..., "stream": false})
+  or the image array (.npy bytes, Content-Type application/x-npy). The parameters of
+  inference_segmentor_sliding_window listed in JOB_PARAMS are given in the query string.
+  The response is the crack mask (.npy bytes, uint8, H x W) with the window counts in the X-Window-Stats header.
+- POST /infer_multi_scale?<params>: the same for inference_segmentor_multi_scale, with the parameters listed in
+  MULTI_SCALE_JOB_PARAMS. The window counts and times are per scale. With prob=true the response is the fused
+  crack probability (float32, H x W) instead of the mask, which is the probability above 0.5.
+- Errors are JSON {"error": ...}, 400 for bad jobs and 500 for failed inference.
+
+Usage:
+    client = InferenceClient('http://127.0.0.1:8765')
+    mask, window_stats = client.infer_path('image.jpg', window_size=1024, blend='cosine')
+    mask, window_stats = client.infer_array(img, roi_scale=0.25)
+    mask, scale_stats = client.infer_multi_scale_path('image.jpg', coarse_scale=0.25, refine_scales=[1.0, 2.0])
+"""
+
+import os
+import io
+import json
+import urllib.error
+import urllib.request
+from urllib.parse import urlencode
+
+import numpy as np
+
+
+DEFAULT_SERVER_URL = 'http://127.0.0.1:8765'
+NPY_CONTENT_TYPE = 'application/x-npy'
+
+# parameters of inference_segmentor_sliding_window accepted by the server, with their types
+JOB_PARAMS = {
+    'score_thr': float,
+    'window_size': int,
+    'overlap_ratio': float,
+    'batch_size': int,
+    'blend': str,
+    'gate_threshold': float,
+    'roi_scale': float,
+    'roi_threshold': float,
+    'roi_margin': int,
+}
+
+# parameters of inference_segmentor_multi_scale accepted by the server, with their types
+# (prob is not a parameter: the response is the fused crack probability instead of the mask)
+MULTI_SCALE_JOB_PARAMS = {
+    'coarse_scale': float,
+    'refine_scales': lambda value: tuple(float(scale) for scale in value.split(',')),
+    'roi_threshold': float,
+    'roi_margin': int,
+    'window_size': int,
+    'overlap_ratio': float,
+    'batch_size': int,
+    'blend': str,
+    'gate_threshold': float,
+    'prob': lambda value: value.lower() == 'true',
+}
+
+# rows of a probability map thresholded into the mask at once
+MASK_ROWS = 1024
+
+# masks are copied in chunks of this many bytes, so disk-backed masks are never loaded whole
+COPY_CHUNK_BYTES = 1 << 24
+
+
+def encode_job_params(params, job_params=JOB_PARAMS):
+    """
+    Query string of the job parameters, None values are sent as 'none' and sequences comma separated
+    Args:
+        params (dict): The parameters, keys of job_params.
+        job_params (dict): The accepted parameters, JOB_PARAMS or MULTI_SCALE_JOB_PARAMS.
+
+    Returns:
+        query (str): The query string.
+    """
+    unknown = set(params) - set(job_params)
+    if unknown:
+        raise ValueError(f"Unknown inference parameters: {', '.join(sorted(unknown))}")
+
+    def _encode(value):
+        if value is None:
+            return 'none'
+        if isinstance(value, (list, tuple)):
+            return ','.join(map(str, value))
+        return str(value).lower() if isinstance(value, bool) else value
+
+    return urlencode({name: _encode(value) for name, value in params.items()})
+
+
+def parse_job_params(pairs, job_params=JOB_PARAMS):
+    """
+    Job parameters from the (name, value) pairs of a query string
+    Args:
+        pairs (list): The (name, value) string pairs.
+        job_params (dict): The accepted parameters, JOB_PARAMS or MULTI_SCALE_JOB_PARAMS.
+
+    Returns:
+        params (dict): The typed parameters.
+    """
+    params = {}
+    for name, value in pairs:
+        if name not in job_params:
+            raise ValueError(f"Unknown inference parameter: {name}")
+        params[name] = None if value.lower() == 'none' else job_params[name](value)
+
+    return params
+
+
+def npy_header(array):
+    """The .npy header of an array (format 1.0), followed by the array bytes in C order"""
+    stream = io.BytesIO()
+    np.lib.format.write_array_header_1_0(stream, np.lib.format.header_data_from_array_1_0(array))
+    return stream.getvalue()
+
+
+def iter_npy(array):
+    """
+    .npy bytes of a C-contiguous array in chunks (the header first), without copying the whole array
+    Args:
+        array (ndarray): The array, e.g. a disk-backed np.memmap.
+
+    Yields:
+        chunk (bytes or memoryview): The bytes.
+    """
+    yield npy_header(array)
+
+    rows = array.reshape(array.shape[0], -1) if array.ndim > 1 else array.reshape(-1, 1)
+    rows_per_chunk = max(COPY_CHUNK_BYTES // max(rows[0].nbytes, 1), 1) if len(rows) else 1
+    for y0 in range(0, len(rows), rows_per_chunk):
+        yield memoryview(np.ascontiguousarray(rows[y0:y0 + rows_per_chunk])).cast('B')
+
+
+def npy_size(array):
+    """Number of bytes of the .npy encoding of an array"""
+    return len(npy_header(array)) + array.nbytes
+
+
+def read_npy(stream, out=None):
+    """
+    Read a .npy array from a stream (e.g. an HTTP body)
+    Args:
+        stream (file): The binary stream, positioned at the .npy header.
+        out (ndarray): Optional C-contiguous array of the same shape and item size to read into, e.g. a disk-backed np.memmap.
+
+    Returns:
+        array (ndarray): The array, out viewed as the dtype of the stream when it was given.
+    """
+    version = np.lib.format.read_magic(stream)
+    read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+    shape, fortran_order, dtype = read_header(stream)
+    if fortran_order:
+        raise ValueError('Fortran ordered arrays are not supported')
+
+    if out is None:
+        out = np.empty(shape, dtype=dtype)
+    elif tuple(out.shape) != tuple(shape) or out.dtype.itemsize != dtype.itemsize:
+        raise ValueError(f"Cannot read an array of shape {shape} ({dtype}) into {out.shape} ({out.dtype})")
+    array = out.view(dtype)
+
+    buffer = memoryview(array.reshape(-1)).cast('B')
+    for start in range(0, len(buffer), COPY_CHUNK_BYTES):
+        chunk = buffer[start:start + COPY_CHUNK_BYTES]
+        while len(chunk):
+            num_bytes = stream.readinto(chunk)
+            if not num_bytes:
+                raise ValueError('The array data ended early')
+            chunk = chunk[num_bytes:]
+
+    return array
+
+
+class InferenceClient():
+    """
+    Client of the inference server
+    Args:
+        url (str): The server URL, e.g. 'http://127.0.0.1:8765'.
+        timeout (float): The socket timeout in seconds. None waits for long jobs.
+    """
+    def __init__(self, url=DEFAULT_SERVER_URL, timeout=None):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def health(self, timeout=5):
+        """
+        Model and state of the server
+        Returns:
+            health (dict): 'config', 'checkpoint', 'device', 'palette', 'classes', 'load_seconds', 'warmup_seconds', 'jobs'.
+        """
+        with self._open(urllib.request.Request(self.url + '/health'), timeout) as response:
+            return json.load(response)
+
+    def is_available(self):
+        """Whether the server answers"""
+        try:
+            self.health(timeout=1)
+        except ConnectionError:
+            return False
+        return True
+
+    def infer_path(self, img_path, out=None, stream=False, **params):
+        """
+        Inference of an image file, read by the server (on the same machine)
+        Args:
+            img_path (str): The image filename.
+            out (ndarray): Optional zero-filled array of shape (H, W) to read the mask into, e.g. a disk-backed np.memmap.
+            stream (bool): The server reads the image strip by strip (see strip_reader), for mosaics which do not fit in memory.
+            **params: Parameters of inference_segmentor_sliding_window, see JOB_PARAMS.
+
+        Returns:
+            mask (ndarray): The uint8 result mask. The shape is (H, W).
+            window_stats (dict): The window counts of the job (see inference_segmentor_sliding_window).
+        """
+        body = json.dumps({'path': os.path.abspath(img_path), 'stream': stream}).encode('utf-8')
+        return self._infer(body, 'application/json', len(body), out, params)
+
+    def infer_array(self, img, out=None, **params):
+        """
+        Inference of a loaded image, sent to the server
+        Args:
+            img (ndarray): The loaded image. The shape is (H, W, 3).
+            out (ndarray): Optional array of shape (H, W) to read the mask into.
+            **params: Parameters of inference_segmentor_sliding_window, see JOB_PARAMS.
+
+        Returns:
+            mask (ndarray): The uint8 result mask. The shape is (H, W).
+            window_stats (dict): The window counts of the job.
+        """
+        img = np.ascontiguousarray(img)
+        return self._infer(iter_npy(img), NPY_CONTENT_TYPE, npy_size(img), out, params)
+
+    def infer_multi_scale_path(self, img_path, out=None, prob_out=None, stream=False, **params):
+        """
+        Multi-scale inference of an image file, read by the server (on the same machine)
+        Args:
+            img_path (str): The image filename.
+            out (ndarray): Optional zero-filled array of shape (H, W) to read the mask into, e.g. a disk-backed np.memmap.
+            prob_out (ndarray): Optional float32 array of shape (H, W) to read the fused crack probability into.
+            stream (bool): The server reads the image strip by strip (see strip_reader), for mosaics which do not fit in memory.
+            **params: Parameters of inference_segmentor_multi_scale, see MULTI_SCALE_JOB_PARAMS.
+
+        Returns:
+            mask (ndarray): The uint8 result mask. The shape is (H, W).
+            scale_stats (dict): The 'windows', 'total_windows' and 'seconds' of the job per scale (see inference_segmentor_multi_scale).
+        """
+        body = json.dumps({'path': os.path.abspath(img_path), 'stream': stream}).encode('utf-8')
+        return self._infer_multi_scale(body, 'application/json', len(body), out, prob_out, params)
+
+    def infer_multi_scale_array(self, img, out=None, prob_out=None, **params):
+        """
+        Multi-scale inference of a loaded image, sent to the server
+        Args:
+            img (ndarray): The loaded image. The shape is (H, W, 3).
+            out (ndarray): Optional array of shape (H, W) to read the mask into.
+            prob_out (ndarray): Optional float32 array of shape (H, W) to read the fused crack probability into.
+            **params: Parameters of inference_segmentor_multi_scale, see MULTI_SCALE_JOB_PARAMS.
+
+        Returns:
+            mask (ndarray): The uint8 result mask. The shape is (H, W).
+            scale_stats (dict): The window counts and times of the job per scale.
+        """
+        img = np.ascontiguousarray(img)
+        return self._infer_multi_scale(iter_npy(img), NPY_CONTENT_TYPE, npy_size(img), out, prob_out, params)
+
+    def _infer_multi_scale(self, body, content_type, content_length, out, prob_out, params):
+        # the mask is the fused probability above 0.5, so only the probability is sent when it is wanted
+        if prob_out is None:
+            mask, scale_stats = self._infer(body, content_type, content_length, out, params, '/infer_multi_scale', MULTI_SCALE_JOB_PARAMS)
+        else:
+            prob, scale_stats = self._infer(body, content_type, content_length, prob_out, dict(params, prob=True),
+                                            '/infer_multi_scale', MULTI_SCALE_JOB_PARAMS)
+            mask = np.zeros(prob.shape, dtype=np.uint8) if out is None else out.view(np.uint8)
+            for y0 in range(0, len(prob), MASK_ROWS):
+                mask[y0:y0 + MASK_ROWS] = prob[y0:y0 + MASK_ROWS] > 0.5
+
+        # the scales are JSON keys
+        return mask, {float(scale): stats for scale, stats in scale_stats.items()}
+
+    def _infer(self, body, content_type, content_length, out, params, path='/infer', job_params=JOB_PARAMS):
+        request = urllib.request.Request(
+            f"{self.url}{path}?{encode_job_params(params, job_params)}", data=body, method='POST',
+            headers={'Content-Type': content_type, 'Content-Length': str(content_length)}
+        )
+        with self._open(request, self.timeout) as response:
+            window_stats = json.loads(response.headers.get('X-Window-Stats') or '{}')
+            array = read_npy(response, out=out)
+
+        return array, window_stats
+
+    def _open(self, request, timeout):
+        # bad jobs raise ValueError, failed inference RuntimeError and an unreachable server ConnectionError
+        try:
+            return urllib.request.urlopen(request, timeout=timeout)
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.load(e).get('error', e.reason)
+            except ValueError:
+                message = e.reason
+            raise (ValueError if e.code < 500 else RuntimeError)(f"Inference server: {message}") from None
+        except urllib.error.URLError as e:
+            raise ConnectionError(f"Inference server not reachable at {self.url} ({e.reason}), start inference_server.py") from None
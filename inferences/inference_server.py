@@ -0,0 +1,295 @@
+"""
+Inference Server
+크랙 탐지 추론 서버 - 모델을 한 번만 로드하는 로컬 HTTP 데몬
+
+Loads the crack model once, warms it up (CUDA context, cuDNN autotuning) and serves sliding window and
+multi-scale inference jobs over local HTTP, so the inference scripts (--server) and PyDracula pay the inference
+time per job only, not the model load. See inference_client.py for the protocol and the client.
+Jobs run one at a time on the GPU, /health answers while a job runs. Only localhost is served by default.
+
+Usage:
+    python inference_server.py --crack_config "config.py" --crack_checkpoint "checkpoint.pth" --port 8765
+    python enhanced_crack_inference.py --server http://127.0.0.1:8765 --srx_dir "input_dir" --rst_dir "output_dir"
+"""
+
+import os
+
+os.environ["OPENCV_IO_MAX_IMAGE_PIXELS"] = str(pow(2,40))
+
+import json
+import time
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, urlparse, parse_qsl
+
+import mmcv
+import numpy as np
+
+from utils import inference_segmentor_sliding_window, inference_segmentor_multi_scale
+from strip_reader import StripReader, open_strip_reader, create_disk_backed_array, create_disk_backed_mask
+from inference_client import DEFAULT_SERVER_URL, NPY_CONTENT_TYPE, JOB_PARAMS, MULTI_SCALE_JOB_PARAMS, parse_job_params, read_npy, iter_npy, npy_size
+from config import CONFIG
+
+
+def parse_args():
+    default_url = urlparse(DEFAULT_SERVER_URL)
+    parser = argparse.ArgumentParser(description='Serve crack inference jobs with the model loaded once')
+    parser.add_argument('--crack_config', required=True, help='the config file to inference crack')
+    parser.add_argument('--crack_checkpoint', required=True, help='the checkpoint file to inference crack')
+    parser.add_argument('--device', default='cuda:0', help='the device used for inference')
+    parser.add_argument('--host', default=default_url.hostname, help='the address to listen on (localhost only by default)')
+    parser.add_argument('--port', type=int, default=default_url.port, help='the port to listen on')
+    parser.add_argument('--warmup_runs', type=int, default=2, help='the number of warm-up batches run before serving')
+
+    args = parser.parse_args()
+    return args
+
+
+class InferenceServer():
+    """
+    The loaded model and the jobs run with it
+    Args:
+        model (nn.Module): The loaded detector.
+        info (dict): Description of the model returned by /health, e.g. config, checkpoint and device.
+        stream_cache_dir (str): The directory of the temporary rasters and masks of stream jobs.
+    """
+    def __init__(self, model, info=None, stream_cache_dir=None):
+        self.model = model
+        self.info = dict(info or {})
+        self.stream_cache_dir = stream_cache_dir
+        self.jobs = 0
+
+        # one job at a time on the GPU, the HTTP threads wait here
+        self.lock = threading.Lock()
+
+        dataset_meta = getattr(model, 'dataset_meta', None) or {}
+        self.info['palette'] = [list(map(int, color)) for color in dataset_meta.get('palette', [])]
+        self.info['classes'] = list(dataset_meta.get('classes', []))
+
+    def warm_up(self, runs=2, window_size=CONFIG['WINDOW_SIZE'], batch_size=CONFIG['BATCH_SIZE']):
+        """
+        Run full batches of random windows, so the first job does not pay the CUDA setup and autotuning
+        Args:
+            runs (int): The number of batches.
+            window_size (int): The window size of the jobs.
+            batch_size (int): The batch size of the jobs.
+
+        Returns:
+            seconds (float): The warm-up time.
+        """
+        start = time.perf_counter()
+        img = np.random.default_rng(0).integers(0, 255, (window_size, window_size * max(batch_size, 1), 3), dtype=np.uint8)
+        for _ in range(runs):
+            inference_segmentor_sliding_window(
+                self.model, img, color_mask=None, window_size=window_size, overlap_ratio=0, batch_size=batch_size
+            )
+        self.info['warmup_seconds'] = time.perf_counter() - start
+        self._empty_cache()
+
+        return self.info['warmup_seconds']
+
+    def health(self):
+        """Model and state of the server"""
+        return dict(self.info, jobs=self.jobs, busy=self.lock.locked())
+
+    def infer(self, img, params, mask_output=None):
+        """
+        Run one job
+        Args:
+            img (ndarray or StripReader): The loaded image or the strip reader.
+            params (dict): Parameters of inference_segmentor_sliding_window.
+            mask_output (ndarray): Optional zero-filled boolean array of shape (H, W) to write the mask into.
+
+        Returns:
+            mask (ndarray): The uint8 result mask. The shape is (H, W).
+            window_stats (dict): The window counts.
+            seconds (float): The inference time, without the wait for the previous jobs.
+        """
+        window_stats = {}
+        with self.lock:
+            start = time.perf_counter()
+            try:
+                _, mask = inference_segmentor_sliding_window(
+                    self.model, img, color_mask=None, mask_output=mask_output, window_stats=window_stats, **params
+                )
+            finally:
+                self._empty_cache()
+            self.jobs += 1
+
+            return mask, window_stats, time.perf_counter() - start
+
+    def infer_multi_scale(self, img, params, mask_output=None):
+        """
+        Run one multi-scale job
+        Args:
+            img (ndarray or StripReader): The loaded image or the strip reader.
+            params (dict): Parameters of inference_segmentor_multi_scale, and prob to return the fused crack probability.
+            mask_output (ndarray): Optional zero-filled boolean array of shape (H, W) to write the mask into.
+
+        Returns:
+            mask (ndarray): The uint8 result mask, or the float32 fused crack probability with prob. The shape is (H, W).
+            scale_stats (dict): The window counts and times per scale.
+            seconds (float): The inference time, without the wait for the previous jobs.
+        """
+        params = dict(params)
+        prob = params.pop('prob', False)
+
+        # the probability maps of a strip reader are temporary files
+        if isinstance(img, StripReader):
+            prob_output = create_disk_backed_array(img.shape[:2], np.float32, self.stream_cache_dir)
+        else:
+            prob_output = np.zeros(img.shape[:2], dtype=np.float32)
+
+        scale_stats = {}
+        with self.lock:
+            start = time.perf_counter()
+            try:
+                _, mask = inference_segmentor_multi_scale(
+                    self.model, img, color_mask=None, prob_output=prob_output, scale_stats=scale_stats, mask_output=mask_output,
+                    cache_dir=self.stream_cache_dir, **params
+                )
+            finally:
+                self._empty_cache()
+            self.jobs += 1
+
+            return prob_output if prob else mask, scale_stats, time.perf_counter() - start
+
+    def infer_path(self, img_path, params, stream=False, multi_scale=False):
+        """
+        Run one job on an image file
+        Args:
+            img_path (str): The image filename on this machine.
+            params (dict): Parameters of inference_segmentor_sliding_window (or of infer_multi_scale).
+            stream (bool): Read the image strip by strip and write the mask to a disk-backed array.
+            multi_scale (bool): Run a multi-scale job.
+
+        Returns:
+            The result of infer (or infer_multi_scale).
+        """
+        if not os.path.isfile(img_path):
+            raise FileNotFoundError(f"No such image: {img_path}")
+        infer = self.infer_multi_scale if multi_scale else self.infer
+
+        if not stream:
+            img = mmcv.imread(img_path)
+            if img is None:
+                raise ValueError(f"Cannot read the image: {img_path}")
+            return infer(img, params)
+
+        with open_strip_reader(img_path, self.stream_cache_dir) as reader:
+            return infer(reader, params, mask_output=create_disk_backed_mask(reader.shape, self.stream_cache_dir))
+
+    def _empty_cache(self):
+        # frees the cached GPU memory between jobs, as the inference scripts do between images
+        if str(self.info.get('device', '')).startswith('cuda'):
+            from torch.cuda import empty_cache
+            empty_cache()
+
+
+class InferenceRequestHandler(BaseHTTPRequestHandler):
+    """HTTP requests of the inference server, self.server.inference is the InferenceServer"""
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if urlsplit(self.path).path != '/health':
+            self._send_json(404, {'error': f"Unknown path: {self.path}"})
+            return
+        self._send_json(200, self.server.inference.health())
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path not in ('/infer', '/infer_multi_scale'):
+            self._send_json(404, {'error': f"Unknown path: {self.path}"})
+            return
+        multi_scale = url.path == '/infer_multi_scale'
+
+        try:
+            params = parse_job_params(parse_qsl(url.query, keep_blank_values=True), MULTI_SCALE_JOB_PARAMS if multi_scale else JOB_PARAMS)
+            if self.headers.get('Content-Type') == NPY_CONTENT_TYPE:
+                img = read_npy(self.rfile)
+                if img.ndim != 3:
+                    raise ValueError(f"Expected an image of shape (H, W, C), got {img.shape}")
+                infer = self.server.inference.infer_multi_scale if multi_scale else self.server.inference.infer
+                mask, window_stats, seconds = infer(img, params)
+            else:
+                job = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                mask, window_stats, seconds = self.server.inference.infer_path(
+                    job['path'], params, stream=bool(job.get('stream')), multi_scale=multi_scale
+                )
+        except (ValueError, KeyError, TypeError, OSError) as e:
+            # bad jobs: parameters, missing or unreadable images
+            self.close_connection = True
+            self._send_json(400, {'error': f"{type(e).__name__}: {e}"})
+            return
+        except Exception as e:
+            self.close_connection = True
+            self._send_json(500, {'error': f"{type(e).__name__}: {e}"})
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', NPY_CONTENT_TYPE)
+        self.send_header('Content-Length', str(npy_size(mask)))
+        self.send_header('X-Window-Stats', json.dumps(window_stats))
+        self.send_header('X-Inference-Seconds', f'{seconds:.4f}')
+        self.end_headers()
+        for chunk in iter_npy(mask):
+            self.wfile.write(chunk)
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        print(f"[{self.log_date_time_string()}] {format % args}")
+
+
+def serve(inference, host, port):
+    """
+    Create the HTTP server of an InferenceServer, serve it with serve_forever() and stop it with shutdown()
+    Args:
+        inference (InferenceServer): The loaded model.
+        host (str): The address to listen on.
+        port (int): The port to listen on, 0 picks a free port (see server_address).
+
+    Returns:
+        server (ThreadingHTTPServer): The HTTP server.
+    """
+    server = ThreadingHTTPServer((host, port), InferenceRequestHandler)
+    server.daemon_threads = True
+    server.inference = inference
+    return server
+
+
+def main():
+    args = parse_args()
+
+    from mmseg.apis import init_model
+
+    print("크랙 탐지 모델을 초기화하는 중...")
+    start = time.perf_counter()
+    model = init_model(args.crack_config, args.crack_checkpoint, device=args.device)
+    inference = InferenceServer(model, {
+        'config': os.path.abspath(args.crack_config),
+        'checkpoint': os.path.abspath(args.crack_checkpoint),
+        'device': args.device,
+        'load_seconds': time.perf_counter() - start,
+    }, stream_cache_dir=CONFIG['STREAM_CACHE_DIR'])
+    print(f"모델 로드 {inference.info['load_seconds']:.1f}초, 워밍업 {inference.warm_up(args.warmup_runs):.1f}초")
+
+    server = serve(inference, args.host, args.port)
+    print(f"추론 서버 실행 중: http://{args.host}:{server.server_address[1]} (종료: Ctrl+C)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -4,76 +4,242 @@ python inferences/multi_scale_inference_segmentor_crack.py --crack_config  "/hom
 
 import os
 
+# images loaded whole (without --stream) may be larger than the default limit of OpenCV
 os.environ["OPENCV_IO_MAX_IMAGE_PIXELS"] = str(pow(2,40))
 
 import argparse
+from functools import partial
 from glob import glob
 
-from mmseg.apis import init_model, inference_model
 import mmcv
 import numpy as np
 from mmengine import track_progress
 
-from quantify_seg_results import quantify_crack_width_length
+from quantify_seg_results import quantify_crack_width_length, quantify_crack_width_length_streaming, crack_result_rows
 
-from torch.cuda import empty_cache
-from utils import inference_segmentor_sliding_window
+from inference_client import InferenceClient
+from pipeline import run_pipeline
+from sparse_mask import SPARSE_MASK_SUFFIX, write_mask
+from strip_reader import TIFF_SUFFIXES, open_strip_reader, create_disk_backed_array, create_disk_backed_mask, write_tiff_strips
+from result_store import image_row, crack_table
+from result_writer import open_result_writer
+from thumbnail_cache import ThumbnailCache
+from config import CONFIG
 
 def parse_args():
     parser = argparse.ArgumentParser(description='Inference detector')
-    parser.add_argument('--crack_config', help='the config file to inference crack')
-    parser.add_argument('--crack_checkpoint', help='the checkpoint file to inference crack')
+    parser.add_argument('--crack_config', help='the config file to inference crack (the model of the server with --server)')
+    parser.add_argument('--crack_checkpoint', help='the checkpoint file to inference crack (the model of the server with --server)')
+    parser.add_argument('--server', default=CONFIG['INFERENCE_SERVER_URL'], help='the inference server URL (inference_server.py), the model is not loaded here')
     parser.add_argument('--srx_dir', help='the dir to inference')
     parser.add_argument('--rst_dir', help='the dir to save result')
     parser.add_argument('--srx_suffix', default='.png', help='the source image extension')
     parser.add_argument('--rst_suffix', default='.png', help='the result image extension')
-    parser.add_argument('--mask_suffix', default='.png', help='the mask output extension')
-    parser.add_argument('--alpha', default=0.8, help='the alpha value for blending')
+    parser.add_argument('--mask_suffix', default='.png', help='the mask output extension (.rle saves the compact sparse mask format)')
+    parser.add_argument('--alpha', type=float, default=0.8, help='the alpha value for blending')
     parser.add_argument('--rgb_to_bgr', action='store_true', help='convert rgb to bgr, if the model palette is written in rgb format.')
     parser.set_defaults(rgb_to_bgr=False)
     parser.add_argument('--overwrite_crack_palette', action='store_true', help='overwrite the crack palette with black and red. To be used when the crack model is trained with a different palette.')
+    parser.add_argument('--batch_size', type=int, default=CONFIG['BATCH_SIZE'], help='the number of sliding windows per forward pass')
+    parser.add_argument('--blend', default=CONFIG['BLEND_MODE'], choices=['none', 'cosine', 'gaussian'], help="the probability blending of overlapping windows ('none' weights every pixel of a window equally)")
+    parser.add_argument('--gate_threshold', type=float, default=CONFIG['GATE_THRESHOLD'], help='the edge energy below which refined windows are skipped')
+    parser.add_argument('--window_size', type=int, default=1024, help='the size of sliding window, at every scale')
+    parser.add_argument('--overlap_ratio', type=float, default=0.1, help='the overlap ratio of sliding window')
+    parser.add_argument('--coarse_scale', type=float, default=CONFIG['COARSE_SCALE'], help='the scale of the coarse pass finding the candidate regions')
+    parser.add_argument('--refine_scales', type=float, nargs='+', default=CONFIG['REFINE_SCALES'], help='the scales the candidate regions are refined at (1: native resolution)')
+    parser.add_argument('--scaling_factor', type=float, default=1, help='also refine at this upscaling factor, for models trained on upscaled images')
+    parser.add_argument('--roi_threshold', type=float, default=CONFIG['ROI_THRESHOLD'], help='the coarse crack probability above which a region is refined')
+    parser.add_argument('--roi_margin', type=int, default=CONFIG['ROI_MARGIN'], help='the margin refined around the candidate regions (pixels)')
+    parser.add_argument('--prob_suffix', default=None, help='also save the fused crack probability map (8 bit) with this extension, e.g. _prob.png')
+    parser.add_argument('--decode_workers', type=int, default=CONFIG['DECODE_WORKERS'], help='the number of threads reading images ahead of inference')
+    parser.add_argument('--postprocess_workers', type=int, default=CONFIG['POSTPROCESS_WORKERS'], help='the number of processes quantifying cracks (0: one thread)')
+    parser.add_argument('--queue_size', type=int, default=CONFIG['PIPELINE_QUEUE_SIZE'], help='the number of images buffered between pipeline stages')
+    parser.add_argument('--result_store', help='the columnar result store directory (default: <rst_dir>/crack_results)')
+    parser.add_argument('--store_format', default=CONFIG['RESULT_STORE_FORMAT'], choices=['parquet', 'feather'], help='the file format of the result store')
+    parser.add_argument('--result_db', help='the SQLite database to also write the results to (readable while running)')
+    parser.add_argument('--damage_index', help='the damage index read by the PyDracula viewer (e.g. PyDracula/init/data/damage_index.sqlite)')
+    parser.add_argument('--result_batch_rows', type=int, default=CONFIG['RESULT_BATCH_ROWS'], help='the maximum number of result rows buffered before writing')
+    parser.add_argument('--thumbnail_cache', help='the thumbnail cache read by the PyDracula viewer (e.g. PyDracula/init/data/thumbnails)')
+    parser.add_argument('--stream', action='store_true', help='read the images strip by strip and keep the masks and probability maps on disk, for mosaics which do not fit in memory')
+    parser.set_defaults(stream=CONFIG['STREAM_INFERENCE'])
 
     args = parser.parse_args()
+    if args.blend == 'none':
+        args.blend = None
+    if not args.server and not (args.crack_config and args.crack_checkpoint):
+        parser.error('--crack_config and --crack_checkpoint (or --server) are required')
+    if args.stream and not all(suffix.lower().endswith(TIFF_SUFFIXES) for suffix in [args.rst_suffix, args.prob_suffix or '.tif']):
+        parser.error('--stream writes the result images and probability maps strip by strip as TIFF, use --rst_suffix .tif (and --prob_suffix _prob.tif)')
+    if args.stream and not args.mask_suffix.lower().endswith(TIFF_SUFFIXES + (SPARSE_MASK_SUFFIX,)):
+        parser.error(f'--stream writes the masks strip by strip, use --mask_suffix {SPARSE_MASK_SUFFIX} or .tif')
     return args
 
+def visualize_and_quantify(img_path, inferred, crack_palette, alpha, stream=False):
+    """
+    Blend the crack mask onto the image and draw the crack measurements, in the postprocess stage
+    With stream, the disk-backed mask is quantified strip by strip and the image (a strip reader) is drawn when it is written.
+    """
+    seg_result, crack_mask, crack_prob = inferred
+
+    if stream:
+        crack_quantification_results = quantify_crack_width_length_streaming(crack_mask, num_workers=CONFIG['QUANTIFY_WORKERS'])
+        return seg_result, crack_mask, crack_prob, crack_quantification_results
+
+    # Visualize the crack mask
+    color = crack_palette[1]
+    color = np.array(color, dtype=np.uint8)
+    mask_bool = crack_mask == 1
+
+    seg_result[mask_bool, :] = seg_result[mask_bool, :] * (1 - alpha) + color * alpha
+
+    # Quantify crack width and length
+    seg_result, crack_quantification_results = quantify_crack_width_length(seg_result, crack_mask, crack_palette[1], num_workers=CONFIG['QUANTIFY_WORKERS'])
+
+    return seg_result, crack_mask, crack_prob, crack_quantification_results
+
+def print_scale_stats(scale_stats, num_images):
+    """Windows run and time spent per scale, over all images"""
+    print(f"\n{'scale':>7} {'windows':>9} {'of grid':>9} {'run':>7} {'windows/image':>14} {'time (s)':>9}")
+    for scale, stats in sorted(scale_stats.items()):
+        run_ratio = stats['windows'] / max(stats['total_windows'], 1)
+        print(f"{scale:>7g} {stats['windows']:>9} {stats['total_windows']:>9} {run_ratio:>7.1%} "
+              f"{stats['windows'] / max(num_images, 1):>14.1f} {stats['seconds']:>9.2f}")
+
 def main():
     args = parse_args()
 
-    crack_model = init_model(args.crack_config, args.crack_checkpoint, device='cuda:0')
+    # load the model, or use the model loaded by the inference server
+    client = None
+    if args.server:
+        client = InferenceClient(args.server)
+        server_model = client.health()
+        args.crack_config, args.crack_checkpoint = server_model['config'], server_model['checkpoint']
+        crack_palette = server_model['palette'][:2]
+    else:
+        # mmseg and torch are only imported to load the model here
+        from mmseg.apis import init_model
+        from utils import inference_segmentor_multi_scale
+
+        crack_model = init_model(args.crack_config, args.crack_checkpoint, device='cuda:0')
+        crack_palette = crack_model.dataset_meta['palette'][:2]  # Only keep the first two colors
 
     img_list = glob(os.path.join(args.srx_dir, f'*{args.srx_suffix}'))
 
-    crack_palette = crack_model.dataset_meta['palette'][:2]  # Only keep the first two colors
-
     if args.rgb_to_bgr:
         crack_palette = [p[::-1] for p in crack_palette]
 
     if args.overwrite_crack_palette:
         crack_palette[1] = [0, 0, 255]  # Redefine crack color if necessary
 
-    for img_path in img_list:
-        _, crack_mask = inference_segmentor_sliding_window(crack_model, img_path, color_mask=None, score_thr=0.1, window_size=1024, overlap_ratio=0.1)
-
-        seg_result = mmcv.imread(img_path)
-
-        # Visualize the crack mask
-        color = crack_palette[1]
-        color = np.array(color, dtype=np.uint8)
-        mask_bool = crack_mask == 1
-
-        seg_result[mask_bool, :] = seg_result[mask_bool, :] * (1 - args.alpha) + color * args.alpha
+    # the candidate regions of the coarse pass are refined at each scale, the upscaling factor included
+    refine_scales = list(args.refine_scales)
+    if args.scaling_factor != 1 and args.scaling_factor not in refine_scales:
+        refine_scales.append(args.scaling_factor)
+    scale_stats = {}
+
+    job_params = {
+        'coarse_scale': args.coarse_scale, 'refine_scales': refine_scales, 'roi_threshold': args.roi_threshold, 'roi_margin': args.roi_margin,
+        'window_size': args.window_size, 'overlap_ratio': args.overlap_ratio, 'batch_size': args.batch_size, 'blend': args.blend,
+        'gate_threshold': args.gate_threshold,
+    }
+
+    def load_image(img_path):
+        if args.stream:
+            # the image is read strip by strip and the mask is a temporary file, neither is held in memory
+            reader = open_strip_reader(img_path, CONFIG['STREAM_CACHE_DIR'])
+            return reader, create_disk_backed_mask(reader.shape, CONFIG['STREAM_CACHE_DIR'])
+        return mmcv.imread(img_path), None
+
+    def infer(img_path, loaded):
+        seg_result, mask_output = loaded
+        # the server only sends the probability map when it is saved
+        if client is not None and not args.prob_suffix:
+            crack_prob = None
+        elif args.stream:
+            crack_prob = create_disk_backed_array(seg_result.shape[:2], np.float32, CONFIG['STREAM_CACHE_DIR'])
+        else:
+            crack_prob = np.zeros(seg_result.shape[:2], dtype=np.float32)
+
+        # on the server when there is one
+        if client is not None:
+            if args.stream:
+                # the server reads a streamed image from its path, strip by strip, into the disk-backed mask
+                crack_mask, job_stats = client.infer_multi_scale_path(img_path, out=mask_output, prob_out=crack_prob, stream=True, **job_params)
+            else:
+                crack_mask, job_stats = client.infer_multi_scale_array(seg_result, prob_out=crack_prob, **job_params)
+            for scale, stats in job_stats.items():
+                totals = scale_stats.setdefault(scale, {'windows': 0, 'total_windows': 0, 'seconds': 0.0})
+                for key, value in stats.items():
+                    totals[key] += value
+        else:
+            _, crack_mask = inference_segmentor_multi_scale(
+                crack_model, seg_result, color_mask=None, prob_output=crack_prob, scale_stats=scale_stats,
+                mask_output=mask_output, cache_dir=CONFIG['STREAM_CACHE_DIR'], **job_params
+            )
+        # the probability map is only passed on (as 8 bit) when it is saved, a streamed one stays on disk and is converted when written
+        if not args.prob_suffix:
+            crack_prob = None
+        elif not args.stream:
+            crack_prob = (crack_prob * 255).round().astype(np.uint8)
+        return seg_result, crack_mask, crack_prob
+
+    # results are written in batches as images finish
+    writer = open_result_writer(
+        store_dir=args.result_store or os.path.join(args.rst_dir, 'crack_results'), db_path=args.result_db,
+        index_path=args.damage_index, fmt=args.store_format, batch_rows=args.result_batch_rows, flush_interval=CONFIG['RESULT_FLUSH_INTERVAL'],
+        survey=os.path.abspath(args.srx_dir)
+    )
+
+    # thumbnails of the visualized images for the viewer, made from the image in memory (a downscaled copy with --stream)
+    thumbnails = ThumbnailCache(args.thumbnail_cache, budget_bytes=CONFIG['THUMBNAIL_CACHE_BUDGET']) if args.thumbnail_cache else None
+
+    def write(img_path, processed):
+        seg_result, crack_mask, crack_prob, crack_quantification_results = processed
 
         rst_name = os.path.basename(img_path).replace(args.srx_suffix, args.rst_suffix)
         mask_name = os.path.basename(img_path).replace(args.srx_suffix, args.mask_suffix)
 
-        # Quantify crack width and length
-        seg_result = quantify_crack_width_length(seg_result, crack_mask, crack_palette[1])
-
         rst_path = os.path.join(args.rst_dir, rst_name)
         mask_path = os.path.join(args.rst_dir, mask_name)
 
-        mmcv.imwrite(seg_result, rst_path)
-        mmcv.imwrite(crack_mask.astype(np.uint8), mask_path)  # Assuming binary mask for simplicity
+        if args.stream:
+            # drawn and written strip by strip, the thumbnails are made from a downscaled copy
+            with seg_result as reader:
+                result_rows = crack_result_rows(reader.read_rows, crack_mask, crack_quantification_results, crack_palette[1], args.alpha)
+                downscaled = write_tiff_strips(rst_path, result_rows, reader.shape,
+                                               downscale=thumbnails.downscale_factor(reader.shape) if thumbnails is not None else None)
+            if thumbnails is not None:
+                thumbnails.add(rst_path, downscaled)
+        else:
+            mmcv.imwrite(seg_result, rst_path)
+            if thumbnails is not None:
+                thumbnails.add(rst_path, seg_result)
+        write_mask(mask_path, crack_mask, {  # Assuming binary mask for simplicity
+            'source_image': os.path.basename(img_path), 'config': args.crack_config, 'checkpoint': args.crack_checkpoint
+        })
+        if crack_prob is not None:
+            prob_path = os.path.join(args.rst_dir, os.path.basename(img_path).replace(args.srx_suffix, args.prob_suffix))
+            if args.stream:
+                write_tiff_strips(prob_path, lambda y0, y1: (crack_prob[y0:y1] * 255).round().astype(np.uint8), crack_prob.shape)
+            else:
+                mmcv.imwrite(crack_prob, prob_path)
+
+        image_name = os.path.basename(img_path)
+        writer.add(image_row(image_name, crack_quantification_results), crack_table(image_name, crack_quantification_results))
+
+    # read, inference, quantification and saving of different images overlap
+    # streamed masks are disk-backed, so they are quantified in threads instead of being copied to processes
+    # the batches written so far are kept if the run fails, the outputs are only finalized when it completes
+    with writer:
+        run_pipeline(
+            img_list, load_image, infer, partial(visualize_and_quantify, crack_palette=crack_palette, alpha=args.alpha, stream=args.stream), write,
+            decode_workers=args.decode_workers, postprocess_workers=0 if args.stream else args.postprocess_workers,
+            queue_size=args.queue_size
+        )
+    if thumbnails is not None:
+        thumbnails.close()
+
+    print_scale_stats(scale_stats, len(img_list))
 
 if __name__ == '__main__':
     main()
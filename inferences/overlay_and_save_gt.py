@@ -18,6 +18,9 @@ import cv2
 from pathlib import Path
 import matplotlib.pyplot as plt
 
+from sparse_mask import SPARSE_MASK_SUFFIX, SparseMask, read_mask
+from crack_records import bbox_mask
+
 # Extended color mapping
 color_mapping = {
     0: [0, 0, 0],        # Class 0 in black
@@ -39,7 +42,7 @@ def parse_args():
     parser.add_argument('--target_label', type=int, default=1, help='the label to filter images (default: 1)')
     parser.add_argument('--alpha', type=float, default=0.6, help='transparency for overlay (default: 0.6)')
     parser.add_argument('--img_suffix', default='.JPG', help='original image file suffix')
-    parser.add_argument('--gt_suffix', default='.png', help='ground truth/detection file suffix')
+    parser.add_argument('--gt_suffix', default='.png', help=f'ground truth/detection file suffix ({SPARSE_MASK_SUFFIX} for sparse masks)')
     args = parser.parse_args()
     return args
 
@@ -66,35 +69,19 @@ def get_matching_files(img_dir, gt_dir, img_suffix, gt_suffix):
     matched_pairs = [(img_dict[k], gt_dict[k]) for k in common_keys]
     return matched_pairs
 
-def convert_coordinates_to_mask(coordinates_str, img_shape):
+def convert_coordinates_to_mask(crack_records, img_shape):
     """
-    Convert coordinate string to binary mask
+    Convert crack bounding boxes to binary mask
     
     Args:
-        coordinates_str: String in format "(minr,minc)-(maxr,maxc)" or similar
+        crack_records: Crack records (crack_records.CRACK_RECORD_DTYPE) from quantify_crack_width_length
         img_shape: Shape of the image (height, width)
     
     Returns:
         binary_mask: Binary mask with detected areas marked as 1
     """
-    if not coordinates_str or coordinates_str == "No cracks detected":
-        return np.zeros(img_shape[:2], dtype=np.uint8)
-    
-    try:
-        # Parse coordinate string like "(minr,minc)-(maxr,maxc)"
-        coords = coordinates_str.replace('(', '').replace(')', '').split('-')
-        if len(coords) == 2:
-            min_coords = tuple(map(int, coords[0].split(',')))
-            max_coords = tuple(map(int, coords[1].split(',')))
-            
-            # Create binary mask
-            mask = np.zeros(img_shape[:2], dtype=np.uint8)
-            mask[min_coords[0]:max_coords[0], min_coords[1]:max_coords[1]] = 1
-            return mask
-    except:
-        pass
-    
-    return np.zeros(img_shape[:2], dtype=np.uint8)
+    # The boxes are read from the bbox columns, all at once
+    return bbox_mask(crack_records, img_shape[:2])
 
 def resize_and_convert_to_jpg(image, target_size=(400, 400), quality=85):
     """
@@ -145,7 +132,8 @@ def create_visualization_overlay(img, gt_mask, color, alpha):
 
 def main():
     args = parse_args()
-    img_dir, gt_dir, output_dir, target_label, alpha, img_suffix, gt_suffix = parse_args()
+    img_dir, gt_dir, output_dir = args.img_dir, args.gt_dir, args.output_dir
+    target_label, alpha, img_suffix, gt_suffix = args.target_label, args.alpha, args.img_suffix, args.gt_suffix
     
     file_pairs = get_matching_files(img_dir, gt_dir, img_suffix, gt_suffix)
     print(f"Found {len(file_pairs)} matching pairs of image and detection files")
@@ -157,6 +145,12 @@ def main():
 
     for img_file, gt_file in file_pairs:
         try:
+            # Sparse masks list their labels in the header, so masks without the target label are skipped before decoding anything
+            if gt_file.endswith(SPARSE_MASK_SUFFIX) and target_label not in SparseMask(gt_file).labels:
+                print(f"Skipping {gt_file} - target label {target_label} not found")
+                skipped_count += 1
+                continue
+
             # Read original image
             img = cv2.imread(img_file)
             if img is None:
@@ -165,7 +159,7 @@ def main():
                 continue
 
             # Read ground truth/detection result
-            gt = cv2.imread(gt_file, cv2.IMREAD_UNCHANGED)
+            gt = read_mask(gt_file)
             if gt is None:
                 print(f"Failed to read detection file: {gt_file}")
                 skipped_count += 1
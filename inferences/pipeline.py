@@ -0,0 +1,190 @@
+"""
+Staged Image Pipeline
+이미지 디코딩 / 추론 / 후처리 / 저장 단계를 동시에 실행하는 모듈
+
+Images flow through four stages which run at the same time on different images:
+- decode: a thread pool reads images ahead of the model.
+- inference: the calling thread runs the model, one image at a time.
+- postprocess: a process pool (or one thread) quantifies cracks and draws results.
+- write: one thread saves the results.
+Stages are connected by bounded queues, so a slow stage blocks the stages before it
+instead of piling up decoded images in memory.
+"""
+
+import time
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+_DONE = object()
+
+
+class StageStats():
+    """Busy time of a pipeline stage, summed over its workers"""
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = workers
+        self.busy = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def add(self, elapsed):
+        with self._lock:
+            self.busy += elapsed
+            self.count += 1
+
+    def utilization(self, wall_time):
+        """Ratio of the wall time the workers of the stage were busy"""
+        if wall_time <= 0:
+            return 0.0
+
+        return self.busy / (wall_time * self.workers)
+
+
+def _timed(func, *args):
+    """Run func and return its result with the elapsed time. Module level, so process pools can pickle it."""
+    start = time.perf_counter()
+    result = func(*args)
+
+    return result, time.perf_counter() - start
+
+
+def _print_error(item, error):
+    print(f"Error processing {item}: {error}")
+
+
+def format_stage_report(stats, wall_time, num_items):
+    """
+    Format the per-stage utilization table
+    Args:
+        stats (list): The StageStats of each stage.
+        wall_time (float): The wall time of the whole run in seconds.
+        num_items (int): The number of items written.
+
+    Returns:
+        report (str): The report.
+    """
+    lines = [f"{'stage':<12} {'workers':>7} {'items':>6} {'busy (s)':>9} {'utilization':>12}"]
+    for stage in stats:
+        lines.append(f"{stage.name:<12} {stage.workers:>7} {stage.count:>6} {stage.busy:>9.2f} {stage.utilization(wall_time):>12.1%}")
+
+    rate = num_items / wall_time if wall_time > 0 else 0.0
+    lines.append(f"wall time {wall_time:.2f} s, {num_items} images, {rate:.2f} images/s")
+
+    return '\n'.join(lines)
+
+
+def run_pipeline(items, decode, infer, postprocess, write, decode_workers=2, postprocess_workers=0, queue_size=4,
+                 on_error=None, report=True):
+    """
+    Run decode / inference / postprocess / write over items with the stages overlapping
+    Args:
+        items (iterable): The items to process, e.g. image paths.
+        decode (callable): decode(item) -> decoded. Runs in a thread pool.
+        infer (callable): infer(item, decoded) -> inferred. Runs in the calling thread, so the model is only used from one thread.
+        postprocess (callable): postprocess(item, inferred) -> processed. Runs in a process pool when postprocess_workers > 0,
+            then it must be picklable (a module level function or functools.partial of one) and so must item and inferred.
+        write (callable): write(item, processed) -> output. Runs in one writer thread, in the order of items.
+        decode_workers (int): The number of decode threads.
+        postprocess_workers (int): The number of postprocess processes. 0 runs postprocess in one thread.
+        queue_size (int): The number of items buffered between stages.
+        on_error (callable): on_error(item, exception) called when a stage fails. The item is skipped. Prints the error by default.
+        report (bool): Print the per-stage utilization at the end.
+
+    Returns:
+        outputs (list): The outputs of write for the items which did not fail, in the order of items.
+        stats (list): The StageStats of each stage.
+    """
+    on_error = on_error or _print_error
+    queue_size = max(int(queue_size), 1)
+
+    decode_stats = StageStats('decode', max(decode_workers, 1))
+    infer_stats = StageStats('inference', 1)
+    postprocess_stats = StageStats('postprocess', max(postprocess_workers, 1))
+    write_stats = StageStats('write', 1)
+    stats = [decode_stats, infer_stats, postprocess_stats, write_stats]
+
+    decode_queue = queue.Queue(maxsize=queue_size)
+    postprocess_queue = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    outputs = []
+
+    decode_pool = ThreadPoolExecutor(max_workers=max(decode_workers, 1))
+    if postprocess_workers > 0:
+        postprocess_pool = ProcessPoolExecutor(max_workers=postprocess_workers)
+    else:
+        postprocess_pool = ThreadPoolExecutor(max_workers=1)
+
+    def _feed():
+        # put blocks while the queue is full, which limits how far decoding runs ahead
+        try:
+            for item in items:
+                if stop.is_set():
+                    break
+                decode_queue.put((item, decode_pool.submit(_timed, decode, item)))
+        finally:
+            decode_queue.put(_DONE)
+
+    def _write():
+        while True:
+            entry = postprocess_queue.get()
+            if entry is _DONE:
+                return
+
+            item, future = entry
+            try:
+                processed, elapsed = future.result()
+                postprocess_stats.add(elapsed)
+
+                output, elapsed = _timed(write, item, processed)
+                write_stats.add(elapsed)
+                outputs.append(output)
+            except Exception as e:
+                on_error(item, e)
+
+    feeder = threading.Thread(target=_feed, daemon=True)
+    writer = threading.Thread(target=_write, daemon=True)
+
+    start = time.perf_counter()
+    feeder.start()
+    writer.start()
+
+    try:
+        while True:
+            entry = decode_queue.get()
+            if entry is _DONE:
+                break
+
+            item, future = entry
+            try:
+                decoded, elapsed = future.result()
+                decode_stats.add(elapsed)
+
+                inferred, elapsed = _timed(infer, item, decoded)
+                infer_stats.add(elapsed)
+            except Exception as e:
+                on_error(item, e)
+                continue
+
+            del decoded
+            postprocess_queue.put((item, postprocess_pool.submit(_timed, postprocess, item, inferred)))
+            del inferred
+    finally:
+        # unblock the feeder if inference stopped early, then let the writer finish the queued items
+        stop.set()
+        while feeder.is_alive():
+            try:
+                decode_queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+        postprocess_queue.put(_DONE)
+        writer.join()
+        decode_pool.shutdown()
+        postprocess_pool.shutdown()
+
+    wall_time = time.perf_counter() - start
+    if report:
+        print(format_stage_report(stats, wall_time, len(outputs)))
+
+    return outputs, stats
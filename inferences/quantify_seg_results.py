@@ -3,12 +3,140 @@ import cv2
 
 from skimage.measure import label, regionprops_table
 from skimage.morphology import medial_axis
+from scipy import ndimage as ndi
+from scipy.spatial import cKDTree
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from concurrent.futures import ProcessPoolExecutor
+
+from crack_records import empty_records
+
+# thickness of the lines connecting the ends of adjacent cracks
+CONNECT_LINE_THICKNESS = 8
+
+# rows labeled at once by the streaming quantification, and rows added above and below each strip for the medial axis
+STRIP_HEIGHT = 1024
+STRIP_HALO = 128
+
+def _crack_endpoints(labels, crack_region_table):
+    """
+    Get the two endpoints of each crack along its major axis
+    Args:
+        labels (ndarray): The labeled crack mask. The shape is (H, W).
+        crack_region_table (dict): The regionprops_table of labels with 'bbox' and 'is_horizontal'.
+    Returns:
+        e2 (ndarray): The (row, col) end point of each crack, the bottom-most pixel on the right edge of
+            horizontal cracks and the right-most pixel on the bottom edge of vertical cracks. The shape is (N, 2).
+        e1 (ndarray): The (row, col) start point of each crack, the top-most pixel on the left edge of
+            horizontal cracks and the left-most pixel on the top edge of vertical cracks. The shape is (N, 2).
+    """
+    # pixels in raster order, the same order as regionprops coords
+    rows, cols = np.nonzero(labels)
+    crack_ids = labels[rows, cols] - 1
+
+    is_horizontal = crack_region_table['is_horizontal'][crack_ids]
+    on_max_edge = np.where(is_horizontal, cols == crack_region_table['bbox-3'][crack_ids] - 1, rows == crack_region_table['bbox-2'][crack_ids] - 1)
+    on_min_edge = np.where(is_horizontal, cols == crack_region_table['bbox-1'][crack_ids], rows == crack_region_table['bbox-0'][crack_ids])
+
+    # e2 is the last pixel on the max edge, e1 the first pixel on the min edge
+    max_edge_pixels = np.flatnonzero(on_max_edge)[::-1]
+    _, last = np.unique(crack_ids[max_edge_pixels], return_index=True)
+    e2_pixels = max_edge_pixels[last]
+
+    min_edge_pixels = np.flatnonzero(on_min_edge)
+    _, first = np.unique(crack_ids[min_edge_pixels], return_index=True)
+    e1_pixels = min_edge_pixels[first]
+
+    e2 = np.stack([rows[e2_pixels], cols[e2_pixels]], axis=1).astype(np.int64)
+    e1 = np.stack([rows[e1_pixels], cols[e1_pixels]], axis=1).astype(np.int64)
+
+    return e2, e1
+
+
+def _pair_nearest_endpoints(e2, e1, epsilon):
+    """
+    Find the nearest e1 of another crack for each e2 with a KD-tree
+    Args:
+        e2 (ndarray): The end points. The shape is (N, 2).
+        e1 (ndarray): The start points. The shape is (N, 2).
+        epsilon (float): The search radius. Only endpoints closer than epsilon are paired.
+    Returns:
+        pairs (ndarray): The index of the paired e1 for each e2, -1 if there is none. The shape is (N,).
+            Among equally close endpoints the lowest index is chosen.
+    """
+    n = len(e2)
+    pairs = np.full(n, -1, dtype=np.int64)
+    if n < 2:
+        return pairs
+
+    tree = cKDTree(e1)
+
+    # the two nearest start points, one of them may belong to the same crack
+    distances, indices = tree.query(e2, k=2, distance_upper_bound=epsilon)
+    nearest = np.where(indices[:, 0] == np.arange(n), distances[:, 1], distances[:, 0])
+    has_candidate = np.isfinite(nearest)
+    if not has_candidate.any():
+        return pairs
+
+    # collect every start point as close as the nearest one, so ties are resolved by index
+    candidate_ids = np.flatnonzero(has_candidate)
+    candidates = tree.query_ball_point(e2[candidate_ids], nearest[candidate_ids] * (1 + 1e-9) + 1e-9)
+
+    for num_e2, candidate in zip(candidate_ids, candidates):
+        candidate = np.array(sorted(c for c in candidate if c != num_e2), dtype=np.int64)
+        if len(candidate) == 0:
+            continue
+
+        # integer squared distances compare exactly, unlike the float KD-tree distances
+        squared_distances = np.sum((e1[candidate] - e2[num_e2]) ** 2, axis=1)
+        best = np.argmin(squared_distances)
+
+        if np.sqrt(squared_distances[best]) < epsilon:
+            pairs[num_e2] = candidate[best]
+
+    return pairs
+
+
+def _connecting_lines(crack_e2, crack_e1, is_horizontal, epsilon):
+    """
+    Lines connecting the end of each crack to the nearest start of another crack, along both axes
+    Args:
+        crack_e2 (ndarray): The (row, col) end points from _crack_endpoints. The shape is (N, 2).
+        crack_e1 (ndarray): The (row, col) start points from _crack_endpoints. The shape is (N, 2).
+        is_horizontal (ndarray): Whether each crack is wider than high. The shape is (N,).
+        epsilon (float): The search radius, see connect_cracks_by_edge.
+    Returns:
+        lines (list): The ((x, y), (x, y)) end points of the lines, in the order they are drawn.
+    """
+    lines = []
+
+    for connecting_direction in ['x_axis', 'y_axis']:
+
+        # horizontal cracks are flipped to point down when connecting along y, vertical cracks to point right along x
+        if connecting_direction == 'y_axis':
+            flip = is_horizontal & (crack_e2[:, 0] < crack_e1[:, 0])
+        else:
+            flip = ~is_horizontal & (crack_e2[:, 1] < crack_e1[:, 1])
+
+        e2_points = np.where(flip[:, None], crack_e1, crack_e2)
+        e1_points = np.where(flip[:, None], crack_e2, crack_e1)
+        pairs = _pair_nearest_endpoints(e2_points, e1_points, epsilon)
+
+        for num_e2 in np.flatnonzero(pairs >= 0):
+            connect_e2 = tuple(int(v) for v in e2_points[num_e2][::-1])
+            connect_e1 = tuple(int(v) for v in e1_points[pairs[num_e2]][::-1])
+            lines.append((connect_e2, connect_e1))
+
+    return lines
+
 
 def connect_cracks_by_edge(mask_output, epsilon = 5000000):
     """
     Connect the edges of adjacent cracks
     Args:
         mask_output (ndarray): The result mask. The shape is (H, W).
+        epsilon (float): The search radius in pixels. The end of a crack is connected to the nearest
+            start of another crack only if it is closer than epsilon.
     Returns:
         mask_output (ndarray): The result mask. The shape is (H, W).
     """
@@ -16,194 +144,625 @@ def connect_cracks_by_edge(mask_output, epsilon = 5000000):
     # label each crack
     labels, num = label(mask_output, connectivity=2, return_num=True)
     # get information of each crack area
-    crack_region_table = regionprops_table(labels, properties=('label', 'bbox', 'coords', 'orientation'))
+    crack_region_table = regionprops_table(labels, properties=('label', 'bbox'))
 
     width = crack_region_table['bbox-3'] - crack_region_table['bbox-1']
     height = crack_region_table['bbox-2'] - crack_region_table['bbox-0']
 
     crack_region_table['is_horizontal'] = width > height
 
-    connecting_directions = ['x_axis', 'y_axis']
     connect_line_img = np.zeros_like(mask_output, dtype=np.uint8)
+    color = (1)  # binary image
 
-    for connecting_direction in connecting_directions:
+    crack_e2, crack_e1 = _crack_endpoints(labels, crack_region_table)
 
-        e2_list = []
-        e1_list = []
+    for connect_e2, connect_e1 in _connecting_lines(crack_e2, crack_e1, crack_region_table['is_horizontal'], epsilon):
+        connect_line_img = cv2.line(connect_line_img, connect_e2, connect_e1, color, CONNECT_LINE_THICKNESS)
 
-        for crack_num, crack_region in enumerate(crack_region_table['label']):
+    mask_output = mask_output + connect_line_img
+    mask_output[mask_output > 1] = 1
 
-            min_row = crack_region_table['bbox-0'][crack_num]
-            min_col = crack_region_table['bbox-1'][crack_num]
-            max_row = crack_region_table['bbox-2'][crack_num] - 1
-            max_col = crack_region_table['bbox-3'][crack_num] - 1
+    return mask_output
 
-            if crack_region_table['is_horizontal'][crack_num]:
-                # max col / min col
-                col = crack_region_table['coords'][crack_num][:, 1]
 
-                e2 = crack_region_table['coords'][crack_num][np.argwhere(col == max_col), :][-1][0]
-                e1 = crack_region_table['coords'][crack_num][np.argwhere(col == min_col), :][0][0]
+def _crack_crops(mask, tile_size):
+    """
+    Crop each crack with one pixel of background around it and pack the crops into atlases of about tile_size.
+    Cracks are never 8-connected to each other, so the distance transform and the medial axis of a crack
+    do not change when it is moved next to other cracks.
+    Cracks touching the image border are cropped in place instead, grouped by tile, because the distance
+    transform does not treat the outside of the image as background.
+    Args:
+        mask (ndarray): The mask image. The shape is (H, W).
+        tile_size (int): The atlas size.
+    Returns:
+        crops (list): (atlas, offsets) of each atlas. The atlas holds the index + 1 of the crack placed at each pixel,
+            offsets (ndarray) of shape (N, 2) is added to atlas coordinates of crack i to get image coordinates.
+    """
+    labels, num = ndi.label(mask, structure=np.ones((3, 3)))
+    objects = ndi.find_objects(labels)
+    height, width = mask.shape[:2]
 
-                if connecting_direction == 'y_axis' and e2[0] < e1[0]:
-                    e2, e1 = e1, e2
+    crops = []
 
-                e2_list.append(e2)
-                e1_list.append(e1)
+    def _add_atlas(atlas_height, atlas_width, placements):
+        atlas = np.zeros((atlas_height, atlas_width), dtype=np.int32)
+        offsets = np.zeros((len(placements), 2), dtype=np.intp)
 
-            else:
-                # max row / min row
-                row = crack_region_table['coords'][crack_num][:, 0]
+        for index, (label_id, top, left) in enumerate(placements):
+            rows, cols = objects[label_id - 1]
+            crack = labels[rows, cols] == label_id
+            atlas[top:top + crack.shape[0], left:left + crack.shape[1]][crack] = index + 1
+            offsets[index] = (rows.start - top, cols.start - left)
 
-                e2 = crack_region_table['coords'][crack_num][np.argwhere(row == max_row), :][-1][0]
-                e1 = crack_region_table['coords'][crack_num][np.argwhere(row == min_row), :][0][0]
+        crops.append((atlas, offsets))
 
-                if connecting_direction == 'x_axis' and e2[1] < e1[1]:
-                    e2, e1 = e1, e2
+    # shelf packing, tall cracks first so each shelf wastes little height
+    order = sorted(range(1, num + 1), key=lambda i: objects[i - 1][0].stop - objects[i - 1][0].start, reverse=True)
+    border_groups = {}
+    placements = []
+    atlas_width = tile_size
+    shelf_top = shelf_left = shelf_height = 0
 
-                e2_list.append(e2)
-                e1_list.append(e1)
+    for label_id in order:
+        rows, cols = objects[label_id - 1]
 
-        crack_region_table['e2'] = e2_list
-        crack_region_table['e1'] = e1_list
+        if rows.start == 0 or cols.start == 0 or rows.stop == height or cols.stop == width:
+            border_groups.setdefault((rows.start // tile_size, cols.start // tile_size), []).append(label_id)
+            continue
 
+        crop_height, crop_width = rows.stop - rows.start + 2, cols.stop - cols.start + 2
 
-        n = len(crack_region_table['label'])
-        color = (1)  # binary image
+        if shelf_left > 0 and shelf_left + crop_width > atlas_width:
+            shelf_top, shelf_left, shelf_height = shelf_top + shelf_height, 0, 0
 
+        if shelf_top > 0 and shelf_top + crop_height > tile_size:
+            _add_atlas(shelf_top, atlas_width, placements)
+            placements = []
+            atlas_width = tile_size
+            shelf_top, shelf_left, shelf_height = 0, 0, 0
 
-        for num_e2, e2 in enumerate(crack_region_table['e2']):
+        placements.append((label_id, shelf_top + 1, shelf_left + 1))
+        atlas_width = max(atlas_width, crop_width)
+        shelf_left += crop_width
+        shelf_height = max(shelf_height, crop_height)
 
-            connect_candidates_e2 = []
-            connect_candidates_e1 = []
-            distance_list = []
+    if placements:
+        _add_atlas(shelf_top + shelf_height, atlas_width, placements)
 
-            for num_e1, e1 in enumerate(crack_region_table['e1']):
+    for label_ids in border_groups.values():
+        min_row = max(min(objects[i - 1][0].start for i in label_ids) - 1, 0)
+        min_col = max(min(objects[i - 1][1].start for i in label_ids) - 1, 0)
+        max_row = min(max(objects[i - 1][0].stop for i in label_ids) + 1, height)
+        max_col = min(max(objects[i - 1][1].stop for i in label_ids) + 1, width)
 
-                if num_e2 != num_e1:
-                    d = np.subtract(e1, e2)
-                    distance = np.sqrt(d[0] ** 2 + d[1] ** 2)
+        _add_atlas(max_row - min_row, max_col - min_col, [
+            (i, objects[i - 1][0].start - min_row, objects[i - 1][1].start - min_col) for i in label_ids
+        ])
 
-                    if (distance < epsilon):
-                        distance_list.append(distance)
-                        connect_candidates_e2.append(tuple(e2[::-1]))
-                        connect_candidates_e1.append(tuple(e1[::-1]))
+    return crops
 
-            if distance_list :
-                connect_idx = np.argmin(distance_list)
-                connect_e2 = connect_candidates_e2[connect_idx]
-                connect_e1 = connect_candidates_e1[connect_idx]
-                connect_line_img = cv2.line(connect_line_img, connect_e2, connect_e1, color, 8)
 
-    mask_output = mask_output + connect_line_img
-    mask_output[mask_output > 1] = 1
+def _crop_medial_axis(crop):
+    """
+    Run medial_axis on an atlas of cracks
+    Args:
+        crop (tuple): (atlas, offsets) from _crack_crops.
+    Returns:
+        rows (ndarray): The rows of the skeleton pixels in the full image.
+        cols (ndarray): The cols of the skeleton pixels in the full image.
+        distances (ndarray): The distance to the background at the skeleton pixels.
+    """
+    atlas, offsets = crop
 
-    return mask_output
+    skel, dist = medial_axis(atlas > 0, return_distance=True)
+    rows, cols = np.nonzero(skel)
+    crack_offsets = offsets[atlas[rows, cols] - 1]
+
+    return rows + crack_offsets[:, 0], cols + crack_offsets[:, 1], dist[rows, cols]
 
 
-def create_distance_map(mask):
+def create_sparse_distance_map(mask, tile_size=1024, num_workers=0, executor=None):
+    """
+    Create the skeleton distance of the mask as sparse coordinates.
+    medial_axis runs on the padded crops of cracks instead of the full image, which saves
+    time and memory when cracks cover a small part of the image.
+    Args:
+        mask (ndarray): The mask image. The shape is (H, W).
+        tile_size (int): The size of the atlases the crack crops are packed into.
+        num_workers (int): The number of processes computing crops in parallel. 0 runs in this process.
+        executor (ProcessPoolExecutor): Optional pool computing the crops instead of a new one of num_workers.
+    Returns:
+        rows (ndarray): The rows of the skeleton pixels, in raster order.
+        cols (ndarray): The cols of the skeleton pixels.
+        distances (ndarray): The distance to the background at the skeleton pixels.
+    """
+    crops = _crack_crops(mask, tile_size)
+
+    if executor is not None and len(crops) > 1:
+        results = list(executor.map(_crop_medial_axis, crops))
+    elif num_workers > 0 and len(crops) > 1:
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            results = list(executor.map(_crop_medial_axis, crops))
+    else:
+        results = [_crop_medial_axis(crop) for crop in crops]
+
+    if not results:
+        return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.float64)
+
+    rows, cols, distances = (np.concatenate(values) for values in zip(*results))
+    order = np.lexsort((cols, rows))
+
+    return rows[order], cols[order], distances[order]
+
+
+def create_distance_map(mask, tile_size=1024, num_workers=0):
     """
     Create distance map from mask
     Args:
         mask (ndarray): The mask image. The shape is (H, W).
+        tile_size (int): See create_sparse_distance_map.
+        num_workers (int): See create_sparse_distance_map.
     Returns:
         distance_map (ndarray): The distance map. The shape is (H, W).
     """
 
-    dist, skel = medial_axis(mask, return_distance=True)
-    distance_map = dist * skel
+    rows, cols, distances = create_sparse_distance_map(mask, tile_size, num_workers)
+
+    distance_map = np.zeros(mask.shape[:2], dtype=np.float64)
+    distance_map[rows, cols] = distances
 
     return distance_map
 
 
-def _calculate_crack_width_length(crack_mask, distance_map):
+def create_sparse_distance_map_streaming(mask, strip_height=STRIP_HEIGHT, halo=STRIP_HALO, tile_size=1024, num_workers=0):
+    """
+    Create the skeleton distance of a mask which does not fit in memory, e.g. a disk-backed np.memmap.
+    create_sparse_distance_map runs on each strip of the mask with halo rows above and below, and keeps the
+    skeleton pixels of the strip. The distances are exact for cracks narrower than 2 * halo, the skeleton
+    only differs from the one of the whole mask where medial_axis breaks ties.
+    Args:
+        mask (ndarray): The mask image. The shape is (H, W).
+        strip_height (int): The number of rows computed at once.
+        halo (int): The number of rows added above and below each strip.
+        tile_size (int): See create_sparse_distance_map.
+        num_workers (int): See create_sparse_distance_map.
+    Returns:
+        rows (ndarray): The rows of the skeleton pixels, in raster order.
+        cols (ndarray): The cols of the skeleton pixels.
+        distances (ndarray): The distance to the background at the skeleton pixels.
+    """
+    height = mask.shape[0]
+    results = []
+
+    executor = ProcessPoolExecutor(max_workers=num_workers) if num_workers > 0 else None
+    try:
+        for y0 in range(0, height, strip_height):
+            y1 = min(y0 + strip_height, height)
+            top, bottom = max(y0 - halo, 0), min(y1 + halo, height)
+
+            rows, cols, distances = create_sparse_distance_map(np.asarray(mask[top:bottom]), tile_size, executor=executor)
+            rows += top
+            in_strip = (rows >= y0) & (rows < y1)
+            results.append((rows[in_strip], cols[in_strip], distances[in_strip]))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    if not results:
+        return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.float64)
+
+    # the strips are in order and each strip is in raster order
+    return tuple(np.concatenate(values) for values in zip(*results))
+
+
+def _strip_components(read_rows, shape, strip_height=STRIP_HEIGHT, points=None):
+    """
+    Label the cracks of a mask strip by strip and measure them, without a label image of the mask size.
+    The 8-connected labels of each strip are merged with the labels of the previous strip they touch.
+    Args:
+        read_rows (callable): Function returning rows [y0, y1) of the mask.
+        shape (tuple): The mask shape (H, W).
+        strip_height (int): The number of rows labeled at once.
+        points (tuple): Optional (rows, cols) of pixels in raster order, e.g. the skeleton, to get the label of.
+    Returns:
+        cracks (dict): The 'bbox-0' to 'bbox-3' of each crack as in regionprops_table, and 'area', 'row_sum',
+            'col_sum' (for the centroid), 'e2' and 'e1' (as _crack_endpoints) of each crack. The cracks are
+            in the label order of skimage.measure.label, the raster order of their first pixel.
+        point_labels (ndarray): The label of each point (0: background). None without points.
+    """
+    height, width = shape[:2]
+    structure = np.ones((3, 3))
+
+    # per strip label ('part'), stacked after the loop
+    parts = {name: [] for name in ('first', 'bbox-0', 'bbox-1', 'bbox-2', 'bbox-3', 'area', 'row_sum', 'col_sum',
+                                   'left_row', 'right_row', 'top_col', 'bottom_col')}
+    links = []
+    point_parts = []
+    num_parts = 0
+    previous_row = None
+
+    def _edge_pixel(ids, on_edge, values, last):
+        # the value of the first (or last) pixel in raster order of each part on one of its edges
+        pixels = np.flatnonzero(on_edge)
+        if last:
+            pixels = pixels[::-1]
+        _, index = np.unique(ids[pixels], return_index=True)
+        return values[pixels[index]]
+
+    for y0 in range(0, height, strip_height):
+        y1 = min(y0 + strip_height, height)
+        labels, num = ndi.label(np.asarray(read_rows(y0, y1)), structure=structure)
+        part_labels = np.where(labels > 0, labels + (num_parts - 1), -1)
+
+        if num > 0:
+            rows, cols = np.nonzero(labels)
+            ids = labels[rows, cols] - 1
+            bbox = np.array([(s[0].start, s[1].start, s[0].stop, s[1].stop) for s in ndi.find_objects(labels)], dtype=np.int64)
+
+            _, first = np.unique(ids, return_index=True)
+            parts['first'].append((rows[first] + y0).astype(np.int64) * width + cols[first])
+            for i, name in enumerate(('bbox-0', 'bbox-1', 'bbox-2', 'bbox-3')):
+                parts[name].append(bbox[:, i] + (y0 if i % 2 == 0 else 0))
+            parts['area'].append(np.bincount(ids, minlength=num))
+            parts['row_sum'].append(np.bincount(ids, weights=rows + y0, minlength=num))
+            parts['col_sum'].append(np.bincount(ids, weights=cols, minlength=num))
+
+            # the end point candidates of _crack_endpoints within the part
+            parts['left_row'].append(_edge_pixel(ids, cols == bbox[ids, 1], rows, last=False) + y0)
+            parts['right_row'].append(_edge_pixel(ids, cols == bbox[ids, 3] - 1, rows, last=True) + y0)
+            parts['top_col'].append(_edge_pixel(ids, rows == bbox[ids, 0], cols, last=False))
+            parts['bottom_col'].append(_edge_pixel(ids, rows == bbox[ids, 2] - 1, cols, last=True))
+
+        # 8-connected pixels across the strip border
+        if previous_row is not None:
+            for above, below in [(previous_row, part_labels[0]), (previous_row[:-1], part_labels[0, 1:]), (previous_row[1:], part_labels[0, :-1])]:
+                touching = (above >= 0) & (below >= 0)
+                links.append(np.stack([above[touching], below[touching]]))
+        previous_row = part_labels[-1]
+
+        if points is not None:
+            start, stop = np.searchsorted(points[0], [y0, y1])
+            point_parts.append(part_labels[points[0][start:stop] - y0, points[1][start:stop]])
+
+        num_parts += num
+
+    parts = {name: np.concatenate(values) if values else np.zeros(0, dtype=np.int64) for name, values in parts.items()}
+
+    # merge the linked parts, numbered by their first pixel
+    links = np.concatenate(links, axis=1) if links else np.zeros((2, 0), dtype=np.int64)
+    graph = coo_matrix((np.ones(links.shape[1], dtype=np.int8), (links[0], links[1])), shape=(num_parts, num_parts))
+    num_cracks, components = connected_components(graph, directed=False)
+
+    crack_first = np.full(num_cracks, np.iinfo(np.int64).max)
+    np.minimum.at(crack_first, components, parts['first'])
+    order = np.empty(num_cracks, dtype=np.int64)
+    order[np.argsort(crack_first)] = np.arange(num_cracks)
+    crack_ids = order[components]
+
+    def _reduce(values, ufunc, initial, where=None):
+        result = np.full(num_cracks, initial, dtype=np.int64)
+        if where is None:
+            ufunc.at(result, crack_ids, values)
+        else:
+            ufunc.at(result, crack_ids[where], values[where])
+        return result
+
+    big = np.iinfo(np.int64).max
+    cracks = {
+        'bbox-0': _reduce(parts['bbox-0'], np.minimum, big),
+        'bbox-1': _reduce(parts['bbox-1'], np.minimum, big),
+        'bbox-2': _reduce(parts['bbox-2'], np.maximum, -1),
+        'bbox-3': _reduce(parts['bbox-3'], np.maximum, -1),
+        'area': np.bincount(crack_ids, weights=parts['area'], minlength=num_cracks).astype(np.int64),
+        'row_sum': np.bincount(crack_ids, weights=parts['row_sum'], minlength=num_cracks),
+        'col_sum': np.bincount(crack_ids, weights=parts['col_sum'], minlength=num_cracks),
+    }
+
+    # end points of the cracks from the parts on the edges of the merged bounding box
+    left_row = _reduce(parts['left_row'], np.minimum, big, parts['bbox-1'] == cracks['bbox-1'][crack_ids])
+    right_row = _reduce(parts['right_row'], np.maximum, -1, parts['bbox-3'] == cracks['bbox-3'][crack_ids])
+    top_col = _reduce(parts['top_col'], np.minimum, big, parts['bbox-0'] == cracks['bbox-0'][crack_ids])
+    bottom_col = _reduce(parts['bottom_col'], np.maximum, -1, parts['bbox-2'] == cracks['bbox-2'][crack_ids])
+
+    cracks['is_horizontal'] = cracks['bbox-3'] - cracks['bbox-1'] > cracks['bbox-2'] - cracks['bbox-0']
+    cracks['e2'] = np.where(cracks['is_horizontal'][:, None],
+                            np.stack([right_row, cracks['bbox-3'] - 1], axis=1), np.stack([cracks['bbox-2'] - 1, bottom_col], axis=1))
+    cracks['e1'] = np.where(cracks['is_horizontal'][:, None],
+                            np.stack([left_row, cracks['bbox-1']], axis=1), np.stack([cracks['bbox-0'], top_col], axis=1))
+
+    point_labels = None
+    if points is not None:
+        point_parts = np.concatenate(point_parts) if point_parts else np.zeros(0, dtype=np.int64)
+        point_labels = np.where(point_parts >= 0, crack_ids[point_parts] + 1, 0)
+
+    return cracks, point_labels
+
+
+def _line_pixels(lines, shape, max_pixels):
+    """
+    Pixels of the connecting lines, as connect_cracks_by_edge draws them on the mask
+    cv2.line clips the outline of thick lines to the image, so a line is only drawn the same on a smaller
+    image which holds all of it: each line is drawn on the image crop of its bounding box.
+    Args:
+        lines (ndarray): The ((x, y), (x, y)) end points of the lines. The shape is (N, 2, 2).
+        shape (tuple): The mask shape (H, W).
+        max_pixels (int): The largest crop drawn. Longer lines are returned to be drawn on each strip.
+    Returns:
+        rows (ndarray): The rows of the line pixels, in raster order.
+        cols (ndarray): The cols of the line pixels.
+        long_lines (ndarray): The lines larger than max_pixels. The shape is (M, 2, 2).
     """
-    Calculate crack width and length
+    height, width = shape[:2]
+    pad = CONNECT_LINE_THICKNESS
+    top = np.maximum(lines[:, :, 1].min(axis=1) - pad, 0)
+    bottom = np.minimum(lines[:, :, 1].max(axis=1) + pad + 1, height)
+    left = np.maximum(lines[:, :, 0].min(axis=1) - pad, 0)
+    right = np.minimum(lines[:, :, 0].max(axis=1) + pad + 1, width)
+    is_long = (bottom - top) * (right - left) > max_pixels
+
+    rows, cols = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.int64)]
+    for ((x_e2, y_e2), (x_e1, y_e1)), y0, y1, x0, x1 in zip(lines[~is_long].tolist(), top[~is_long], bottom[~is_long], left[~is_long], right[~is_long]):
+        crop = cv2.line(np.zeros((y1 - y0, x1 - x0), dtype=np.uint8), (x_e2 - x0, y_e2 - y0), (x_e1 - x0, y_e1 - y0), 1, CONNECT_LINE_THICKNESS)
+        crop_rows, crop_cols = np.nonzero(crop)
+        rows.append(crop_rows + y0)
+        cols.append(crop_cols + x0)
+
+    rows, cols = np.concatenate(rows), np.concatenate(cols)
+    order = np.lexsort((cols, rows))
+
+    return rows[order], cols[order], lines[is_long]
+
+
+def _calculate_crack_width_length(mask_label, skeleton, num_labels):
+    """
+    Calculate area, width and length of all cracks at once
     Args: 
-        crack_mask (ndarray): The crack mask image. The shape is (H, W).
-        distance_map (ndarray): The distance map. The shape is (H, W).
+        mask_label (ndarray): The labeled crack mask. The shape is (H, W).
+        skeleton (tuple): The (rows, cols, distances) of the skeleton pixels from create_sparse_distance_map.
+        num_labels (int): The number of crack labels.
     Returns:
-        crack_width (float): The crack width.
-        crack_length (float): The crack length.
+        crack_areas (ndarray): The crack areas. The shape is (num_labels + 1,), indexed by label.
+        crack_widths (ndarray): The mean distance on the skeleton of each crack. NaN for cracks without skeleton.
+        crack_lengths (ndarray): The number of skeleton pixels of each crack.
     """
-    crack_distance_map = distance_map * crack_mask
+    rows, cols, distances = skeleton
+    crack_areas = np.bincount(mask_label.ravel(), minlength=num_labels + 1)
+
+    skeleton_labels = mask_label[rows, cols]
+
+    crack_lengths = np.bincount(skeleton_labels, minlength=num_labels + 1)
+    width_sums = np.bincount(skeleton_labels, weights=distances, minlength=num_labels + 1)
+
+    crack_widths = np.full(num_labels + 1, np.nan)
+    np.divide(width_sums, crack_lengths, out=crack_widths, where=crack_lengths > 0)
+
+    return crack_areas, crack_widths, crack_lengths
+
+
+def _crack_centroids(mask_label, crack_areas, num_labels):
+    """
+    Calculate the centroid of all cracks at once
+    Args:
+        mask_label (ndarray): The labeled crack mask. The shape is (H, W).
+        crack_areas (ndarray): The crack areas from _calculate_crack_width_length.
+        num_labels (int): The number of crack labels.
+    Returns:
+        centroid_rows (ndarray): The mean row of each crack. The shape is (num_labels + 1,), indexed by label.
+        centroid_cols (ndarray): The mean column of each crack.
+    """
+    # only the crack pixels are visited
+    rows, cols = np.nonzero(mask_label)
+    pixel_labels = mask_label[rows, cols]
+
+    areas = np.maximum(crack_areas, 1)
+    centroid_rows = np.bincount(pixel_labels, weights=rows, minlength=num_labels + 1) / areas
+    centroid_cols = np.bincount(pixel_labels, weights=cols, minlength=num_labels + 1) / areas
+
+    return centroid_rows, centroid_cols
+
+
+def _crack_records(region_table, crack_areas, crack_widths, crack_lengths, centroid_rows, centroid_cols, minimum_area):
+    """
+    Records of the cracks larger than the minimum area
+    Args:
+        region_table (dict): The 'bbox-0' to 'bbox-3' of each crack, indexed by label - 1.
+        crack_areas (ndarray): The crack areas, indexed by label.
+        crack_widths (ndarray): The crack widths, indexed by label.
+        crack_lengths (ndarray): The crack lengths, indexed by label.
+        centroid_rows (ndarray): The mean row of each crack, indexed by label.
+        centroid_cols (ndarray): The mean column of each crack, indexed by label.
+        minimum_area (int): The minimum crack area.
+    Returns:
+        crack_quantification_results (ndarray): The crack records (crack_records.CRACK_RECORD_DTYPE).
+    """
+    # keep the cracks larger than the minimum area, as columns
+    crack_ids = np.flatnonzero(crack_areas[1:] >= minimum_area) + 1
+
+    crack_quantification_results = empty_records(len(crack_ids))
+    crack_quantification_results['min_row'] = region_table['bbox-0'][crack_ids - 1]
+    crack_quantification_results['min_col'] = region_table['bbox-1'][crack_ids - 1]
+    crack_quantification_results['max_row'] = region_table['bbox-2'][crack_ids - 1]
+    crack_quantification_results['max_col'] = region_table['bbox-3'][crack_ids - 1]
+    crack_quantification_results['area'] = crack_areas[crack_ids]
+    crack_quantification_results['width'] = crack_widths[crack_ids]
+    crack_quantification_results['length'] = crack_lengths[crack_ids]
+    crack_quantification_results['centroid_row'] = centroid_rows[crack_ids]
+    crack_quantification_results['centroid_col'] = centroid_cols[crack_ids]
+    crack_quantification_results['class_id'] = 1  # crack class
+
+    return crack_quantification_results
+
+
+def draw_crack_measurements(seg_result, crack_quantification_results, color, image_height, line_thickness=2, row_offset=0):
+    """
+    Draw the box and the width x length of each crack
+    Args:
+        seg_result (ndarray): The image to draw on, or a strip of it. The shape is (h, W, C).
+        crack_quantification_results (ndarray): The crack records.
+        color (tuple): The color of the crack width and length. The shape is (3,).
+        image_height (int): The height of the whole image, which sets the font scale.
+        line_thickness (int): The thickness of the crack width and length.
+        row_offset (int): The image row of the first row of seg_result, when it is a strip.
+    Returns:
+        seg_result (ndarray): The image with crack measurements visualized
+    """
+    # determine font scale and line thickness of text
+    font_scale = image_height / 1000
+    font_thickness = int(line_thickness * font_scale)
+
+    # loop through each crack to draw it
+    for minr, minc, maxr, maxc, crack_width, crack_length in zip(
+        *(crack_quantification_results[name].tolist() for name in ('min_row', 'min_col', 'max_row', 'max_col', 'width', 'length'))
+    ):
+        # clip minr, minc, maxr, maxc
+        textr = max(minr, 20)
+        textc = max(minc, 20)
+
+        # display on image
+        seg_result = cv2.putText(
+            seg_result, f'Crack: {crack_width:.2f} x {crack_length:.2f}', (textc, textr - row_offset), cv2.FONT_HERSHEY_SIMPLEX, font_scale, color, font_thickness, cv2.LINE_AA)
 
-    crack_width = np.mean(crack_distance_map[crack_distance_map > 0])
+        # put rectangle on crack
+        seg_result = cv2.rectangle(seg_result, (minc, minr - row_offset), (maxc, maxr - row_offset), color, line_thickness)
 
-    crack_length = np.sum(crack_distance_map > 0)
+    return seg_result
 
-    return crack_width, crack_length
 
+def crack_result_rows(read_rows, mask_output, crack_quantification_results, color, alpha, line_thickness=2):
+    """
+    Rows of the result image of an image which does not fit in memory, to be written strip by strip
+    (e.g. with strip_reader.write_tiff_strips): the crack pixels blended with color and the crack measurements,
+    the same as blending the whole image and drawing it with quantify_crack_width_length.
+    Args:
+        read_rows (callable): Function returning rows [y0, y1) of the image, e.g. StripReader.read_rows.
+        mask_output (ndarray): The crack mask image, e.g. a np.memmap. The shape is (H, W).
+        crack_quantification_results (ndarray): The crack records.
+        color (tuple): The color of the cracks and of their measurements. The shape is (3,).
+        alpha (float): The alpha value for blending.
+        line_thickness (int): The thickness of the crack width and length.
 
+    Returns:
+        result_rows (callable): Function returning rows [y0, y1) of the result image.
+    """
+    image_height = mask_output.shape[0]
+    blend_color = np.array(color, dtype=np.uint8)
+
+    def result_rows(y0, y1):
+        strip = read_rows(y0, y1).copy()
+        mask_bool = np.asarray(mask_output[y0:y1]) == 1
+        strip[mask_bool, :] = strip[mask_bool, :] * (1 - alpha) + blend_color * alpha
+        return draw_crack_measurements(strip, crack_quantification_results, color, image_height, line_thickness, row_offset=y0)
+
+    return result_rows
 
-def quantify_crack_width_length(seg_result, mask_output, color, minimum_area=500, line_thickness=2):
+
+def quantify_crack_width_length(seg_result, mask_output, color, minimum_area=500, line_thickness=2, num_workers=0):
     """
     Quantify crack width and length. The word 'quantify' means to calculate the crack width and length and visualize them one the segmentation result image. 
     
     Args:
-        seg_result (ndarray): The segmentation result. The shape is (H, W, C).
+        seg_result (ndarray): The segmentation result. The shape is (H, W, C). If None, only the measurements are returned.
         mask_output (ndarray): The crack mask image. The shape is (H, W).
         color (tuple): The color of the crack width and length. The shape is (3,).
         minimum_area (int): The minimum crack area. The default value is 500.
         line_thickness (int): The thickness of the crack width and length. The default value is 2.
+        num_workers (int): The number of processes computing the medial axis of crack crops. 0 runs in this process.
         
     Returns:
         seg_result (ndarray): The segmentation result with crack measurements visualized
-        crack_quantification_results (list): List of crack quantification data
+        crack_quantification_results (ndarray): The crack records (crack_records.CRACK_RECORD_DTYPE) of the cracks larger than minimum_area
     """
 
-    # determine font scale and line thickness of text
-    font_scale = seg_result.shape[0] / 1000
-    font_thickness = int(line_thickness * font_scale)
-
-    # create distance map
-    distance_map = create_distance_map(mask_output)
+    # create distance map of the skeleton as sparse coordinates
+    skeleton = create_sparse_distance_map(mask_output, num_workers=num_workers)
 
     # label mask 
-    mask_output = connect_cracks_by_edge(mask_output)
-    mask_label = label(mask_output)
+    connected_mask = connect_cracks_by_edge(mask_output)
+    mask_label, num_labels = label(connected_mask, return_num=True)
     # regionprops_table
     crack_region_table = regionprops_table(mask_label)
 
-    # Initialize list to store crack quantification results
-    crack_quantification_results = []
+    # measure every crack in a single pass over the image
+    crack_areas, crack_widths, crack_lengths = _calculate_crack_width_length(mask_label, skeleton, num_labels)
+    centroid_rows, centroid_cols = _crack_centroids(mask_label, crack_areas, num_labels)
 
-    # loop through each crack
-    for crack_id in np.unique(mask_label)[1:]:
-        crack_mask = mask_label == crack_id
+    crack_quantification_results = _crack_records(
+        crack_region_table, crack_areas, crack_widths, crack_lengths, centroid_rows, centroid_cols, minimum_area
+    )
 
-        if np.sum(crack_mask) < minimum_area:
-            continue
+    if seg_result is None:
+        return seg_result, crack_quantification_results
 
-        crack_width, crack_length = _calculate_crack_width_length(crack_mask, distance_map)
+    seg_result = draw_crack_measurements(seg_result, crack_quantification_results, color, mask_output.shape[0], line_thickness)
 
-        # get crack x, y   
-        crack_num = crack_id - 1
+    return seg_result, crack_quantification_results
 
-        minr = crack_region_table['bbox-0'][crack_num]
-        minc = crack_region_table['bbox-1'][crack_num]
-        maxr = crack_region_table['bbox-2'][crack_num]
-        maxc = crack_region_table['bbox-3'][crack_num]
 
-        # Store crack quantification data
-        crack_quantification_results.append([
-            f"({minr},{minc})-({maxr},{maxc})",  # Pixel_Coordinates
-            f"{crack_width:.2f}x{crack_length:.2f}",  # Measurements
-            1  # class_id (crack class)
-        ])
+def quantify_crack_width_length_streaming(mask_output, minimum_area=500, strip_height=STRIP_HEIGHT, num_workers=0, epsilon=5000000):
+    """
+    Quantify crack width and length of a mask which does not fit in memory, e.g. the disk-backed mask of the
+    streaming inference. The mask is read strip by strip, and cracks crossing strips are merged, so no array of
+    the mask size is allocated. The records are those of quantify_crack_width_length, except where the
+    medial axis breaks ties differently (see create_sparse_distance_map_streaming).
+    Draw the records with crack_result_rows (or draw_crack_measurements), strip by strip.
 
-        # clip minr, minc, maxr, maxc
-        textr = max(minr, 20)
-        textc = max(minc, 20)
+    Args:
+        mask_output (ndarray): The crack mask image, e.g. a np.memmap. The shape is (H, W).
+        minimum_area (int): The minimum crack area. The default value is 500.
+        strip_height (int): The number of rows read at once.
+        num_workers (int): The number of processes computing the medial axis of crack crops. 0 runs in this process.
+        epsilon (float): The search radius of the crack connection, see connect_cracks_by_edge.
 
-        # display on image
-        seg_result = cv2.putText(
-            seg_result, f'Crack: {crack_width:.2f} x {crack_length:.2f}', (textc, textr), cv2.FONT_HERSHEY_SIMPLEX, font_scale, color, font_thickness, cv2.LINE_AA)
+    Returns:
+        crack_quantification_results (ndarray): The crack records (crack_records.CRACK_RECORD_DTYPE) of the cracks larger than minimum_area
+    """
+    shape = mask_output.shape[:2]
+    read_mask = lambda y0, y1: np.asarray(mask_output[y0:y1])
 
-        # put rectangle on crack
-        seg_result = cv2.rectangle(seg_result, (minc, minr), (maxc, maxr), color, line_thickness)
+    # create distance map of the skeleton as sparse coordinates
+    skeleton_rows, skeleton_cols, distances = create_sparse_distance_map_streaming(
+        mask_output, strip_height=strip_height, num_workers=num_workers
+    )
 
-    return seg_result, crack_quantification_results
+    # connect the cracks of the mask, the line pixels are added to each strip they cross
+    cracks, _ = _strip_components(read_mask, shape, strip_height)
+    lines = np.array(_connecting_lines(cracks['e2'], cracks['e1'], cracks['is_horizontal'], epsilon), dtype=np.int64).reshape(-1, 2, 2)
+    # a line crop is at most the size of the int32 labels of a strip
+    line_rows, line_cols, long_lines = _line_pixels(lines, shape, 4 * strip_height * shape[1])
+
+    # longer lines are drawn on the strip and a margin around it, and may differ by a few pixels
+    margin = strip_height // 4
+    long_top = long_lines[:, :, 1].min(axis=1) - CONNECT_LINE_THICKNESS
+    long_bottom = long_lines[:, :, 1].max(axis=1) + CONNECT_LINE_THICKNESS
+
+    def read_connected_mask(y0, y1):
+        strip = read_mask(y0, y1).astype(np.uint8)
+        start, stop = np.searchsorted(line_rows, [y0, y1])
+        strip[line_rows[start:stop] - y0, line_cols[start:stop]] = 1
+
+        top, bottom = max(y0 - margin, 0), min(y1 + margin, shape[0])
+        for (x_e2, y_e2), (x_e1, y_e1) in long_lines[(long_top < y1) & (long_bottom >= y0)].tolist():
+            canvas = cv2.line(np.zeros((bottom - top, shape[1]), dtype=np.uint8), (x_e2, y_e2 - top), (x_e1, y_e1 - top), 1, CONNECT_LINE_THICKNESS)
+            strip |= canvas[y0 - top:y1 - top]
+        return strip
+
+    # label the connected mask and measure every crack in a single pass over the strips
+    cracks, skeleton_labels = _strip_components(read_connected_mask, shape, strip_height, points=(skeleton_rows, skeleton_cols))
+    num_labels = len(cracks['area'])
+
+    crack_areas = np.concatenate([[shape[0] * shape[1] - cracks['area'].sum()], cracks['area']])
+    crack_lengths = np.bincount(skeleton_labels, minlength=num_labels + 1)
+    width_sums = np.bincount(skeleton_labels, weights=distances, minlength=num_labels + 1)
+
+    crack_widths = np.full(num_labels + 1, np.nan)
+    np.divide(width_sums, crack_lengths, out=crack_widths, where=crack_lengths > 0)
+
+    areas = np.maximum(crack_areas, 1)
+    centroid_rows = np.concatenate([[0], cracks['row_sum']]) / areas
+    centroid_cols = np.concatenate([[0], cracks['col_sum']]) / areas
+
+    return _crack_records(cracks, crack_areas, crack_widths, crack_lengths, centroid_rows, centroid_cols, minimum_area)
 
 
 def check_vis_config(vis_config):
@@ -251,15 +810,12 @@ def quantify_deterioration_area(seg_result, seg_mask, vis_config, minimum_area=5
 
         _seg_mask = seg_mask == class_idx
 
-        seg_label = label(_seg_mask.astype(np.uint8))
+        seg_label, num_labels = label(_seg_mask.astype(np.uint8), return_num=True)
         seg_region_table = regionprops_table(seg_label)
+        obj_areas = np.bincount(seg_label.ravel(), minlength=num_labels + 1)
 
-
-
-        for label_id in np.unique(seg_label)[1:]:
-            obj_mask = seg_label == label_id
-
-            if np.sum(obj_mask) < minimum_area:
+        for label_id in range(1, num_labels + 1):
+            if obj_areas[label_id] < minimum_area:
                 continue
 
             # get object width and height 
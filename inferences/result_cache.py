@@ -0,0 +1,180 @@
+"""
+Inference Result Cache
+이미지 내용 해시 기반 추론 결과 캐시 모듈
+
+Results are stored per image under a key made of
+- the content hash of the image,
+- the content hashes of the model config and checkpoint,
+- the inference parameters (window size, overlap ratio, score threshold, ...).
+Unchanged images are skipped on the next run, and changing the model or a parameter invalidates every entry.
+
+Each entry is a crack mask (<key>.rle, see sparse_mask) and the crack records (<key>.npy, see crack_records).
+Both are written to a temporary file and renamed, and the records are written last,
+so an entry exists only once it is complete and an interrupted run resumes from the last saved image.
+
+File hashes are indexed by path, size and modification time in a SQLite database,
+so re-runs over large archives only stat the files which did not change instead of reading them.
+"""
+
+import os
+import json
+import sqlite3
+import hashlib
+import tempfile
+
+import numpy as np
+
+from sparse_mask import SPARSE_MASK_SUFFIX, SparseMask, save_sparse_mask
+from crack_records import CRACK_RECORD_DTYPE
+
+HASH_CHUNK_SIZE = 1 << 20
+
+# file hashes are committed to the index every this many new hashes
+INDEX_COMMIT_INTERVAL = 256
+
+
+def hash_file(path):
+    """
+    Hash the content of a file
+    Args:
+        path (str): The file path.
+
+    Returns:
+        digest (str): The hex SHA-256 digest.
+    """
+    file_hash = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            file_hash.update(chunk)
+
+    return file_hash.hexdigest()
+
+
+def _atomic_write(path, write):
+    """Call write(file) on a temporary file in the same directory, then rename it to path"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+class ResultCache():
+    """
+    Crack mask and measurement cache keyed by image content, model and inference parameters
+    Args:
+        cache_dir (str): The cache directory.
+        model_files (list): The model config and checkpoint paths.
+        params (dict): The inference parameters. They must be JSON serializable.
+    """
+    def __init__(self, cache_dir, model_files, params):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self._index = sqlite3.connect(os.path.join(cache_dir, 'file_hashes.sqlite'))
+        self._index.execute(
+            'CREATE TABLE IF NOT EXISTS file_hashes (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, digest TEXT)'
+        )
+        self._uncommitted = 0
+
+        model_hash = hashlib.sha256()
+        for path in model_files:
+            model_hash.update(self.file_digest(path).encode())
+        model_hash.update(json.dumps(params, sort_keys=True).encode())
+        self.model_key = model_hash.hexdigest()
+
+    def file_digest(self, path):
+        """
+        Content hash of a file, read from the index when the size and modification time did not change
+        Args:
+            path (str): The file path.
+
+        Returns:
+            digest (str): The hex SHA-256 digest.
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+
+        row = self._index.execute('SELECT size, mtime_ns, digest FROM file_hashes WHERE path = ?', (path,)).fetchone()
+        if row is not None and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return row[2]
+
+        digest = hash_file(path)
+        self._index.execute(
+            'INSERT OR REPLACE INTO file_hashes VALUES (?, ?, ?, ?)', (path, stat.st_size, stat.st_mtime_ns, digest)
+        )
+        self._uncommitted += 1
+        if self._uncommitted >= INDEX_COMMIT_INTERVAL:
+            self._index.commit()
+            self._uncommitted = 0
+
+        return digest
+
+    def key(self, img_path):
+        """
+        Cache key of an image for the current model and parameters
+        Args:
+            img_path (str): The image path.
+
+        Returns:
+            key (str): The hex cache key.
+        """
+        return hashlib.sha256((self.model_key + self.file_digest(img_path)).encode()).hexdigest()
+
+    def _entry_path(self, key, suffix):
+        return os.path.join(self.cache_dir, key[:2], key + suffix)
+
+    def load_results(self, key):
+        """
+        Load the crack measurements of an entry
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            results (ndarray): The crack records, or None when the entry does not exist.
+        """
+        try:
+            results = np.load(self._entry_path(key, '.npy'), allow_pickle=False)
+        except (OSError, ValueError):
+            return None
+
+        # entries written by another version of the record type are stale
+        if results.dtype != CRACK_RECORD_DTYPE:
+            return None
+
+        return results
+
+    def load_mask(self, key, out=None):
+        """
+        Load the crack mask of an entry
+        Args:
+            key (str): The cache key.
+            out (ndarray): Optional mask to fill, e.g. a disk-backed mask.
+
+        Returns:
+            mask (ndarray): The crack mask, or None when the entry does not exist.
+        """
+        if self.load_results(key) is None:
+            return None
+
+        return SparseMask(self._entry_path(key, SPARSE_MASK_SUFFIX)).to_dense(out=out)
+
+    def save(self, key, crack_mask, results):
+        """
+        Save the crack mask and measurements of an image
+        Args:
+            key (str): The cache key.
+            crack_mask (ndarray): The crack mask (np.memmap possible).
+            results (ndarray): The crack records.
+        """
+        os.makedirs(os.path.dirname(self._entry_path(key, '')), exist_ok=True)
+
+        save_sparse_mask(self._entry_path(key, SPARSE_MASK_SUFFIX), crack_mask)
+        _atomic_write(self._entry_path(key, '.npy'), lambda f: np.save(f, results, allow_pickle=False))
+
+    def close(self):
+        self._index.commit()
+        self._index.close()
@@ -0,0 +1,315 @@
+"""
+Columnar Result Store
+탐지 결과를 열 기반 파일(Parquet / Feather)로 저장하고 조회하는 모듈
+
+A result store is a directory with two tables, each partitioned by run:
+    store_dir/images/run=<run_id>/part-00000.parquet   # one row per image (IMAGE_COLUMNS)
+    store_dir/cracks/run=<run_id>/part-00000.parquet   # one row per crack (image_path + crack record fields)
+Every CLI run writes a new partition, so earlier runs are never rewritten and can be compared or dropped
+by deleting their directory. Parts appear while the run goes on (result_writer flushes them in batches)
+and the run is marked complete with a _SUCCESS file in each table when it finishes.
+
+Reads go through pyarrow.dataset: only the requested columns are decoded, the run filter prunes whole
+partitions, and other filters skip Parquet row groups by their statistics before the remaining rows are filtered. Feather (Arrow IPC) parts are faster to write and read in full
+but have no row group statistics.
+
+pyarrow is only needed for the store itself. The Excel file read by PyDracula is a view of the image
+table and can be derived from any run with export_excel (python result_store.py --store_dir ... --excel_output ...).
+"""
+
+import os
+import argparse
+from glob import glob
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from crack_records import CRACK_RECORD_DTYPE, records_to_dataframe, summarize_records
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = ds = feather = pq = None
+
+IMAGE_TABLE = 'images'
+CRACK_TABLE = 'cracks'
+
+# image table columns and the Excel headers of the same columns (PyDracula reads 위도, 경도, 이미지 경로)
+IMAGE_COLUMNS = ['latitude', 'longitude', 'image_path', 'crack_count', 'max_width', 'max_length']
+EXCEL_COLUMNS = ['위도', '경도', '이미지 경로', '크랙 개수', '최대 폭', '최대 길이']
+
+STORE_FORMATS = {'parquet': '.parquet', 'feather': '.feather'}
+
+# rows per Parquet row group, the unit skipped by filters
+ROW_GROUP_SIZE = 65536
+
+# written in the run partitions of a finished run (ignored by pyarrow.dataset like other '_' files)
+COMPLETE_MARKER = '_SUCCESS'
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("pyarrow is required for the result store (pip install pyarrow)")
+
+
+def _schema(table):
+    """Arrow schema of a table, fixed so empty parts and all runs share the same types"""
+    if table == IMAGE_TABLE:
+        return pa.schema([
+            ('latitude', pa.float64()),
+            ('longitude', pa.float64()),
+            ('image_path', pa.string()),
+            ('crack_count', pa.int64()),
+            ('max_width', pa.float64()),
+            ('max_length', pa.float64()),
+        ])
+    if table == CRACK_TABLE:
+        return pa.schema([('image_path', pa.string())] + [
+            (name, pa.from_numpy_dtype(CRACK_RECORD_DTYPE[name])) for name in CRACK_RECORD_DTYPE.names
+        ])
+
+    raise ValueError(f"Unknown table: {table}")
+
+
+def _partitioning():
+    return ds.partitioning(pa.schema([('run', pa.string())]), flavor='hive')
+
+
+def new_run_id():
+    """Run id sorting in the order the runs were started"""
+    return datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+
+
+def image_row(image_path, records, latitude=np.nan, longitude=np.nan):
+    """
+    One row of the image table
+    Args:
+        image_path (str): The image path stored in the table (as shown by PyDracula).
+        records (ndarray): The crack records of the image.
+        latitude, longitude (float): The image location, NaN when unknown.
+
+    Returns:
+        row (list): The values in IMAGE_COLUMNS order.
+    """
+    summary = summarize_records(records)
+
+    return [latitude, longitude, image_path, summary['count'], summary['max_width'], summary['max_length']]
+
+
+def crack_table(image_path, records):
+    """
+    Rows of the crack table for one image
+    Args:
+        image_path (str): The image path, the key shared with the image table.
+        records (ndarray): The crack records of the image.
+
+    Returns:
+        df (DataFrame): One row per crack, image_path first.
+    """
+    df = records_to_dataframe(records)
+    df.insert(0, 'image_path', image_path)
+
+    return df
+
+
+class ResultStore():
+    """
+    Writer of one run of a result store
+    Args:
+        store_dir (str): The store directory.
+        run_id (str): The run partition to write, a new one by default.
+        fmt (str): 'parquet' or 'feather'.
+    """
+    def __init__(self, store_dir, run_id=None, fmt='parquet'):
+        _require_pyarrow()
+        if fmt not in STORE_FORMATS:
+            raise ValueError(f"Unknown store format: {fmt}")
+
+        self.store_dir = store_dir
+        self.run_id = run_id or new_run_id()
+        self.fmt = fmt
+
+    def run_dir(self, table):
+        return os.path.join(self.store_dir, table, f'run={self.run_id}')
+
+    def write(self, table, df):
+        """
+        Append a part to a table of this run
+        Args:
+            table (str): IMAGE_TABLE or CRACK_TABLE.
+            df (DataFrame): The rows, with the columns of the table.
+
+        Returns:
+            path (str): The written part.
+        """
+        schema = _schema(table)
+        arrow_table = pa.Table.from_pandas(df[schema.names], schema=schema, preserve_index=False)
+
+        run_dir = self.run_dir(table)
+        os.makedirs(run_dir, exist_ok=True)
+
+        # parts are numbered after the existing ones, so a run can be appended to
+        suffix = STORE_FORMATS[self.fmt]
+        path = os.path.join(run_dir, f'part-{len(glob(os.path.join(run_dir, "part-*"))):05d}{suffix}')
+
+        # hidden temporary name, readers only see complete parts
+        tmp_path = os.path.join(run_dir, '.' + os.path.basename(path) + '.tmp')
+        if self.fmt == 'parquet':
+            pq.write_table(arrow_table, tmp_path, row_group_size=ROW_GROUP_SIZE)
+        else:
+            feather.write_feather(arrow_table, tmp_path)
+        os.replace(tmp_path, path)
+
+        return path
+
+    def finalize(self):
+        """Mark the run complete, after its last part"""
+        for table in (IMAGE_TABLE, CRACK_TABLE):
+            run_dir = self.run_dir(table)
+            os.makedirs(run_dir, exist_ok=True)
+            open(os.path.join(run_dir, COMPLETE_MARKER), 'w').close()
+
+
+def write_results(store_dir, image_df, crack_df, run_id=None, fmt='parquet'):
+    """
+    Write the image and crack tables of a run
+    Args:
+        store_dir (str): The store directory.
+        image_df (DataFrame): The image table (IMAGE_COLUMNS).
+        crack_df (DataFrame): The crack table (crack_table rows).
+        run_id (str): The run partition, a new one by default.
+        fmt (str): 'parquet' or 'feather'.
+
+    Returns:
+        run_id (str): The written run.
+    """
+    store = ResultStore(store_dir, run_id, fmt)
+    store.write(IMAGE_TABLE, image_df)
+    store.write(CRACK_TABLE, crack_df)
+    store.finalize()
+
+    return store.run_id
+
+
+def list_runs(store_dir, table=IMAGE_TABLE, complete_only=False):
+    """
+    Run ids of a table, oldest first
+    Args:
+        store_dir (str): The store directory.
+        table (str): IMAGE_TABLE or CRACK_TABLE.
+        complete_only (bool): Only the runs which finished, not the running or failed ones.
+
+    Returns:
+        runs (list): The run ids.
+    """
+    table_dir = os.path.join(store_dir, table)
+    if not os.path.isdir(table_dir):
+        return []
+
+    runs = sorted(name for name in os.listdir(table_dir) if name.startswith('run='))
+    if complete_only:
+        runs = [name for name in runs if os.path.exists(os.path.join(table_dir, name, COMPLETE_MARKER))]
+
+    return [name[len('run='):] for name in runs]
+
+
+def latest_run(store_dir, table=IMAGE_TABLE):
+    """The latest complete run, or the latest run when none has finished yet (None for an empty store)"""
+    runs = list_runs(store_dir, table, complete_only=True) or list_runs(store_dir, table)
+
+    return runs[-1] if runs else None
+
+
+def open_dataset(store_dir, table=IMAGE_TABLE):
+    """
+    Dataset of all runs of a table
+    Args:
+        store_dir (str): The store directory.
+        table (str): IMAGE_TABLE or CRACK_TABLE.
+
+    Returns:
+        dataset (pyarrow.dataset.Dataset): The parts of all runs with the 'run' partition column, None when empty.
+    """
+    _require_pyarrow()
+
+    table_dir = os.path.join(store_dir, table)
+    schema = _schema(table).append(pa.field('run', pa.string()))
+
+    datasets = []
+    for fmt, suffix in STORE_FORMATS.items():
+        parts = sorted(glob(os.path.join(table_dir, 'run=*', f'part-*{suffix}')))
+        if parts:
+            datasets.append(ds.dataset(parts, schema=schema, format=fmt, partitioning=_partitioning(), partition_base_dir=table_dir))
+
+    if not datasets:
+        return None
+
+    return datasets[0] if len(datasets) == 1 else ds.dataset(datasets)
+
+
+def read_table(store_dir, table=IMAGE_TABLE, columns=None, filters=None, run='latest'):
+    """
+    Read a table with column selection and filters pushed down to the files
+    Args:
+        store_dir (str): The store directory.
+        table (str): IMAGE_TABLE or CRACK_TABLE.
+        columns (list): The columns to read, all (including 'run') by default.
+        filters (list): pandas.read_parquet style filters, e.g. [('max_width', '>=', 3.0)].
+        run (str | list | None): 'latest' (see latest_run), a run id, a list of run ids, or None for all runs.
+
+    Returns:
+        df (DataFrame): The matching rows.
+    """
+    dataset = open_dataset(store_dir, table)
+    if dataset is None:
+        return pd.DataFrame(columns=columns or _schema(table).names)
+
+    expression = pq.filters_to_expression(filters) if filters else None
+
+    if run == 'latest':
+        run = [latest_run(store_dir, table)]
+    if run is not None:
+        runs = [run] if isinstance(run, str) else list(run)
+        run_expression = ds.field('run').isin(runs)
+        expression = run_expression if expression is None else expression & run_expression
+
+    return dataset.to_table(columns=columns, filter=expression).to_pandas()
+
+
+def export_excel(store_dir, excel_path, run='latest'):
+    """
+    Write the image table of a run as the Excel file read by PyDracula
+    Args:
+        store_dir (str): The store directory.
+        excel_path (str): The Excel output path.
+        run (str): 'latest' or a run id.
+
+    Returns:
+        df (DataFrame): The exported rows.
+    """
+    df = read_table(store_dir, IMAGE_TABLE, columns=IMAGE_COLUMNS, run=run)
+    df.columns = EXCEL_COLUMNS
+
+    os.makedirs(os.path.dirname(os.path.abspath(excel_path)), exist_ok=True)
+    df.to_excel(excel_path, index=False, engine='openpyxl')
+
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export a run of a crack result store to Excel')
+    parser.add_argument('--store_dir', required=True, help='the result store directory')
+    parser.add_argument('--excel_output', required=True, help='the Excel output path')
+    parser.add_argument('--run', default='latest', help='the run id to export (default: the latest run)')
+    args = parser.parse_args()
+
+    df = export_excel(args.store_dir, args.excel_output, args.run)
+    print(f"{len(df)} rows exported to {args.excel_output}")
+
+
+if __name__ == '__main__':
+    main()
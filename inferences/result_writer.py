@@ -0,0 +1,325 @@
+"""
+Streaming Result Writer
+이미지 처리가 끝날 때마다 결과를 일정 크기 배치로 기록하는 모듈
+
+Long batch jobs pass each finished image to ResultWriter.add instead of collecting all results in a list.
+The writer keeps at most batch_rows rows (or flush_interval seconds of results) in memory and appends
+each batch to every sink:
+- StoreSink: a new Parquet/Feather part of the run in a result store (result_store.py), the run is marked complete on close.
+- CsvSink: appended to <path>.partial, renamed to <path> on close.
+- SqliteSink: one transaction per batch in WAL mode, the run is marked finished on close.
+- ExcelSink: rows streamed to a write-only workbook, saved to a temporary file and renamed on close.
+- DamageIndexSink: the images with damage upserted into the viewer's damage index (damage_index.py), the others removed.
+The store, SQLite and damage index sinks can be read while the job runs and only ever show whole batches, the CSV
+sink can be followed in its .partial file. If the job fails, the batches flushed so far stay on disk
+(as .partial files or an unfinished run) and nothing is finalized.
+"""
+
+import os
+import time
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from crack_records import empty_records
+from damage_index import DamageIndex
+from result_store import IMAGE_TABLE, CRACK_TABLE, IMAGE_COLUMNS, EXCEL_COLUMNS, ResultStore, crack_table, new_run_id
+
+PARTIAL_SUFFIX = '.partial'
+
+
+class StoreSink():
+    """
+    Result store sink, one part per table and batch
+    Args:
+        store_dir (str): The result store directory.
+        run_id (str): The run partition, a new one by default.
+        fmt (str): 'parquet' or 'feather'.
+    """
+    def __init__(self, store_dir, run_id=None, fmt='parquet'):
+        self.store = ResultStore(store_dir, run_id, fmt)
+        self.path = store_dir
+
+    def write(self, tables):
+        for table, df in tables.items():
+            self.store.write(table, df)
+
+    def finalize(self):
+        self.store.finalize()
+
+    def close(self):
+        pass
+
+
+class CsvSink():
+    """
+    CSV sink of one table
+    Args:
+        path (str): The CSV path, written as path + PARTIAL_SUFFIX until the job finishes.
+        table (str): IMAGE_TABLE or CRACK_TABLE.
+        rename (dict): Column names of the CSV file, e.g. {'image_path': 'Image_Name'}.
+    """
+    def __init__(self, path, table=CRACK_TABLE, rename=None):
+        self.path = path
+        self.table = table
+        self.rename = rename or {}
+        self.header_written = False
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.file = open(path + PARTIAL_SUFFIX, 'w', encoding='utf-8', newline='')
+
+    def write(self, tables):
+        df = tables[self.table]
+        if len(df) == 0 and self.header_written:
+            return
+
+        df.rename(columns=self.rename).to_csv(self.file, header=not self.header_written, index=False)
+        self.file.flush()
+        self.header_written = True
+
+    def finalize(self):
+        self.file.close()
+        os.replace(self.path + PARTIAL_SUFFIX, self.path)
+
+    def close(self):
+        self.file.close()
+
+
+def _sqlite_type(dtype):
+    if pd.api.types.is_integer_dtype(dtype) or pd.api.types.is_bool_dtype(dtype):
+        return 'INTEGER'
+    if pd.api.types.is_float_dtype(dtype):
+        return 'REAL'
+    return 'TEXT'
+
+
+class SqliteSink():
+    """
+    SQLite sink, the tables of all runs in one database with a 'run' column
+    Args:
+        path (str): The database path.
+        run_id (str): The run written by this sink, a new one by default.
+    """
+    def __init__(self, path, run_id=None):
+        self.path = path
+        self.run_id = run_id or new_run_id()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # opened by the caller, written by the pipeline writer thread (one thread at a time, see ResultWriter)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+
+        # readers see the committed batches while the job appends new ones
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        with self.conn:
+            self.conn.execute('CREATE TABLE IF NOT EXISTS runs (run TEXT PRIMARY KEY, started TEXT, finished TEXT)')
+            self.conn.execute('INSERT OR REPLACE INTO runs VALUES (?, ?, NULL)', (self.run_id, datetime.now().isoformat()))
+
+    def _create_table(self, table, df):
+        columns = ', '.join(f'"{name}" {_sqlite_type(df[name].dtype)}' for name in df.columns)
+        self.conn.execute(f'CREATE TABLE IF NOT EXISTS {table} (run TEXT, {columns})')
+        self.conn.execute(f'CREATE INDEX IF NOT EXISTS {table}_run_image ON {table} (run, image_path)')
+
+    def write(self, tables):
+        # the tables of a batch are committed together
+        with self.conn:
+            for table, df in tables.items():
+                self._create_table(table, df)
+                placeholders = ', '.join('?' * (len(df.columns) + 1))
+                rows = zip([self.run_id] * len(df), *[df[name].tolist() for name in df.columns])
+                self.conn.executemany(f'INSERT INTO {table} VALUES ({placeholders})', rows)
+
+    def finalize(self):
+        with self.conn:
+            self.conn.execute('UPDATE runs SET finished = ? WHERE run = ?', (datetime.now().isoformat(), self.run_id))
+        self.conn.close()
+
+    def close(self):
+        self.conn.close()
+
+
+class ExcelSink():
+    """
+    Excel sink of the image table, the view read by PyDracula
+    Args:
+        path (str): The Excel path.
+        columns (list): The header row, EXCEL_COLUMNS in IMAGE_COLUMNS order by default.
+    """
+    def __init__(self, path, columns=EXCEL_COLUMNS):
+        from openpyxl import Workbook
+
+        self.path = path
+
+        # write-only workbooks keep the rows in a temporary file instead of memory
+        self.workbook = Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet()
+        self.sheet.append(list(columns))
+
+    def write(self, tables):
+        df = tables[IMAGE_TABLE]
+        for row in df[IMAGE_COLUMNS].astype(object).where(df[IMAGE_COLUMNS].notna(), None).values.tolist():
+            self.sheet.append(row)
+
+    def finalize(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = self.path + PARTIAL_SUFFIX
+        self.workbook.save(tmp_path)
+        os.replace(tmp_path, self.path)
+
+    def close(self):
+        # unfinished run: end the sheet's row stream and remove its temporary file, no Excel file is written
+        if not self.sheet.closed:
+            self.sheet.close()
+            self.sheet._writer.cleanup()
+
+
+class DamageIndexSink():
+    """
+    Damage index sink, the images with damage upserted per batch for the PyDracula viewer
+    and the images without damage removed (a re-run may clear an image indexed before)
+    Args:
+        path (str): The damage index database (damage_index.py).
+        run_id (str): The run written by this sink, a new one by default.
+        survey (str): The survey of the images (damage_index.DamageIndex.upsert), e.g. their source directory.
+    """
+    def __init__(self, path, run_id=None, survey=''):
+        self.index = DamageIndex(path)
+        self.path = path
+        self.run_id = run_id or new_run_id()
+        self.survey = survey
+
+    def write(self, tables):
+        self.index.upsert(tables[IMAGE_TABLE], self.run_id, self.survey)
+
+    def finalize(self):
+        self.index.close()
+
+    def close(self):
+        self.index.close()
+
+
+class ResultWriter():
+    """
+    Buffer the results of finished images and write them to the sinks in bounded batches
+    Not thread safe, call it from one thread at a time (e.g. the caller, then the write stage of run_pipeline).
+    Args:
+        sinks (list): The sinks (StoreSink, CsvSink, SqliteSink, ExcelSink, DamageIndexSink).
+        batch_rows (int): Flush when this many image or crack rows are buffered.
+        flush_interval (float): Flush when the oldest buffered row is older than this many seconds (None: only by size).
+    """
+    def __init__(self, sinks, batch_rows=10000, flush_interval=30.0):
+        self.sinks = list(sinks)
+        self.batch_rows = max(int(batch_rows), 1)
+        self.flush_interval = flush_interval
+
+        self.image_rows = []
+        self.crack_tables = []
+        self.num_crack_rows = 0
+        self.buffer_start = None
+
+        self.num_batches = 0
+        self.rows_written = {IMAGE_TABLE: 0, CRACK_TABLE: 0}
+
+    def add(self, image_row=None, cracks=None):
+        """
+        Add the results of one image
+        Args:
+            image_row (list): The image table row (IMAGE_COLUMNS order), see result_store.image_row.
+            cracks (DataFrame): The crack table rows of the image, see result_store.crack_table.
+        """
+        if self.buffer_start is None:
+            self.buffer_start = time.monotonic()
+
+        if image_row is not None:
+            self.image_rows.append(image_row)
+        if cracks is not None and len(cracks) > 0:
+            self.crack_tables.append(cracks)
+            self.num_crack_rows += len(cracks)
+
+        if len(self.image_rows) >= self.batch_rows or self.num_crack_rows >= self.batch_rows:
+            self.flush()
+        elif self.flush_interval is not None and time.monotonic() - self.buffer_start >= self.flush_interval:
+            self.flush()
+
+    def flush(self, force=False):
+        """Write the buffered rows to every sink as one batch"""
+        if not (self.image_rows or self.crack_tables or force):
+            return
+
+        image_df = pd.DataFrame(self.image_rows, columns=IMAGE_COLUMNS)
+        image_df['crack_count'] = image_df['crack_count'].astype(np.int64)
+        crack_df = pd.concat(self.crack_tables or [crack_table('', empty_records())], ignore_index=True)
+        tables = {IMAGE_TABLE: image_df, CRACK_TABLE: crack_df}
+
+        for sink in self.sinks:
+            sink.write(tables)
+
+        self.num_batches += 1
+        self.rows_written[IMAGE_TABLE] += len(image_df)
+        self.rows_written[CRACK_TABLE] += len(crack_df)
+
+        self.image_rows = []
+        self.crack_tables = []
+        self.num_crack_rows = 0
+        self.buffer_start = None
+
+    def close(self):
+        """Flush the last batch and finalize the sinks (at least one batch, so empty runs still have headers)"""
+        self.flush(force=self.num_batches == 0)
+        for sink in self.sinks:
+            sink.finalize()
+
+    def abort(self):
+        """Flush what is buffered but leave the outputs unfinished, after a failure"""
+        try:
+            self.flush()
+        finally:
+            for sink in self.sinks:
+                sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def open_result_writer(store_dir=None, csv_path=None, db_path=None, excel_path=None, index_path=None, fmt='parquet',
+                       batch_rows=10000, flush_interval=30.0, survey=''):
+    """
+    ResultWriter with the sinks used by the inference scripts, all writing the same run
+    Args:
+        store_dir (str): The result store directory. Skipped with a notice when pyarrow is not installed.
+        csv_path (str): The per-crack CSV file (crack_records.records_to_dataframe columns after 'Image_Name').
+        db_path (str): The SQLite database.
+        excel_path (str): The Excel file of the image table.
+        index_path (str): The damage index read by PyDracula.
+        fmt (str): The result store format, 'parquet' or 'feather'.
+        batch_rows (int), flush_interval (float): See ResultWriter.
+        survey (str): The survey keying the images in the damage index, the absolute source directory in the scripts.
+
+    Returns:
+        writer (ResultWriter): The writer. Use it as a context manager or call close / abort.
+    """
+    run_id = new_run_id()
+    sinks = []
+
+    if store_dir:
+        try:
+            sinks.append(StoreSink(store_dir, run_id, fmt))
+        except ImportError as e:
+            print(f"Skipping the result store: {e}")
+    if csv_path:
+        sinks.append(CsvSink(csv_path, CRACK_TABLE, rename={'image_path': 'Image_Name'}))
+    if db_path:
+        sinks.append(SqliteSink(db_path, run_id))
+    if excel_path:
+        sinks.append(ExcelSink(excel_path))
+    if index_path:
+        sinks.append(DamageIndexSink(index_path, run_id, survey))
+
+    return ResultWriter(sinks, batch_rows=batch_rows, flush_interval=flush_interval)
@@ -0,0 +1,299 @@
+"""
+Sparse Mask Format
+크랙 마스크를 행 단위 run-length 형식으로 저장/읽기하는 모듈
+
+Crack masks are mostly background, so instead of a full raster a mask file stores the runs of
+non-zero pixels of every row. File layout (little endian):
+- MAGIC (8 bytes), the header length (uint32) and a JSON header with the mask shape, dtype,
+  number of runs, labels present and free-form metadata (model, parameters, source image, ...).
+- row_ptr (int64, H + 1): the runs of row y are runs[row_ptr[y]:row_ptr[y + 1]].
+- starts, lengths (uint16, or uint32 for images wider than 65535) and values (mask dtype) of the runs, in raster order.
+
+The run arrays are memory-mapped, so reading a window only touches the runs of its rows,
+and its cost and memory scale with the crack pixels in the window instead of the image area.
+Conversions to and from PNG (or any raster) are lossless.
+"""
+
+import os
+import json
+
+import cv2
+import numpy as np
+
+SPARSE_MASK_SUFFIX = '.rle'
+
+# written strip by strip (strip_reader.TIFF_SUFFIXES)
+TIFF_SUFFIXES = ('.tif', '.tiff')
+
+MAGIC = b'CRKMASK1'
+
+# rows of the mask encoded at once, so disk-backed masks are never loaded whole
+ENCODE_ROWS = 1024
+
+
+def _align(offset, alignment=8):
+    return (offset + alignment - 1) // alignment * alignment
+
+
+def _clip_range(start, stop, size):
+    """Clip a [start, stop) range to [0, size), stop None meaning size"""
+    stop = size if stop is None else stop
+    start = min(max(start, 0), size)
+
+    return start, min(max(stop, start), size)
+
+
+def _encode_rows(rows):
+    """
+    Find the runs of non-zero pixels in a band of rows
+    Args:
+        rows (ndarray): The mask rows. The shape is (h, W).
+
+    Returns:
+        tuple: (row, start, length, value) arrays of the runs, in raster order.
+    """
+    height, width = rows.shape
+
+    # a run starts wherever the value differs from the pixel on its left (the border counts as 0)
+    padded = np.zeros((height, width + 2), dtype=rows.dtype)
+    padded[:, 1:-1] = rows
+    run_rows, boundaries = np.nonzero(padded[:, 1:] != padded[:, :-1])
+
+    # a run ends at the next boundary of the same row, the last boundary of a row only closes the previous run
+    same_row = run_rows[:-1] == run_rows[1:]
+    run_rows = run_rows[:-1][same_row]
+    starts = boundaries[:-1][same_row]
+    lengths = boundaries[1:][same_row] - starts
+    values = rows[run_rows, starts]
+
+    non_zero = values != 0
+    return run_rows[non_zero], starts[non_zero], lengths[non_zero], values[non_zero]
+
+
+def save_sparse_mask(path, mask, metadata=None):
+    """
+    Save a mask in the sparse format
+    Args:
+        path (str): The output path.
+        mask (ndarray): The 2D mask (bool or integer, np.memmap possible).
+        metadata (dict): JSON serializable information stored in the header, e.g. the model and its parameters.
+    """
+    if mask.ndim != 2:
+        raise ValueError(f"Expected a 2D mask, got shape {mask.shape}")
+
+    height, width = mask.shape
+    row_counts = np.zeros(height, dtype=np.int64)
+    runs = []
+
+    for y0 in range(0, height, ENCODE_ROWS):
+        run_rows, starts, lengths, values = _encode_rows(np.asarray(mask[y0:y0 + ENCODE_ROWS]))
+        row_counts[y0:y0 + ENCODE_ROWS] = np.bincount(run_rows, minlength=min(ENCODE_ROWS, height - y0))
+        runs.append((starts, lengths, values))
+
+    index_dtype = '<u2' if width <= np.iinfo(np.uint16).max else '<u4'
+    starts = np.concatenate([run[0] for run in runs] or [np.zeros(0)]).astype(index_dtype)
+    lengths = np.concatenate([run[1] for run in runs] or [np.zeros(0)]).astype(index_dtype)
+    values = np.concatenate([run[2] for run in runs] or [np.zeros(0)]).astype(mask.dtype.newbyteorder('<'))
+
+    row_ptr = np.zeros(height + 1, dtype='<i8')
+    np.cumsum(row_counts, out=row_ptr[1:])
+
+    header = json.dumps({
+        'shape': [height, width],
+        'dtype': values.dtype.str,
+        'index_dtype': index_dtype,
+        'num_runs': len(starts),
+        'labels': np.unique(values).tolist(),
+        'metadata': metadata or {},
+    }).encode('utf-8')
+    data_offset = _align(len(MAGIC) + 4 + len(header))
+
+    # write next to the target and rename, so readers never see a partial file
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(np.uint32(len(header)).astype('<u4').tobytes())
+        f.write(header)
+        f.write(b'\0' * (data_offset - f.tell()))
+        for array in (row_ptr, starts, lengths, values):
+            f.write(array.tobytes())
+    os.replace(tmp_path, path)
+
+
+class SparseMask():
+    """
+    Reader of the sparse mask format
+    Args:
+        path (str): The sparse mask path.
+    """
+    def __init__(self, path):
+        self.path = path
+
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"Not a sparse mask file: {path}")
+            header_size = int(np.frombuffer(f.read(4), dtype='<u4')[0])
+            header = json.loads(f.read(header_size).decode('utf-8'))
+
+        self.shape = tuple(header['shape'])
+        self.dtype = np.dtype(header['dtype'])
+        self.labels = header['labels']
+        self.metadata = header['metadata']
+        index_dtype = header['index_dtype']
+        num_runs = header['num_runs']
+
+        # views into one read-only memory map of the file
+        offset = _align(len(MAGIC) + 4 + header_size)
+        self._file = np.memmap(path, dtype=np.uint8, mode='r')
+        arrays = []
+        for dtype, count in [('<i8', self.shape[0] + 1), (index_dtype, num_runs), (index_dtype, num_runs), (self.dtype, num_runs)]:
+            size = np.dtype(dtype).itemsize * count
+            arrays.append(self._file[offset:offset + size].view(dtype))
+            offset += size
+        self.row_ptr, self.starts, self.lengths, self.values = arrays
+
+    def __len__(self):
+        return len(self.starts)
+
+    def nonzero(self, y0=0, y1=None, x0=0, x1=None):
+        """
+        Coordinates of the non-zero pixels in a window, without materializing it
+        Args:
+            y0, y1 (int): The rows of the window (y1 exclusive, None for the last row).
+            x0, x1 (int): The columns of the window (x1 exclusive, None for the last column).
+
+        Returns:
+            tuple: (rows, cols, values) of the non-zero pixels in raster order, relative to the image.
+        """
+        height, width = self.shape
+        y0, y1 = _clip_range(y0, y1, height)
+        x0, x1 = _clip_range(x0, x1, width)
+
+        # only the runs of the window rows are read from the file
+        first, last = self.row_ptr[y0], self.row_ptr[y1]
+        run_rows = np.repeat(np.arange(y0, y1), np.diff(self.row_ptr[y0:y1 + 1]))
+        starts = np.clip(self.starts[first:last].astype(np.int64), x0, x1)
+        ends = np.clip(self.starts[first:last].astype(np.int64) + self.lengths[first:last], x0, x1)
+        counts = ends - starts
+
+        # expand the runs into pixel coordinates
+        run_index = np.repeat(np.arange(len(counts)), counts)
+        offsets = np.arange(len(run_index)) - np.repeat(np.cumsum(counts) - counts, counts)
+
+        return run_rows[run_index], starts[run_index] + offsets, self.values[first:last][run_index]
+
+    def read_window(self, y0=0, y1=None, x0=0, x1=None, out=None):
+        """
+        Materialize a window of the mask
+        Args:
+            y0, y1 (int): The rows of the window (y1 exclusive, None for the last row).
+            x0, x1 (int): The columns of the window (x1 exclusive, None for the last column).
+            out (ndarray): Optional array of the window shape to fill, e.g. a slice of a larger mask or a np.memmap.
+
+        Returns:
+            window (ndarray): The mask values in the window.
+        """
+        y0, y1 = _clip_range(y0, y1, self.shape[0])
+        x0, x1 = _clip_range(x0, x1, self.shape[1])
+
+        if out is None:
+            out = np.zeros((y1 - y0, x1 - x0), dtype=self.dtype)
+        else:
+            out[...] = 0
+
+        rows, cols, values = self.nonzero(y0, y1, x0, x1)
+        out[rows - y0, cols - x0] = values
+
+        return out
+
+    def to_dense(self, out=None):
+        """Materialize the whole mask"""
+        return self.read_window(out=out)
+
+    def close(self):
+        self.row_ptr = self.starts = self.lengths = self.values = None
+        self._file = None
+
+
+def load_sparse_mask(path):
+    """
+    Open a sparse mask file
+    Args:
+        path (str): The sparse mask path.
+
+    Returns:
+        mask (SparseMask): The reader.
+    """
+    return SparseMask(path)
+
+
+def png_to_sparse_mask(png_path, path, metadata=None):
+    """
+    Convert a PNG (or any lossless raster) mask to the sparse format
+    Args:
+        png_path (str): The raster mask path. Single channel, or 3 identical channels.
+        path (str): The output sparse mask path.
+        metadata (dict): Information stored in the header.
+    """
+    mask = cv2.imread(png_path, cv2.IMREAD_UNCHANGED)
+    if mask is None:
+        raise IOError(f"Failed to read mask file: {png_path}")
+
+    if mask.ndim == 3:
+        if not (mask == mask[..., :1]).all():
+            raise ValueError(f"Color mask cannot be stored as labels: {png_path}")
+        mask = mask[..., 0]
+
+    save_sparse_mask(path, mask, metadata)
+
+
+def sparse_mask_to_png(path, png_path):
+    """
+    Convert a sparse mask to a single channel PNG
+    Args:
+        path (str): The sparse mask path.
+        png_path (str): The output PNG path.
+    """
+    mask = SparseMask(path).to_dense()
+    if mask.dtype == bool:
+        mask = mask.astype(np.uint8)
+
+    os.makedirs(os.path.dirname(os.path.abspath(png_path)), exist_ok=True)
+    if not cv2.imwrite(png_path, mask):
+        raise IOError(f"Failed to write mask file: {png_path}")
+
+
+def write_mask(path, mask, metadata=None):
+    """
+    Save a mask in the format given by the suffix of path, the sparse format for SPARSE_MASK_SUFFIX
+    The sparse format and TIFF are written strip by strip, so disk-backed masks are never loaded whole.
+    Args:
+        path (str): The output path.
+        mask (ndarray): The 2D mask.
+        metadata (dict): Information stored in the header of sparse masks.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    if path.endswith(SPARSE_MASK_SUFFIX):
+        save_sparse_mask(path, mask, metadata)
+    elif path.lower().endswith(TIFF_SUFFIXES):
+        # imported here, the other formats only need OpenCV
+        from strip_reader import write_tiff_strips
+        write_tiff_strips(path, lambda y0, y1: np.asarray(mask[y0:y1], dtype=np.uint8), mask.shape, strip_height=ENCODE_ROWS)
+    elif not cv2.imwrite(path, np.asarray(mask, dtype=np.uint8)):
+        raise IOError(f"Failed to write mask file: {path}")
+
+
+def read_mask(path):
+    """
+    Read a mask saved by write_mask
+    Args:
+        path (str): The mask path.
+
+    Returns:
+        mask (ndarray): The mask, or None when it cannot be read (as cv2.imread).
+    """
+    if path.endswith(SPARSE_MASK_SUFFIX):
+        return SparseMask(path).to_dense()
+
+    return cv2.imread(path, cv2.IMREAD_UNCHANGED)
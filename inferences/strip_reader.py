@@ -0,0 +1,368 @@
+"""
+Strip Reader for Gigapixel Images
+초대형 이미지를 가로 띠(strip) 단위로 읽는 모듈
+
+Readers decode only the rows that are requested, so memory scales with the strip height instead of the image area.
+- TIFF: only the tiles/strips intersecting the requested rows are read and decoded (tifffile).
+- JPEG/PNG: the file is decoded once in a streaming way into a disk-backed raster, then rows are read from disk.
+  This drives the Pillow decoder directly, which is not a public Pillow API: it is only used with the tested
+  Pillow versions (PILLOW_TESTED_VERSIONS, pinned in requirements.txt), other versions load the image with mmcv.imread.
+- Others: the image is loaded into memory with mmcv.imread.
+
+All readers return BGR uint8 rows of shape (rows, W, 3), the same as mmcv.imread.
+Results of the image size are written the same way, strip by strip, as tiled TIFF files (write_tiff_strips).
+"""
+
+import os
+import mmap
+import tempfile
+
+import cv2
+import mmcv
+import numpy as np
+import tifffile
+import PIL
+from PIL import Image, ImageFile
+
+# bytes of compressed input decoded between flushes of the disk-backed raster
+DECODE_CHUNK_SIZE = 1 << 20
+
+EXIF_ORIENTATION = 0x0112
+
+TIFF_SUFFIXES = ('.tif', '.tiff')
+
+# tile size of the TIFF files written strip by strip
+TIFF_TILE_SIZE = 256
+
+# Pillow versions [first, last) whose decoder internals DiskBackedStripReader was tested with (test_strip_reader.py)
+PILLOW_TESTED_VERSIONS = ((8, 4), (13, 0))
+
+
+def pillow_decoder_supported():
+    """Check whether the installed Pillow has the decoder internals used by DiskBackedStripReader"""
+    version = tuple(int(part) for part in PIL.__version__.split('.')[:2])
+    first, last = PILLOW_TESTED_VERSIONS
+
+    return (
+        first <= version < last
+        and hasattr(Image, '_getdecoder')
+        and hasattr(ImageFile.ImageFile, 'load_prepare')
+    )
+
+
+class StripReader():
+    """
+    Base class of strip readers. The last strip read is cached, because sliding windows
+    in the same row request the same rows repeatedly.
+    """
+    def __init__(self, shape):
+        self.shape = shape
+        self._cached_rows = None
+        self._cached_strip = None
+
+    def read_rows(self, y0, y1):
+        """
+        Read rows of the image
+        Args:
+            y0 (int): The first row (inclusive).
+            y1 (int): The last row (exclusive).
+
+        Returns:
+            strip (ndarray): BGR image rows. The shape is (y1 - y0, W, 3).
+        """
+        if self._cached_rows != (y0, y1):
+            self._cached_strip = self._read_rows(y0, y1)
+            self._cached_rows = (y0, y1)
+
+        return self._cached_strip
+
+    def _read_rows(self, y0, y1):
+        raise NotImplementedError
+
+    def close(self):
+        self._cached_rows = None
+        self._cached_strip = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class ArrayStripReader(StripReader):
+    """Strip reader over an image already loaded in memory"""
+    def __init__(self, img):
+        super().__init__(img.shape)
+        self.img = img
+
+    def _read_rows(self, y0, y1):
+        return self.img[y0:y1]
+
+
+class TiffStripReader(StripReader):
+    """Strip reader decoding only the TIFF tiles or strips which intersect the requested rows"""
+    def __init__(self, img_path):
+        self.tif = tifffile.TiffFile(img_path)
+        self.page = self.tif.pages[0]
+
+        height, width = self.page.shape[:2]
+        super().__init__((height, width, 3))
+
+        # segment grid in (rows, cols) of tiles, strips are tiles of full width
+        self.segment_height, self.segment_width = self.page.chunks[:2]
+        self.segments_across = -(-width // self.segment_width)
+
+    @staticmethod
+    def is_supported(page):
+        """Check whether the page layout can be read segment by segment"""
+        samples = page.shape[2] if len(page.shape) == 3 else 1
+
+        return (
+            page.dtype == np.uint8
+            and page.planarconfig == 1
+            and page.imagedepth == 1
+            and page.photometric in (tifffile.PHOTOMETRIC.MINISBLACK, tifffile.PHOTOMETRIC.RGB)
+            and samples in (1, 3, 4)
+        )
+
+    def _read_rows(self, y0, y1):
+        height, width = self.shape[:2]
+        strip = np.zeros((y1 - y0, width) + self.page.shape[2:], dtype=np.uint8)
+        filehandle = self.tif.filehandle
+
+        for segment_row in range(y0 // self.segment_height, -(-y1 // self.segment_height)):
+            for segment_col in range(self.segments_across):
+                index = segment_row * self.segments_across + segment_col
+
+                filehandle.seek(self.page.dataoffsets[index])
+                data = filehandle.read(self.page.databytecounts[index])
+                segment, indices, _ = self.page.decode(data, index, jpegtables=self.page.jpegtables)
+
+                # segments at the right and bottom borders are padded to the full tile size
+                top, left = indices[2], indices[3]
+                rows = slice(max(top, y0), min(top + segment.shape[1], y1, height))
+                cols = slice(left, min(left + segment.shape[2], width))
+                strip[rows.start - y0:rows.stop - y0, cols] = segment[0, rows.start - top:rows.stop - top, :cols.stop - left].reshape(
+                    (rows.stop - rows.start, cols.stop - cols.start) + self.page.shape[2:])
+
+        if strip.ndim == 2:
+            return cv2.cvtColor(strip, cv2.COLOR_GRAY2BGR)
+
+        return np.ascontiguousarray(strip[..., 2::-1])
+
+    def close(self):
+        super().close()
+        self.tif.close()
+
+
+class DiskBackedStripReader(StripReader):
+    """
+    Strip reader for JPEG/PNG. Pillow decodes the file sequentially into a temporary raster file,
+    and decoded pages are flushed to disk as the decoder moves on, so the full image is never held in memory.
+    """
+    def __init__(self, pil_img, cache_dir=None):
+        width, height = pil_img.size
+        super().__init__((height, width, 3))
+
+        # Pillow stores RGB with 4 bytes per pixel, so the raster is written as RGBX
+        self.raster_mode = 'RGBX' if pil_img.mode == 'RGB' else 'L'
+        self.channels = 4 if self.raster_mode == 'RGBX' else 1
+        self.row_bytes = width * self.channels
+
+        self.raster_file = tempfile.TemporaryFile(dir=cache_dir)
+        self.raster_file.truncate(height * self.row_bytes)
+        self._decode(pil_img)
+
+    @staticmethod
+    def is_supported(pil_img):
+        """Check whether the image can be decoded sequentially into a raster"""
+        if not pillow_decoder_supported():
+            return False
+
+        # mmcv.imread applies the EXIF orientation of JPEG files, which is not done here
+        if pil_img.format == 'JPEG' and pil_img.getexif().get(EXIF_ORIENTATION, 1) != 1:
+            return False
+
+        return len(pil_img.tile) == 1 and pil_img.mode in ('RGB', 'L')
+
+    def _decode(self, pil_img):
+        width, height = pil_img.size
+        buffer = mmap.mmap(self.raster_file.fileno(), height * self.row_bytes)
+        target = Image.frombuffer(self.raster_mode, (width, height), buffer, 'raw', self.raster_mode, 0, 1)
+
+        # same decoding loop as ImageFile.load, but writing into the disk-backed raster (Pillow internals, see is_supported)
+        decoder_name, extents, offset, args = pil_img.tile[0]
+        decoder = Image._getdecoder(pil_img.mode, decoder_name, args, pil_img.decoderconfig)
+        decoder.setimage(target.im, extents)
+
+        pil_img.im = target.im
+        pil_img.load_prepare()
+        read = getattr(pil_img, 'load_read', pil_img.fp.read)
+        getattr(pil_img, 'load_seek', pil_img.fp.seek)(offset)
+
+        data = b''
+        while True:
+            chunk = read(DECODE_CHUNK_SIZE)
+            if not chunk:
+                raise OSError(f'Image file is truncated: {pil_img.filename}')
+
+            data += chunk
+            consumed, err_code = decoder.decode(data)
+
+            # write decoded rows back to the file and drop them from memory
+            buffer.flush()
+            if hasattr(mmap, 'MADV_DONTNEED'):
+                buffer.madvise(mmap.MADV_DONTNEED)
+
+            if consumed < 0:
+                if err_code < 0:
+                    raise OSError(f'Decoder error {err_code} while reading {pil_img.filename}')
+                break
+            data = data[consumed:]
+
+        decoder.cleanup()
+        pil_img.close()
+        del decoder, target
+        buffer.close()
+
+    def _read_rows(self, y0, y1):
+        self.raster_file.seek(y0 * self.row_bytes)
+        strip = np.fromfile(self.raster_file, dtype=np.uint8, count=(y1 - y0) * self.row_bytes)
+        strip = strip.reshape(y1 - y0, self.shape[1], self.channels)
+
+        if self.channels == 1:
+            return cv2.cvtColor(strip, cv2.COLOR_GRAY2BGR)
+
+        return np.ascontiguousarray(strip[..., 2::-1])
+
+    def close(self):
+        super().close()
+        self.raster_file.close()
+
+
+def open_strip_reader(img_path, cache_dir=None):
+    """
+    Open a strip reader suitable for the image file
+    Args:
+        img_path (str): The image filename.
+        cache_dir (str): The directory for temporary rasters of JPEG/PNG images. The default is the system temp directory.
+
+    Returns:
+        reader (StripReader): The strip reader. Use it as a context manager or call close().
+    """
+    if os.path.splitext(img_path)[1].lower() in TIFF_SUFFIXES:
+        with tifffile.TiffFile(img_path) as tif:
+            supported = TiffStripReader.is_supported(tif.pages[0])
+        if supported:
+            return TiffStripReader(img_path)
+
+    Image.MAX_IMAGE_PIXELS = None
+    try:
+        pil_img = Image.open(img_path)
+    except OSError:
+        pil_img = None
+
+    if pil_img is not None and DiskBackedStripReader.is_supported(pil_img):
+        return DiskBackedStripReader(pil_img, cache_dir)
+
+    if pil_img is not None:
+        pil_img.close()
+
+    return ArrayStripReader(mmcv.imread(img_path))
+
+
+def create_disk_backed_array(shape, dtype, cache_dir=None):
+    """
+    Create a zero-filled array stored in a temporary file
+    Args:
+        shape (tuple): The array shape.
+        dtype (dtype): The array dtype.
+        cache_dir (str): The directory for the temporary file. The default is the system temp directory.
+
+    Returns:
+        array (np.memmap): The array. The file is removed when the array is garbage collected.
+    """
+    return np.memmap(tempfile.TemporaryFile(dir=cache_dir), dtype=dtype, mode='w+', shape=tuple(shape))
+
+
+def create_disk_backed_mask(shape, cache_dir=None):
+    """
+    Create a zero-filled boolean mask stored in a temporary file
+    Args:
+        shape (tuple): The mask shape (H, W).
+        cache_dir (str): The directory for the temporary file. The default is the system temp directory.
+
+    Returns:
+        mask (np.memmap): The mask. The file is removed when the mask is garbage collected.
+    """
+    return create_disk_backed_array(shape[:2], bool, cache_dir)
+
+
+def read_downscaled(read_rows, shape, factor, strip_height=1024):
+    """
+    Downscale an image strip by strip with cv2.INTER_AREA
+    Args:
+        read_rows (callable): Function returning rows [y0, y1) of the image.
+        shape (tuple): The image shape (H, W, ...).
+        factor (int): The integer downscale factor.
+        strip_height (int): The number of rows read at once. Rounded up to a multiple of factor.
+
+    Returns:
+        downscaled (ndarray): The downscaled image. The shape is (ceil(H / factor), ceil(W / factor), ...).
+    """
+    height, width = shape[:2]
+    strip_height = factor * -(-strip_height // factor)
+    downscaled_width = -(-width // factor)
+
+    strips = []
+    for y0 in range(0, height, strip_height):
+        y1 = min(y0 + strip_height, height)
+        strip = read_rows(y0, y1)
+        strips.append(cv2.resize(strip, (downscaled_width, -(-(y1 - y0) // factor)), interpolation=cv2.INTER_AREA))
+
+    return np.concatenate(strips, axis=0)
+
+
+def write_tiff_strips(path, read_rows, shape, strip_height=1024, downscale=None):
+    """
+    Write a uint8 image to a tiled TIFF strip by strip, so only one strip is in memory
+    Args:
+        path (str): The output path.
+        read_rows (callable): Function returning rows [y0, y1) of the image, BGR (as mmcv.imread) or single channel.
+        shape (tuple): The image shape, (H, W, 3) or (H, W).
+        strip_height (int): The number of rows read at once. Rounded up to a multiple of TIFF_TILE_SIZE.
+        downscale (int): Also return the image downscaled by this integer factor with cv2.INTER_AREA, e.g. for thumbnails.
+
+    Returns:
+        downscaled (ndarray): The downscaled image (BGR, or single channel), None without downscale.
+    """
+    height, width = shape[:2]
+    strip_height = TIFF_TILE_SIZE * -(-strip_height // TIFF_TILE_SIZE)
+    downscaled = []
+
+    def _tiles():
+        for y0 in range(0, height, strip_height):
+            strip = read_rows(y0, min(y0 + strip_height, height))
+            if downscale is not None:
+                downscaled.append(cv2.resize(strip, (-(-width // downscale), -(-strip.shape[0] // downscale)), interpolation=cv2.INTER_AREA))
+
+            # tiles in raster order, the tiles at the right and bottom borders are padded by tifffile
+            rgb = strip[..., ::-1] if strip.ndim == 3 else strip
+            for ty in range(0, strip.shape[0], TIFF_TILE_SIZE):
+                for tx in range(0, width, TIFF_TILE_SIZE):
+                    yield rgb[ty:ty + TIFF_TILE_SIZE, tx:tx + TIFF_TILE_SIZE]
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    # write next to the target and rename, so readers never see a partial file
+    tmp_path = path + '.tmp'
+    with tifffile.TiffWriter(tmp_path, bigtiff=True) as tif:
+        tif.write(_tiles(), shape=tuple(shape), dtype=np.uint8, photometric='rgb' if len(shape) == 3 else 'minisblack',
+                  tile=(TIFF_TILE_SIZE, TIFF_TILE_SIZE), compression='zlib')
+    os.replace(tmp_path, path)
+
+    if downscale is None:
+        return None
+
+    return np.concatenate(downscaled, axis=0)
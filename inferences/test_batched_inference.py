@@ -0,0 +1,235 @@
+"""
+Batched Sliding Window Inference Test Script
+배치 슬라이딩 윈도우 추론 테스트 스크립트
+
+This script checks that batched inference in utils.inference_segmentor_sliding_window
+produces the same mask as the per-window loop, that overlap blending in strips matches
+a full-image probability accumulator, and that the edge-energy gate skips flat windows.
+A stub model is used, so no GPU or checkpoint is needed.
+"""
+
+import sys
+import math
+import numpy as np
+
+
+class StubTensor():
+    """Minimal stand-in for the torch tensor returned in pred_sem_seg.data"""
+    def __init__(self, array):
+        self.array = array
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.array
+
+
+class StubResult():
+    """Minimal stand-in for mmseg SegDataSample"""
+    def __init__(self, logits):
+        self.seg_logits = type('PixelData', (), {'data': StubTensor(logits)})()
+        self.pred_sem_seg = type('PixelData', (), {'data': StubTensor(np.argmax(logits, axis=0)[None])})()
+
+
+class StubModel():
+    """
+    Stub segmentor. A pixel is 'crack' when it is darker than the mean of its window,
+    so overlapping windows disagree and the write-back order matters.
+    """
+    def __init__(self):
+        self.forward_calls = 0
+
+    def predict(self, imgs):
+        self.forward_calls += 1
+        results = []
+        for img in imgs:
+            crack_logit = (img[..., 0].mean() - img[..., 0].astype(np.float32)) / 32
+            results.append(StubResult(np.stack([-crack_logit, crack_logit])))
+        return results
+
+
+def stub_inference_model(model, imgs):
+    """Replacement for mmseg.apis.inference_model working on the stub model"""
+    if isinstance(imgs, (list, tuple)):
+        return model.predict(imgs)
+    return model.predict([imgs])[0]
+
+
+def run_sliding_window(utils, batch_size, img, overlap_ratio=0.5, blend=None):
+    model = StubModel()
+    _, mask = utils.inference_segmentor_sliding_window(
+        model, img.copy(), color_mask=None, window_size=64, overlap_ratio=overlap_ratio, batch_size=batch_size, blend=blend
+    )
+    return model.forward_calls, mask
+
+
+def full_image_blend(utils, img, overlap_ratio, blend):
+    """Reference blending which keeps the whole (C, H, W) probability map in memory"""
+    model = StubModel()
+    windows = utils.sw.generate(img, utils.sw.DimOrder.HeightWidthChannel, 64, overlap_ratio)
+    windows = sorted(windows, key=lambda window: (window.y, window.x))
+    prob_sum = np.zeros((2, img.shape[0], img.shape[1]), dtype=np.float32)
+
+    for window in windows:
+        result = model.predict([img[window.indices()]])[0]
+        weight = utils._window_weight(window.h, window.w, blend)
+        prob_sum[(slice(None),) + window.indices()] += utils._seg_probabilities(result) * weight
+
+    return np.argmax(prob_sum, axis=0).astype(np.uint8)
+
+
+def test_batched_mask_matches_per_window():
+    """배치 추론 결과가 윈도우별 추론 결과와 동일한지 테스트"""
+    print("=== 배치 추론 마스크 일치 테스트 ===")
+
+    try:
+        import utils
+    except ImportError as e:
+        print(f"✗ utils import 실패: {e}")
+        return False
+
+    original_inference_model = utils.inference_model
+    utils.inference_model = stub_inference_model
+
+    try:
+        rng = np.random.default_rng(0)
+        img = rng.integers(0, 255, (200, 330, 3), dtype=np.uint8)
+
+        num_windows = len(utils.sw.generate(img, utils.sw.DimOrder.HeightWidthChannel, 64, 0.5))
+        reference_calls, reference_mask = run_sliding_window(utils, 1, img)
+        assert reference_calls == num_windows
+
+        for batch_size in [2, 4, 7, num_windows, num_windows + 3]:
+            forward_calls, mask = run_sliding_window(utils, batch_size, img)
+
+            assert forward_calls == math.ceil(num_windows / batch_size), f"batch_size={batch_size}: {forward_calls} forward calls"
+            assert np.array_equal(mask, reference_mask), f"batch_size={batch_size}: mask differs from per-window loop"
+            print(f"✓ batch_size={batch_size}: forward {forward_calls}회 (윈도우 {num_windows}개), 마스크 동일")
+    finally:
+        utils.inference_model = original_inference_model
+
+    print("✓ 배치 추론 테스트 완료.\n")
+    return True
+
+
+def test_blended_mask_matches_full_accumulator():
+    """스트립 단위 확률 병합 결과가 전체 이미지 누적 결과와 동일한지 테스트"""
+    print("=== 윈도우 확률 병합 테스트 ===")
+
+    try:
+        import utils
+    except ImportError as e:
+        print(f"✗ utils import 실패: {e}")
+        return False
+
+    original_inference_model = utils.inference_model
+    utils.inference_model = stub_inference_model
+
+    try:
+        rng = np.random.default_rng(1)
+        img = rng.integers(0, 255, (200, 330, 3), dtype=np.uint8)
+
+        for blend in ['cosine', 'gaussian']:
+            for overlap_ratio in [0.0, 0.25, 0.5]:
+                reference_mask = full_image_blend(utils, img, overlap_ratio, blend)
+                _, last_writer_mask = run_sliding_window(utils, 1, img, overlap_ratio)
+
+                for batch_size in [1, 5]:
+                    _, mask = run_sliding_window(utils, batch_size, img, overlap_ratio, blend)
+                    assert np.array_equal(mask, reference_mask), f"{blend}, overlap={overlap_ratio}, batch_size={batch_size}: mask differs"
+
+                changed = np.mean(reference_mask != last_writer_mask)
+                print(f"✓ {blend}, overlap={overlap_ratio}: 전체 누적과 동일 (마지막 윈도우 방식과 {changed:.1%} 차이)")
+
+        # windows which agree everywhere must give the same mask with or without blending
+        uniform_img = np.full((200, 330, 3), 200, dtype=np.uint8)
+        uniform_img[50:60, :, 0] = 0
+        _, last_writer_mask = run_sliding_window(utils, 1, uniform_img)
+        _, blended_mask = run_sliding_window(utils, 4, uniform_img, blend='cosine')
+        assert np.array_equal(blended_mask, last_writer_mask)
+        print("✓ 모든 윈도우가 동일하게 예측하면 병합 결과도 동일")
+    finally:
+        utils.inference_model = original_inference_model
+
+    print("✓ 윈도우 확률 병합 테스트 완료.\n")
+    return True
+
+
+def test_gate_skips_flat_windows():
+    """엣지 에너지 게이트가 평탄한 윈도우를 건너뛰는지 테스트"""
+    print("=== 윈도우 게이트 테스트 ===")
+
+    try:
+        import utils
+    except ImportError as e:
+        print(f"✗ utils import 실패: {e}")
+        return False
+
+    original_inference_model = utils.inference_model
+    utils.inference_model = stub_inference_model
+
+    try:
+        # flat top half (sky / water) and textured bottom half, so the first windows are skipped
+        rng = np.random.default_rng(2)
+        img = np.full((256, 320, 3), 120, dtype=np.uint8)
+        img[128:] = rng.integers(0, 255, (128, 320, 3), dtype=np.uint8)
+
+        assert utils.window_edge_energy(img[:64, :64]) == 0
+        assert utils.window_edge_energy(img[192:, :64]) > 0
+
+        for blend in [None, 'cosine']:
+            window_stats = {}
+            model = StubModel()
+            _, ungated_mask = utils.inference_segmentor_sliding_window(
+                StubModel(), img.copy(), color_mask=None, window_size=64, overlap_ratio=0.5, batch_size=4, blend=blend
+            )
+            _, gated_mask = utils.inference_segmentor_sliding_window(
+                model, img.copy(), color_mask=None, window_size=64, overlap_ratio=0.5, batch_size=4, blend=blend,
+                gate_threshold=1.0, window_stats=window_stats
+            )
+
+            kept_windows = window_stats['windows'] - window_stats['skipped_windows']
+            assert window_stats['skipped_windows'] > 0
+            assert model.forward_calls == math.ceil(kept_windows / 4)
+            assert not gated_mask[:96].any(), "skipped windows must be background"
+            assert np.array_equal(gated_mask[160:], ungated_mask[160:]), "windows away from the skipped area must not change"
+            print(f"✓ blend={blend}: 윈도우 {window_stats['windows']}개 중 {window_stats['skipped_windows']}개 건너뜀")
+
+        # a zero threshold never skips
+        window_stats = {}
+        utils.inference_segmentor_sliding_window(
+            StubModel(), img.copy(), color_mask=None, window_size=64, gate_threshold=0, window_stats=window_stats
+        )
+        assert window_stats['skipped_windows'] == 0
+        print("✓ gate_threshold=0 이면 건너뛰지 않음")
+    finally:
+        utils.inference_model = original_inference_model
+
+    print("✓ 윈도우 게이트 테스트 완료.\n")
+    return True
+
+
+def main():
+    """메인 테스트 함수"""
+    tests = [
+        test_batched_mask_matches_per_window,
+        test_blended_mask_matches_full_accumulator,
+        test_gate_skips_flat_windows,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except Exception as e:
+            print(f"✗ 테스트 실행 중 오류 발생: {e}\n")
+
+    print(f"통과: {passed}/{len(tests)}")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,144 @@
+"""
+Crack Records Test Script
+균열 측정 레코드 테스트 스크립트
+
+This script checks that the column-wise filtering of crack_records keeps the same cracks as the
+previous filter which parsed "(minr,minc)-(maxr,maxc)" / "w.xxxl.xx" strings, and that the
+summaries, table conversions and bounding box masks are correct.
+"""
+
+import sys
+import numpy as np
+
+
+def random_records(num_cracks, seed=0):
+    """Random crack records, some without skeleton (NaN width)"""
+    from crack_records import empty_records
+
+    rng = np.random.default_rng(seed)
+    records = empty_records(num_cracks)
+    records['min_row'] = rng.integers(0, 900, num_cracks)
+    records['min_col'] = rng.integers(0, 900, num_cracks)
+    records['max_row'] = records['min_row'] + rng.integers(1, 100, num_cracks)
+    records['max_col'] = records['min_col'] + rng.integers(1, 100, num_cracks)
+    records['area'] = rng.integers(1, 2000, num_cracks)
+    records['width'] = np.round(rng.uniform(0, 8, num_cracks), 2)
+    records['width'][rng.random(num_cracks) < 0.05] = np.nan
+    records['length'] = rng.integers(0, 300, num_cracks)
+    records['class_id'] = 1
+
+    return records
+
+
+def legacy_filter(results, min_area=None, min_width=None, min_length=None):
+    """The string parsing filter previously in enhanced_crack_inference.filter_crack_by_size"""
+    filtered_results = []
+
+    for coordinates, measurements, _ in results:
+        width, length = map(float, measurements.split('x'))
+
+        coord_parts = coordinates.replace('(', '').replace(')', '').split('-')
+        min_coords = tuple(map(int, coord_parts[0].split(',')))
+        max_coords = tuple(map(int, coord_parts[1].split(',')))
+        area = (max_coords[0] - min_coords[0]) * (max_coords[1] - min_coords[1])
+
+        if min_area and area < min_area:
+            continue
+        if min_width and width < min_width:
+            continue
+        if min_length and length < min_length:
+            continue
+
+        filtered_results.append(coordinates)
+
+    return filtered_results
+
+
+def test_filter_matches_string_filter():
+    """열 단위 필터링 결과가 문자열 파싱 필터링 결과와 동일한지 테스트"""
+    print("=== 크랙 필터링 일치 테스트 ===")
+
+    try:
+        from crack_records import filter_records
+    except ImportError as e:
+        print(f"✗ crack_records import 실패: {e}")
+        return False
+
+    records = random_records(2000)
+    strings = [
+        [f"({r['min_row']},{r['min_col']})-({r['max_row']},{r['max_col']})", f"{r['width']:.2f}x{r['length']:.2f}", 1]
+        for r in records
+    ]
+
+    for criteria in [{}, {'min_area': 2500}, {'min_width': 3}, {'min_length': 100}, {'min_area': 1000, 'min_width': 2, 'min_length': 50}]:
+        filtered = filter_records(records, **criteria)
+        expected = legacy_filter(strings, **criteria)
+        assert [f"({r['min_row']},{r['min_col']})-({r['max_row']},{r['max_col']})" for r in filtered] == expected, criteria
+        print(f"✓ {criteria}: {len(filtered)}개 동일")
+
+    assert len(filter_records(records[:0], min_area=10)) == 0
+    print("✓ 크랙 필터링 일치 테스트 완료.\n")
+    return True
+
+
+def test_summary_and_tables():
+    """요약, 테이블 변환, 바운딩 박스 마스크 테스트"""
+    print("=== 크랙 요약 / 테이블 테스트 ===")
+
+    try:
+        from crack_records import (CRACK_RECORD_DTYPE, empty_records, summarize_records,
+                                   records_to_dataframe, records_from_dataframe, bbox_mask)
+    except ImportError as e:
+        print(f"✗ crack_records import 실패: {e}")
+        return False
+
+    records = random_records(300, seed=1)
+    summary = summarize_records(records)
+    assert summary['count'] == 300
+    assert summary['max_width'] == np.nanmax(records['width']) and summary['max_length'] == records['length'].max()
+
+    empty_summary = summarize_records(empty_records())
+    assert empty_summary['count'] == 0 and np.isnan(empty_summary['max_width'])
+    print("✓ 크랙 개수 / 최대 폭 / 최대 길이")
+
+    df = records_to_dataframe(records, 'image.png')
+    assert list(df.columns) == ['Image_Name'] + list(CRACK_RECORD_DTYPE.names)
+    assert (df['Image_Name'] == 'image.png').all()
+    restored = records_from_dataframe(df)
+    assert restored.dtype == CRACK_RECORD_DTYPE
+    assert all(np.array_equal(restored[name], records[name], equal_nan=True) for name in CRACK_RECORD_DTYPE.names)
+    print("✓ DataFrame 변환 왕복")
+
+    mask = bbox_mask(records, (950, 1000))
+    expected = np.zeros((950, 1000), dtype=np.uint8)
+    for record in records:
+        expected[record['min_row']:record['max_row'], record['min_col']:record['max_col']] = 1
+    assert np.array_equal(mask, expected)
+    print("✓ 바운딩 박스 마스크")
+
+    print("✓ 크랙 요약 / 테이블 테스트 완료.\n")
+    return True
+
+
+def main():
+    """메인 테스트 함수"""
+    tests = [
+        test_filter_matches_string_filter,
+        test_summary_and_tables,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except Exception as e:
+            print(f"✗ 테스트 실행 중 오류 발생: {e}\n")
+
+    print(f"통과: {passed}/{len(tests)}")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,201 @@
+"""
+Damage Index Test Script
+손상 인덱스 테스트 스크립트
+
+This script checks that damage_index upserts the images of each batch (a re-run replaces the row, or removes it
+when the image has no damage any more), keeps images of the same name from different surveys apart, migrates the
+version 1 schema, keeps images without a location out of the R-tree, derives the survey date, and that the PyDracula
+reader pages through bounding box, attribute and date filters like filtering in pandas.
+"""
+
+import os
+import sys
+import sqlite3
+import tempfile
+import numpy as np
+import pandas as pd
+
+
+def make_images(num_images, seed=0):
+    """Image table of one run, dates in the names of half of the images"""
+    from result_store import IMAGE_COLUMNS
+
+    rng = np.random.default_rng(seed)
+    rows = []
+    for i in range(num_images):
+        name = f'IMG_2024{1 + i % 12:02d}15_{i}.jpg' if i % 2 == 0 else f'image_{i}.jpg'
+        rows.append([37.4 + rng.uniform(0, 0.3), 126.8 + rng.uniform(0, 0.4), name,
+                     int(rng.integers(1, 20)), rng.uniform(0, 8), rng.uniform(0, 500)])
+
+    return pd.DataFrame(rows, columns=IMAGE_COLUMNS)
+
+
+def test_upsert():
+    """배치 추가, 재실행 시 교체, 위치 없는 이미지, 조사 날짜 테스트"""
+    print("=== 손상 인덱스 추가 테스트 ===")
+
+    try:
+        from damage_index import DamageIndex, survey_date
+    except ImportError as e:
+        print(f"✗ damage_index import 실패: {e}")
+        return False
+
+    assert survey_date('a/IMG_20231201_37.5665_126.9780.png') == '2023-12-01'
+    assert survey_date('image_1.jpg', '20240305-101010-000000') == '2024-03-05'
+    assert survey_date('IMG_20231301.png') is None and survey_date('image_1.jpg') is None
+    print("✓ 파일 이름 / 실행 id의 조사 날짜")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        index = DamageIndex(os.path.join(tmp_dir, 'index', 'damage_index.sqlite'))
+        images = make_images(100)
+        index.upsert(images.iloc[:60], '20240101-000000-000000')
+        index.upsert(images.iloc[60:], '20240101-000000-000000')
+        assert index.count() == 100
+
+        # a re-run replaces the rows and the R-tree entries of its images
+        moved = images.iloc[:10].copy()
+        moved['latitude'] = 35.0
+        moved.loc[0, ['latitude', 'longitude']] = np.nan
+        index.upsert(moved, '20240201-000000-000000')
+        conn = index.conn
+        assert index.count() == 100
+        assert conn.execute('SELECT COUNT(*) FROM damage_rtree').fetchone()[0] == 99
+        assert conn.execute('SELECT COUNT(*) FROM damage_rtree WHERE min_lat < 36').fetchone()[0] == 9
+        assert conn.execute("SELECT COUNT(*) FROM damages WHERE run = '20240201-000000-000000'").fetchone()[0] == 10
+        print("✓ 재실행 시 행 / R-tree 교체, 위치 없는 이미지 제외")
+        index.close()
+
+        # a re-run through the result writer which finds no crack any more removes the row and the R-tree entry
+        from result_writer import open_result_writer
+
+        cleared = images.iloc[10:15].copy()
+        cleared['crack_count'] = 0
+        cleared[['max_width', 'max_length']] = 0.0
+        index_path = os.path.join(tmp_dir, 'index', 'damage_index.sqlite')
+        with open_result_writer(index_path=index_path) as writer:
+            for image_row in pd.concat([cleared, images.iloc[15:20]]).values.tolist():
+                writer.add(image_row)
+        index = DamageIndex(index_path)
+        conn = index.conn
+        assert index.count() == 95
+        assert conn.execute('SELECT COUNT(*) FROM damage_rtree').fetchone()[0] == 94
+        assert conn.execute('SELECT COUNT(*) FROM damages WHERE image_path IN (%s)' % ','.join('?' * 5),
+                            cleared['image_path'].tolist()).fetchone()[0] == 0
+        print("✓ 재실행에서 손상이 없어진 이미지 제거")
+
+        # the same camera file names in another survey are other images, a re-run of one survey keeps the other
+        index.upsert(images.iloc[20:30], '20240301-000000-000000', survey='/surveys/b')
+        index.upsert(images.iloc[20:25], '20240401-000000-000000', survey='/surveys/b')
+        assert index.count() == 105
+        assert conn.execute('SELECT COUNT(*) FROM damage_rtree').fetchone()[0] == 104
+        assert conn.execute("SELECT run FROM damages WHERE survey = '' AND image_path = ?",
+                            (images['image_path'][20],)).fetchone()[0] == '20240101-000000-000000'
+        assert conn.execute("SELECT run, survey_date FROM damages WHERE survey = '/surveys/b' AND image_path = ?",
+                            (images['image_path'][21],)).fetchone() == ('20240401-000000-000000', '2024-03-01')
+        print("✓ 조사별로 같은 이름의 이미지 구분")
+        index.close()
+
+        # a version 1 database (rows keyed by image_path alone) keeps its rows and R-tree entries
+        v1_path = os.path.join(tmp_dir, 'damage_index_v1.sqlite')
+        v1 = sqlite3.connect(v1_path)
+        v1.executescript("""
+            CREATE TABLE damages (id INTEGER PRIMARY KEY, image_path TEXT NOT NULL UNIQUE, run TEXT, survey_date TEXT,
+                latitude REAL, longitude REAL, crack_count INTEGER, max_width REAL, max_length REAL, indexed_at TEXT);
+            CREATE VIRTUAL TABLE damage_rtree USING rtree(id, min_lat, max_lat, min_lon, max_lon);
+            CREATE INDEX damages_max_width ON damages (max_width);
+            INSERT INTO damages VALUES (7, 'DJI_0001.JPG', 'r', '2024-01-01', 37.5, 127.0, 3, 1.0, 10.0, NULL);
+            INSERT INTO damage_rtree VALUES (7, 37.5, 37.5, 127.0, 127.0);
+            PRAGMA user_version = 1;
+        """)
+        v1.close()
+        index = DamageIndex(v1_path)
+        index.upsert(images.iloc[:1].assign(image_path='DJI_0001.JPG'), '20240501-000000-000000', survey='/surveys/c')
+        assert index.conn.execute('PRAGMA user_version').fetchone()[0] == 2
+        assert index.conn.execute("SELECT id FROM damages WHERE survey = ''").fetchall() == [(7,)]
+        assert index.count() == 2 and index.conn.execute('SELECT COUNT(*) FROM damage_rtree').fetchone()[0] == 2
+        print("✓ 버전 1 인덱스 변환")
+        index.close()
+
+    print("✓ 손상 인덱스 추가 테스트 완료.\n")
+    return True
+
+
+def test_reader_queries():
+    """뷰어의 영역 / 속성 / 날짜 필터와 페이지 조회 테스트"""
+    print("=== 손상 인덱스 조회 테스트 ===")
+
+    try:
+        from damage_index import DamageIndex, DamageIndexReader, survey_date
+    except ImportError as e:
+        print(f"✗ damage_index import 실패: {e}")
+        return False
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'damage_index.sqlite')
+        index = DamageIndex(path)
+        images = make_images(1000, seed=1)
+        index.upsert(images, '20240101-000000-000000')
+        images['survey_date'] = [survey_date(name, '20240101-000000-000000') for name in images['image_path']]
+
+        reader = DamageIndexReader(path)
+        bbox = (37.45, 126.9, 37.6, 127.1)
+        filters = {'bbox': bbox, 'min_width': 2.0, 'date_from': '2024-03-01', 'date_to': '2024-09-30'}
+        expected = images[images['latitude'].between(bbox[0], bbox[2]) & images['longitude'].between(bbox[1], bbox[3]) &
+                          (images['max_width'] >= 2.0) & images['survey_date'].between('2024-03-01', '2024-09-30')]
+
+        # pages of 20 rows after the last id, together the matching rows in id order
+        pages, after_id = [], None
+        while True:
+            page = reader.query(after_id=after_id, limit=20, **filters)
+            pages.extend(page)
+            if len(page) < 20:
+                break
+            after_id = page[-1]['id']
+
+        assert [item['image_path'] for item in pages] == expected['image_path'].tolist()
+        assert reader.count(**filters) == len(expected) > 20
+        assert np.allclose(reader.center(**filters), [expected['latitude'].mean(), expected['longitude'].mean()])
+        assert pages[0]['name'] == f"항목 {pages[0]['id']}"
+        print(f"✓ 필터 결과 {len(expected)}개, 페이지 {len(pages) // 20 + 1}개")
+
+        # grid clusters of the map: every matching damage in one cell of cell_size degrees
+        cell_size = 0.05
+        clusters = reader.clusters(cell_size, **filters)
+        cells = expected.groupby([((expected['latitude'] + 90) // cell_size), ((expected['longitude'] + 180) // cell_size)])
+        assert sorted(count for count, _, _ in clusters) == sorted(cells.size().tolist())
+        assert np.isclose(sum(count * latitude for count, latitude, _ in clusters), expected['latitude'].sum())
+        print(f"✓ 지도 클러스터 {len(clusters)}개")
+
+        assert reader.count() == 1000 and len(reader.query(limit=200)) == 200
+        assert reader.center(min_width=100.0) is None
+        print("✓ 필터 없는 조회 / 빈 결과")
+
+        reader.close()
+        index.close()
+
+    print("✓ 손상 인덱스 조회 테스트 완료.\n")
+    return True
+
+
+def main():
+    """메인 테스트 함수"""
+    tests = [
+        test_upsert,
+        test_reader_queries,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except Exception as e:
+            print(f"✗ 테스트 실행 중 오류 발생: {e}\n")
+
+    print(f"통과: {passed}/{len(tests)}")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
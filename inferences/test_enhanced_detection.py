@@ -35,17 +35,17 @@ def test_filter_function():
     """크기 필터링 함수 테스트"""
     print("=== 크기 필터링 함수 테스트 ===")
     
-    # 테스트 데이터 생성
-    test_results = [
-        ["(100,100)-(200,200)", "5.0x50.0", 1],  # 큰 크랙
-        ["(300,300)-(310,310)", "1.0x5.0", 1],   # 작은 크랙 (필터링됨)
-        ["(400,400)-(450,450)", "4.0x60.0", 1],  # 중간 크랙
-        ["(500,500)-(502,502)", "0.5x2.0", 1],   # 매우 작은 크랙 (필터링됨)
-    ]
-    
     # 필터링 함수 import 및 테스트
     try:
         from enhanced_crack_inference import filter_crack_by_size
+        from crack_records import empty_records
+        
+        # 테스트 데이터 생성 (바운딩 박스, 폭, 길이)
+        test_results = empty_records(4)
+        test_results['min_row'] = test_results['min_col'] = [100, 300, 400, 500]
+        test_results['max_row'] = test_results['max_col'] = [200, 310, 450, 502]
+        test_results['width'] = [5.0, 1.0, 4.0, 0.5]   # 큰 크랙, 작은 크랙, 중간 크랙, 매우 작은 크랙
+        test_results['length'] = [50.0, 5.0, 60.0, 2.0]
         
         # 기본 필터링 테스트
         filtered = filter_crack_by_size(test_results)
@@ -61,6 +61,10 @@ def test_filter_function():
         )
         print(f"강화 필터링 후: {len(filtered_strict)}개")
         
+        filtered_size = filter_crack_by_size(test_results, min_area=500, min_width=2, min_length=10)
+        assert filtered_size['width'].tolist() == [5.0, 4.0]
+        print(f"크기 기준 필터링 후: {len(filtered_size)}개")
+        
         print("✓ 크기 필터링 함수가 정상 작동합니다.\n")
         return True
         
@@ -0,0 +1,261 @@
+"""
+Inference Server Test Script
+추론 서버 테스트 스크립트
+
+This script checks inference_server.py and inference_client.py: a server on a free local port with a
+stub model answers /health, array jobs, path jobs and stream path jobs with the same masks and window
+counts as inference_segmentor_sliding_window run locally, multi-scale jobs with the same masks, probability
+maps and windows per scale as inference_segmentor_multi_scale, and bad jobs and an unreachable server are
+reported to the client. No GPU or checkpoint is needed.
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import contextlib
+
+import cv2
+import numpy as np
+
+from test_batched_inference import stub_inference_model
+from test_multi_scale_inference import ContrastStubModel, crack_image
+
+
+JOB_PARAMS = {'window_size': 64, 'overlap_ratio': 0.25, 'batch_size': 8, 'blend': 'cosine'}
+MULTI_SCALE_JOB_PARAMS = {'coarse_scale': 0.25, 'refine_scales': (1.0, 2.0), 'roi_threshold': 0.2, 'roi_margin': 16,
+                          'window_size': 64, 'overlap_ratio': 0.25, 'batch_size': 8, 'blend': 'cosine'}
+
+
+@contextlib.contextmanager
+def running_server():
+    """Inference server with a stub model on a free local port, yields (client, inference)"""
+    from inference_server import InferenceServer, serve
+    from inference_client import InferenceClient
+
+    model = ContrastStubModel()
+    model.dataset_meta = {'classes': ('background', 'crack'), 'palette': [[0, 0, 0], [255, 0, 0]]}
+    inference = InferenceServer(model, {'config': 'stub.py', 'checkpoint': 'stub.pth', 'device': 'cpu'})
+
+    server = serve(inference, '127.0.0.1', 0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield InferenceClient(f'http://127.0.0.1:{server.server_address[1]}'), inference
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_array_jobs():
+    """배열로 보낸 작업의 결과가 직접 추론과 같은지, 상태 조회와 워밍업 테스트"""
+    print("=== 배열 작업 테스트 ===")
+
+    try:
+        import utils
+    except ImportError as e:
+        print(f"✗ utils import 실패: {e}")
+        return False
+
+    original_inference_model = utils.inference_model
+    utils.inference_model = stub_inference_model
+
+    try:
+        with running_server() as (client, inference):
+            warmup_seconds = inference.warm_up(runs=1, window_size=64, batch_size=2)
+            assert inference.model.windows == 2
+
+            health = client.health()
+            assert health['checkpoint'] == 'stub.pth' and health['palette'][1] == [255, 0, 0]
+            assert health['classes'] == ['background', 'crack'] and health['jobs'] == 0 and not health['busy']
+            assert client.is_available()
+            print(f"✓ 상태 조회: {health['checkpoint']}, 워밍업 {warmup_seconds:.3f}초")
+
+            img = crack_image()
+            for params in [JOB_PARAMS, dict(JOB_PARAMS, roi_scale=0.25, roi_margin=32), dict(JOB_PARAMS, blend=None, gate_threshold=None)]:
+                window_stats = {}
+                _, reference_mask = utils.inference_segmentor_sliding_window(
+                    ContrastStubModel(), img.copy(), color_mask=None, window_stats=window_stats, **params
+                )
+
+                mask, job_stats = client.infer_array(img, **params)
+                assert mask.dtype == np.uint8 and np.array_equal(mask, reference_mask)
+                assert job_stats == window_stats, f"{job_stats} != {window_stats}"
+            assert client.health()['jobs'] == 3
+            print("✓ 배열 작업 3개 (일반 / ROI / 병합 없음): 직접 추론과 같은 마스크 / 윈도우 수")
+    finally:
+        utils.inference_model = original_inference_model
+
+    print("✓ 배열 작업 테스트 완료.\n")
+    return True
+
+
+def test_path_jobs():
+    """파일 경로로 보낸 작업 (일반 / 스트리밍) 테스트"""
+    print("=== 경로 작업 테스트 ===")
+
+    try:
+        import utils
+    except ImportError as e:
+        print(f"✗ utils import 실패: {e}")
+        return False
+
+    original_inference_model = utils.inference_model
+    utils.inference_model = stub_inference_model
+
+    try:
+        with running_server() as (client, _), tempfile.TemporaryDirectory() as tmp_dir:
+            img = crack_image(300, 400, seed=2)
+            img_path = os.path.join(tmp_dir, 'image.png')
+            cv2.imwrite(img_path, img)
+
+            _, reference_mask = utils.inference_segmentor_sliding_window(
+                ContrastStubModel(), img.copy(), color_mask=None, **JOB_PARAMS
+            )
+            assert reference_mask.any()
+
+            mask, _ = client.infer_path(img_path, **JOB_PARAMS)
+            assert np.array_equal(mask, reference_mask)
+            print("✓ 경로 작업: 직접 추론과 같은 마스크")
+
+            # the stream job mask is read into the given array (e.g. a disk-backed mask), chunk by chunk
+            out = np.zeros(img.shape[:2], dtype=bool)
+            mask, job_stats = client.infer_path(img_path, out=out, stream=True, **JOB_PARAMS)
+            assert np.shares_memory(mask, out) and np.array_equal(out, reference_mask.astype(bool))
+            print(f"✓ 스트리밍 경로 작업: 출력 배열에 마스크 기록 (윈도우 {job_stats['windows']}개)")
+    finally:
+        utils.inference_model = original_inference_model
+
+    print("✓ 경로 작업 테스트 완료.\n")
+    return True
+
+
+def test_multi_scale_jobs():
+    """다중 스케일 작업 (배열 / 확률 지도 / 스트리밍 경로)의 결과가 직접 추론과 같은지 테스트"""
+    print("=== 다중 스케일 작업 테스트 ===")
+
+    try:
+        import utils
+    except ImportError as e:
+        print(f"✗ utils import 실패: {e}")
+        return False
+
+    original_inference_model = utils.inference_model
+    utils.inference_model = stub_inference_model
+
+    def windows_per_scale(scale_stats):
+        return {scale: (stats['windows'], stats['total_windows']) for scale, stats in scale_stats.items()}
+
+    try:
+        with running_server() as (client, _), tempfile.TemporaryDirectory() as tmp_dir:
+            img = crack_image(300, 400, seed=3)
+            img_path = os.path.join(tmp_dir, 'image.png')
+            cv2.imwrite(img_path, img)
+
+            reference_stats = {}
+            reference_prob = np.zeros(img.shape[:2], dtype=np.float32)
+            _, reference_mask = utils.inference_segmentor_multi_scale(
+                ContrastStubModel(), img.copy(), color_mask=None, prob_output=reference_prob, scale_stats=reference_stats,
+                **MULTI_SCALE_JOB_PARAMS
+            )
+            assert reference_mask.any()
+
+            mask, scale_stats = client.infer_multi_scale_array(img, **MULTI_SCALE_JOB_PARAMS)
+            assert mask.dtype == np.uint8 and np.array_equal(mask, reference_mask)
+            assert windows_per_scale(scale_stats) == windows_per_scale(reference_stats), f"{scale_stats} != {reference_stats}"
+            print(f"✓ 배열 작업: 직접 추론과 같은 마스크 / 배율별 윈도우 수 {windows_per_scale(scale_stats)}")
+
+            # with a probability output only the probability is sent, the mask is derived from it
+            prob_out = np.zeros(img.shape[:2], dtype=np.float32)
+            mask, _ = client.infer_multi_scale_array(img, prob_out=prob_out, **MULTI_SCALE_JOB_PARAMS)
+            assert np.array_equal(prob_out, reference_prob) and np.array_equal(mask, reference_mask)
+            print("✓ 확률 지도 작업: 직접 추론과 같은 확률 지도와 마스크")
+
+            out = np.zeros(img.shape[:2], dtype=bool)
+            prob_out = np.zeros(img.shape[:2], dtype=np.float32)
+            mask, scale_stats = client.infer_multi_scale_path(img_path, out=out, prob_out=prob_out, stream=True, **MULTI_SCALE_JOB_PARAMS)
+            assert np.shares_memory(mask, out) and np.array_equal(out, reference_mask.astype(bool))
+            assert np.array_equal(prob_out, reference_prob)
+            assert windows_per_scale(scale_stats) == windows_per_scale(reference_stats)
+            print("✓ 스트리밍 경로 작업: 출력 배열에 마스크와 확률 지도 기록")
+    finally:
+        utils.inference_model = original_inference_model
+
+    print("✓ 다중 스케일 작업 테스트 완료.\n")
+    return True
+
+
+def test_errors():
+    """잘못된 작업과 연결할 수 없는 서버 오류 테스트"""
+    print("=== 오류 처리 테스트 ===")
+
+    try:
+        import utils
+        from inference_client import InferenceClient
+    except ImportError as e:
+        print(f"✗ utils import 실패: {e}")
+        return False
+
+    original_inference_model = utils.inference_model
+    utils.inference_model = stub_inference_model
+
+    try:
+        with running_server() as (client, _):
+            for job, message in [
+                (lambda: client.infer_path('/no/such/image.png'), 'No such image'),
+                (lambda: client.infer_array(np.zeros((64, 64), dtype=np.uint8)), 'Expected an image'),
+                (lambda: client.infer_array(np.zeros((64, 64, 3), dtype=np.uint8), blend='median'), 'Unsupported blend mode'),
+                (lambda: client.infer_array(np.zeros((64, 64, 3), dtype=np.uint8), window=64), 'Unknown inference parameter'),
+                (lambda: client.infer_multi_scale_array(np.zeros((64, 64, 3), dtype=np.uint8), roi_scale=0.25), 'Unknown inference parameter'),
+            ]:
+                try:
+                    job()
+                except (ValueError, RuntimeError) as e:
+                    assert message in str(e), str(e)
+                else:
+                    raise AssertionError(f"No error for: {message}")
+
+            # the server keeps serving after bad jobs
+            mask, _ = client.infer_array(crack_image(200, 300), **JOB_PARAMS)
+            assert mask.shape == (200, 300)
+            print("✓ 잘못된 작업은 오류로 보고되고 서버는 계속 동작")
+
+        try:
+            client.health()
+        except ConnectionError as e:
+            assert 'not reachable' in str(e)
+        else:
+            raise AssertionError('No error for a stopped server')
+        assert not InferenceClient(client.url).is_available()
+        print("✓ 종료된 서버: ConnectionError")
+    finally:
+        utils.inference_model = original_inference_model
+
+    print("✓ 오류 처리 테스트 완료.\n")
+    return True
+
+
+def main():
+    """메인 테스트 함수"""
+    tests = [
+        test_array_jobs,
+        test_path_jobs,
+        test_multi_scale_jobs,
+        test_errors,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except Exception as e:
+            print(f"✗ 테스트 실행 중 오류 발생: {e}\n")
+
+    print(f"통과: {passed}/{len(tests)}")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,270 @@
+"""
+Multi-Scale Inference Test Script
+다중 스케일 추론 테스트 스크립트
+
+This script checks utils.inference_segmentor_multi_scale: refining every window at the native scale
+gives the blended sliding window mask, a thin crack found by the coarse pass is refined with a fraction
+of the full resolution windows, upscaled refinement and the per-scale statistics work, and a strip reader
+with disk-backed outputs gives the result of the image in memory.
+A stub model is used, so no GPU or checkpoint is needed.
+"""
+
+import sys
+import numpy as np
+
+from test_batched_inference import StubResult, stub_inference_model
+
+
+class ContrastStubModel():
+    """
+    Stub segmentor. A pixel is 'crack' when it is much darker than the mean of its window,
+    flat windows are confidently background.
+    """
+    def __init__(self):
+        self.windows = 0
+
+    def predict(self, imgs):
+        self.windows += len(imgs)
+        results = []
+        for img in imgs:
+            crack_logit = (img[..., 0].mean() - img[..., 0].astype(np.float32)) / 8 - 2
+            results.append(StubResult(np.stack([-crack_logit, crack_logit])))
+        return results
+
+
+def crack_image(height=512, width=768, seed=0):
+    """Flat gray image with slight noise and a thin dark crack in its top left part"""
+    rng = np.random.default_rng(seed)
+    img = np.full((height, width, 3), 150, dtype=np.uint8) + rng.integers(0, 4, (height, width, 3), dtype=np.uint8)
+    for x in range(40, 260):
+        y = 60 + (x - 40) // 3
+        img[y:y + 2, x] = 40
+    return img
+
+
+def test_full_refinement_matches_sliding_window():
+    """모든 윈도우를 원본 해상도로 정밀 추론하면 슬라이딩 윈도우 병합 결과와 동일한지 테스트"""
+    print("=== 전체 정밀 추론 일치 테스트 ===")
+
+    try:
+        import utils
+    except ImportError as e:
+        print(f"✗ utils import 실패: {e}")
+        return False
+
+    original_inference_model = utils.inference_model
+    utils.inference_model = stub_inference_model
+
+    try:
+        rng = np.random.default_rng(3)
+        img = rng.integers(0, 255, (200, 330, 3), dtype=np.uint8)
+
+        for blend in ['cosine', 'gaussian']:
+            _, reference_mask = utils.inference_segmentor_sliding_window(
+                ContrastStubModel(), img.copy(), color_mask=None, window_size=64, overlap_ratio=0.5, batch_size=4, blend=blend
+            )
+
+            # a zero threshold makes every pixel a candidate, so every native window is refined
+            scale_stats = {}
+            _, mask = utils.inference_segmentor_multi_scale(
+                ContrastStubModel(), img.copy(), color_mask=None, coarse_scale=0.5, refine_scales=(1.0,), roi_threshold=0,
+                window_size=64, overlap_ratio=0.5, batch_size=4, blend=blend, scale_stats=scale_stats
+            )
+
+            assert scale_stats[1.0]['windows'] == scale_stats[1.0]['total_windows']
+            assert np.array_equal(mask, reference_mask), f"{blend}: {np.mean(mask != reference_mask):.4%} of the pixels differ"
+            print(f"✓ {blend}: 윈도우 {scale_stats[1.0]['windows']}개 정밀 추론, 슬라이딩 윈도우 결과와 동일")
+    finally:
+        utils.inference_model = original_inference_model
+
+    print("✓ 전체 정밀 추론 일치 테스트 완료.\n")
+    return True
+
+
+def test_coarse_pass_limits_refined_windows():
+    """저해상도 탐색 결과 주변만 정밀 추론하여 원본 해상도 재현율을 유지하는지 테스트"""
+    print("=== 후보 영역 정밀 추론 테스트 ===")
+
+    try:
+        import utils
+    except ImportError as e:
+        print(f"✗ utils import 실패: {e}")
+        return False
+
+    original_inference_model = utils.inference_model
+    utils.inference_model = stub_inference_model
+
+    try:
+        img = crack_image()
+
+        full_model = ContrastStubModel()
+        _, full_mask = utils.inference_segmentor_sliding_window(
+            full_model, img.copy(), color_mask=None, window_size=64, overlap_ratio=0.25, batch_size=8, blend='cosine'
+        )
+        full_mask = full_mask.astype(bool)
+        assert full_mask[:200, :300].any() and not full_mask[300:, 400:].any()
+
+        model = ContrastStubModel()
+        scale_stats = {}
+        prob_output = np.zeros(img.shape[:2], dtype=np.float32)
+        _, mask = utils.inference_segmentor_multi_scale(
+            model, img.copy(), color_mask=None, coarse_scale=0.25, refine_scales=(1.0,), roi_threshold=0.2, roi_margin=32,
+            window_size=64, overlap_ratio=0.25, batch_size=8, blend='cosine', prob_output=prob_output, scale_stats=scale_stats
+        )
+        mask = mask.astype(bool)
+
+        refined = scale_stats[1.0]
+        recall = (mask & full_mask).sum() / full_mask.sum()
+        assert refined['windows'] < refined['total_windows'] / 2, f"{refined['windows']}/{refined['total_windows']} windows refined"
+        assert model.windows == refined['windows'] + scale_stats[0.25]['windows']
+        assert recall > 0.99, f"recall {recall:.4f}"
+        assert not mask[300:, 400:].any()
+        assert np.array_equal(mask, prob_output > 0.5) and prob_output.min() >= 0 and prob_output.max() <= 1
+        print(f"✓ 원본 윈도우 {refined['total_windows']}개 중 {refined['windows']}개만 정밀 추론 "
+              f"(저해상도 {scale_stats[0.25]['windows']}개), 재현율 {recall:.4f}")
+
+        # without candidates nothing is refined and the mask is empty
+        flat = np.full((256, 256, 3), 150, dtype=np.uint8)
+        scale_stats = {}
+        _, flat_mask = utils.inference_segmentor_multi_scale(
+            ContrastStubModel(), flat, color_mask=None, coarse_scale=0.25, window_size=64, scale_stats=scale_stats
+        )
+        assert scale_stats[1.0]['windows'] == 0 and not flat_mask.any()
+        print("✓ 후보가 없으면 정밀 추론하지 않음")
+    finally:
+        utils.inference_model = original_inference_model
+
+    print("✓ 후보 영역 정밀 추론 테스트 완료.\n")
+    return True
+
+
+def test_upscaled_refinement_and_stats():
+    """확대 스케일 정밀 추론과 스케일별 통계 누적 테스트"""
+    print("=== 확대 스케일 / 스케일별 통계 테스트 ===")
+
+    try:
+        import utils
+    except ImportError as e:
+        print(f"✗ utils import 실패: {e}")
+        return False
+
+    original_inference_model = utils.inference_model
+    utils.inference_model = stub_inference_model
+
+    try:
+        img = crack_image(300, 400, seed=1)
+
+        scale_stats = {}
+        for _ in range(2):
+            _, mask = utils.inference_segmentor_multi_scale(
+                ContrastStubModel(), img.copy(), color_mask=None, coarse_scale=0.25, refine_scales=(1.0, 2.0), roi_margin=16,
+                window_size=64, overlap_ratio=0.25, batch_size=8, scale_stats=scale_stats
+            )
+            assert mask.shape == img.shape[:2]
+
+        assert set(scale_stats) == {0.25, 1.0, 2.0}
+        assert all(stats['seconds'] > 0 and stats['windows'] <= stats['total_windows'] for stats in scale_stats.values())
+
+        # two images: the counts are the sums of both
+        single_stats = {}
+        utils.inference_segmentor_multi_scale(
+            ContrastStubModel(), img.copy(), color_mask=None, coarse_scale=0.25, refine_scales=(1.0, 2.0), roi_margin=16,
+            window_size=64, overlap_ratio=0.25, batch_size=8, scale_stats=single_stats
+        )
+        assert all(scale_stats[scale]['windows'] == 2 * single_stats[scale]['windows'] for scale in single_stats)
+
+        # the upscaled windows cover a quarter of the area of the native windows
+        assert scale_stats[2.0]['total_windows'] > 3 * scale_stats[1.0]['total_windows']
+        assert mask[60:140, 40:260].any() and not mask[220:, 300:].any()
+        for scale, stats in sorted(scale_stats.items()):
+            print(f"✓ x{scale:g}: 윈도우 {stats['windows']}/{stats['total_windows']}개, {stats['seconds']:.3f}초")
+
+        # a colored overlay is drawn on the crack pixels
+        color = np.array([0, 0, 255], dtype=np.uint8)
+        img_result, mask = utils.inference_segmentor_multi_scale(
+            ContrastStubModel(), img.copy(), color_mask=color, alpha=1.0, coarse_scale=0.25, window_size=64
+        )
+        assert (img_result[mask.astype(bool)] == color).all()
+        print("✓ 크랙 픽셀에 색상 표시")
+    finally:
+        utils.inference_model = original_inference_model
+
+    print("✓ 확대 스케일 / 스케일별 통계 테스트 완료.\n")
+    return True
+
+
+def test_strip_reader_multi_scale():
+    """strip reader 입력의 다중 스케일 추론이 메모리 이미지 입력과 동일한지 테스트"""
+    print("=== strip reader 다중 스케일 추론 테스트 ===")
+
+    try:
+        import utils
+        from strip_reader import ArrayStripReader, create_disk_backed_array, create_disk_backed_mask
+    except ImportError as e:
+        print(f"✗ utils import 실패: {e}")
+        return False
+
+    original_inference_model = utils.inference_model
+    original_fuse_rows = utils.FUSE_ROWS
+    utils.inference_model = stub_inference_model
+
+    try:
+        img = crack_image(400, 520, seed=2)
+        params = dict(color_mask=None, coarse_scale=0.25, refine_scales=(1.0, 2.0), roi_margin=16, window_size=64,
+                      overlap_ratio=0.25, batch_size=8)
+
+        reference_stats = {}
+        reference_prob = np.zeros(img.shape[:2], dtype=np.float32)
+        _, reference_mask = utils.inference_segmentor_multi_scale(
+            ContrastStubModel(), img.copy(), prob_output=reference_prob, scale_stats=reference_stats, **params
+        )
+
+        # the probability maps are fused in bands of a few rows, the outputs are temporary files
+        utils.FUSE_ROWS = 48
+        reader = ArrayStripReader(img.copy())
+        reader_stats = {}
+        prob_output = create_disk_backed_array(img.shape[:2], np.float32)
+        mask_output = create_disk_backed_mask(img.shape)
+        img_result, mask = utils.inference_segmentor_multi_scale(
+            ContrastStubModel(), reader, prob_output=prob_output, mask_output=mask_output, scale_stats=reader_stats, **params
+        )
+
+        assert img_result is None and isinstance(mask, np.memmap)
+        assert [(scale, stats['windows']) for scale, stats in sorted(reader_stats.items())] == \
+            [(scale, stats['windows']) for scale, stats in sorted(reference_stats.items())]
+        assert np.array_equal(np.asarray(mask), reference_mask) and reference_mask.any()
+        assert np.array_equal(np.asarray(prob_output), reference_prob)
+        print(f"✓ strip reader: 정밀 추론 윈도우 {reader_stats[1.0]['windows'] + reader_stats[2.0]['windows']}개, "
+              f"메모리 이미지 결과와 동일 (확률 / 마스크)")
+    finally:
+        utils.inference_model = original_inference_model
+        utils.FUSE_ROWS = original_fuse_rows
+
+    print("✓ strip reader 다중 스케일 추론 테스트 완료.\n")
+    return True
+
+
+def main():
+    """메인 테스트 함수"""
+    tests = [
+        test_full_refinement_matches_sliding_window,
+        test_coarse_pass_limits_refined_windows,
+        test_upscaled_refinement_and_stats,
+        test_strip_reader_multi_scale,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except Exception as e:
+            print(f"✗ 테스트 실행 중 오류 발생: {e}\n")
+
+    print(f"통과: {passed}/{len(tests)}")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,129 @@
+"""
+Staged Pipeline Test Script
+단계별 병렬 파이프라인 테스트 스크립트
+
+This script checks that pipeline.run_pipeline keeps the order of items, skips failed items,
+limits how far decoding runs ahead of inference, and reports per-stage statistics.
+"""
+
+import os
+import sys
+import time
+import threading
+
+
+def square(item, inferred):
+    """Postprocess stage used with the process pool, it has to be a module level function"""
+    return inferred * inferred, os.getpid()
+
+
+def test_pipeline_order_and_errors():
+    """파이프라인 결과 순서와 오류 처리 테스트"""
+    print("=== 파이프라인 순서 / 오류 처리 테스트 ===")
+
+    try:
+        from pipeline import run_pipeline
+    except ImportError as e:
+        print(f"✗ pipeline import 실패: {e}")
+        return False
+
+    def decode(item):
+        if item == 3:
+            raise ValueError('broken image')
+        time.sleep(0.01 * (item % 3))  # decoding finishes out of order
+        return item
+
+    def infer(item, decoded):
+        if item == 5:
+            raise RuntimeError('inference failed')
+        return decoded + 1
+
+    for postprocess_workers in [0, 2]:
+        errors = []
+        outputs, stats = run_pipeline(
+            range(10), decode, infer, square, lambda item, processed: (item, processed[0]),
+            decode_workers=3, postprocess_workers=postprocess_workers, queue_size=2,
+            on_error=lambda item, e: errors.append(item), report=False
+        )
+
+        expected = [(item, (item + 1) ** 2) for item in range(10) if item not in (3, 5)]
+        assert outputs == expected, f"postprocess_workers={postprocess_workers}: {outputs}"
+        assert sorted(errors) == [3, 5]
+        assert [stage.name for stage in stats] == ['decode', 'inference', 'postprocess', 'write']
+        assert stats[1].count == 8 and stats[3].count == 8
+        print(f"✓ postprocess_workers={postprocess_workers}: 순서 유지, 실패한 이미지 {len(errors)}개 건너뜀")
+
+    print("✓ 파이프라인 순서 / 오류 처리 테스트 완료.\n")
+    return True
+
+
+def test_pipeline_backpressure():
+    """느린 단계가 앞 단계를 막아 메모리 사용이 제한되는지 테스트"""
+    print("=== 파이프라인 backpressure 테스트 ===")
+
+    try:
+        from pipeline import run_pipeline, format_stage_report
+    except ImportError as e:
+        print(f"✗ pipeline import 실패: {e}")
+        return False
+
+    lock = threading.Lock()
+    in_flight = {'decoded': 0, 'max_decoded': 0}
+
+    def decode(item):
+        with lock:
+            in_flight['decoded'] += 1
+            in_flight['max_decoded'] = max(in_flight['max_decoded'], in_flight['decoded'])
+        return item
+
+    def infer(item, decoded):
+        with lock:
+            in_flight['decoded'] -= 1
+        time.sleep(0.005)
+        return decoded
+
+    def write(item, processed):
+        time.sleep(0.02)  # the writer is the bottleneck
+        return processed
+
+    queue_size, decode_workers = 2, 2
+    start = time.perf_counter()
+    outputs, stats = run_pipeline(
+        range(20), decode, infer, lambda item, inferred: inferred, write,
+        decode_workers=decode_workers, postprocess_workers=0, queue_size=queue_size, report=False
+    )
+    wall_time = time.perf_counter() - start
+
+    assert outputs == list(range(20))
+    # decoded images wait in the decode queue, plus the one the feeder is blocked on
+    assert in_flight['max_decoded'] <= queue_size + decode_workers + 1, in_flight
+    assert stats[3].utilization(wall_time) > 0.8, "the slowest stage should be busy most of the time"
+    print(f"✓ 디코딩 대기 이미지 최대 {in_flight['max_decoded']}개 (queue_size={queue_size})")
+    print(format_stage_report(stats, wall_time, len(outputs)))
+
+    print("✓ 파이프라인 backpressure 테스트 완료.\n")
+    return True
+
+
+def main():
+    """메인 테스트 함수"""
+    tests = [
+        test_pipeline_order_and_errors,
+        test_pipeline_backpressure,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except Exception as e:
+            print(f"✗ 테스트 실행 중 오류 발생: {e}\n")
+
+    print(f"통과: {passed}/{len(tests)}")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,305 @@
+"""
+Crack Quantification Test Script
+균열 정량화 테스트 스크립트
+
+This script checks that the single-pass crack measurement and the KD-tree endpoint pairing
+in quantify_seg_results give the same results as the previous nested loops, that the
+medial axis computed on crack crops matches the full-image medial axis, and that the streaming
+quantification of disk-backed masks gives the same records and result image without arrays of the mask size.
+"""
+
+import sys
+import tempfile
+import numpy as np
+
+
+def test_measurements_match_loop():
+    """bincount 측정 결과가 균열별 반복문 결과와 동일한지 테스트"""
+    print("=== 균열 폭/길이 측정 일치 테스트 ===")
+
+    try:
+        from skimage.measure import label
+        from quantify_seg_results import create_distance_map
+        from benchmark_quantify import make_crack_mask, loop_measurements, bincount_measurements
+    except ImportError as e:
+        print(f"✗ quantify_seg_results import 실패: {e}")
+        return False
+
+    for num_cracks in [0, 1, 40, 200]:
+        mask = make_crack_mask(400, num_cracks, seed=num_cracks)
+        distance_map = create_distance_map(mask)
+        mask_label = label(mask)
+
+        for minimum_area in [0, 50]:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                expected = loop_measurements(mask_label, distance_map, minimum_area)
+            result = bincount_measurements(mask_label, distance_map, minimum_area)
+
+            assert len(result) == len(expected), f"{num_cracks} cracks: {len(result)} != {len(expected)}"
+            for (crack_id, area, width, length), (expected_id, expected_area, expected_width, expected_length) in zip(result, expected):
+                assert crack_id == expected_id and area == expected_area and length == expected_length
+                assert np.isclose(width, expected_width, rtol=1e-12, atol=0, equal_nan=True)
+
+        print(f"✓ 균열 조각 {num_cracks}개: 측정값 {len(expected)}개 동일")
+
+    print("✓ 균열 측정 테스트 완료.\n")
+    return True
+
+
+def test_connect_cracks_matches_loop():
+    """KD-tree 끝점 연결 결과가 이중 반복문 결과와 동일한지 테스트"""
+    print("=== 균열 끝점 연결 일치 테스트 ===")
+
+    try:
+        from quantify_seg_results import connect_cracks_by_edge
+        from benchmark_connect_cracks import make_fragment_mask, loop_connect_cracks_by_edge
+        from benchmark_quantify import make_crack_mask
+    except ImportError as e:
+        print(f"✗ quantify_seg_results import 실패: {e}")
+        return False
+
+    # fragments on a regular grid give many equally distant endpoints
+    grid_mask = np.zeros((120, 120), dtype=np.uint8)
+    grid_mask[10::20, :] = 1
+    grid_mask[:, 5::20] = 0
+
+    masks = {
+        'empty': np.zeros((50, 50), dtype=np.uint8),
+        'single': make_fragment_mask(1),
+        'grid': grid_mask,
+        'fragments': make_fragment_mask(150, seed=3),
+        'random lines': make_crack_mask(300, 60, seed=4),
+    }
+
+    for name, mask in masks.items():
+        for epsilon in [5000000, 40, 20, 1]:
+            expected = loop_connect_cracks_by_edge(mask.copy(), epsilon)
+            result = connect_cracks_by_edge(mask.copy(), epsilon)
+            assert np.array_equal(result, expected), f"{name}, epsilon={epsilon}: connection lines differ"
+
+        print(f"✓ {name}: 연결선 동일")
+
+    # epsilon is a real search radius, far fragments are not connected
+    far_mask = np.zeros((100, 300), dtype=np.uint8)
+    far_mask[50, 10:40] = 1
+    far_mask[50, 200:240] = 1
+    assert np.array_equal(connect_cracks_by_edge(far_mask.copy(), 100), far_mask)
+    assert connect_cracks_by_edge(far_mask.copy(), 200)[50, 40:200].all()
+    print("✓ epsilon보다 먼 균열은 연결하지 않음")
+
+    print("✓ 균열 끝점 연결 테스트 완료.\n")
+    return True
+
+
+def test_cropped_medial_axis_matches_full_image():
+    """균열 영역별 medial axis 결과가 전체 이미지 결과와 동일한지 테스트"""
+    print("=== 균열 영역별 medial axis 테스트 ===")
+
+    try:
+        from scipy import ndimage as ndi
+        from skimage.measure import label
+        from skimage.morphology import medial_axis
+        from quantify_seg_results import create_sparse_distance_map, create_distance_map, _calculate_crack_width_length
+        from benchmark_quantify import make_crack_mask
+    except ImportError as e:
+        print(f"✗ quantify_seg_results import 실패: {e}")
+        return False
+
+    mask = make_crack_mask(600, 120, seed=5)
+    mask[0:5, 100:400] = 1  # a crack touching the image border
+    mask_label, num_labels = label(mask, return_num=True)
+
+    skel, dist = medial_axis(mask, return_distance=True)
+    rows, cols = np.nonzero(skel)
+    _, full_widths, full_lengths = _calculate_crack_width_length(mask_label, (rows, cols, dist[rows, cols]), num_labels)
+
+    for tile_size, num_workers in [(1024, 0), (64, 0), (64, 2)]:
+        skeleton = create_sparse_distance_map(mask, tile_size=tile_size, num_workers=num_workers)
+        skeleton_rows, skeleton_cols, distances = skeleton
+
+        # distances are exact, the skeleton only differs where medial_axis breaks ties randomly
+        assert np.array_equal(distances, ndi.distance_transform_edt(mask)[skeleton_rows, skeleton_cols])
+        assert mask[skeleton_rows, skeleton_cols].all()
+
+        # two full-image runs also differ by a few pixels in length and a few hundredths in width
+        _, widths, lengths = _calculate_crack_width_length(mask_label, skeleton, num_labels)
+        assert np.allclose(lengths, full_lengths, rtol=0.02, atol=8)
+        assert np.allclose(widths, full_widths, atol=0.2, equal_nan=True)
+        print(f"✓ tile_size={tile_size}, num_workers={num_workers}: 골격 {len(distances)}개 픽셀")
+
+    assert not create_distance_map(np.zeros((40, 40), dtype=np.uint8)).any()
+    print("✓ 균열이 없으면 빈 거리 맵")
+
+    print("✓ 균열 영역별 medial axis 테스트 완료.\n")
+    return True
+
+
+def test_quantify_crack_width_length():
+    """quantify_crack_width_length 결과 형식 테스트"""
+    print("=== 균열 정량화 결과 테스트 ===")
+
+    try:
+        from quantify_seg_results import quantify_crack_width_length
+    except ImportError as e:
+        print(f"✗ quantify_seg_results import 실패: {e}")
+        return False
+
+    mask = np.zeros((300, 300), dtype=np.uint8)
+    mask[50:56, 20:280] = 1
+
+    seg_result = np.zeros((300, 300, 3), dtype=np.uint8)
+    seg_result, results = quantify_crack_width_length(seg_result, mask, (0, 0, 255), minimum_area=500)
+
+    assert len(results) == 1
+    crack = results[0]
+    assert (crack['min_row'], crack['min_col'], crack['max_row'], crack['max_col']) == (50, 20, 56, 280)
+    assert crack['area'] == 6 * 260 and crack['class_id'] == 1
+    assert (crack['centroid_row'], crack['centroid_col']) == (52.5, 149.5)
+    assert 2 <= crack['width'] <= 4 and crack['length'] > 200
+    assert seg_result[..., 2].any()
+    print(f"✓ ({crack['min_row']},{crack['min_col']})-({crack['max_row']},{crack['max_col']}): {crack['width']:.2f}x{crack['length']:.2f}")
+
+    # cracks below the minimum area are dropped
+    small_mask = np.zeros((300, 300), dtype=np.uint8)
+    small_mask[200:203, 100:110] = 1
+    _, small_results = quantify_crack_width_length(None, small_mask, (0, 0, 255), minimum_area=500)
+    assert len(small_results) == 0
+    print("✓ 최소 면적보다 작은 균열 제외")
+
+    _, empty_results = quantify_crack_width_length(None, np.zeros((100, 100), dtype=np.uint8), (0, 0, 255))
+    assert len(empty_results) == 0
+    print("✓ 균열이 없으면 빈 결과")
+
+    print("✓ 균열 정량화 테스트 완료.\n")
+    return True
+
+
+def test_streaming_quantification_matches_in_memory():
+    """띠 단위 정량화 결과가 전체 마스크 정량화 결과와 동일한지 테스트"""
+    print("=== 띠 단위 균열 정량화 테스트 ===")
+
+    try:
+        import tracemalloc
+        from quantify_seg_results import quantify_crack_width_length, quantify_crack_width_length_streaming
+        from benchmark_quantify import make_crack_mask
+        from benchmark_connect_cracks import make_fragment_mask
+    except ImportError as e:
+        print(f"✗ quantify_seg_results import 실패: {e}")
+        return False
+
+    border_mask = np.zeros((300, 300), dtype=np.uint8)
+    border_mask[0:5, 20:280] = 1
+    border_mask[100:300, 150:153] = 1  # a crack crossing every strip down to the bottom border
+
+    masks = {
+        'random lines': make_crack_mask(600, 120, seed=5),
+        'fragments': make_fragment_mask(150, seed=3),
+        'border': border_mask,
+        'empty': np.zeros((200, 300), dtype=np.uint8),
+    }
+
+    with tempfile.TemporaryFile() as f:
+        for name, mask in masks.items():
+            _, expected = quantify_crack_width_length(None, mask, (0, 0, 255), minimum_area=0)
+
+            # the disk-backed mask of the streaming inference
+            disk_mask = np.memmap(f, dtype=bool, mode='w+', shape=mask.shape)
+            disk_mask[:] = mask
+
+            for strip_height in [50, 64, 1024]:
+                results = quantify_crack_width_length_streaming(disk_mask, minimum_area=0, strip_height=strip_height)
+
+                # cracks merged across strips, connection lines, boxes, areas and centroids are exact
+                assert len(results) == len(expected), f"{name}, {strip_height}: {len(results)} != {len(expected)}"
+                for field in ['min_row', 'min_col', 'max_row', 'max_col', 'area', 'class_id']:
+                    assert np.array_equal(results[field], expected[field]), f"{name}, {strip_height}: {field} differs"
+                assert np.allclose(results['centroid_row'], expected['centroid_row'])
+                assert np.allclose(results['centroid_col'], expected['centroid_col'])
+
+                # the skeleton differs where medial_axis breaks ties, as between crops and the full image
+                assert np.allclose(results['length'], expected['length'], rtol=0.02, atol=8)
+                assert np.allclose(results['width'], expected['width'], atol=0.2, equal_nan=True)
+
+            del disk_mask
+            print(f"✓ {name}: 균열 {len(expected)}개, 띠 높이와 관계없이 동일")
+
+        # the in-memory quantification needs about 16 bytes per pixel, the strips less than a label image of the mask (8)
+        mask = make_crack_mask(2000, 200, seed=6)
+        disk_mask = np.memmap(f, dtype=bool, mode='w+', shape=mask.shape)
+        disk_mask[:] = mask
+        del mask
+
+        tracemalloc.start()
+        results = quantify_crack_width_length_streaming(disk_mask, minimum_area=0, strip_height=128)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        assert len(results) > 0 and peak < disk_mask.size * 8, f"peak {peak / 2 ** 20:.1f} MB"
+        print(f"✓ 2000x2000 마스크: 최대 {peak / 2 ** 20:.1f} MB (라벨 이미지 {disk_mask.size * 8 / 2 ** 20:.0f} MB)")
+        del disk_mask
+
+    print("✓ 띠 단위 균열 정량화 테스트 완료.\n")
+    return True
+
+
+def test_result_rows_match_in_memory():
+    """띠 단위로 그린 결과 이미지가 전체 이미지에 그린 결과와 동일한지 테스트"""
+    print("=== 띠 단위 결과 이미지 테스트 ===")
+
+    try:
+        from quantify_seg_results import quantify_crack_width_length, crack_result_rows
+        from benchmark_quantify import make_crack_mask
+    except ImportError as e:
+        print(f"✗ quantify_seg_results import 실패: {e}")
+        return False
+
+    mask = make_crack_mask(900, 10, seed=7)
+    img = np.random.default_rng(7).integers(0, 256, mask.shape + (3,), dtype=np.uint8)
+    source = img.copy()
+    color, alpha = (0, 0, 255), 0.8
+
+    # the whole image blended and drawn, as the scripts do in memory
+    seg_result = img.copy()
+    mask_bool = mask == 1
+    seg_result[mask_bool, :] = seg_result[mask_bool, :] * (1 - alpha) + np.array(color, dtype=np.uint8) * alpha
+    seg_result, results = quantify_crack_width_length(seg_result, mask, color)
+    assert len(results) > 0
+
+    # the boxes and texts crossing the strip borders are drawn the same in every strip
+    result_rows = crack_result_rows(lambda y0, y1: img[y0:y1], mask, results, color, alpha)
+    for strip_height in [37, 256]:
+        strips = [result_rows(y0, min(y0 + strip_height, mask.shape[0])) for y0 in range(0, mask.shape[0], strip_height)]
+        assert np.array_equal(np.concatenate(strips), seg_result), f"{strip_height}: result image differs"
+    assert np.array_equal(img, source)
+    print(f"✓ 균열 {len(results)}개: 띠 단위 결과 이미지가 전체 이미지 결과와 동일")
+
+    print("✓ 띠 단위 결과 이미지 테스트 완료.\n")
+    return True
+
+
+def main():
+    """메인 테스트 함수"""
+    tests = [
+        test_measurements_match_loop,
+        test_connect_cracks_matches_loop,
+        test_cropped_medial_axis_matches_full_image,
+        test_quantify_crack_width_length,
+        test_streaming_quantification_matches_in_memory,
+        test_result_rows_match_in_memory,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except Exception as e:
+            print(f"✗ 테스트 실행 중 오류 발생: {e}\n")
+
+    print(f"통과: {passed}/{len(tests)}")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
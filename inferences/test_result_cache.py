@@ -0,0 +1,142 @@
+"""
+Result Cache Test Script
+추론 결과 캐시 테스트 스크립트
+
+This script checks that result_cache keys change with the image content, the model files
+and the inference parameters, and that cached masks and measurements are restored exactly.
+"""
+
+import os
+import sys
+import tempfile
+import numpy as np
+
+
+def test_cache_keys():
+    """이미지 내용, 모델 파일, 추론 파라미터에 따라 캐시 키가 바뀌는지 테스트"""
+    print("=== 캐시 키 테스트 ===")
+
+    try:
+        from result_cache import ResultCache
+    except ImportError as e:
+        print(f"✗ result_cache import 실패: {e}")
+        return False
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        paths = {}
+        for name, content in [('config.py', b'model = 1'), ('model.pth', b'weights'), ('a.png', b'image a'), ('b.png', b'image a')]:
+            paths[name] = os.path.join(tmp_dir, name)
+            with open(paths[name], 'wb') as f:
+                f.write(content)
+
+        cache_dir = os.path.join(tmp_dir, 'cache')
+        model_files = [paths['config.py'], paths['model.pth']]
+        params = {'window_size': 1024, 'overlap_ratio': 0.5}
+
+        cache = ResultCache(cache_dir, model_files, params)
+        key = cache.key(paths['a.png'])
+        assert cache.key(paths['b.png']) == key, "the key depends on the content, not the path"
+        cache.close()
+
+        # the same model and parameters in a new run give the same key
+        cache = ResultCache(cache_dir, model_files, dict(reversed(list(params.items()))))
+        assert cache.key(paths['a.png']) == key
+        cache.close()
+        print("✓ 같은 내용의 이미지는 같은 키")
+
+        cache = ResultCache(cache_dir, model_files, {'window_size': 512, 'overlap_ratio': 0.5})
+        assert cache.key(paths['a.png']) != key
+        cache.close()
+        print("✓ 추론 파라미터가 바뀌면 다른 키")
+
+        with open(paths['model.pth'], 'wb') as f:
+            f.write(b'new weights')
+        cache = ResultCache(cache_dir, model_files, params)
+        assert cache.key(paths['a.png']) != key
+        model_key = cache.model_key
+
+        with open(paths['a.png'], 'wb') as f:
+            f.write(b'image a, edited')
+        assert cache.key(paths['a.png']) != cache.key(paths['b.png'])
+        cache.close()
+        print("✓ 체크포인트나 이미지가 바뀌면 다른 키")
+
+        cache = ResultCache(cache_dir, model_files, params)
+        assert cache.model_key == model_key
+        cache.close()
+
+    print("✓ 캐시 키 테스트 완료.\n")
+    return True
+
+
+def test_cache_round_trip():
+    """캐시된 마스크와 정량화 결과가 그대로 복원되는지 테스트"""
+    print("=== 캐시 저장 / 복원 테스트 ===")
+
+    try:
+        from result_cache import ResultCache
+        from crack_records import empty_records
+    except ImportError as e:
+        print(f"✗ result_cache import 실패: {e}")
+        return False
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        model_file = os.path.join(tmp_dir, 'model.pth')
+        with open(model_file, 'wb') as f:
+            f.write(b'weights')
+
+        cache = ResultCache(os.path.join(tmp_dir, 'cache'), [model_file], {})
+        assert cache.load_results('0' * 64) is None and cache.load_mask('0' * 64) is None
+        print("✓ 없는 항목은 None")
+
+        # empty, tiny and more rows than one encoded band
+        rng = np.random.default_rng(0)
+        for shape in [(1, 1), (37, 13), (2500, 61)]:
+            mask = (rng.random(shape) < 0.3).astype(np.uint8)
+            results = empty_records(shape[0] % 3)
+            results['max_row'], results['width'], results['class_id'] = 5, 1.5, 1
+            key = f"{shape[0]:064d}"
+
+            cache.save(key, mask, results)
+            assert np.array_equal(cache.load_results(key), results)
+            assert np.array_equal(cache.load_mask(key), mask)
+
+            out = np.memmap(os.path.join(tmp_dir, 'mask.raw'), dtype=np.uint8, mode='w+', shape=shape)
+            cache.load_mask(key, out=out)
+            assert np.array_equal(out, mask)
+            del out
+            print(f"✓ {shape} 마스크 복원")
+
+        # an entry without measurements is incomplete, e.g. the run stopped while saving
+        os.remove(os.path.join(tmp_dir, 'cache', key[:2], key + '.npy'))
+        assert cache.load_results(key) is None and cache.load_mask(key) is None
+        print("✓ 저장이 끝나지 않은 항목은 무시")
+
+        cache.close()
+
+    print("✓ 캐시 저장 / 복원 테스트 완료.\n")
+    return True
+
+
+def main():
+    """메인 테스트 함수"""
+    tests = [
+        test_cache_keys,
+        test_cache_round_trip,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except Exception as e:
+            print(f"✗ 테스트 실행 중 오류 발생: {e}\n")
+
+    print(f"통과: {passed}/{len(tests)}")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
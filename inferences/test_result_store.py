@@ -0,0 +1,138 @@
+"""
+Result Store Test Script
+열 기반 결과 저장소 테스트 스크립트
+
+This script checks that result_store appends one partition per run, that reads select columns,
+runs and filters correctly for Parquet and Feather parts, and that the Excel view matches the image table.
+"""
+
+import os
+import sys
+import tempfile
+import numpy as np
+import pandas as pd
+
+# the result store needs pyarrow (requirements.txt), without it these tests fail instead of passing as skipped
+import pyarrow
+
+
+def make_tables(num_images, cracks_per_image, seed=0):
+    """Image and crack tables of one run"""
+    from crack_records import empty_records
+    from result_store import IMAGE_COLUMNS, image_row, crack_table
+
+    rng = np.random.default_rng(seed)
+    image_rows, crack_tables = [], []
+
+    for i in range(num_images):
+        records = empty_records(cracks_per_image)
+        records['area'] = rng.integers(1, 5000, cracks_per_image)
+        records['width'] = rng.uniform(0, 8, cracks_per_image)
+        records['length'] = rng.integers(0, 500, cracks_per_image)
+        records['class_id'] = 1
+
+        image_rows.append(image_row(f'image_{i}.jpg', records, 37.5 + i * 1e-4, 127.0))
+        crack_tables.append(crack_table(f'image_{i}.jpg', records))
+
+    return pd.DataFrame(image_rows, columns=IMAGE_COLUMNS), pd.concat(crack_tables, ignore_index=True)
+
+
+def test_runs_and_filters():
+    """실행별 파티션 추가, 열 선택, 필터 조회 테스트"""
+    print("=== 결과 저장소 실행 / 필터 테스트 ===")
+
+    try:
+        from result_store import (IMAGE_TABLE, CRACK_TABLE, write_results, list_runs, read_table,
+                                  crack_table)
+        from crack_records import empty_records
+    except ImportError as e:
+        print(f"✗ result_store import 실패: {e}")
+        return False
+
+    with tempfile.TemporaryDirectory() as store_dir:
+        assert read_table(store_dir).empty
+        print("✓ 빈 저장소 조회")
+
+        first_images, first_cracks = make_tables(50, 200, seed=0)
+        second_images, second_cracks = make_tables(30, 100, seed=1)
+        first_run = write_results(store_dir, first_images, first_cracks, run_id='20240101-000000-000000', fmt='parquet')
+        second_run = write_results(store_dir, second_images, second_cracks, run_id='20240102-000000-000000', fmt='feather')
+        assert list_runs(store_dir) == list_runs(store_dir, CRACK_TABLE) == [first_run, second_run]
+
+        # the latest run by default, a single run or all runs on request
+        latest = read_table(store_dir, IMAGE_TABLE)
+        assert (latest['run'] == second_run).all() and latest['image_path'].tolist() == second_images['image_path'].tolist()
+        assert len(read_table(store_dir, CRACK_TABLE, run=first_run)) == len(first_cracks)
+        assert len(read_table(store_dir, CRACK_TABLE, run=None)) == len(first_cracks) + len(second_cracks)
+        print(f"✓ 실행 {len(list_runs(store_dir))}개 파티션")
+
+        # filters and column selection give the same rows as filtering in pandas, for both formats
+        for run, cracks in [(first_run, first_cracks), (second_run, second_cracks)]:
+            filtered = read_table(store_dir, CRACK_TABLE, columns=['image_path', 'width', 'length'],
+                                  filters=[('width', '>=', 6.0), ('length', '<', 100)], run=run)
+            expected = cracks[(cracks['width'] >= 6.0) & (cracks['length'] < 100)]
+            assert list(filtered.columns) == ['image_path', 'width', 'length']
+            assert filtered['image_path'].tolist() == expected['image_path'].tolist()
+            assert np.allclose(filtered['width'], expected['width'])
+        print("✓ Parquet / Feather 필터 조회")
+
+        # runs without detections keep the schema of the other runs
+        empty_run = write_results(store_dir, second_images.iloc[:0], crack_table('', empty_records()), run_id='20240103-000000-000000')
+        assert read_table(store_dir).empty and list_runs(store_dir)[-1] == empty_run
+        all_images = read_table(store_dir, IMAGE_TABLE, run=None)
+        assert len(all_images) == 80 and all_images['crack_count'].dtype == np.int64
+        print("✓ 탐지가 없는 실행")
+
+    print("✓ 결과 저장소 실행 / 필터 테스트 완료.\n")
+    return True
+
+
+def test_excel_view():
+    """저장소의 이미지 테이블에서 Excel 파일을 파생하는지 테스트"""
+    print("=== Excel 파생 테스트 ===")
+
+    try:
+        from result_store import EXCEL_COLUMNS, write_results, export_excel
+    except ImportError as e:
+        print(f"✗ result_store import 실패: {e}")
+        return False
+
+    with tempfile.TemporaryDirectory() as store_dir:
+        image_df, crack_df = make_tables(20, 10)
+        write_results(store_dir, image_df, crack_df)
+
+        excel_path = os.path.join(store_dir, 'excel', 'results.xlsx')
+        export_excel(store_dir, excel_path)
+        excel_df = pd.read_excel(excel_path)
+
+        assert list(excel_df.columns) == EXCEL_COLUMNS
+        assert excel_df['이미지 경로'].tolist() == image_df['image_path'].tolist()
+        assert np.allclose(excel_df['최대 폭'], image_df['max_width'])
+        print("✓ Excel 열 / 값 일치")
+
+    print("✓ Excel 파생 테스트 완료.\n")
+    return True
+
+
+def main():
+    """메인 테스트 함수"""
+    tests = [
+        test_runs_and_filters,
+        test_excel_view,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except Exception as e:
+            print(f"✗ 테스트 실행 중 오류 발생: {e}\n")
+
+    print(f"통과: {passed}/{len(tests)}")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,181 @@
+"""
+Result Writer Test Script
+결과 스트리밍 기록 테스트 스크립트
+
+This script checks that result_writer writes bounded batches while images are added, that the outputs
+can be read during the run, that they are finalized only when the run completes, and that a failed run
+keeps the batches written so far without finalizing them.
+"""
+
+import os
+import sys
+import sqlite3
+import tempfile
+import threading
+import numpy as np
+import pandas as pd
+
+# the result store needs pyarrow (requirements.txt), without it these tests fail instead of passing as skipped
+import pyarrow
+
+
+def image_results(num_images, seed=0):
+    """(image row, crack table) of each image, some images without cracks"""
+    from crack_records import empty_records
+    from result_store import image_row, crack_table
+
+    rng = np.random.default_rng(seed)
+    results = []
+
+    for i in range(num_images):
+        records = empty_records(rng.integers(0, 4))
+        records['area'] = rng.integers(1, 5000, len(records))
+        records['width'] = rng.uniform(0, 8, len(records))
+        records['class_id'] = 1
+        results.append((image_row(f'image_{i}.jpg', records, 37.5, 127.0), crack_table(f'image_{i}.jpg', records)))
+
+    return results
+
+
+def test_batches_and_finalize():
+    """배치 단위 기록, 실행 중 조회, 완료 시 확정 테스트"""
+    print("=== 결과 배치 기록 테스트 ===")
+
+    try:
+        from result_writer import open_result_writer, PARTIAL_SUFFIX
+        from result_store import pa, CRACK_TABLE, IMAGE_TABLE, list_runs, read_table
+    except ImportError as e:
+        print(f"✗ result_writer import 실패: {e}")
+        return False
+
+    results = image_results(300)
+    expected_cracks = pd.concat([cracks for _, cracks in results], ignore_index=True)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_path = os.path.join(tmp_dir, 'cracks.csv')
+        db_path = os.path.join(tmp_dir, 'results.sqlite')
+        excel_path = os.path.join(tmp_dir, 'results.xlsx')
+        index_path = os.path.join(tmp_dir, 'damage_index.sqlite')
+        store_dir = os.path.join(tmp_dir, 'store') if pa is not None else None
+
+        writer = open_result_writer(store_dir=store_dir, csv_path=csv_path, db_path=db_path, excel_path=excel_path,
+                                    index_path=index_path, batch_rows=50, flush_interval=None)
+        for image_row, cracks in results[:200]:
+            writer.add(image_row, cracks)
+
+        # at most batch_rows rows are buffered, the flushed batches are readable while the run goes on
+        assert len(writer.image_rows) < 50 and writer.num_crack_rows < 50
+        assert writer.num_batches >= 4
+        assert not os.path.exists(csv_path)
+        partial_df = pd.read_csv(csv_path + PARTIAL_SUFFIX)
+        assert len(partial_df) == writer.rows_written[CRACK_TABLE]
+
+        with sqlite3.connect(db_path) as conn:
+            assert conn.execute('SELECT COUNT(*) FROM images').fetchone()[0] == writer.rows_written[IMAGE_TABLE]
+            assert conn.execute('SELECT finished FROM runs').fetchone()[0] is None
+
+        if store_dir is not None:
+            assert list_runs(store_dir, complete_only=True) == []
+            assert len(read_table(store_dir)) == writer.rows_written[IMAGE_TABLE]
+        print(f"✓ 실행 중 배치 {writer.num_batches}개 조회")
+
+        # the rest is added by another thread, like the write stage of run_pipeline
+        adder = threading.Thread(target=lambda: [writer.add(image_row, cracks) for image_row, cracks in results[200:]])
+        adder.start()
+        adder.join()
+        assert writer.rows_written[IMAGE_TABLE] > 200
+        writer.close()
+
+        csv_df = pd.read_csv(csv_path)
+        assert list(csv_df.columns)[0] == 'Image_Name' and len(csv_df) == len(expected_cracks)
+        assert csv_df['Image_Name'].tolist() == expected_cracks['image_path'].tolist()
+        assert np.allclose(csv_df['width'], expected_cracks['width'])
+
+        with sqlite3.connect(db_path) as conn:
+            assert conn.execute('SELECT COUNT(*) FROM images').fetchone()[0] == 300
+            assert conn.execute('SELECT COUNT(*) FROM cracks').fetchone()[0] == len(expected_cracks)
+            assert conn.execute('SELECT finished FROM runs').fetchone()[0] is not None
+
+        excel_df = pd.read_excel(excel_path)
+        assert excel_df['이미지 경로'].tolist() == [row[2] for row, _ in results]
+
+        # the damage index only keeps the images with damage
+        with sqlite3.connect(index_path) as conn:
+            assert conn.execute('SELECT COUNT(*) FROM damages').fetchone()[0] == sum(row[3] > 0 for row, _ in results)
+
+        if store_dir is not None:
+            assert len(list_runs(store_dir, complete_only=True)) == 1
+            assert len(read_table(store_dir, CRACK_TABLE)) == len(expected_cracks)
+        print("✓ 완료 후 CSV / SQLite / Excel / 손상 인덱스 / 결과 저장소 확정")
+
+    print("✓ 결과 배치 기록 테스트 완료.\n")
+    return True
+
+
+def test_failed_run():
+    """실패한 실행은 기록된 배치를 남기고 확정하지 않는지 테스트"""
+    print("=== 실패한 실행 테스트 ===")
+
+    try:
+        from result_writer import open_result_writer, PARTIAL_SUFFIX
+    except ImportError as e:
+        print(f"✗ result_writer import 실패: {e}")
+        return False
+
+    results = image_results(120, seed=1)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_path = os.path.join(tmp_dir, 'cracks.csv')
+        db_path = os.path.join(tmp_dir, 'results.sqlite')
+        excel_path = os.path.join(tmp_dir, 'results.xlsx')
+
+        try:
+            with open_result_writer(csv_path=csv_path, db_path=db_path, excel_path=excel_path, batch_rows=40, flush_interval=None) as writer:
+                for image_row, cracks in results[:100]:
+                    writer.add(image_row, cracks)
+                raise RuntimeError("job stopped")
+        except RuntimeError:
+            pass
+
+        # the buffered rows are flushed too, only the finalization is missing
+        assert not os.path.exists(csv_path) and not os.path.exists(excel_path)
+        excel_sheet = writer.sinks[-1].sheet
+        assert excel_sheet.closed and not os.path.exists(excel_sheet._writer.out)
+        assert len(pd.read_csv(csv_path + PARTIAL_SUFFIX)) == sum(len(cracks) for _, cracks in results[:100])
+        with sqlite3.connect(db_path) as conn:
+            assert conn.execute('SELECT COUNT(*) FROM images').fetchone()[0] == 100
+            assert conn.execute('SELECT finished FROM runs').fetchone()[0] is None
+        print("✓ 기록된 배치 유지, 완료 표시 없음, Excel 임시 파일 삭제")
+
+        # an empty run still writes the CSV header
+        with open_result_writer(csv_path=csv_path) as writer:
+            pass
+        assert list(pd.read_csv(csv_path).columns)[0] == 'Image_Name'
+        print("✓ 빈 실행의 CSV 헤더")
+
+    print("✓ 실패한 실행 테스트 완료.\n")
+    return True
+
+
+def main():
+    """메인 테스트 함수"""
+    tests = [
+        test_batches_and_finalize,
+        test_failed_run,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except Exception as e:
+            print(f"✗ 테스트 실행 중 오류 발생: {e}\n")
+
+    print(f"통과: {passed}/{len(tests)}")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
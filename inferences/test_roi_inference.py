@@ -0,0 +1,179 @@
+"""
+ROI Inference Test Script
+저해상도 ROI 추론 테스트 스크립트
+
+This script checks the coarse-to-fine mode of utils.inference_segmentor_sliding_window (roi_scale):
+planning every window gives the full sliding window mask, a thin crack found in the low resolution
+heatmap is detected with a fraction of the full resolution windows, the window plan is reported in
+window_stats, and strip readers give the same result as loaded images.
+A stub model is used, so no GPU or checkpoint is needed.
+"""
+
+import sys
+import numpy as np
+
+from test_batched_inference import stub_inference_model
+from test_multi_scale_inference import ContrastStubModel, crack_image
+
+
+def test_full_plan_matches_sliding_window():
+    """모든 윈도우가 계획되면 일반 슬라이딩 윈도우 결과와 동일한지 테스트"""
+    print("=== 전체 계획 일치 테스트 ===")
+
+    try:
+        import utils
+    except ImportError as e:
+        print(f"✗ utils import 실패: {e}")
+        return False
+
+    original_inference_model = utils.inference_model
+    utils.inference_model = stub_inference_model
+
+    try:
+        rng = np.random.default_rng(5)
+        img = rng.integers(0, 255, (200, 330, 3), dtype=np.uint8)
+
+        for blend in [None, 'cosine']:
+            _, reference_mask = utils.inference_segmentor_sliding_window(
+                ContrastStubModel(), img.copy(), color_mask=None, window_size=64, overlap_ratio=0.5, batch_size=4, blend=blend
+            )
+
+            # a zero threshold makes every pixel a candidate
+            window_stats = {}
+            _, mask = utils.inference_segmentor_sliding_window(
+                ContrastStubModel(), img.copy(), color_mask=None, window_size=64, overlap_ratio=0.5, batch_size=4, blend=blend,
+                window_stats=window_stats, roi_scale=0.5, roi_threshold=0
+            )
+
+            assert window_stats['roi_skipped_windows'] == 0 and window_stats['skipped_windows'] == 0
+            assert window_stats['coarse_windows'] > 0
+            assert np.array_equal(mask, reference_mask), f"{blend}: {np.mean(mask != reference_mask):.4%} of the pixels differ"
+            print(f"✓ blend={blend}: 윈도우 {window_stats['windows']}개 모두 추론, 일반 슬라이딩 윈도우 결과와 동일")
+    finally:
+        utils.inference_model = original_inference_model
+
+    print("✓ 전체 계획 일치 테스트 완료.\n")
+    return True
+
+
+def test_heatmap_limits_windows():
+    """저해상도 확률 지도의 후보 영역만 추론하여 재현율을 유지하는지 테스트"""
+    print("=== ROI 윈도우 계획 테스트 ===")
+
+    try:
+        import utils
+    except ImportError as e:
+        print(f"✗ utils import 실패: {e}")
+        return False
+
+    original_inference_model = utils.inference_model
+    utils.inference_model = stub_inference_model
+
+    try:
+        img = crack_image()
+
+        _, full_mask = utils.inference_segmentor_sliding_window(
+            ContrastStubModel(), img.copy(), color_mask=None, window_size=64, overlap_ratio=0.25, batch_size=8, blend='cosine'
+        )
+        full_mask = full_mask.astype(bool)
+
+        model = ContrastStubModel()
+        window_stats = {}
+        _, mask = utils.inference_segmentor_sliding_window(
+            model, img.copy(), color_mask=None, window_size=64, overlap_ratio=0.25, batch_size=8, blend='cosine',
+            window_stats=window_stats, roi_scale=0.25, roi_threshold=0.2, roi_margin=32
+        )
+        mask = mask.astype(bool)
+
+        run_windows = window_stats['windows'] - window_stats['skipped_windows']
+        recall = (mask & full_mask).sum() / full_mask.sum()
+        assert window_stats['skipped_windows'] == window_stats['roi_skipped_windows']
+        assert run_windows < window_stats['windows'] / 2, f"{run_windows}/{window_stats['windows']} windows run"
+        assert model.windows == run_windows + window_stats['coarse_windows']
+        assert recall > 0.99, f"recall {recall:.4f}"
+        assert not mask[300:, 400:].any()
+        print(f"✓ 원본 윈도우 {window_stats['windows']}개 중 {run_windows}개만 추론 "
+              f"(저해상도 {window_stats['coarse_windows']}개, 건너뜀 {window_stats['skipped_windows'] / window_stats['windows']:.1%}), "
+              f"재현율 {recall:.4f}")
+
+        # the counts of several images add up, the gate skips some of the planned windows
+        flat = np.full((256, 256, 3), 150, dtype=np.uint8)
+        utils.inference_segmentor_sliding_window(
+            ContrastStubModel(), flat, color_mask=None, window_size=64, overlap_ratio=0.25, blend='cosine',
+            window_stats=window_stats, roi_scale=0.25, gate_threshold=1000
+        )
+        assert window_stats['windows'] - window_stats['skipped_windows'] == run_windows
+        print("✓ 후보가 없는 이미지는 윈도우를 추론하지 않고, 통계가 누적됨")
+    finally:
+        utils.inference_model = original_inference_model
+
+    print("✓ ROI 윈도우 계획 테스트 완료.\n")
+    return True
+
+
+def test_strip_reader_roi():
+    """strip reader 입력의 ROI 추론이 메모리 이미지 입력과 동일한지 테스트"""
+    print("=== strip reader ROI 추론 테스트 ===")
+
+    try:
+        import utils
+        from strip_reader import ArrayStripReader
+    except ImportError as e:
+        print(f"✗ utils import 실패: {e}")
+        return False
+
+    original_inference_model = utils.inference_model
+    utils.inference_model = stub_inference_model
+
+    try:
+        img = crack_image()
+
+        # the strip reader heatmap is downscaled by an integer factor, as the image with a scale of 1/4
+        window_stats = {}
+        _, reference_mask = utils.inference_segmentor_sliding_window(
+            ContrastStubModel(), img.copy(), color_mask=None, window_size=64, overlap_ratio=0.25, batch_size=8, blend='cosine',
+            roi_scale=0.25, roi_margin=32, window_stats=window_stats
+        )
+
+        reader = ArrayStripReader(img.copy())
+        reader_stats = {}
+        mask_output = np.zeros(img.shape[:2], dtype=bool)
+        img_result, mask = utils.inference_segmentor_sliding_window(
+            ContrastStubModel(), reader, color_mask=None, window_size=64, overlap_ratio=0.25, batch_size=8, blend='cosine',
+            mask_output=mask_output, roi_scale=0.25, roi_margin=32, window_stats=reader_stats
+        )
+
+        assert img_result is None
+        assert reader_stats == window_stats
+        assert np.array_equal(mask, reference_mask)
+        print(f"✓ strip reader: 윈도우 {reader_stats['windows'] - reader_stats['skipped_windows']}개 추론, 메모리 이미지 결과와 동일")
+    finally:
+        utils.inference_model = original_inference_model
+
+    print("✓ strip reader ROI 추론 테스트 완료.\n")
+    return True
+
+
+def main():
+    """메인 테스트 함수"""
+    tests = [
+        test_full_plan_matches_sliding_window,
+        test_heatmap_limits_windows,
+        test_strip_reader_roi,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except Exception as e:
+            print(f"✗ 테스트 실행 중 오류 발생: {e}\n")
+
+    print(f"통과: {passed}/{len(tests)}")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
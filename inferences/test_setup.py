@@ -19,6 +19,7 @@ def test_imports():
         'skimage',
         'slidingwindow',
         'PIL',
+        'tifffile',
         'matplotlib'
     ]
     
@@ -38,7 +39,8 @@ def test_local_modules():
     """Test if local modules can be imported."""
     local_modules = [
         'utils',
-        'quantify_seg_results'
+        'quantify_seg_results',
+        'strip_reader'
     ]
     
     failed_imports = []
@@ -0,0 +1,143 @@
+"""
+Sparse Mask Format Test Script
+sparse 마스크 형식 테스트 스크립트
+
+This script checks that sparse_mask round-trips masks exactly, that any sub-window read
+from the file matches the same window of the original mask, and that the PNG converters are lossless.
+"""
+
+import os
+import sys
+import tempfile
+import numpy as np
+
+
+def test_round_trip_and_windows():
+    """마스크 저장/복원 및 부분 윈도우 읽기 테스트"""
+    print("=== sparse 마스크 저장 / 윈도우 읽기 테스트 ===")
+
+    try:
+        from sparse_mask import SparseMask, save_sparse_mask
+    except ImportError as e:
+        print(f"✗ sparse_mask import 실패: {e}")
+        return False
+
+    rng = np.random.default_rng(0)
+    cases = [
+        ((0, 5), np.uint8), ((5, 0), np.uint8), ((1, 1), np.uint8), ((37, 13), np.uint8),
+        ((2500, 61), bool), ((300, 400), np.uint16), ((50, 70000), np.uint8),
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'mask.rle')
+
+        for shape, dtype in cases:
+            mask = ((rng.random(shape) < 0.2) * rng.integers(1, 4, shape)).astype(dtype)
+            save_sparse_mask(path, mask, {'config': 'model.py', 'window_size': 1024})
+
+            sparse = SparseMask(path)
+            dense = sparse.to_dense()
+            assert dense.dtype == mask.dtype and np.array_equal(dense, mask), f"{shape} {dtype}"
+            assert sparse.metadata == {'config': 'model.py', 'window_size': 1024}
+            assert sparse.labels == np.unique(mask[mask != 0]).tolist()
+
+            for _ in range(20):
+                y0, y1 = np.sort(rng.integers(-2, shape[0] + 3, 2))
+                x0, x1 = np.sort(rng.integers(-2, shape[1] + 3, 2))
+                window = mask[max(y0, 0):max(y1, 0), max(x0, 0):max(x1, 0)]
+                assert np.array_equal(sparse.read_window(y0, y1, x0, x1), window), f"{shape}: window {y0}:{y1}, {x0}:{x1}"
+
+                rows, cols, values = sparse.nonzero(y0, y1, x0, x1)
+                expected_rows, expected_cols = np.nonzero(window)
+                assert np.array_equal(rows, expected_rows + max(y0, 0)) and np.array_equal(cols, expected_cols + max(x0, 0))
+                assert np.array_equal(values, window[expected_rows, expected_cols])
+
+            print(f"✓ {shape} {np.dtype(dtype).name}: 라벨 {len(sparse.labels)}개, 윈도우 20개 일치")
+            sparse.close()
+
+        # windows can be written into a disk-backed mask
+        mask = (rng.random((64, 48)) < 0.1).astype(np.uint8)
+        save_sparse_mask(path, mask)
+        out = np.memmap(os.path.join(tmp_dir, 'mask.raw'), dtype=np.uint8, mode='w+', shape=(64, 48))
+        out[:] = 9
+        SparseMask(path).read_window(10, 40, out=out[10:40])
+        assert np.array_equal(out[10:40], mask[10:40]) and (out[:10] == 9).all()
+        del out
+        print("✓ 디스크 기반 마스크에 윈도우 쓰기")
+
+    print("✓ sparse 마스크 저장 / 윈도우 읽기 테스트 완료.\n")
+    return True
+
+
+def test_png_conversion():
+    """PNG 변환이 손실 없이 왕복되는지 테스트"""
+    print("=== PNG 변환 테스트 ===")
+
+    try:
+        import cv2
+        from sparse_mask import png_to_sparse_mask, sparse_mask_to_png, write_mask, read_mask
+    except ImportError as e:
+        print(f"✗ sparse_mask import 실패: {e}")
+        return False
+
+    rng = np.random.default_rng(1)
+    mask = ((rng.random((120, 90)) < 0.1) * rng.integers(0, 256, (120, 90))).astype(np.uint8)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        png_path = os.path.join(tmp_dir, 'mask.png')
+        sparse_path = os.path.join(tmp_dir, 'mask.rle')
+        restored_path = os.path.join(tmp_dir, 'restored.png')
+
+        cv2.imwrite(png_path, mask)
+        png_to_sparse_mask(png_path, sparse_path)
+        sparse_mask_to_png(sparse_path, restored_path)
+        assert np.array_equal(cv2.imread(restored_path, cv2.IMREAD_UNCHANGED), mask)
+        print("✓ PNG -> sparse -> PNG 동일")
+
+        # 3 channel masks with identical channels are accepted, color masks are not
+        cv2.imwrite(png_path, np.dstack([mask] * 3))
+        png_to_sparse_mask(png_path, sparse_path)
+        assert np.array_equal(read_mask(sparse_path), mask)
+
+        color_mask = np.dstack([mask, mask, np.zeros_like(mask)])
+        cv2.imwrite(png_path, color_mask)
+        try:
+            png_to_sparse_mask(png_path, sparse_path)
+            assert False, "color masks must be rejected"
+        except ValueError:
+            pass
+        print("✓ 3채널 마스크 처리")
+
+        # write_mask chooses the format from the suffix
+        for suffix in ['.png', '.rle']:
+            path = os.path.join(tmp_dir, 'written' + suffix)
+            write_mask(path, mask)
+            assert np.array_equal(read_mask(path), mask)
+        print("✓ write_mask / read_mask 확장자별 형식")
+
+    print("✓ PNG 변환 테스트 완료.\n")
+    return True
+
+
+def main():
+    """메인 테스트 함수"""
+    tests = [
+        test_round_trip_and_windows,
+        test_png_conversion,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except Exception as e:
+            print(f"✗ 테스트 실행 중 오류 발생: {e}\n")
+
+    print(f"통과: {passed}/{len(tests)}")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
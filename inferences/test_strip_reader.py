@@ -0,0 +1,230 @@
+"""
+Strip Reader Test Script
+띠 단위 이미지 reader 테스트 스크립트
+
+This script checks that strip readers return the same pixels as mmcv.imread / cv2.imread,
+that JPEG/PNG files are decoded by the disk-backed reader with the tested Pillow versions only,
+that sliding window inference over a strip reader gives the same mask as over a loaded image,
+and that images written strip by strip (write_tiff_strips) are read back unchanged.
+"""
+
+import os
+import sys
+import tempfile
+import numpy as np
+
+from test_batched_inference import StubModel, stub_inference_model
+
+
+def make_test_images(tmp_dir):
+    """Write the same image in several formats and layouts"""
+    import cv2
+    import tifffile
+
+    rng = np.random.default_rng(0)
+    img = cv2.GaussianBlur(rng.integers(0, 255, (300, 410, 3), dtype=np.uint8), (5, 5), 2)
+
+    paths = {
+        'png': os.path.join(tmp_dir, 'img.png'),
+        'jpg': os.path.join(tmp_dir, 'img.jpg'),
+        'gray_png': os.path.join(tmp_dir, 'gray.png'),
+        'rgba_png': os.path.join(tmp_dir, 'rgba.png'),
+        'tiled_tif': os.path.join(tmp_dir, 'tiled.tif'),
+        'stripped_tif': os.path.join(tmp_dir, 'stripped.tif'),
+    }
+    cv2.imwrite(paths['png'], img)
+    cv2.imwrite(paths['jpg'], img)
+    cv2.imwrite(paths['gray_png'], img[..., 0])
+    cv2.imwrite(paths['rgba_png'], np.dstack([img, img[..., :1]]))
+    tifffile.imwrite(paths['tiled_tif'], img[..., ::-1], tile=(64, 64), compression='zlib', photometric='rgb')
+    tifffile.imwrite(paths['stripped_tif'], img[..., ::-1], rowsperstrip=48, photometric='rgb')
+
+    return paths
+
+
+def test_strip_reader_matches_imread():
+    """strip reader가 cv2.imread와 동일한 픽셀을 반환하는지 테스트"""
+    print("=== strip reader 픽셀 일치 테스트 ===")
+
+    try:
+        import cv2
+        from strip_reader import open_strip_reader
+    except ImportError as e:
+        print(f"✗ strip_reader import 실패: {e}")
+        return False
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        paths = make_test_images(tmp_dir)
+
+        for name, path in paths.items():
+            reference = cv2.imread(path, cv2.IMREAD_COLOR)
+
+            with open_strip_reader(path, cache_dir=tmp_dir) as reader:
+                assert reader.shape == reference.shape, f"{name}: shape {reader.shape}"
+                for y0, y1 in [(0, 300), (0, 1), (37, 101), (64, 128), (250, 300)]:
+                    assert np.array_equal(reader.read_rows(y0, y1), reference[y0:y1]), f"{name}: rows {y0}-{y1} differ"
+
+                print(f"✓ {name}: {type(reader).__name__} 픽셀 동일")
+
+    print("✓ strip reader 테스트 완료.\n")
+    return True
+
+
+def test_reader_selection():
+    """형식별로 띠 단위 reader가 선택되는지, 검증되지 않은 Pillow에서는 mmcv.imread를 사용하는지 테스트"""
+    print("=== strip reader 선택 테스트 ===")
+
+    try:
+        import PIL
+        import cv2
+        import strip_reader
+        from strip_reader import open_strip_reader, DiskBackedStripReader, TiffStripReader, ArrayStripReader
+    except ImportError as e:
+        print(f"✗ strip_reader import 실패: {e}")
+        return False
+
+    # the disk-backed decoder uses Pillow internals, requirements.txt pins the tested versions
+    assert strip_reader.pillow_decoder_supported(), f"Pillow {PIL.__version__} is not in {strip_reader.PILLOW_TESTED_VERSIONS}"
+
+    expected_types = {
+        'png': DiskBackedStripReader,
+        'jpg': DiskBackedStripReader,
+        'gray_png': DiskBackedStripReader,
+        'rgba_png': ArrayStripReader,
+        'tiled_tif': TiffStripReader,
+        'stripped_tif': TiffStripReader,
+    }
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        paths = make_test_images(tmp_dir)
+
+        for name, path in paths.items():
+            with open_strip_reader(path, cache_dir=tmp_dir) as reader:
+                assert type(reader) is expected_types[name], f"{name}: {type(reader).__name__}"
+        print(f"✓ Pillow {PIL.__version__}: JPEG/PNG는 DiskBackedStripReader, TIFF는 TiffStripReader")
+
+        # another Pillow version may have changed the decoder internals, the image is loaded as a whole instead
+        original_version = PIL.__version__
+        PIL.__version__ = '{}.{}.0'.format(*strip_reader.PILLOW_TESTED_VERSIONS[1])
+        try:
+            with open_strip_reader(paths['jpg'], cache_dir=tmp_dir) as reader:
+                assert type(reader) is ArrayStripReader
+                assert np.array_equal(reader.read_rows(0, 300), cv2.imread(paths['jpg']))
+        finally:
+            PIL.__version__ = original_version
+        print("✓ 검증되지 않은 Pillow 버전은 mmcv.imread로 읽음")
+
+    print("✓ strip reader 선택 테스트 완료.\n")
+    return True
+
+
+def test_streaming_inference_matches_in_memory():
+    """strip reader 입력의 추론 결과가 메모리 이미지 입력과 동일한지 테스트"""
+    print("=== 스트리밍 추론 테스트 ===")
+
+    try:
+        import cv2
+        import utils
+        from strip_reader import open_strip_reader, create_disk_backed_mask
+    except ImportError as e:
+        print(f"✗ utils import 실패: {e}")
+        return False
+
+    original_inference_model = utils.inference_model
+    utils.inference_model = stub_inference_model
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            paths = make_test_images(tmp_dir)
+
+            for name in ['png', 'tiled_tif']:
+                img = cv2.imread(paths[name])
+                _, reference_mask = utils.inference_segmentor_sliding_window(
+                    StubModel(), img, color_mask=None, window_size=64, overlap_ratio=0.25, batch_size=3, blend='cosine'
+                )
+
+                with open_strip_reader(paths[name], cache_dir=tmp_dir) as reader:
+                    mask_output = create_disk_backed_mask(reader.shape, cache_dir=tmp_dir)
+                    img_result, mask = utils.inference_segmentor_sliding_window(
+                        StubModel(), reader, color_mask=None, window_size=64, overlap_ratio=0.25, batch_size=3, blend='cosine',
+                        mask_output=mask_output
+                    )
+
+                assert img_result is None
+                assert np.array_equal(np.asarray(mask), reference_mask), f"{name}: streaming mask differs"
+                print(f"✓ {name}: 스트리밍 마스크가 메모리 추론 결과와 동일")
+    finally:
+        utils.inference_model = original_inference_model
+
+    print("✓ 스트리밍 추론 테스트 완료.\n")
+    return True
+
+
+def test_write_tiff_strips():
+    """띠 단위로 저장한 TIFF가 원본 이미지와 동일한지 테스트"""
+    print("=== 띠 단위 TIFF 저장 테스트 ===")
+
+    try:
+        import cv2
+        from strip_reader import write_tiff_strips, open_strip_reader, TiffStripReader, TIFF_TILE_SIZE
+    except ImportError as e:
+        print(f"✗ strip_reader import 실패: {e}")
+        return False
+
+    rng = np.random.default_rng(1)
+    img = rng.integers(0, 256, (700, 530, 3), dtype=np.uint8)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # only the strips requested by the writer are read, one at a time
+        requested = []
+        def read_rows(y0, y1):
+            requested.append((y0, y1))
+            return img[y0:y1]
+
+        path = os.path.join(tmp_dir, 'result.tif')
+        downscaled = write_tiff_strips(path, read_rows, img.shape, strip_height=300, downscale=4)
+        assert requested == [(0, 2 * TIFF_TILE_SIZE), (2 * TIFF_TILE_SIZE, 700)]
+        assert np.array_equal(cv2.imread(path), img)
+        assert downscaled.shape == (175, 133, 3)
+        assert np.abs(downscaled.astype(int) - cv2.resize(img, (133, 175), interpolation=cv2.INTER_AREA)).max() <= 1
+
+        # the written file is tiled, so it is read back strip by strip as well
+        with open_strip_reader(path) as reader:
+            assert type(reader) is TiffStripReader
+            assert np.array_equal(reader.read_rows(250, 600), img[250:600])
+        print("✓ BGR 이미지: 띠 단위 저장, TiffStripReader로 다시 읽기")
+
+        gray = img[..., 1]
+        gray_path = os.path.join(tmp_dir, 'gray.tiff')
+        assert write_tiff_strips(gray_path, lambda y0, y1: gray[y0:y1], gray.shape) is None
+        assert np.array_equal(cv2.imread(gray_path, cv2.IMREAD_UNCHANGED), gray)
+        print("✓ 단일 채널 이미지 띠 단위 저장")
+
+    print("✓ 띠 단위 TIFF 저장 테스트 완료.\n")
+    return True
+
+
+def main():
+    """메인 테스트 함수"""
+    tests = [
+        test_strip_reader_matches_imread,
+        test_reader_selection,
+        test_streaming_inference_matches_in_memory,
+        test_write_tiff_strips,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except Exception as e:
+            print(f"✗ 테스트 실행 중 오류 발생: {e}\n")
+
+    print(f"통과: {passed}/{len(tests)}")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
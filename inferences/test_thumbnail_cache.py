@@ -0,0 +1,208 @@
+"""
+Thumbnail Cache Test Script
+썸네일 캐시 테스트 스크립트
+
+This script checks that thumbnail_cache stores the thumbnails of an image by content hash and size,
+that moved, copied or touched images still find them, that the least recently used thumbnails are
+removed under the disk budget, and that the PyDracula reader uses the thumbnails made by the scripts.
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import numpy as np
+
+# PyDracula/modules/thumbnail_cache.py is loaded by path, its package imports the whole GUI
+VIEWER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'PyDracula', 'modules', 'thumbnail_cache.py')
+
+
+def write_images(image_dir, num_images, shape=(400, 400, 3)):
+    """Random images written as JPG, returned with their arrays"""
+    import cv2
+
+    rng = np.random.default_rng(0)
+    images = []
+    for i in range(num_images):
+        image = rng.integers(0, 256, shape, dtype=np.uint8)
+        path = os.path.join(image_dir, f'image_{i}.jpg')
+        cv2.imwrite(path, image)
+        images.append((path, image))
+
+    return images
+
+
+def test_add_and_validate():
+    """내용 해시 기반 저장, 이동/수정된 이미지 검증 테스트"""
+    print("=== 썸네일 추가 / 검증 테스트 ===")
+
+    try:
+        import cv2
+        from thumbnail_cache import ThumbnailCache, thumbnail_shape
+    except ImportError as e:
+        print(f"✗ thumbnail_cache import 실패: {e}")
+        return False
+
+    assert thumbnail_shape((400, 400), 60) == (60, 60) and thumbnail_shape((300, 600, 3), 200) == (200, 100)
+    assert thumbnail_shape((40, 50), 60) == (50, 40)
+    print("✓ 썸네일 크기 (긴 변 기준, 확대하지 않음)")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        images = write_images(tmp_dir, 3, shape=(300, 400, 3))
+        cache = ThumbnailCache(os.path.join(tmp_dir, 'thumbnails'))
+
+        digests = [cache.add(path, image) for path, image in images]
+        for (path, _), digest in zip(images, digests):
+            for size in (60, 200):
+                thumbnail = cv2.imread(cache.get(path, size))
+                assert cache.get(path, size) == cache.path(digest, size)
+                assert max(thumbnail.shape[:2]) == size
+        print("✓ 60px / 200px 썸네일 저장")
+
+        # a copy (other path and mtime) is hashed and finds the same thumbnails, a changed image gets new ones
+        copy_path = os.path.join(tmp_dir, 'copy', 'image_0.jpg')
+        os.makedirs(os.path.dirname(copy_path))
+        shutil.copy(images[0][0], copy_path)
+        assert cache.get(copy_path, 60) == cache.get(images[0][0], 60)
+
+        cv2.imwrite(images[1][0], 255 - images[1][1])
+        assert cache.get(images[1][0], 60) is None
+        assert cache.add_file(images[1][0]) != digests[1]
+        assert cache.get(images[1][0], 60) is not None
+        print("✓ 복사 / 변경된 이미지 검증")
+
+        # unchanged images are not hashed again
+        calls = []
+        import thumbnail_cache
+        original_image_digest = thumbnail_cache.image_digest
+        thumbnail_cache.image_digest = lambda path: calls.append(path) or original_image_digest(path)
+        try:
+            cache.get(images[2][0], 200)
+        finally:
+            thumbnail_cache.image_digest = original_image_digest
+        assert calls == []
+        print("✓ 크기 / 수정 시간이 같으면 해시 생략")
+
+        cache.close()
+
+    print("✓ 썸네일 추가 / 검증 테스트 완료.\n")
+    return True
+
+
+def test_lru_budget():
+    """디스크 예산 초과 시 가장 오래 사용하지 않은 썸네일 삭제 테스트"""
+    print("=== 썸네일 디스크 예산 테스트 ===")
+
+    try:
+        from thumbnail_cache import ThumbnailCache
+    except ImportError as e:
+        print(f"✗ thumbnail_cache import 실패: {e}")
+        return False
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        images = write_images(tmp_dir, 6)
+        cache = ThumbnailCache(os.path.join(tmp_dir, 'thumbnails'))
+        for path, image in images:
+            cache.add(path, image)
+            time.sleep(0.01)
+
+        # the oldest images are used again and survive, the others are removed first
+        for path, _ in images[:2]:
+            cache.get(path, 60)
+            cache.get(path, 200)
+
+        per_image = cache.total_bytes() / len(images)
+        removed = cache.evict(budget_bytes=int(per_image * 3))
+        assert cache.total_bytes() <= per_image * 3 and removed >= 6
+        assert all(cache.get(path, 60) is not None for path, _ in images[:2])
+        assert cache.get(images[2][0], 200) is None
+
+        kept = sum(len(files) for _, _, files in os.walk(os.path.join(tmp_dir, 'thumbnails', '200')))
+        assert kept == cache.conn.execute('SELECT COUNT(*) FROM thumbnails WHERE size = 200').fetchone()[0]
+        print(f"✓ 썸네일 {removed}개 삭제, 최근 사용한 썸네일 유지")
+
+        cache.close()
+
+    print("✓ 썸네일 디스크 예산 테스트 완료.\n")
+    return True
+
+
+def test_viewer_reads_script_thumbnails():
+    """PyDracula 읽기 모듈이 스크립트가 만든 썸네일을 사용하는지 테스트"""
+    print("=== 뷰어 썸네일 조회 테스트 ===")
+
+    try:
+        import importlib.util
+        from thumbnail_cache import ThumbnailCache
+
+        spec = importlib.util.spec_from_file_location('pydracula_thumbnail_cache', VIEWER_PATH)
+        viewer = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(viewer)
+    except ImportError as e:
+        # the viewer side needs PySide6, which only PyDracula's environment has: reported as skipped, not passed
+        import pytest
+        pytest.skip(f"PySide6 import 실패: {e}")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        images = write_images(tmp_dir, 4)
+        cache_dir = os.path.join(tmp_dir, 'thumbnails')
+
+        cache = ThumbnailCache(cache_dir)
+        script_paths = [cache.path(cache.add(path, image), 60) for path, image in images[:2]]
+        script_mtimes = [os.stat(path).st_mtime_ns for path in script_paths]
+        cache.close()
+
+        # copied into the viewer's image folder, the thumbnails of the scripts are reused as they are
+        viewer_dir = os.path.join(tmp_dir, 'Images')
+        shutil.copytree(tmp_dir, viewer_dir, ignore=shutil.ignore_patterns('thumbnails'))
+        viewer_cache = viewer.ThumbnailCache(cache_dir, budget_bytes=10 ** 9)
+        made_by_script = [viewer_cache.thumbnail(os.path.join(viewer_dir, os.path.basename(path)), 60) for path, _ in images[:2]]
+        assert made_by_script == script_paths
+        assert [os.stat(path).st_mtime_ns for path in made_by_script] == script_mtimes
+
+        # the map only links thumbnails which are already cached, it never hashes or decodes an image
+        assert viewer_cache.cachedThumbnail(os.path.join(viewer_dir, os.path.basename(images[0][0])), 60) == script_paths[0]
+        assert viewer_cache.cachedThumbnail(images[3][0], 200) is None
+
+        # missing thumbnails are made by the viewer, in both sizes
+        made_by_viewer = viewer_cache.thumbnail(images[3][0], 200)
+        assert made_by_viewer is not None and os.path.exists(made_by_viewer.replace(os.sep + '200' + os.sep, os.sep + '60' + os.sep))
+        assert viewer_cache.thumbnail(os.path.join(tmp_dir, 'missing.jpg'), 60) is None
+        viewer_cache.close()
+        print("✓ 스크립트 썸네일 재사용, 없는 썸네일 생성")
+
+        # and the scripts find the thumbnails made by the viewer
+        cache = ThumbnailCache(cache_dir)
+        assert cache.get(images[3][0], 200) == made_by_viewer
+        assert cache.add_file(images[3][0]) == os.path.basename(made_by_viewer)[:-len('.jpg')]
+        cache.close()
+        print("✓ 뷰어가 만든 썸네일을 스크립트가 사용")
+
+    print("✓ 뷰어 썸네일 조회 테스트 완료.\n")
+    return True
+
+
+def main():
+    """메인 테스트 함수"""
+    tests = [
+        test_add_and_validate,
+        test_lru_budget,
+        test_viewer_reads_script_thumbnails,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except Exception as e:
+            print(f"✗ 테스트 실행 중 오류 발생: {e}\n")
+
+    print(f"통과: {passed}/{len(tests)}")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,191 @@
+"""
+Thumbnail Cache
+PyDracula 목록 아이콘/지도 팝업용 썸네일 캐시 (이미지 내용 해시 기반)
+
+Thumbnails are stored by the content hash of the image shown by the viewer and by size
+(layout and manifest schema in thumbnail_layout.py). The manifest maps image paths to their hash,
+validated by size and modification time (a copied or touched image is hashed again and still finds its
+thumbnails), and records the size and last access of every thumbnail. When the thumbnails exceed the
+disk budget, the least recently used are removed.
+
+The inference scripts add the thumbnails of the result images they write, from the image already in
+memory, so the viewer reads N small files at startup instead of decoding N full images.
+PyDracula reads the cache with modules/thumbnail_cache.py (and adds the thumbnails it misses),
+both import the layout from thumbnail_layout.py.
+"""
+
+import os
+import time
+import tempfile
+
+import cv2
+
+from thumbnail_layout import THUMBNAIL_SIZES, THUMBNAIL_SUFFIX, THUMBNAIL_QUALITY, thumbnail_path, image_digest, open_manifest
+
+
+def thumbnail_shape(shape, size):
+    """(width, height) of a thumbnail with the longest side of size pixels, images are never enlarged"""
+    height, width = shape[:2]
+    scale = min(1.0, size / max(height, width))
+
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+class ThumbnailCache():
+    """
+    Content addressed thumbnail cache shared by the inference scripts and PyDracula
+    Args:
+        cache_dir (str): The cache directory.
+        sizes (tuple): The thumbnail sizes (longest side in pixels).
+        budget_bytes (int): The disk budget of the thumbnails, enforced on close (None: unlimited).
+    """
+    def __init__(self, cache_dir, sizes=THUMBNAIL_SIZES, budget_bytes=None):
+        self.cache_dir = cache_dir
+        self.sizes = tuple(sizes)
+        self.budget_bytes = budget_bytes
+
+        # the scripts use the cache from one thread at a time (the caller, then the pipeline writer thread)
+        self.conn = open_manifest(cache_dir)
+
+    def path(self, digest, size):
+        return thumbnail_path(self.cache_dir, digest, size)
+
+    def digest(self, source_path):
+        """
+        Content hash of an image, read from the manifest when its size and modification time did not change
+        Args:
+            source_path (str): The image path.
+
+        Returns:
+            digest (str): The hex SHA-256 digest.
+        """
+        source_path = os.path.abspath(source_path)
+        stat = os.stat(source_path)
+
+        row = self.conn.execute('SELECT size, mtime_ns, digest FROM sources WHERE path = ?', (source_path,)).fetchone()
+        if row is not None and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return row[2]
+
+        digest = image_digest(source_path)
+        with self.conn:
+            self.conn.execute('INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?)',
+                              (source_path, stat.st_size, stat.st_mtime_ns, digest))
+
+        return digest
+
+    def downscale_factor(self, shape):
+        """Integer factor an image may be downscaled by before add, keeping the largest thumbnail size (e.g. for write_tiff_strips)"""
+        return max(1, max(shape[:2]) // max(self.sizes))
+
+    def add(self, source_path, image):
+        """
+        Add the thumbnails of an image which was just written
+        Args:
+            source_path (str): The written image, the file shown by the viewer.
+            image (ndarray): The same image in memory (BGR or grayscale), resized instead of decoding the file.
+                It may be downscaled by downscale_factor first, for images written strip by strip.
+
+        Returns:
+            digest (str): The content hash of the image.
+        """
+        digest = self.digest(source_path)
+        now = time.time()
+
+        rows = []
+        for size in self.sizes:
+            path = self.path(digest, size)
+            if not os.path.exists(path):
+                thumbnail = cv2.resize(image, thumbnail_shape(image.shape, size), interpolation=cv2.INTER_AREA)
+                ok, encoded = cv2.imencode(THUMBNAIL_SUFFIX, thumbnail, [cv2.IMWRITE_JPEG_QUALITY, THUMBNAIL_QUALITY])
+                if not ok:
+                    raise ValueError(f"Cannot encode the thumbnail of {source_path}")
+                self._write(path, encoded.tobytes())
+            rows.append((digest, size, os.path.getsize(path), now))
+
+        with self.conn:
+            self.conn.executemany('INSERT OR REPLACE INTO thumbnails VALUES (?, ?, ?, ?)', rows)
+
+        return digest
+
+    def add_file(self, source_path):
+        """Add the thumbnails of an existing image, decoded only when one of them is missing"""
+        digest = self.digest(source_path)
+        if all(os.path.exists(self.path(digest, size)) for size in self.sizes):
+            with self.conn:
+                self.conn.execute('UPDATE thumbnails SET last_access = ? WHERE digest = ?', (time.time(), digest))
+            return digest
+
+        image = cv2.imread(source_path, cv2.IMREAD_UNCHANGED)
+        if image is None:
+            raise ValueError(f"Cannot read {source_path}")
+
+        return self.add(source_path, image)
+
+    def get(self, source_path, size):
+        """
+        Thumbnail of an image
+        Args:
+            source_path (str): The image path.
+            size (int): The thumbnail size.
+
+        Returns:
+            path (str): The thumbnail file, None when it is not cached.
+        """
+        digest = self.digest(source_path)
+        path = self.path(digest, size)
+        if not os.path.exists(path):
+            return None
+
+        with self.conn:
+            self.conn.execute('UPDATE thumbnails SET last_access = ? WHERE digest = ? AND size = ?', (time.time(), digest, size))
+        return path
+
+    def _write(self, path, data):
+        # written to a temporary file and renamed, readers never see a partial thumbnail
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def total_bytes(self):
+        return self.conn.execute('SELECT COALESCE(SUM(bytes), 0) FROM thumbnails').fetchone()[0]
+
+    def evict(self, budget_bytes=None):
+        """
+        Remove the least recently used thumbnails until they fit in the disk budget
+        Args:
+            budget_bytes (int): The budget, the one of the cache by default.
+
+        Returns:
+            removed (int): The number of removed thumbnails.
+        """
+        budget_bytes = self.budget_bytes if budget_bytes is None else budget_bytes
+        if budget_bytes is None:
+            return 0
+
+        excess = self.total_bytes() - budget_bytes
+        removed = []
+        for digest, size, num_bytes in self.conn.execute('SELECT digest, size, bytes FROM thumbnails ORDER BY last_access'):
+            if excess <= 0:
+                break
+            removed.append((digest, size))
+            excess -= num_bytes
+
+        for digest, size in removed:
+            try:
+                os.remove(self.path(digest, size))
+            except FileNotFoundError:
+                pass
+        with self.conn:
+            self.conn.executemany('DELETE FROM thumbnails WHERE digest = ? AND size = ?', removed)
+
+        return len(removed)
+
+    def close(self):
+        self.evict()
+        self.conn.close()
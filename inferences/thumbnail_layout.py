@@ -0,0 +1,71 @@
+"""
+Thumbnail Cache Layout
+썸네일 캐시 구조 (추론 스크립트와 PyDracula 공용)
+
+The layout of the thumbnail cache, shared by the writer of the inference scripts (thumbnail_cache.py,
+OpenCV) and the reader of the viewer (PyDracula/modules/thumbnail_cache.py, Qt):
+    cache_dir/<size>/<ab>/<sha256 of the image>.jpg
+    cache_dir/thumbnails.sqlite: image path -> content hash (validated by size and mtime),
+                                 size and last access of every thumbnail
+Only the standard library is imported, both sides import this module instead of repeating it.
+"""
+
+import os
+import sqlite3
+import hashlib
+
+THUMBNAIL_SIZES = (60, 200)
+THUMBNAIL_SUFFIX = '.jpg'
+THUMBNAIL_QUALITY = 85
+MANIFEST_NAME = 'thumbnails.sqlite'
+HASH_CHUNK_SIZE = 1 << 20
+
+SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS sources (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, digest TEXT)',
+    'CREATE TABLE IF NOT EXISTS thumbnails (digest TEXT, size INTEGER, bytes INTEGER, last_access REAL, PRIMARY KEY (digest, size))',
+    'CREATE INDEX IF NOT EXISTS thumbnails_last_access ON thumbnails (last_access)',
+]
+
+
+def thumbnail_path(cache_dir, digest, size):
+    """Path of the thumbnail of an image (by its content hash) at a size"""
+    return os.path.join(cache_dir, str(size), digest[:2], digest + THUMBNAIL_SUFFIX)
+
+
+def image_digest(path):
+    """
+    Content hash of an image, the key of its thumbnails
+    Args:
+        path (str): The image path.
+
+    Returns:
+        digest (str): The hex SHA-256 digest.
+    """
+    file_hash = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            file_hash.update(chunk)
+
+    return file_hash.hexdigest()
+
+
+def open_manifest(cache_dir):
+    """
+    Open the manifest of a cache, created when missing
+    The connection may be used from other threads, one at a time (check_same_thread=False).
+    Args:
+        cache_dir (str): The cache directory.
+
+    Returns:
+        conn (sqlite3.Connection): The manifest.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+
+    # the viewer may read and add thumbnails while a run writes
+    conn = sqlite3.connect(os.path.join(cache_dir, MANIFEST_NAME), timeout=30, check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    with conn:
+        for statement in SCHEMA:
+            conn.execute(statement)
+
+    return conn
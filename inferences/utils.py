@@ -1,5 +1,9 @@
 
+import math
+import time
+
 import mmcv 
+import cv2
 import numpy as np
 import mmengine
 
@@ -7,21 +11,238 @@ from mmseg.apis import inference_model
 
 import slidingwindow as sw
 
-def inference_segmentor_sliding_window(model, input_img, color_mask, score_thr = 0.1, window_size = 1024, overlap_ratio = 0.5, alpha=0.6):
+from strip_reader import StripReader, read_downscaled, create_disk_backed_array
+
+# rows of the probability maps of the multi-scale inference fused at once
+FUSE_ROWS = 1024
+
+
+class _ScaledImage():
+    """
+    An image (or a strip reader) seen at another scale, resized window by window when the windows are cropped,
+    so an upscaled image is never held in memory (only the windows which are run are resized)
+    """
+    def __init__(self, img, scale):
+        self.img = img
+        self.scale = scale
+        self.shape = (int(round(img.shape[0] * scale)), int(round(img.shape[1] * scale))) + img.shape[2:]
+
+    def source_rect(self, window):
+        """The (y0, y1, x0, x1) rectangle of the source image covered by a window of the scaled image"""
+        y0, x0 = int(window.y / self.scale), int(window.x / self.scale)
+        y1 = min(max(int(math.ceil((window.y + window.h) / self.scale)), y0 + 1), self.img.shape[0])
+        x1 = min(max(int(math.ceil((window.x + window.w) / self.scale)), x0 + 1), self.img.shape[1])
+        return y0, y1, x0, x1
+
+    def crop(self, window):
+        y0, y1, x0, x1 = self.source_rect(window)
+        interpolation = cv2.INTER_AREA if self.scale < 1 else cv2.INTER_LINEAR
+        if isinstance(self.img, StripReader):
+            source = self.img.read_rows(y0, y1)[:, x0:x1]
+        else:
+            source = self.img[y0:y1, x0:x1]
+        return cv2.resize(source, (window.w, window.h), interpolation=interpolation)
+
+
+def _crop_window(img, window):
+    """
+    Crop a window from a loaded image, a strip reader or a scaled image
+    Args:
+        img (ndarray, StripReader or _ScaledImage): The loaded image, the strip reader or the scaled image.
+        window (SlidingWindow): The window.
+
+    Returns:
+        img_subset (ndarray): The window image. The shape is (h, w, 3).
+    """
+    if isinstance(img, StripReader):
+        return img.read_rows(window.y, window.y + window.h)[:, window.x:window.x + window.w]
+
+    if isinstance(img, _ScaledImage):
+        return img.crop(window)
+
+    return img[window.indices()]
+
+
+def window_edge_energy(img_subset, downscale=4):
+    """
+    Cheap crack likelihood of a window. Cracks are thin dark lines with strong local gradients,
+    while sky, water and plain concrete are smooth, so a high percentile of the gradient magnitude
+    on a downscaled window separates them without running the segmentor.
+    Args:
+        img_subset (ndarray): The window image. The shape is (h, w, 3).
+        downscale (int): The downscale factor applied before computing gradients.
+
+    Returns:
+        edge_energy (float): The 99th percentile of the gradient magnitude.
+    """
+    gray = cv2.cvtColor(img_subset, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (max(gray.shape[1] // downscale, 1), max(gray.shape[0] // downscale, 1)), interpolation=cv2.INTER_AREA)
+
+    grad_x = cv2.Sobel(small, cv2.CV_32F, 1, 0, ksize=3)
+    grad_y = cv2.Sobel(small, cv2.CV_32F, 0, 1, ksize=3)
+
+    return float(np.percentile(cv2.magnitude(grad_x, grad_y), 99))
+
+
+def _iter_window_results(model, img, windows, batch_size, gate_threshold=None, window_stats=None):
+    """
+    Run the model over sliding windows in batches
+    Args:
+        model (nn.Module): The loaded detector.
+        img (ndarray, StripReader or _ScaledImage): The loaded image, the strip reader or the scaled image.
+        windows (list): The windows generated by slidingwindow.
+        batch_size (int): The number of windows forwarded through the model at once.
+        gate_threshold (float): Windows whose edge energy is below this value are skipped. None runs every window.
+        window_stats (dict): Optional dict updated with the number of windows and skipped windows.
+
+    Yields:
+        window (SlidingWindow): The window.
+        result (SegDataSample): The segmentation result of the window.
+    """
+    batch_size = max(int(batch_size), 1)
+    skipped_windows = 0
+    window_batch = []
+    img_subsets = []
+
+    for i, window in enumerate(mmengine.track_iter_progress(windows)):
+        img_subset = _crop_window(img, window)
+
+        if gate_threshold is not None and window_edge_energy(img_subset) < gate_threshold:
+            skipped_windows += 1
+        else:
+            window_batch.append(window)
+            img_subsets.append(img_subset)
+
+        if len(window_batch) == batch_size or (i == len(windows) - 1 and window_batch):
+            # A list input makes inference_model run the whole batch in a single forward pass.
+            results = inference_model(model, img_subsets)
+
+            for window_result in zip(window_batch, results):
+                yield window_result
+
+            window_batch = []
+            img_subsets = []
+
+    if window_stats is not None:
+        window_stats['windows'] = window_stats.get('windows', 0) + len(windows)
+        window_stats['skipped_windows'] = window_stats.get('skipped_windows', 0) + skipped_windows
+
+
+def _window_weight(height, width, blend):
+    """
+    Create blending weight of a window, which is high at the center and low at the borders
+    Args:
+        height (int): The window height.
+        width (int): The window width.
+        blend (str): The blending mode. 'cosine' or 'gaussian'.
+
+    Returns:
+        weight (ndarray): The window weight. The shape is (height, width).
+    """
+    def _profile(n):
+        if blend == 'cosine':
+            return np.sin(np.pi * (np.arange(n) + 0.5) / n)
+        if blend == 'gaussian':
+            sigma = n / 4
+            return np.exp(-0.5 * ((np.arange(n) - (n - 1) / 2) / sigma) ** 2)
+        raise ValueError(f'Unsupported blend mode: {blend}')
+
+    return np.outer(_profile(height), _profile(width)).astype(np.float32)
+
+
+def _seg_probabilities(result):
+    """
+    Convert the segmentation logits of a window to class probabilities
+    Args:
+        result (SegDataSample): The segmentation result of the window.
+
+    Returns:
+        probabilities (ndarray): The class probabilities. The shape is (C, H, W).
+    """
+    logits = result.seg_logits.data.cpu().numpy().astype(np.float32)
+
+    # single channel decode heads predict the crack probability with sigmoid
+    if logits.shape[0] == 1:
+        crack_prob = 1 / (1 + np.exp(-logits[0]))
+        return np.stack([1 - crack_prob, crack_prob])
+
+    logits = logits - logits.max(axis=0, keepdims=True)
+    probabilities = np.exp(logits)
+
+    return probabilities / probabilities.sum(axis=0, keepdims=True)
+
+
+def _blend_window_results(window_results, mask_output, blend):
+    """
+    Blend overlapping window probabilities and write the argmax to mask_output.
+    Windows must arrive sorted by (y, x). Only one strip of window height is kept in memory,
+    and rows are written to mask_output as soon as no later window can touch them.
+    Args:
+        window_results (iterable): (window, result) pairs sorted by window position.
+        mask_output (ndarray): The zero-filled result mask to be filled. The shape is (H, W).
+        blend (str): The blending mode. 'cosine' or 'gaussian'.
+    """
+    prob_sum = None
+    strip_top = 0
+
+    def _flush(num_rows):
+        # rows beyond the strip were not covered by any window (skipped by the gate) and stay background
+        num_rows = min(num_rows, prob_sum.shape[1])
+
+        # weights are positive, so the argmax of the weighted sum needs no normalization
+        mask_output[strip_top:strip_top + num_rows] = np.argmax(prob_sum[:, :num_rows], axis=0)
+        prob_sum[:, :-num_rows] = prob_sum[:, num_rows:]
+        prob_sum[:, -num_rows:] = 0
+
+    for window, result in window_results:
+        probabilities = _seg_probabilities(result)
+
+        if prob_sum is None:
+            weight = _window_weight(window.h, window.w, blend)
+            prob_sum = np.zeros((probabilities.shape[0], window.h, mask_output.shape[1]), dtype=np.float32)
+
+        if window.y > strip_top:
+            _flush(window.y - strip_top)
+            strip_top = window.y
+
+        strip_rows = slice(window.y - strip_top, window.y - strip_top + window.h)
+        prob_sum[:, strip_rows, window.x:window.x + window.w] += probabilities * weight
+
+    if prob_sum is not None:
+        _flush(mask_output.shape[0] - strip_top)
+
+
+def inference_segmentor_sliding_window(model, input_img, color_mask, score_thr = 0.1, window_size = 1024, overlap_ratio = 0.5, alpha=0.6, batch_size=1, blend=None, mask_output=None,
+                                       gate_threshold=None, window_stats=None, roi_scale=None, roi_threshold=0.2, roi_margin=128):
 
     """
     Inference by sliding window
     Args:
         model (nn.Module): The loaded detector.
-        input_img (str or ndarray): The image filename or loaded image.
+        input_img (str, ndarray or StripReader): The image filename, loaded image or strip reader.
+            A strip reader decodes only the rows of the current window row, so the full image is never loaded.
         color_mask (ndarray): The color mask for each class.
         score_thr (float): The threshold of bbox score.
         window_size (int): The size of sliding window.
         overlap_ratio (float): The overlap ratio of sliding window.
         alpha (float): The transparency of mask.
+        batch_size (int): The number of windows forwarded through the model at once.
+        blend (str): How overlapping windows are merged. None keeps the last window's prediction,
+            'cosine' or 'gaussian' blends class probabilities with center-weighted windows.
+        mask_output (ndarray): Optional zero-filled boolean array of shape (H, W) to write the mask into, e.g. a disk-backed np.memmap.
+        gate_threshold (float): Skip windows whose edge energy (see window_edge_energy) is below this value.
+            Skipped windows are treated as background. None runs the segmentor on every window.
+        window_stats (dict): Optional dict updated with 'windows' and 'skipped_windows' counts.
+            With roi_scale also 'roi_skipped_windows' (included in 'skipped_windows') and 'coarse_windows'.
+        roi_scale (float): Coarse-to-fine mode: the scale of a first pass over the whole downscaled image.
+            Only the windows covering a region whose coarse crack probability is above roi_threshold
+            (dilated by roi_margin) are run, the others are treated as background. None runs every window.
+            Strip readers are downscaled by the nearest integer factor, strip by strip.
+        roi_threshold (float): The coarse crack probability above which a region is run at full resolution.
+        roi_margin (int): The margin run around the candidate regions, in pixels of the image.
 
     Returns:
-        img_result (ndarray): The result image. The shape is (H, W, 3).
+        img_result (ndarray): The result image. The shape is (H, W, 3). None when input_img is a strip reader.
         mask_output (ndarray): The result mask. The shape is (H, W).
     """
 
@@ -33,19 +254,30 @@ def inference_segmentor_sliding_window(model, input_img, color_mask, score_thr =
 
     # Generate the set of windows, with a 256-pixel max window size and 50% overlap
     windows = sw.generate(img, sw.DimOrder.HeightWidthChannel, window_size, overlap_ratio)
-    mask_output = np.zeros((img.shape[0], img.shape[1]), dtype=bool)
+    if mask_output is None:
+        mask_output = np.zeros((img.shape[0], img.shape[1]), dtype=bool)
 
+    if roi_scale is not None:
+        windows = _roi_windows(model, img, windows, roi_scale, roi_threshold, roi_margin, window_size, overlap_ratio, batch_size, blend,
+                               window_stats)
 
-    for window in mmengine.track_iter_progress(windows):
-        # Add print option for sliding window detection
-        img_subset = img[window.indices()]
-        results = inference_model(model, img_subset)
-        mask_output[window.indices()] = results.pred_sem_seg.data.cpu().numpy()
+    # strip readers are read row by row, so each image row is decoded only once
+    if isinstance(img, StripReader):
+        windows = sorted(windows, key=lambda window: (window.y, window.x))
 
-    mask_output = mask_output.astype(np.uint8)
-    mask_output[mask_output > 1] = 1
+    if blend is None:
+        for window, result in _iter_window_results(model, img, windows, batch_size, gate_threshold, window_stats):
+            mask_output[window.indices()] = result.pred_sem_seg.data.cpu().numpy()
+    else:
+        windows = sorted(windows, key=lambda window: (window.y, window.x))
+        window_results = _iter_window_results(model, img, windows, batch_size, gate_threshold, window_stats)
+        _blend_window_results(window_results, mask_output, blend)
 
-    mask_output_bool = mask_output.astype(bool)
+    mask_output_bool = mask_output
+    mask_output = mask_output.view(np.uint8)
+
+    if isinstance(img, StripReader):
+        return None, mask_output
 
     # Add colors to detection result on img
     img_result = img
@@ -55,4 +287,328 @@ def inference_segmentor_sliding_window(model, input_img, color_mask, score_thr =
         img_result[mask_output_bool, :] = img_result[mask_output_bool,:] * (1-alpha) + color_mask * alpha
     
 
-    return img_result, mask_output
\ No newline at end of file
+    return img_result, mask_output
+
+
+def _accumulate_window_probabilities(model, img, windows, batch_size, blend, prob_sum, weight_sum, gate_threshold=None, window_stats=None):
+    """
+    Run the windows and add their blend-weighted crack probabilities to prob_sum and the weights to weight_sum
+    Args:
+        model (nn.Module): The loaded detector.
+        img (ndarray, StripReader or _ScaledImage): The image the windows were generated on.
+        windows (list): The windows to run.
+        batch_size (int): The number of windows forwarded through the model at once.
+        blend (str): The blending mode. 'cosine' or 'gaussian', None weights every pixel of a window equally.
+        prob_sum (ndarray): The float32 crack probability sums. The shape is (H, W), the size of the image
+            or of the source image of a _ScaledImage (the windows are resized back to it).
+        weight_sum (ndarray): The float32 weight sums. The shape is the shape of prob_sum.
+        gate_threshold (float): Windows whose edge energy is below this value are skipped. None runs every window.
+        window_stats (dict): Optional dict updated with the number of windows and skipped windows.
+    """
+    weight = None
+
+    for window, result in _iter_window_results(model, img, windows, batch_size, gate_threshold, window_stats):
+        # the last class is the crack (background and crack classes)
+        window_prob = _seg_probabilities(result)[-1]
+        if weight is None:
+            weight = np.ones((window.h, window.w), dtype=np.float32) if blend is None else _window_weight(window.h, window.w, blend)
+        window_weight = weight
+
+        if isinstance(img, _ScaledImage):
+            y0, y1, x0, x1 = img.source_rect(window)
+            if (y1 - y0, x1 - x0) != window_prob.shape:
+                window_prob = cv2.resize(window_prob, (x1 - x0, y1 - y0), interpolation=cv2.INTER_LINEAR)
+                window_weight = cv2.resize(weight, (x1 - x0, y1 - y0), interpolation=cv2.INTER_LINEAR)
+        else:
+            y0, y1, x0, x1 = window.y, window.y + window.h, window.x, window.x + window.w
+
+        prob_sum[y0:y1, x0:x1] += window_prob * window_weight
+        weight_sum[y0:y1, x0:x1] += window_weight
+
+
+def _candidate_mask(coarse_prob, threshold, margin):
+    """
+    Candidate crack regions of the coarse pass
+    Args:
+        coarse_prob (ndarray): The crack probability of the coarse pass. The shape is (h, w).
+        threshold (float): The probability above which a coarse pixel is a candidate.
+        margin (int): The dilation of the candidates, in coarse pixels.
+
+    Returns:
+        candidates (ndarray): The uint8 candidate mask (1: candidate). The shape is (h, w).
+    """
+    candidates = (coarse_prob >= threshold).astype(np.uint8)
+    if margin > 0 and candidates.any():
+        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2 * margin + 1, 2 * margin + 1))
+        candidates = cv2.dilate(candidates, kernel)
+
+    return candidates
+
+
+def _windows_in_candidates(windows, scale, candidates, coarse_scale):
+    """
+    Windows generated at a scale which cover at least one candidate pixel of the coarse pass
+    Args:
+        windows (list): The windows of the image at the scale.
+        scale (float): The scale of the windows, relative to the source image.
+        candidates (ndarray): The candidate mask of the coarse pass.
+        coarse_scale (float): The scale of the coarse pass, relative to the source image.
+
+    Returns:
+        windows (list): The windows to run.
+    """
+    if not candidates.any():
+        return []
+
+    # number of candidates in any rectangle from four lookups
+    integral = cv2.integral(candidates)
+    height, width = candidates.shape
+    ratio = coarse_scale / scale
+
+    selected = []
+    for window in windows:
+        y0 = min(int(window.y * ratio), height - 1)
+        x0 = min(int(window.x * ratio), width - 1)
+        y1 = min(max(int(math.ceil((window.y + window.h) * ratio)), y0 + 1), height)
+        x1 = min(max(int(math.ceil((window.x + window.w) * ratio)), x0 + 1), width)
+        if integral[y1, x1] - integral[y0, x1] - integral[y1, x0] + integral[y0, x0] > 0:
+            selected.append(window)
+
+    return selected
+
+
+def _coarse_heatmap(model, img, coarse_scale, window_size, overlap_ratio, batch_size, blend):
+    """
+    Crack probability of the whole image downscaled once, by sliding window
+    Args:
+        model (nn.Module): The loaded detector. The last class is the crack.
+        img (ndarray or StripReader): The loaded image or the strip reader.
+        coarse_scale (float): The scale of the heatmap. Strip readers are downscaled by the nearest integer factor.
+        window_size (int): The size of sliding window.
+        overlap_ratio (float): The overlap ratio of sliding window.
+        batch_size (int): The number of windows forwarded through the model at once.
+        blend (str): The blending mode. 'cosine' or 'gaussian', None weights every pixel of a window equally.
+
+    Returns:
+        coarse_prob (ndarray): The float32 crack probability. The shape is about (H * coarse_scale, W * coarse_scale).
+        coarse_scale (float): The scale used.
+        num_windows (int): The number of windows run.
+    """
+    height, width = img.shape[:2]
+    if isinstance(img, StripReader):
+        factor = max(int(round(1 / coarse_scale)), 1)
+        coarse_img = read_downscaled(img.read_rows, img.shape, factor)
+        coarse_scale = 1 / factor
+    elif coarse_scale == 1:
+        coarse_img = img
+    else:
+        coarse_size = (max(int(round(width * coarse_scale)), 1), max(int(round(height * coarse_scale)), 1))
+        coarse_img = cv2.resize(img, coarse_size, interpolation=cv2.INTER_AREA if coarse_scale < 1 else cv2.INTER_LINEAR)
+    coarse_windows = sw.generate(coarse_img, sw.DimOrder.HeightWidthChannel, window_size, overlap_ratio)
+
+    coarse_prob = np.zeros(coarse_img.shape[:2], dtype=np.float32)
+    coarse_weight = np.zeros(coarse_img.shape[:2], dtype=np.float32)
+    _accumulate_window_probabilities(model, coarse_img, coarse_windows, batch_size, blend, coarse_prob, coarse_weight)
+    coarse_prob /= np.maximum(coarse_weight, 1e-12)
+
+    return coarse_prob, coarse_scale, len(coarse_windows)
+
+
+def _roi_windows(model, img, windows, roi_scale, roi_threshold, roi_margin, window_size, overlap_ratio, batch_size, blend, window_stats=None):
+    """
+    Plan the full resolution windows of the coarse-to-fine mode from a low resolution crack heatmap
+    Args:
+        model (nn.Module): The loaded detector.
+        img (ndarray or StripReader): The loaded image or the strip reader.
+        windows (list): The full resolution windows.
+        roi_scale (float): The scale of the heatmap.
+        roi_threshold (float): The heatmap probability above which a region is run.
+        roi_margin (int): The margin run around the candidate regions, in pixels of the image.
+        window_size (int): The size of sliding window.
+        overlap_ratio (float): The overlap ratio of sliding window.
+        batch_size (int): The number of windows forwarded through the model at once.
+        blend (str): The blending mode of the heatmap windows.
+        window_stats (dict): Optional dict updated with 'windows', 'skipped_windows', 'roi_skipped_windows' and 'coarse_windows'.
+
+    Returns:
+        windows (list): The windows to run, in the order of the input windows.
+    """
+    coarse_prob, coarse_scale, coarse_windows = _coarse_heatmap(model, img, roi_scale, window_size, overlap_ratio, batch_size, blend)
+    candidates = _candidate_mask(coarse_prob, roi_threshold, int(math.ceil(roi_margin * coarse_scale)))
+    planned = _windows_in_candidates(windows, 1.0, candidates, coarse_scale)
+
+    roi_skipped = len(windows) - len(planned)
+
+    # the windows not planned count as skipped, so 'windows' stays the full grid
+    if window_stats is not None:
+        for key, count in [('windows', roi_skipped), ('skipped_windows', roi_skipped), ('roi_skipped_windows', roi_skipped),
+                           ('coarse_windows', coarse_windows)]:
+            window_stats[key] = window_stats.get(key, 0) + count
+
+    return planned
+
+
+def _resize_rows(small, size, y0, y1):
+    """
+    Rows of a single channel float image upscaled with cv2.INTER_LINEAR, without the whole upscaled image
+    The columns are resized by OpenCV, the rows are interpolated as cv2.resize does (up to float32 rounding).
+    Args:
+        small (ndarray): The float32 image. The shape is (h, w).
+        size (tuple): The (width, height) of the upscaled image.
+        y0 (int): The first row of the upscaled image (inclusive).
+        y1 (int): The last row of the upscaled image (exclusive).
+
+    Returns:
+        rows (ndarray): The float32 rows [y0, y1) of the upscaled image. The shape is (y1 - y0, width).
+    """
+    width, height = size
+    small_height = small.shape[0]
+
+    # source row and weight of every row, clamped at the borders
+    fy = ((np.arange(y0, y1) + 0.5) * (small_height / height) - 0.5).astype(np.float32)
+    top = np.floor(fy).astype(np.int64)
+    fy -= top
+    fy[top < 0] = 0
+    top[top < 0] = 0
+    fy[top >= small_height - 1] = 0
+    top[top >= small_height - 1] = small_height - 1
+    bottom = np.minimum(top + 1, small_height - 1)
+
+    r0, r1 = top.min(), bottom.max() + 1
+    rows = cv2.resize(small[r0:r1], (width, r1 - r0), interpolation=cv2.INTER_LINEAR)
+
+    return rows[top - r0] * (1 - fy)[:, None] + rows[bottom - r0] * fy[:, None]
+
+
+def _image_array(shape, dtype, disk_backed, cache_dir=None):
+    """Zero-filled array of the image size, in a temporary file for strip readers"""
+    if disk_backed:
+        return create_disk_backed_array(shape, dtype, cache_dir)
+
+    return np.zeros(shape, dtype=dtype)
+
+
+def inference_segmentor_multi_scale(model, input_img, color_mask, coarse_scale=0.25, refine_scales=(1.0,), roi_threshold=0.2, roi_margin=128,
+                                    window_size=1024, overlap_ratio=0.1, alpha=0.6, batch_size=1, blend='cosine', gate_threshold=None,
+                                    prob_output=None, scale_stats=None, mask_output=None, cache_dir=None):
+    """
+    Multi-scale inference: a coarse pass over the whole downscaled image finds the candidate crack regions,
+    which are then refined at each scale of refine_scales (1.0 is the native resolution, above 1 the windows are
+    upscaled from the image, e.g. for models trained on upscaled images). Only the windows of a scale which cover
+    a candidate region are run. The crack probabilities of the refined scales are averaged, the pixels which no
+    refined window covered keep the probability of the coarse pass.
+    Probability maps of the image size are kept (about 13 bytes per pixel), in memory for a loaded image and in
+    temporary files for a strip reader, and are fused FUSE_ROWS rows at a time.
+    Args:
+        model (nn.Module): The loaded detector. The last class is the crack.
+        input_img (str, ndarray or StripReader): The image filename, loaded image or strip reader.
+            A strip reader decodes only the rows of the windows, so the full image is never loaded.
+        color_mask (ndarray): The color mask for each class.
+        coarse_scale (float): The scale of the coarse pass. 1 runs the coarse pass at the native resolution.
+            Strip readers are downscaled by the nearest integer factor, strip by strip.
+        refine_scales (sequence): The scales of the refined passes.
+        roi_threshold (float): The coarse crack probability above which a region is refined.
+            Lower than 0.5 (the crack decision), to refine what the coarse pass nearly found.
+        roi_margin (int): The margin refined around the candidates, in pixels of the source image.
+        window_size (int): The size of sliding window, at every scale.
+        overlap_ratio (float): The overlap ratio of sliding window.
+        alpha (float): The transparency of mask.
+        batch_size (int): The number of windows forwarded through the model at once.
+        blend (str): How overlapping windows of a scale are merged. 'cosine' or 'gaussian' weights the window
+            centers, None averages them equally.
+        gate_threshold (float): Skip the refined windows whose edge energy (see window_edge_energy) is below this value.
+            The skipped regions keep the coarse probability. None runs every refined window.
+        prob_output (ndarray): Optional float32 array of shape (H, W) to write the fused crack probability into,
+            e.g. a disk-backed np.memmap.
+        scale_stats (dict): Optional dict updated per scale with 'windows' (run), 'total_windows' (the full grid)
+            and 'seconds'. The keys are the scales, the coarse pass is under coarse_scale.
+        mask_output (ndarray): Optional boolean array of shape (H, W) to write the mask into, e.g. a disk-backed np.memmap.
+        cache_dir (str): The directory of the temporary probability maps of a strip reader. The default is the system temp directory.
+
+    Returns:
+        img_result (ndarray): The result image. The shape is (H, W, 3). None when input_img is a strip reader.
+        mask_output (ndarray): The result mask, crack where the fused probability is above 0.5. The shape is (H, W).
+    """
+    if isinstance(input_img, str):
+        img = mmcv.imread(input_img)
+    else:
+        img = input_img
+
+    height, width = img.shape[:2]
+    disk_backed = isinstance(img, StripReader)
+    if prob_output is None:
+        prob_output = _image_array((height, width), np.float32, disk_backed, cache_dir)
+    if mask_output is None:
+        mask_output = _image_array((height, width), bool, disk_backed, cache_dir)
+    bands = [(y0, min(y0 + FUSE_ROWS, height)) for y0 in range(0, height, FUSE_ROWS)]
+
+    def _record(scale, windows, total_windows, start):
+        if scale_stats is not None:
+            stats = scale_stats.setdefault(scale, {'windows': 0, 'total_windows': 0, 'seconds': 0.0})
+            stats['windows'] += windows
+            stats['total_windows'] += total_windows
+            stats['seconds'] += time.perf_counter() - start
+
+    # 1. Coarse pass over the whole image, downscaled once (it is small)
+    start = time.perf_counter()
+    coarse_prob, coarse_scale, coarse_windows = _coarse_heatmap(model, img, coarse_scale, window_size, overlap_ratio, batch_size, blend)
+    candidates = _candidate_mask(coarse_prob, roi_threshold, int(math.ceil(roi_margin * coarse_scale)))
+    _record(coarse_scale, coarse_windows, coarse_windows, start)
+
+    # 2. Refined passes over the candidate regions, averaged into prob_output
+    for y0, y1 in bands:
+        prob_output[y0:y1] = 0
+    refined_count = _image_array((height, width), np.uint8, disk_backed, cache_dir)
+    prob_sum = None
+
+    for scale in refine_scales:
+        start = time.perf_counter()
+        scaled_img = img if scale == 1 else _ScaledImage(img, scale)
+        windows = sw.generate(scaled_img, sw.DimOrder.HeightWidthChannel, window_size, overlap_ratio)
+        # in row order, so a strip reader decodes each image row once
+        refine_windows = sorted(_windows_in_candidates(windows, scale, candidates, coarse_scale), key=lambda window: (window.y, window.x))
+
+        window_stats = {'skipped_windows': 0}
+        if refine_windows:
+            if prob_sum is None:
+                prob_sum = _image_array((height, width), np.float32, disk_backed, cache_dir)
+                weight_sum = _image_array((height, width), np.float32, disk_backed, cache_dir)
+            else:
+                for y0, y1 in bands:
+                    prob_sum[y0:y1] = 0
+                    weight_sum[y0:y1] = 0
+            _accumulate_window_probabilities(model, scaled_img, refine_windows, batch_size, blend, prob_sum, weight_sum,
+                                             gate_threshold, window_stats)
+
+            for y0, y1 in bands:
+                weights = weight_sum[y0:y1]
+                refined = weights > 0
+                prob_output[y0:y1][refined] += prob_sum[y0:y1][refined] / weights[refined]
+                refined_count[y0:y1][refined] += 1
+        _record(scale, len(refine_windows) - window_stats['skipped_windows'], len(windows), start)
+
+    prob_sum = weight_sum = None
+
+    # 3. Average of the refined scales, the coarse probability where nothing was refined
+    for y0, y1 in bands:
+        probs = prob_output[y0:y1]
+        counts = refined_count[y0:y1]
+        refined = counts > 0
+        probs[refined] /= counts[refined]
+        probs[~refined] = _resize_rows(coarse_prob, (width, height), y0, y1)[~refined]
+        mask_output[y0:y1] = probs > 0.5
+    del refined_count
+
+    mask_output_bool = mask_output
+    mask_output = mask_output.view(np.uint8)
+
+    if isinstance(img, StripReader):
+        return None, mask_output
+
+    # Add colors to detection result on img
+    img_result = img
+
+    if color_mask is not None:
+        img_result[mask_output_bool, :] = img_result[mask_output_bool, :] * (1 - alpha) + color_mask * alpha
+
+    return img_result, mask_output